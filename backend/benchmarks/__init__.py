@@ -0,0 +1,3 @@
+"""
+One-off performance comparisons against a scratch database (see each module).
+"""
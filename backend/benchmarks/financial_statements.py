@@ -0,0 +1,220 @@
+"""
+Financial statement benchmark (run from backend/)
+
+    python -m benchmarks.financial_statements [--entries 1000000] [--runs 5] [--reseed]
+
+Seeds a scratch database (BENCH_DB_NAME, default "myerp_benchmark"; never the
+configured DB_NAME) with posted journal entries and their gl_entries lines, then
+computes per-account totals as of the last seeded day three ways:
+
+- loop:        the old report code - every posted entry shipped to Python and summed
+- je_pipeline: $match -> $unwind accounts -> $group by account -> $lookup accounts
+               on journal_entries
+- snapshots:   services/balance_snapshots.account_totals (month-end snapshot +
+               gl_entries delta, summed and joined server-side)
+
+Latency is wall time per run (median and max); wire bytes are the BSON size of
+the documents each variant receives. The first snapshots run builds every month
+and is reported separately as the cold build.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+CONFIGURED_DB = os.environ.get("DB_NAME", "test_database")
+BENCH_DB = os.environ.get("BENCH_DB_NAME", "myerp_benchmark")
+if BENCH_DB == CONFIGURED_DB:
+    sys.exit(f"BENCH_DB_NAME must differ from DB_NAME ({CONFIGURED_DB}); the benchmark drops its database")
+# database.py reads DB_NAME at import, so every service below talks to the scratch database
+os.environ["DB_NAME"] = BENCH_DB
+
+import bson  # noqa: E402
+
+from database import client, db  # noqa: E402
+from services.balance_snapshots import account_totals, day_end  # noqa: E402
+from services.general_ledger import gl_lines  # noqa: E402
+from services.index_registry import ensure_indexes  # noqa: E402
+from services.sort_keys import with_sort_key  # noqa: E402
+
+SEED_BATCH_SIZE = 5000
+ROOT_TYPES = ["Asset", "Liability", "Equity", "Income", "Expense"]
+
+
+def _accounts(count: int):
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "account_code": f"{1000 + i}",
+            "account_name": f"Bench {ROOT_TYPES[i % len(ROOT_TYPES)]} {i}",
+            "root_type": ROOT_TYPES[i % len(ROOT_TYPES)],
+            "account_type": ROOT_TYPES[i % len(ROOT_TYPES)],
+            "is_group": False,
+            "is_active": True,
+        }
+        for i in range(count)
+    ]
+
+
+def _entry(n: int, accounts, first_day: datetime, days: int, rng: random.Random):
+    amount = round(rng.uniform(10, 5000), 2)
+    debit, credit = rng.sample(accounts, 2)
+    posting_date = (first_day + timedelta(days=rng.randrange(days))).strftime("%Y-%m-%d")
+    return {
+        "id": str(uuid.uuid4()),
+        "entry_number": f"JE-BENCH-{n:08d}",
+        "posting_date": posting_date,
+        "reference": f"BENCH-{n}",
+        "description": "Benchmark entry",
+        "voucher_type": "Journal Entry",
+        "accounts": [
+            {"account_id": debit["id"], "account_name": debit["account_name"], "debit_amount": amount, "credit_amount": 0.0,
+             "description": "Benchmark debit"},
+            {"account_id": credit["id"], "account_name": credit["account_name"], "debit_amount": 0.0, "credit_amount": amount,
+             "description": "Benchmark credit"},
+        ],
+        "total_debit": amount,
+        "total_credit": amount,
+        "status": "posted",
+        "company_id": "default_company",
+        "created_at": datetime.now(timezone.utc),
+    }
+
+
+async def seed(entries: int, account_count: int, months: int) -> str:
+    """Fill the scratch database; returns the last posting day (YYYY-MM-DD)"""
+    await client.drop_database(BENCH_DB)
+    await ensure_indexes(db)
+    accounts = _accounts(account_count)
+    await db.accounts.insert_many(accounts)
+    rng = random.Random(42)
+    days = months * 30
+    first_day = (datetime.now(timezone.utc) - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    for start in range(0, entries, SEED_BATCH_SIZE):
+        batch = [_entry(n, accounts, first_day, days, rng) for n in range(start, min(start + SEED_BATCH_SIZE, entries))]
+        await db.journal_entries.insert_many([with_sort_key("journal_entries", entry) for entry in batch])
+        await db.gl_entries.insert_many([line for entry in batch for line in gl_lines(entry)])
+        print(f"\rseeded {start + len(batch)}/{entries} entries", end="", flush=True)
+    print()
+    last = await db.journal_entries.find({}, {"posting_date": 1}).sort("posting_date_sort", -1).limit(1).to_list(length=1)
+    return last[0]["posting_date"]
+
+
+def _size(doc) -> int:
+    return len(bson.encode(doc))
+
+
+async def loop_totals(target_date: str):
+    totals, wire = {}, 0
+    async for entry in db.journal_entries.find({"status": "posted", "posting_date": {"$lte": target_date}}):
+        wire += _size(entry)
+        for line in entry.get("accounts", []):
+            t = totals.setdefault(line.get("account_id"), {"debit": 0.0, "credit": 0.0})
+            t["debit"] += float(line.get("debit_amount", 0))
+            t["credit"] += float(line.get("credit_amount", 0))
+    accounts = await db.accounts.find({"is_active": True}).to_list(length=None)
+    wire += sum(_size(a) for a in accounts)
+    return totals, wire
+
+
+async def je_pipeline_totals(target_date: str):
+    pipeline = [
+        {"$match": {"status": "posted", "posting_date": {"$lte": target_date}}},
+        {"$unwind": "$accounts"},
+        {"$group": {
+            "_id": "$accounts.account_id",
+            "debit": {"$sum": {"$toDouble": {"$ifNull": ["$accounts.debit_amount", 0]}}},
+            "credit": {"$sum": {"$toDouble": {"$ifNull": ["$accounts.credit_amount", 0]}}},
+        }},
+        {"$lookup": {"from": "accounts", "localField": "_id", "foreignField": "id", "as": "account"}},
+        {"$unwind": "$account"},
+        {"$project": {"_id": 0, "account_id": "$_id", "debit": 1, "credit": 1,
+                      "account_name": "$account.account_name", "root_type": "$account.root_type"}},
+    ]
+    totals, wire = {}, 0
+    async for row in db.journal_entries.aggregate(pipeline, allowDiskUse=True):
+        wire += _size(row)
+        totals[row["account_id"]] = row
+    return totals, wire
+
+
+async def snapshot_totals(target_date: str):
+    totals = await account_totals(day_end(target_date))
+    return totals, sum(_size(row) for row in totals.values())
+
+
+def _max_difference(expected, actual) -> float:
+    keys = set(expected) | set(actual)
+    zero = {"debit": 0.0, "credit": 0.0}
+    return max(
+        (abs(expected.get(k, zero)[side] - actual.get(k, zero)[side]) for k in keys for side in ("debit", "credit")),
+        default=0.0,
+    )
+
+
+async def measure(name: str, fn, target_date: str, runs: int, reference=None):
+    timings, wire, totals = [], 0, None
+    for _ in range(runs):
+        started = time.perf_counter()
+        totals, wire = await fn(target_date)
+        timings.append((time.perf_counter() - started) * 1000)
+    result = {
+        "variant": name,
+        "median_ms": round(statistics.median(timings), 1),
+        "max_ms": round(max(timings), 1),
+        "wire_bytes": wire,
+        "rows": len(totals),
+    }
+    if reference is not None:
+        result["max_difference"] = round(_max_difference(reference, totals), 4)
+    return result, totals
+
+
+async def main(args) -> None:
+    existing = await db.journal_entries.estimated_document_count()
+    if args.reseed or existing != args.entries:
+        target_date = await seed(args.entries, args.accounts, args.months)
+    else:
+        last = await db.journal_entries.find({}, {"posting_date": 1}).sort("posting_date_sort", -1).limit(1).to_list(length=1)
+        target_date = last[0]["posting_date"]
+
+    await db.account_snapshots.delete_many({})
+    started = time.perf_counter()
+    await account_totals(day_end(target_date))
+    cold_build_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    loop, reference = await measure("loop", loop_totals, target_date, args.runs)
+    pipeline, _ = await measure("je_pipeline", je_pipeline_totals, target_date, args.runs, reference)
+    snapshots, _ = await measure("snapshots", snapshot_totals, target_date, args.runs, reference)
+
+    print(json.dumps({
+        "database": BENCH_DB,
+        "entries": args.entries,
+        "as_of": target_date,
+        "snapshot_cold_build_ms": cold_build_ms,
+        "results": [loop, pipeline, snapshots],
+    }, indent=2))
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.financial_statements", description=__doc__.split("\n")[1])
+    parser.add_argument("--entries", type=int, default=1_000_000, help="Posted journal entries to seed")
+    parser.add_argument("--accounts", type=int, default=60, help="Ledger accounts to seed")
+    parser.add_argument("--months", type=int, default=36, help="History spread over this many months")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per variant")
+    parser.add_argument("--reseed", action="store_true", help="Drop and reseed the scratch database")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,124 @@
+"""
+Outbound email/SMS throughput benchmark (run from backend/)
+
+    python -m benchmarks.outbound_messages [--messages 2000] [--concurrency 50] [--latency-ms 40] [--failure-rate 0]
+
+Sends invoice emails and SMS through the async clients against the in-process
+stub server (services/outbound_stub.py), so it needs no credentials, network or
+database. Two variants:
+
+- pooled:      SendGridEmailService / TwilioSmsService on the shared keep-alive
+               pool of services/outbound_http.py
+- per_send:    the same requests, each on a fresh connection, as the SDK
+               clients built per send used to do
+
+Reports messages per second, latency percentiles, the number of TCP connections
+the stub saw and, for the pooled variant, retries spent.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+import aiohttp
+
+os.environ.setdefault("SENDGRID_API_KEY", "stub-key")
+os.environ.setdefault("TWILIO_ACCOUNT_SID", "ACstub")
+os.environ.setdefault("TWILIO_AUTH_TOKEN", "stub-token")
+os.environ.setdefault("TWILIO_FROM_PHONE", "+10000000000")
+
+from services import outbound_http  # noqa: E402
+from services.email_service import SendGridEmailService  # noqa: E402
+from services.outbound_stub import StubServer  # noqa: E402
+from services.sms_service import TwilioSmsService  # noqa: E402
+
+INVOICE = {
+    "invoice_number": "INV-BENCH-0001",
+    "customer_name": "Benchmark Customer",
+    "items": [{"item_name": f"Item {i}", "quantity": 1, "rate": 100, "amount": 100} for i in range(10)],
+    "subtotal": 1000,
+    "tax_amount": 180,
+    "total_amount": 1180,
+}
+
+
+async def _pooled_send(n: int) -> bool:
+    if n % 2:
+        result = await TwilioSmsService().send_sms("+919876543210", f"Invoice {n} total 1180. Thank you.")
+    else:
+        result = await SendGridEmailService().send_invoice("customer@example.com", INVOICE)
+    return result["success"]
+
+
+async def _per_send(n: int, base_url: str) -> bool:
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(force_close=True)) as fresh:
+        if n % 2:
+            url = f"{base_url}/2010-04-01/Accounts/ACstub/Messages.json"
+            async with fresh.post(url, data={"To": "+919876543210", "From": "+10000000000", "Body": "x"}) as resp:
+                return resp.status < 400
+        async with fresh.post(f"{base_url}/v3/mail/send", json={"personalizations": [], "subject": "x"}) as resp:
+            return resp.status < 400
+
+
+async def run_variant(name: str, send, messages: int, concurrency: int, stub: StubServer):
+    stub.connections.clear()
+    latencies = []
+    failures = 0
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(n: int) -> None:
+        nonlocal failures
+        async with slots:
+            started = time.perf_counter()
+            ok = await send(n)
+            latencies.append((time.perf_counter() - started) * 1000)
+            failures += 0 if ok else 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(messages)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "variant": name,
+        "messages_per_second": round(messages / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 1),
+        "failures": failures,
+        "connections": len(stub.connections),
+    }
+
+
+async def main(args) -> None:
+    stub = StubServer(latency_ms=args.latency_ms, failure_rate=args.failure_rate)
+    base_url = await stub.start()
+    outbound_http.set_base_url("sendgrid", base_url)
+    outbound_http.set_base_url("twilio", base_url)
+    try:
+        pooled = await run_variant("pooled", _pooled_send, args.messages, args.concurrency, stub)
+        pooled["retries"] = sum(p["retries"] for p in outbound_http.stats()["providers"].values())
+        per_send = await run_variant("per_send", lambda n: _per_send(n, base_url), args.messages, args.concurrency, stub)
+    finally:
+        await outbound_http.close()
+        await stub.stop()
+    print(json.dumps({
+        "messages": args.messages,
+        "concurrency": args.concurrency,
+        "stub_latency_ms": args.latency_ms,
+        "stub_failure_rate": args.failure_rate,
+        "results": [pooled, per_send],
+    }, indent=2))
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.outbound_messages", description=__doc__.split("\n")[1])
+    parser.add_argument("--messages", type=int, default=2000, help="Messages per variant (half email, half SMS)")
+    parser.add_argument("--concurrency", type=int, default=50, help="Sends in flight at once")
+    parser.add_argument("--latency-ms", type=float, default=40, help="Stub response delay")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of stub answers that are 503")
+    asyncio.run(main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,116 @@
+"""
+Type-ahead lookup benchmark (run from backend/)
+
+    python -m benchmarks.suggest_lookup [--customers 100000] [--items 200000] [--documents 1000000] [--queries 2000]
+
+Fills the in-memory suggestion index (services/suggest_index.py) with synthetic
+customers, items and document numbers, no database needed, then replays
+keystroke sequences (each query typed one character at a time) and times every
+lookup. Also times the incremental update a write makes, and the periodic
+reload's async rebuild (build_index) with the longest event loop stall it causes.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from services.suggest_index import SOURCES_BY_COLLECTION, SuggestIndex, build_index, suggestion_for
+
+WORDS = ["acme", "global", "traders", "steel", "textiles", "foods", "agro", "tech", "motors", "pharma",
+         "india", "exports", "retail", "paper", "cotton", "spices", "plastics", "electric", "fabric", "castings"]
+
+
+def _name(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS).title() for _ in range(rng.randint(1, 3))) + f" {rng.randint(1, 9999)}"
+
+
+def build(args, rng: random.Random):
+    suggestions = []
+    for n in range(args.customers):
+        doc = {"id": f"c{n}", "name": _name(rng), "phone": f"+91{rng.randint(7000000000, 9999999999)}", "email": f"c{n}@example.com"}
+        suggestions.append(suggestion_for(SOURCES_BY_COLLECTION["customers"], doc))
+    for n in range(args.items):
+        doc = {"id": f"i{n}", "name": _name(rng), "item_code": f"ITM-{n:07d}", "barcode": f"{rng.randint(10**11, 10**12 - 1)}", "unit_price": 100}
+        suggestions.append(suggestion_for(SOURCES_BY_COLLECTION["items"], doc))
+    for n in range(args.documents):
+        doc = {"id": f"d{n}", "invoice_number": f"SINV-2025-{n:07d}", "customer_name": _name(rng), "total_amount": 1180, "status": "submitted"}
+        suggestions.append(suggestion_for(SOURCES_BY_COLLECTION["sales_invoices"], doc))
+    return suggestions
+
+
+async def timed_rebuild(suggestions):
+    """(seconds, longest gap between event loop turns in ms) of build_index()"""
+    stalls = []
+
+    async def ticker():
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            stalls.append(now - last)
+            last = now
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    await build_index(suggestions)
+    seconds = time.perf_counter() - started
+    tick.cancel()
+    return seconds, max(stalls) * 1000
+
+
+def percentile(samples, q: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def main(args) -> None:
+    rng = random.Random(7)
+    suggestions = build(args, rng)
+    index = SuggestIndex()
+    started = time.perf_counter()
+    index.replace_all(suggestions)
+    build_seconds = time.perf_counter() - started
+    rebuild_seconds, rebuild_stall_ms = asyncio.run(timed_rebuild(suggestions))
+
+    typed = [rng.choice(WORDS) for _ in range(args.queries // 3)]
+    typed += [f"itm{rng.randint(0, max(args.items - 1, 0)):07d}" for _ in range(args.queries // 3)]
+    typed += [f"sinv2025{rng.randint(0, max(args.documents - 1, 0)):07d}" for _ in range(args.queries - len(typed))]
+    latencies = []
+    for query in typed:
+        for end in range(1, len(query) + 1):
+            t0 = time.perf_counter()
+            index.lookup(query[:end], 10)
+            latencies.append((time.perf_counter() - t0) * 1e6)
+    latencies.sort()
+
+    updates = []
+    for n in range(1000):
+        doc = {"id": f"c{rng.randint(0, max(args.customers - 1, 0))}", "name": _name(rng), "phone": "", "email": ""}
+        suggestion = suggestion_for(SOURCES_BY_COLLECTION["customers"], doc)
+        t0 = time.perf_counter()
+        index.put(suggestion)
+        updates.append((time.perf_counter() - t0) * 1e6)
+    updates.sort()
+
+    print(json.dumps({
+        "entries": len(index),
+        "build_seconds": round(build_seconds, 2),
+        "async_rebuild": {"seconds": round(rebuild_seconds, 2), "max_loop_stall_ms": round(rebuild_stall_ms, 1)},
+        "keystrokes": len(latencies),
+        "lookup_us": {"p50": round(percentile(latencies, 0.5), 1), "p99": round(percentile(latencies, 0.99), 1), "max": round(latencies[-1], 1)},
+        "update_us": {"p50": round(percentile(updates, 0.5), 1), "p99": round(percentile(updates, 0.99), 1)},
+    }, indent=2))
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suggest_lookup", description=__doc__.split("\n")[1])
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--items", type=int, default=200_000)
+    parser.add_argument("--documents", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2000, help="Queries typed one character at a time")
+    main(parser.parse_args())
+
+
+if __name__ == "__main__":
+    cli()
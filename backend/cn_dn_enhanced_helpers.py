@@ -13,6 +13,8 @@ import uuid
 from typing import Dict, Optional, Tuple
 from fastapi import HTTPException
 
+from services.search_index import reindex
+
 
 def now_utc():
     return datetime.now(timezone.utc)
@@ -186,6 +188,8 @@ async def adjust_invoice_for_credit_note(
         {"id": reference_invoice_id},
         {"$set": update_data}
     )
+    # Total and payment status changed: search entry and dashboard counters follow
+    await reindex(sales_invoices_coll.name, {"id": reference_invoice_id})
     
     # NO automatic payment entries created
     # Users must create refund payment entries manually when needed
@@ -364,6 +368,8 @@ async def adjust_invoice_for_debit_note(
         {"id": reference_invoice_id},
         {"$set": update_data}
     )
+    # Total and payment status changed: search entry and dashboard counters follow
+    await reindex(purchase_invoices_coll.name, {"id": reference_invoice_id})
     
     # NO automatic payment entries created
     # Users must create refund payment entries manually when needed
@@ -1,10 +1,16 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import importlib.util
 from datetime import datetime, timedelta
 import uuid
+from typing import Any, Dict, List
 from dotenv import load_dotenv
 from pathlib import Path
 
+from services.pool_monitor import PoolStatsListener
+from services.query_accounting import query_listener
+from services.count_service import count_invalidation_listener
+
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -12,13 +18,69 @@ load_dotenv(ROOT_DIR / '.env')
 # MongoDB connection
 mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
 db_name = os.environ.get('DB_NAME', 'test_database')
-client = AsyncIOMotorClient(mongo_url)
+
+# Compressor -> python module pymongo needs for it (zlib ships with Python)
+_COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": None}
+
+
+def _available_compressors(requested: str) -> List[str]:
+    """Keep only the requested wire compressors whose python module is installed"""
+    available = []
+    for name in [c.strip() for c in requested.split(",") if c.strip()]:
+        if name not in _COMPRESSOR_MODULES:
+            continue
+        module = _COMPRESSOR_MODULES[name]
+        if module is None or importlib.util.find_spec(module) is not None:
+            available.append(name)
+    return available
+
+
+def client_options() -> Dict[str, Any]:
+    """Pool, timeout, compression and app name settings for the shared client (from env)"""
+    options: Dict[str, Any] = {
+        "appname": os.environ.get('MONGO_APP_NAME', 'gili-api'),
+        "maxPoolSize": int(os.environ.get('MONGO_MAX_POOL_SIZE', '100')),
+        "minPoolSize": int(os.environ.get('MONGO_MIN_POOL_SIZE', '0')),
+        "maxIdleTimeMS": int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '60000')),
+        "serverSelectionTimeoutMS": int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000')),
+        "connectTimeoutMS": int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '10000')),
+        "waitQueueTimeoutMS": int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '10000')),
+    }
+    socket_timeout = os.environ.get('MONGO_SOCKET_TIMEOUT_MS')
+    if socket_timeout:
+        options["socketTimeoutMS"] = int(socket_timeout)
+    compressors = _available_compressors(os.environ.get('MONGO_COMPRESSORS', 'zstd,snappy,zlib'))
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    return options
+
+
+# Pool wait-queue / checkout latency stats for the shared client
+pool_stats = PoolStatsListener()
+
+
+def create_client(url: str = None, event_listeners: List[Any] = None) -> AsyncIOMotorClient:
+    """Build a Motor client with the shared pool settings. The API process uses the
+    module-level `client` below; standalone scripts may call this for their own."""
+    listeners = [pool_stats, query_listener, count_invalidation_listener] + list(event_listeners or [])
+    return AsyncIOMotorClient(url or mongo_url, event_listeners=listeners, **client_options())
+
+
+# Single client (and connection pool) per process, shared by every router
+client = create_client()
 db = client[db_name]
 
 def get_database():
     """Get database instance for PoS integration"""
     return db
 
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Connection pool wait-queue, checkout latency and connection churn stats"""
+    stats = pool_stats.snapshot()
+    stats["configured"] = client_options()
+    return stats
+
 # Collections
 users_collection = db.users
 companies_collection = db.companies
@@ -34,6 +96,9 @@ credit_notes_collection = db.credit_notes
 debit_notes_collection = db.debit_notes
 transactions_collection = db.transactions
 notifications_collection = db.notifications
+counters_collection = db.counters  # Document number sequences (see services/sequence_service.py)
+general_settings_collection = db.general_settings  # Cached by services/settings_service.py
+report_exports_collection = db.report_exports  # Export records; files in the report_exports GridFS bucket (services/report_export.py)
 
 # Stock module collections
 warehouses_collection = db.warehouses
@@ -54,6 +119,11 @@ bank_transactions_collection = db.bank_transactions
 tax_rates_collection = db.tax_rates
 currencies_collection = db.currencies
 financial_settings_collection = db.financial_settings
+gl_entries_collection = db.gl_entries  # One document per posted JE line (see services/general_ledger.py)
+account_snapshots_collection = db.account_snapshots  # Month-end balances (see services/balance_snapshots.py)
+jobs_collection = db.jobs  # Background job queue (see services/job_queue.py)
+search_index_collection = db.search_index  # Global search entries (see services/search_index.py)
+dashboard_counters_collection = db.dashboard_counters  # Per-company dashboard totals (see services/dashboard_counters.py)
 
 async def init_sample_data():
     """Initialize sample data for demonstration"""
@@ -238,4 +308,10 @@ async def force_init_sample_data():
     ]
     await notifications_collection.insert_many(notifications_data)
 
+    # Sample rows bypass the routers' search index and dashboard counter writes
+    from services.search_index import rebuild_search_index
+    from services.dashboard_counters import reconcile
+    await rebuild_search_index()
+    await reconcile()
+
     print("✅ Sample data initialized successfully")
\ No newline at end of file
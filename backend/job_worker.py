@@ -0,0 +1,52 @@
+"""
+Standalone background job worker (run from backend/)
+
+    python job_worker.py [--concurrency 4] [--types send_document report_export ...]
+
+Runs the same job handlers as the API process against the `jobs` collection.
+Start one or more of these and set JOB_WORKERS_IN_PROCESS=0 on the API to keep
+slow jobs off the web servers entirely; leases make it safe to run several.
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from database import client
+from services.job_queue import JobWorkerPool
+from services.pdf_renderer import POOL as pdf_render_pool
+from services import outbound_http
+
+logger = logging.getLogger("job_worker")
+
+
+async def run(concurrency: int, job_types) -> None:
+    pool = JobWorkerPool(concurrency, job_types)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await outbound_http.start()
+    await pdf_render_pool.start()
+    pool.start()
+    await stop.wait()
+    logger.info("Stopping job workers")
+    await pool.stop()
+    pdf_render_pool.stop()
+    await outbound_http.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python job_worker.py", description="Background job worker")
+    parser.add_argument("--concurrency", type=int, default=4, help="Jobs run at the same time")
+    parser.add_argument("--types", nargs="+", metavar="TYPE", help="Only run these job types")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(run(args.concurrency, args.types))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""
+Versioned data migrations. Run with `python -m migrations` from backend/;
+see migrations/runner.py for checkpointing and dry-run semantics.
+"""
+from migrations.m0001_fix_invoice_ids import FixInvoiceIds
+from migrations.m0002_dedupe_journal_entry_numbers import DedupeJournalEntryNumbers
+from migrations.m0003_dedupe_payment_numbers import DedupePaymentNumbers
+from migrations.m0004_backfill_gl_entries import BackfillGlEntries
+from migrations.m0005_reset_account_snapshots import ResetAccountSnapshots
+from migrations.m0006_build_search_index import BuildSearchIndex
+from migrations.m0007_seed_dashboard_counters import SeedDashboardCounters
+from migrations.m0008_backfill_sort_keys import BackfillSortKeys
+
+# Applied in id order; never renumber or edit an applied migration, add a new one
+MIGRATIONS = [
+    FixInvoiceIds(),
+    DedupeJournalEntryNumbers(),
+    DedupePaymentNumbers(),
+    BackfillGlEntries(),
+    ResetAccountSnapshots(),
+    BuildSearchIndex(),
+    SeedDashboardCounters(),
+    BackfillSortKeys(),
+]
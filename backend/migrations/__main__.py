@@ -0,0 +1,97 @@
+"""
+Migration CLI (run from backend/)
+
+    python -m migrations status
+    python -m migrations run [--dry-run] [--batch-size N] [--only ID ...]
+    python -m migrations clean-test-data [--dry-run] [--yes]
+"""
+import argparse
+import asyncio
+import json
+import logging
+
+from database import client, db
+from migrations.runner import DEFAULT_BATCH_SIZE, migration_status, run_migrations
+from services.index_registry import ensure_indexes
+
+# clean-test-data: wiped vs. preserved collections (formerly clean_database.py)
+CLEAN_COLLECTIONS = {
+    "Transactional Data": [
+        "sales_orders", "quotations", "sales_quotations", "sales_invoices",
+        "purchase_orders", "purchase_invoices", "credit_notes", "debit_notes",
+        "payments", "payment_allocations", "journal_entries", "bank_transactions",
+        "stock_entries",
+    ],
+    "Master Data": ["customers", "suppliers", "items", "products"],
+}
+PRESERVED_COLLECTIONS = ["users", "general_settings", "accounts", "stock_settings", "bank_accounts"]
+
+
+def _print(data) -> None:
+    print(json.dumps(data, indent=2, default=str))
+
+
+async def cmd_status(args) -> None:
+    _print(await migration_status(db))
+
+
+async def cmd_run(args) -> None:
+    summaries = await run_migrations(db, dry_run=args.dry_run, batch_size=args.batch_size, only=args.only)
+    _print(summaries)
+    applied = [s for s in summaries if s["status"] == "completed"]
+    if applied and not args.dry_run:
+        # Unique indexes that fell back to non-unique because of duplicates can build now
+        summary = await ensure_indexes(db)
+        print(f"Index sync: {summary['indexes']} indexes, {summary['issues']} issues")
+
+
+async def cmd_clean_test_data(args) -> None:
+    print(f"Database: {db.name}")
+    for category, names in CLEAN_COLLECTIONS.items():
+        print(f"\n{category} (to be cleaned):")
+        for name in names:
+            print(f"  - {name}: {await db[name].estimated_document_count()} records")
+    print("\nPreserved:")
+    for name in PRESERVED_COLLECTIONS:
+        print(f"  - {name}: {await db[name].estimated_document_count()} records")
+    if args.dry_run:
+        print("\nDry run: nothing deleted.")
+        return
+    if not args.yes and input("\nProceed with cleanup? This cannot be undone! (yes/no): ").lower() != "yes":
+        print("Cleanup cancelled.")
+        return
+    total = 0
+    for names in CLEAN_COLLECTIONS.values():
+        for name in names:
+            result = await db[name].delete_many({})
+            total += result.deleted_count
+            print(f"  {name}: deleted {result.deleted_count}")
+    print(f"\nTotal records deleted: {total}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m migrations", description="Versioned data migrations")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("status", help="List migrations and whether they have been applied")
+
+    run = sub.add_parser("run", help="Apply pending migrations in order")
+    run.add_argument("--dry-run", action="store_true", help="Scan and count, write nothing")
+    run.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Cursor batch and bulk_write chunk size")
+    run.add_argument("--only", nargs="+", metavar="ID", help="Run only these migration ids")
+
+    clean = sub.add_parser("clean-test-data", help="Delete transactional and master data, keep users/settings/accounts")
+    clean.add_argument("--dry-run", action="store_true", help="Only show record counts")
+    clean.add_argument("--yes", action="store_true", help="Do not ask for confirmation")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    handler = {"status": cmd_status, "run": cmd_run, "clean-test-data": cmd_clean_test_data}[args.command]
+    try:
+        asyncio.run(handler(args))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Duplicate document number repair shared by the journal entry and payment migrations.
+Duplicates are found server-side with $group (allowDiskUse) and streamed one group
+at a time in number order; the oldest document keeps its number and the others get
+a fresh one from the counters sequence, so the fix can never collide again.
+"""
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from pymongo import UpdateOne
+
+from migrations.runner import Migration, MigrationContext
+from services.sequence_service import next_document_number
+
+
+def _number_date(number: str) -> Optional[datetime]:
+    parts = number.split("-")
+    if len(parts) >= 3:
+        try:
+            return datetime.strptime(parts[1], "%Y%m%d")
+        except ValueError:
+            return None
+    return None
+
+
+def _age_key(doc):
+    created = doc.get("created_at")
+    if isinstance(created, datetime):
+        return (0, created.replace(tzinfo=None))
+    return (1, datetime.min)
+
+
+class DedupeNumbers(Migration):
+    collection = ""
+    number_field = ""
+    default_prefix = ""
+
+    def prefix_for(self, number: str) -> str:
+        return number.split("-")[0] or self.default_prefix
+
+    async def run(self, ctx: MigrationContext) -> None:
+        field = self.number_field
+        after = ctx.checkpoint(self.collection)
+        match = {field: {"$type": "string"}}
+        if after is not None:
+            match = {field: {"$type": "string", "$gt": after}}
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": f"${field}",
+                "docs": {"$push": {"_id": "$_id", "created_at": "$created_at"}},
+                "n": {"$sum": 1},
+            }},
+            {"$match": {"n": {"$gt": 1}}},
+            {"$sort": {"_id": 1}},
+        ]
+        batch = ctx.batch(self.collection)
+        cursor = ctx.db[self.collection].aggregate(pipeline, allowDiskUse=True, batchSize=ctx.batch_size)
+        async for group in cursor:
+            number = group["_id"]
+            ctx.count("duplicate_numbers")
+            # Oldest keeps the number; documents without a datetime created_at sort last
+            docs = sorted(group["docs"], key=_age_key)
+            if ctx.dry_run:
+                # Allocating numbers would advance the counters; only count
+                ctx.count("would_write", len(docs) - 1)
+                await batch.add(number)
+                continue
+            ops = []
+            for doc in docs[1:]:
+                when = _number_date(number)
+                if when is not None:
+                    new_number = await next_document_number(self.prefix_for(number), when)
+                else:
+                    new_number = f"{self.default_prefix}-FIX-{uuid.uuid4().hex[:8].upper()}"
+                ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {field: new_number, "renumbered_from": number}}))
+            ctx.count("renumbered", len(ops))
+            await batch.add(number, *ops)
+        await batch.flush()
@@ -0,0 +1,29 @@
+"""
+0001: Replace corrupted invoice ids
+Older code paths copied str(_id) into the `id` field of sales/purchase invoices;
+those rows get a fresh UUID (formerly fix_invoice_ids.py).
+"""
+import uuid
+
+from pymongo import UpdateOne
+
+from migrations.runner import Migration, MigrationContext
+
+COLLECTIONS = ["sales_invoices", "purchase_invoices"]
+
+
+class FixInvoiceIds(Migration):
+    id = "0001_fix_invoice_ids"
+    description = "Give invoices whose id equals str(_id) a fresh UUID"
+
+    async def run(self, ctx: MigrationContext) -> None:
+        corrupted = {"$expr": {"$eq": ["$id", {"$toString": "$_id"}]}}
+        for coll_name in COLLECTIONS:
+            batch = ctx.batch(coll_name)
+            async for doc in ctx.stream(coll_name, corrupted, {"_id": 1}):
+                ctx.count(f"{coll_name}.corrupted")
+                await batch.add(doc["_id"], UpdateOne(
+                    {"_id": doc["_id"]},
+                    {"$set": {"id": str(uuid.uuid4())}},
+                ))
+            await batch.flush()
@@ -0,0 +1,15 @@
+"""
+0002: Renumber duplicate journal entry numbers (formerly fix_duplicate_journal_entries.py)
+"""
+from migrations.dedupe_numbers import DedupeNumbers
+
+
+class DedupeJournalEntryNumbers(DedupeNumbers):
+    id = "0002_dedupe_journal_entry_numbers"
+    description = "Give every journal entry after the oldest sharing an entry_number a fresh JE number"
+    collection = "journal_entries"
+    number_field = "entry_number"
+    default_prefix = "JE"
+
+    def prefix_for(self, number: str) -> str:
+        return "JE"
@@ -0,0 +1,16 @@
+"""
+0003: Renumber duplicate payment numbers (formerly fix_duplicate_payments.py)
+"""
+from migrations.dedupe_numbers import DedupeNumbers
+
+
+class DedupePaymentNumbers(DedupeNumbers):
+    id = "0003_dedupe_payment_numbers"
+    description = "Give every payment after the oldest sharing a payment_number a fresh REC/PAY number"
+    collection = "payments"
+    number_field = "payment_number"
+    default_prefix = "PAY"
+
+    def prefix_for(self, number: str) -> str:
+        prefix = number.split("-")[0]
+        return prefix if prefix in ("REC", "PAY") else self.default_prefix
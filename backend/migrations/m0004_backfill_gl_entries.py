@@ -0,0 +1,23 @@
+"""
+0004: Backfill general ledger lines
+Writes gl_entries lines for every journal entry posted before the collection
+existed. Uses the same idempotent upserts as live posting, so entries posted
+while this runs are simply rewritten with identical lines.
+"""
+from migrations.runner import Migration, MigrationContext
+from services.general_ledger import gl_write_ops
+
+
+class BackfillGlEntries(Migration):
+    id = "0004_backfill_gl_entries"
+    description = "Write one gl_entries line per posted journal entry line"
+
+    async def run(self, ctx: MigrationContext) -> None:
+        batch = ctx.batch("gl_entries", checkpoint_key="journal_entries")
+        async for entry in ctx.stream("journal_entries", {"status": "posted"}, checkpoint_key="journal_entries"):
+            if not entry.get("id"):
+                ctx.count("skipped_without_id")
+                continue
+            ctx.count("entries")
+            await batch.add(entry["_id"], *gl_write_ops(entry))
+        await batch.flush()
@@ -0,0 +1,27 @@
+"""
+0005: Reset account balance snapshots
+Lines backfilled by 0004 bypass the snapshot invalidation done by live posting,
+so any snapshots a report built before the backfill ran would miss them. Marks
+every snapshot as unbuilt; the next financial report rebuilds them from gl_entries.
+"""
+from migrations.runner import Migration, MigrationContext
+from services.balance_snapshots import NO_PERIOD, STATE_ID, now_utc
+
+
+class ResetAccountSnapshots(Migration):
+    id = "0005_reset_account_snapshots"
+    description = "Rebuild account balance snapshots from gl_entries on the next report"
+
+    async def run(self, ctx: MigrationContext) -> None:
+        coll = ctx.db["account_snapshots"]
+        ctx.count("snapshots", await coll.count_documents({"_id": {"$ne": STATE_ID}}))
+        if ctx.dry_run:
+            return
+        # Bump the generation first so a build running right now discards its work
+        await coll.update_one(
+            {"_id": STATE_ID},
+            {"$set": {"built_through": NO_PERIOD, "updated_at": now_utc()}, "$inc": {"generation": 1}},
+            upsert=True,
+        )
+        result = await coll.delete_many({"_id": {"$ne": STATE_ID}})
+        ctx.count("deleted", result.deleted_count)
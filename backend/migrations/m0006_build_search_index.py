@@ -0,0 +1,21 @@
+"""
+0006: Build the global search index
+Writes a search_index entry for every document the search bar covers. Uses the
+same idempotent upserts as live writes, so documents saved while this runs are
+simply re-indexed with identical entries.
+"""
+from migrations.runner import Migration, MigrationContext
+from services.search_index import CATEGORIES_BY_COLLECTION, SEARCH_INDEX_COLLECTION, index_write_op
+
+
+class BuildSearchIndex(Migration):
+    id = "0006_build_search_index"
+    description = "Index customers, suppliers, items and documents for the global search"
+
+    async def run(self, ctx: MigrationContext) -> None:
+        for collection_name in CATEGORIES_BY_COLLECTION:
+            batch = ctx.batch(SEARCH_INDEX_COLLECTION, checkpoint_key=collection_name)
+            async for doc in ctx.stream(collection_name, checkpoint_key=collection_name):
+                ctx.count(collection_name)
+                await batch.add(doc["_id"], index_write_op(collection_name, doc))
+            await batch.flush()
@@ -0,0 +1,24 @@
+"""
+0007: Seed the dashboard counters
+Builds the dashboard_contributions rows and per-company dashboard_counters that
+/api/dashboard/stats reads, from orders, sales invoices and items. This is the
+same reconcile the periodic dashboard_reconcile job runs, so rerunning it is
+harmless.
+"""
+from migrations.runner import Migration, MigrationContext
+from services.dashboard_counters import CONTRIBUTIONS, reconcile
+
+
+class SeedDashboardCounters(Migration):
+    id = "0007_seed_dashboard_counters"
+    description = "Compute the pre-aggregated dashboard totals from source"
+
+    async def run(self, ctx: MigrationContext) -> None:
+        if ctx.dry_run:
+            for collection_name in CONTRIBUTIONS:
+                ctx.count(collection_name, await ctx.db[collection_name].count_documents({}))
+            return
+        summary = await reconcile()
+        for collection_name, scanned in summary["scanned"].items():
+            ctx.count(collection_name, scanned)
+        ctx.count("companies", summary["companies"])
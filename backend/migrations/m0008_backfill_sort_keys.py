@@ -0,0 +1,24 @@
+"""
+0008: Backfill date sort keys
+Stores the normalized date sort key (services/sort_keys.py) on documents
+written before list endpoints sorted and filtered on it. Rows with no usable
+date get a null key, so neither this nor a later backfill visits them again.
+Documents written while this runs already carry their key and are skipped.
+"""
+from migrations.runner import Migration, MigrationContext
+from services.sort_keys import SORT_KEY_FIELDS, missing_sort_key, sort_key_backfill_op, sort_key_for
+
+
+class BackfillSortKeys(Migration):
+    id = "0008_backfill_sort_keys"
+    description = "Store normalized date sort keys on documents that predate them"
+
+    async def run(self, ctx: MigrationContext) -> None:
+        for collection_name in SORT_KEY_FIELDS:
+            query, projection = missing_sort_key(collection_name)
+            batch = ctx.batch(collection_name)
+            async for doc in ctx.stream(collection_name, query, projection):
+                if sort_key_for(collection_name, doc) is None:
+                    ctx.count("unparseable")
+                await batch.add(doc["_id"], sort_key_backfill_op(collection_name, doc))
+            await batch.flush()
@@ -0,0 +1,236 @@
+"""
+Data Migration Runner
+Ordered, recorded data migrations. Each migration streams documents with batched
+cursors (never loading a collection into memory), writes through bulk_write in
+chunks of `batch_size`, and checkpoints its position in `schema_migrations` after
+every flushed chunk, so a crashed run resumes where it stopped instead of
+starting over. Dry runs scan and count but write nothing, including checkpoints.
+
+A run holds a lease on the migration's record; a second runner skips migrations
+leased by another live run, and an expired lease (crashed runner) is taken over.
+The API runs pending migrations in the background at startup
+(MIGRATIONS_ON_STARTUP); reads that need a migration's data check is_applied().
+"""
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_COLLECTION = "schema_migrations"
+DEFAULT_BATCH_SIZE = int(os.environ.get("MIGRATION_BATCH_SIZE", "1000"))
+LEASE_SECONDS = int(os.environ.get("MIGRATION_LEASE_SECONDS", "300"))
+# Flush the checkpoint at least this often even when few documents need writes
+SCAN_CHECKPOINT_FACTOR = 10
+
+_applied: set = set()
+
+
+def now_utc():
+    return datetime.now(timezone.utc)
+
+
+class Migration:
+    """Subclasses set `id` (sortable, e.g. '0001_fix_invoice_ids') and implement run()"""
+
+    id: str = ""
+    description: str = ""
+
+    async def run(self, ctx: "MigrationContext") -> None:
+        raise NotImplementedError
+
+
+class BulkBatch:
+    """Buffers write ops for one collection; each flush writes them and then
+    advances the checkpoint to the last document scanned before the flush."""
+
+    def __init__(self, ctx: "MigrationContext", collection_name: str, checkpoint_key: str) -> None:
+        self.ctx = ctx
+        self.collection = ctx.db[collection_name]
+        self.checkpoint_key = checkpoint_key
+        self.ops: List[Any] = []
+        self.position: Any = None
+        self.scanned_since_flush = 0
+
+    async def add(self, position: Any, *ops: Any) -> None:
+        self.ops.extend(ops)
+        self.position = position
+        self.scanned_since_flush += 1
+        size = self.ctx.batch_size
+        if len(self.ops) >= size or self.scanned_since_flush >= size * SCAN_CHECKPOINT_FACTOR:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if self.ops:
+            if self.ctx.dry_run:
+                self.ctx.count("would_write", len(self.ops))
+            else:
+                result = await self.collection.bulk_write(self.ops, ordered=False)
+                self.ctx.count("modified", result.modified_count)
+                self.ctx.count("upserted", result.upserted_count)
+                self.ctx.count("deleted", result.deleted_count)
+            self.ops = []
+        if self.position is not None:
+            await self.ctx.save_checkpoint(self.checkpoint_key, self.position)
+        self.scanned_since_flush = 0
+
+
+class MigrationContext:
+    def __init__(self, db, record: Dict[str, Any], dry_run: bool, batch_size: int) -> None:
+        self.db = db
+        self.migration_id = record["_id"]
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.checkpoints: Dict[str, Any] = dict(record.get("checkpoints") or {})
+        self.resumed = bool(self.checkpoints)
+        # A resumed run keeps counting from where the crashed one stopped
+        self.stats: Dict[str, int] = dict(record.get("stats") or {}) if self.resumed else {}
+
+    def count(self, key: str, n: int = 1) -> None:
+        self.stats[key] = self.stats.get(key, 0) + n
+
+    def checkpoint(self, key: str) -> Any:
+        return self.checkpoints.get(key)
+
+    async def save_checkpoint(self, key: str, value: Any) -> None:
+        self.checkpoints[key] = value
+        if self.dry_run:
+            return
+        await self.db[MIGRATIONS_COLLECTION].update_one(
+            {"_id": self.migration_id},
+            {"$set": {
+                f"checkpoints.{key}": value,
+                "stats": self.stats,
+                "lease_expires_at": now_utc() + timedelta(seconds=LEASE_SECONDS),
+                "updated_at": now_utc(),
+            }},
+        )
+
+    def batch(self, collection_name: str, checkpoint_key: Optional[str] = None) -> BulkBatch:
+        return BulkBatch(self, collection_name, checkpoint_key or collection_name)
+
+    async def stream(
+        self,
+        collection_name: str,
+        query: Optional[Dict[str, Any]] = None,
+        projection: Optional[Dict[str, Any]] = None,
+        checkpoint_key: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Documents in _id order, starting after the saved checkpoint"""
+        after = self.checkpoint(checkpoint_key or collection_name)
+        filt = dict(query or {})
+        if after is not None:
+            filt = {"$and": [filt, {"_id": {"$gt": after}}]} if filt else {"_id": {"$gt": after}}
+        cursor = self.db[collection_name].find(filt, projection).sort("_id", 1).batch_size(self.batch_size)
+        async for doc in cursor:
+            self.count("scanned")
+            yield doc
+
+
+async def _acquire(db, migration: Migration, dry_run: bool) -> Optional[Dict[str, Any]]:
+    """Claim the migration record; None when it is completed or leased by a live run"""
+    coll = db[MIGRATIONS_COLLECTION]
+    record = await coll.find_one({"_id": migration.id})
+    if record and record.get("status") == "completed":
+        return None
+    if dry_run:
+        return record or {"_id": migration.id}
+    now = now_utc()
+    lease = now + timedelta(seconds=LEASE_SECONDS)
+    if not record:
+        try:
+            await coll.insert_one({
+                "_id": migration.id,
+                "description": migration.description,
+                "status": "running",
+                "checkpoints": {},
+                "stats": {},
+                "started_at": now,
+                "lease_expires_at": lease,
+                "updated_at": now,
+            })
+            return await coll.find_one({"_id": migration.id})
+        except DuplicateKeyError:
+            pass
+    # Take over a failed run or a running one whose lease expired
+    return await coll.find_one_and_update(
+        {"_id": migration.id, "$or": [
+            {"status": {"$in": ["failed", "pending"]}},
+            {"status": "running", "lease_expires_at": {"$lt": now}},
+        ]},
+        {"$set": {"status": "running", "lease_expires_at": lease, "updated_at": now}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def run_migrations(
+    db,
+    dry_run: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    only: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Apply pending migrations in id order; returns one summary per migration"""
+    from migrations import MIGRATIONS
+
+    summaries = []
+    for migration in sorted(MIGRATIONS, key=lambda m: m.id):
+        if only and migration.id not in only:
+            continue
+        record = await _acquire(db, migration, dry_run)
+        if record is None:
+            summaries.append({"id": migration.id, "status": "skipped"})
+            continue
+        ctx = MigrationContext(db, record, dry_run, batch_size)
+        logger.info(f"Migration {migration.id}{' (dry run)' if dry_run else ''}{' resuming' if ctx.resumed else ''}")
+        try:
+            await migration.run(ctx)
+        except Exception as e:
+            logger.error(f"Migration {migration.id} failed: {e}")
+            if not dry_run:
+                await db[MIGRATIONS_COLLECTION].update_one(
+                    {"_id": migration.id},
+                    {"$set": {"status": "failed", "error": str(e), "stats": ctx.stats, "updated_at": now_utc()}},
+                )
+            summaries.append({"id": migration.id, "status": "failed", "error": str(e), "stats": ctx.stats})
+            break
+        if not dry_run:
+            await db[MIGRATIONS_COLLECTION].update_one(
+                {"_id": migration.id},
+                {"$set": {"status": "completed", "stats": ctx.stats, "completed_at": now_utc(), "updated_at": now_utc()},
+                 "$unset": {"lease_expires_at": "", "error": ""}},
+            )
+        summaries.append({"id": migration.id, "status": "dry_run" if dry_run else "completed", "stats": ctx.stats})
+    return summaries
+
+
+async def is_applied(db, migration_id: str) -> bool:
+    """Whether the migration has completed; read paths that depend on one check this"""
+    if migration_id in _applied:
+        return True
+    record = await db[MIGRATIONS_COLLECTION].find_one({"_id": migration_id}, {"status": 1})
+    if record and record.get("status") == "completed":
+        # Completed migrations stay completed, so only the positive answer is cached
+        _applied.add(migration_id)
+        return True
+    return False
+
+
+async def migration_status(db) -> List[Dict[str, Any]]:
+    from migrations import MIGRATIONS
+
+    records = {r["_id"]: r async for r in db[MIGRATIONS_COLLECTION].find({})}
+    status = []
+    for migration in sorted(MIGRATIONS, key=lambda m: m.id):
+        record = records.get(migration.id) or {}
+        status.append({
+            "id": migration.id,
+            "description": migration.description,
+            "status": record.get("status", "pending"),
+            "stats": record.get("stats", {}),
+            "completed_at": record.get("completed_at"),
+        })
+    return status
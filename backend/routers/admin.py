@@ -0,0 +1,77 @@
+from fastapi import APIRouter, HTTPException
+from database import db, get_pool_stats
+from services.index_registry import ensure_indexes, index_report
+from services.sort_keys import backfill_sort_keys
+from services.search_index import rebuild_search_index
+from services.dashboard_counters import reconcile as reconcile_dashboard_counters
+from migrations.runner import migration_status
+from services import outbound_http
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+
+@router.get("/indexes")
+async def get_index_report():
+    """Index usage report: unused indexes ($indexStats) and collection scans on hot routes (explain)"""
+    try:
+        return await index_report(db)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error building index report: {str(e)}")
+
+
+@router.post("/indexes/sync")
+async def sync_indexes():
+    """Re-run the index bootstrap (idempotent)"""
+    try:
+        summary = await ensure_indexes(db)
+        return {"success": summary["issues"] == 0, **summary}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating indexes: {str(e)}")
+
+
+@router.post("/sort-keys/backfill")
+async def run_sort_key_backfill():
+    """Store normalized date sort keys on documents that predate them (idempotent)"""
+    try:
+        return await backfill_sort_keys(db)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error backfilling sort keys: {str(e)}")
+
+
+@router.post("/search-index/rebuild")
+async def run_search_index_rebuild():
+    """Re-index every searchable document and drop entries of deleted ones (idempotent)"""
+    try:
+        return await rebuild_search_index()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error rebuilding search index: {str(e)}")
+
+
+@router.post("/dashboard-counters/reconcile")
+async def run_dashboard_counter_reconcile():
+    """Recompute the dashboard counters from source, correcting drift (idempotent)"""
+    try:
+        return await reconcile_dashboard_counters()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reconciling dashboard counters: {str(e)}")
+
+
+@router.get("/migrations")
+async def get_migration_status():
+    """Data migrations and whether they have been applied (run them with `python -m migrations run`)"""
+    try:
+        return await migration_status(db)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading migration status: {str(e)}")
+
+
+@router.get("/db-pool")
+async def get_db_pool_stats():
+    """Shared Motor client pool stats: wait-queue depth, checkout latency, connection churn"""
+    return get_pool_stats()
+
+
+@router.get("/outbound")
+async def get_outbound_stats():
+    """Email/SMS transport: target base URLs, request, retry and failure counts, retry budget left"""
+    return outbound_http.stats()
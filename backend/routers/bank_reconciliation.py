@@ -1,7 +1,11 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi.responses import JSONResponse
 from typing import Dict, Any, List, Optional
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 from database import db
+from services.bank_matching import queue_auto_match
+from services.job_queue import wait_for_job
+import os
 import uuid
 import csv
 import io
@@ -13,6 +17,9 @@ transactions_coll = db.bank_transactions
 payments_coll = db.payments
 journal_entries_coll = db.journal_entries
 
+# How long POST /auto-match waits for the job before answering 202
+AUTO_MATCH_WAIT_SECONDS = float(os.environ.get("AUTO_MATCH_WAIT_SECONDS", "10"))
+
 
 def now_utc():
     return datetime.now(timezone.utc)
@@ -194,111 +201,28 @@ async def get_statement_details(statement_id: str):
 async def auto_match_transactions(payload: Dict[str, Any]):
     """
     Automatically match bank transactions with payments/journal entries
-    Uses date tolerance and amount tolerance from settings
+    Uses date tolerance and amount tolerance from settings. Runs as a background
+    job; returns its result if it finishes within AUTO_MATCH_WAIT_SECONDS,
+    otherwise 202 with the job id to poll
     """
     statement_id = payload.get("statement_id")
     if not statement_id:
         raise HTTPException(status_code=400, detail="statement_id is required")
     
-    # Get settings
-    settings_coll = db.general_settings
-    settings = await settings_coll.find_one({"id": "general_settings"})
-    
-    date_tolerance = 3  # days
-    amount_tolerance = 0.01  # 1%
-    
-    if settings:
-        recon_settings = settings.get("financial", {}).get("bank_reconciliation", {})
-        date_tolerance = recon_settings.get("date_tolerance_days", 3)
-        amount_tolerance = recon_settings.get("amount_tolerance_percent", 0.01)
-    
-    # Get unmatched transactions for this statement
-    unmatched = await transactions_coll.find({"statement_id": statement_id, "is_matched": False}).to_list(length=10000)
-    
-    matched_count = 0
-    
-    for txn in unmatched:
-        txn_date = txn.get("transaction_date")
-        txn_amount = abs(float(txn.get("amount", 0)))
-        
-        if not txn_date or txn_amount == 0:
-            continue
-        
-        # Calculate date range for matching
-        date_start = txn_date - timedelta(days=date_tolerance)
-        date_end = txn_date + timedelta(days=date_tolerance)
-        
-        # Calculate amount range for matching
-        amount_min = txn_amount * (1 - amount_tolerance)
-        amount_max = txn_amount * (1 + amount_tolerance)
-        
-        # Try to match with payments
-        matching_payment = await payments_coll.find_one({
-            "payment_date": {"$gte": date_start, "$lte": date_end},
-            "amount": {"$gte": amount_min, "$lte": amount_max},
-            "status": "paid"
-        })
-        
-        if matching_payment:
-            # Mark as matched
-            await transactions_coll.update_one(
-                {"id": txn.get("id")},
-                {"$set": {
-                    "is_matched": True,
-                    "matched_entry_id": matching_payment.get("id"),
-                    "matched_entry_type": "payment",
-                    "matched_entry_number": matching_payment.get("payment_number"),
-                    "matched_date": now_utc()
-                }}
-            )
-            matched_count += 1
-            continue
-        
-        # Try to match with journal entries if no payment match
-        matching_entry = await journal_entries_coll.find_one({
-            "posting_date": {"$gte": date_start, "$lte": date_end},
-            "$or": [
-                {"total_debit": {"$gte": amount_min, "$lte": amount_max}},
-                {"total_credit": {"$gte": amount_min, "$lte": amount_max}}
-            ],
-            "status": "posted"
-        })
-        
-        if matching_entry:
-            await transactions_coll.update_one(
-                {"id": txn.get("id")},
-                {"$set": {
-                    "is_matched": True,
-                    "matched_entry_id": matching_entry.get("id"),
-                    "matched_entry_type": "journal_entry",
-                    "matched_entry_number": matching_entry.get("entry_number"),
-                    "matched_date": now_utc()
-                }}
-            )
-            matched_count += 1
-    
-    # Update statement matched counts
-    all_transactions = await transactions_coll.find({"statement_id": statement_id}).to_list(length=10000)
-    matched = sum(1 for t in all_transactions if t.get("is_matched"))
-    unmatched_count = len(all_transactions) - matched
-    
-    await statements_coll.update_one(
-        {"id": statement_id},
-        {"$set": {
-            "matched_count": matched,
-            "unmatched_count": unmatched_count,
-            "status": "partially_matched" if unmatched_count > 0 else "fully_matched"
-        }}
-    )
-    
-    return {
+    job = await queue_auto_match(statement_id)
+    job = await wait_for_job(job["id"], AUTO_MATCH_WAIT_SECONDS)
+    if job["status"] == "succeeded":
+        return job["result"]
+    if job["status"] == "dead":
+        raise HTTPException(status_code=500, detail=f"Auto-match failed: {job.get('last_error')}")
+    return JSONResponse(status_code=202, content={
         "success": True,
-        "message": f"Auto-matched {matched_count} transactions",
-        "matched_count": matched_count,
-        "total_matched": matched,
-        "total_unmatched": unmatched_count
-    }
-
+        "queued": True,
+        "message": "Auto-match is still running; refresh to see the matches",
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": f"/api/jobs/{job['id']}",
+    })
 
 @router.post("/manual-match")
 async def manual_match_transaction(payload: Dict[str, Any]):
@@ -3,6 +3,15 @@ from typing import Optional, List, Dict, Any
 from datetime import datetime, timezone
 import uuid
 from database import db
+from services.sequence_service import next_document_number
+from services.account_roles import account_roles
+from services.general_ledger import record_entry
+from services.pagination import is_cursor_request, find_page
+from services.count_service import cached_count
+from services.document_send import email_configured, queue_send, sms_configured
+from services.send_tracking import get_queued_send_response
+from services.sort_keys import with_sort_key, with_sort_key_update, date_range_match
+from services.search_index import index_document, remove_document
 from validators import (
     validate_required_fields, validate_items, validate_amounts,
     validate_status_transition, validate_transaction_update, validate_transaction_delete,
@@ -29,11 +38,9 @@ def sanitize(doc: Dict[str, Any]):
     return d
 
 
-def generate_credit_note_number():
-    """Generate credit note number in format CN-YYYYMMDD-XXXX"""
-    now = datetime.now()
-    date_str = now.strftime('%Y%m%d')
-    return f"CN-{date_str}-{str(uuid.uuid4())[:4].upper()}"
+async def generate_credit_note_number():
+    """Generate credit note number in format CN-YYYYMMDD-NNNN"""
+    return await next_document_number("CN")
 
 
 async def create_credit_note_accounting_entries(credit_note: Dict[str, Any]):
@@ -45,9 +52,10 @@ async def create_credit_note_accounting_entries(credit_note: Dict[str, Any]):
     from cn_dn_enhanced_helpers import adjust_invoice_for_credit_note
     
     # Get accounts
-    receivables_account = await accounts_collection.find_one({"account_name": {"$regex": "Accounts Receivable", "$options": "i"}})
-    sales_return_account = await accounts_collection.find_one({"account_name": {"$regex": "Sales Return|Returns", "$options": "i"}})
-    tax_account = await accounts_collection.find_one({"account_name": {"$regex": "Tax", "$options": "i"}})
+    roles = await account_roles(accounts_collection)
+    receivables_account = roles["receivable"]
+    sales_return_account = roles["returns_inward"]
+    tax_account = roles["tax"]
     
     if not receivables_account or not sales_return_account:
         # Skip if accounts don't exist
@@ -102,7 +110,8 @@ async def create_credit_note_accounting_entries(credit_note: Dict[str, Any]):
         "created_at": now_utc(),
         "updated_at": now_utc()
     }
-    await journal_entries_collection.insert_one(journal_entry)
+    await journal_entries_collection.insert_one(with_sort_key("journal_entries", journal_entry))
+    await record_entry(journal_entry)
     
     # If linked to invoice, adjust invoice balance and handle refund workflow
     adjustment_je_id, refund_id = await adjust_invoice_for_credit_note(
@@ -142,7 +151,9 @@ async def get_credit_notes(
     limit: int = Query(50, ge=1, le=500),
     status: Optional[str] = None,
     from_date: Optional[str] = None,
-    to_date: Optional[str] = None
+    to_date: Optional[str] = None,
+    exact: bool = Query(False, description="Exact total_count instead of the cached/estimated one"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor ('start' for the first page); returns {items, next_cursor}")
 ):
     """Get list of credit notes with filtering"""
     query = {}
@@ -160,23 +171,23 @@ async def get_credit_notes(
         query["status"] = status
     
     # Date range filter
-    if from_date or to_date:
-        date_query = {}
-        if from_date:
-            date_query["$gte"] = from_date
-        if to_date:
-            date_query["$lte"] = to_date
-        query["credit_note_date"] = date_query
-    
-    cursor = credit_notes_collection.find(query).sort("created_at", -1).limit(limit)
-    rows = await cursor.to_list(length=limit)
-    
-    # Get total count for pagination
-    total_count = await credit_notes_collection.count_documents(query)
+    date_query = date_range_match(from_date, to_date)
+    if date_query:
+        query["credit_note_date_sort"] = date_query
+
+    if is_cursor_request(cursor):
+        return await find_page(credit_notes_collection, query, "created_at", -1, limit, cursor, sanitize)
+
+    rows = await credit_notes_collection.find(query).sort("created_at", -1).limit(limit).to_list(length=limit)
     
+    # Total for pagination (cached per filter, invalidated on writes)
+    total_count, total_is_estimate = await cached_count(
+        credit_notes_collection, [{"$match": query}] if query else [], exact
+    )
+
     result = [sanitize(row) for row in rows]
     if result:
-        result[0]["_meta"] = {"total_count": total_count}
+        result[0]["_meta"] = {"total_count": total_count, "total_is_estimate": total_is_estimate}
     
     return result
 
@@ -310,7 +321,7 @@ async def create_credit_note(body: Dict[str, Any]):
     
     doc = {
         "id": str(uuid.uuid4()),
-        "credit_note_number": generate_credit_note_number(),
+        "credit_note_number": await generate_credit_note_number(),
         "customer_id": body.get("customer_id"),
         "customer_name": body.get("customer_name"),
         "customer_email": body.get("customer_email"),
@@ -340,7 +351,9 @@ async def create_credit_note(body: Dict[str, Any]):
     # Validate amounts after calculation
     validate_amounts(doc, "Credit Note")
     
+    with_sort_key("credit_notes", doc)
     await credit_notes_collection.insert_one(doc)
+    await index_document("credit_notes", doc)
     
     # If created directly as submitted, create reversal entries
     if doc["status"] == "submitted":
@@ -410,6 +423,7 @@ async def update_credit_note(credit_note_id: str, body: Dict[str, Any]):
         # Validate amounts after recalculation
         validate_amounts(body, "Credit Note")
     
+    with_sort_key_update("credit_notes", body, existing)
     body["updated_at"] = now_utc()
     
     # If status changed to submitted, create accounting entries
@@ -426,6 +440,7 @@ async def update_credit_note(credit_note_id: str, body: Dict[str, Any]):
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Credit note not found")
         
+        await index_document("credit_notes", {**existing, **body})
         return {"success": True, "message": "Credit Note updated and accounting entries created"}
     
     result = await credit_notes_collection.update_one(
@@ -437,6 +452,7 @@ async def update_credit_note(credit_note_id: str, body: Dict[str, Any]):
         raise HTTPException(status_code=404, detail="Credit note not found")
     
     doc = await credit_notes_collection.find_one({"id": credit_note_id})
+    await index_document("credit_notes", doc)
     return sanitize(doc)
 
 
@@ -454,135 +470,50 @@ async def delete_credit_note(credit_note_id: str):
     result = await credit_notes_collection.delete_one({"id": credit_note_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Credit note not found")
+    await remove_document("credit_notes", credit_note_id)
     return {"success": True}
 
 
 @router.post("/credit-notes/{credit_note_id}/send")
 async def send_credit_note(credit_note_id: str, body: Dict[str, Any]):
-    """Send credit note via email/SMS"""
+    """Queue sending the credit note via email/SMS; poll status_url for the outcome"""
     # Get the credit note
     credit_note = await credit_notes_collection.find_one({"id": credit_note_id})
     if not credit_note:
         raise HTTPException(status_code=404, detail="Credit note not found")
     
+    method = body.get("method", "email")
+    attach_pdf = body.get("attach_pdf", True)
+    recipient = body.get("email") or body.get("phone")
+    
+    if not recipient:
+        raise HTTPException(status_code=400, detail="Email or phone number is required")
+    if method == "email":
+        if not email_configured():
+            raise HTTPException(status_code=503, detail="Email service not configured. Set SENDGRID_API_KEY.")
+    elif method == "sms":
+        if not sms_configured():
+            raise HTTPException(status_code=503, detail="SMS service not configured")
+    else:
+        raise HTTPException(status_code=400, detail="Invalid method. Use 'email' or 'sms'")
+    
     try:
-        # Update send status
-        now = now_utc()
-        method = body.get("method", "email")
-        attach_pdf = body.get("attach_pdf", True)
-        recipient = body.get("email") or body.get("phone")
-        
-        if not recipient:
-            raise HTTPException(status_code=400, detail="Email or phone number is required")
-        
-        # Import services
-        from services.email_service import SendGridEmailService
-        from services.sms_service import TwilioSmsService
-        
-        send_result = None
-        
-        if method == "email":
-            try:
-                email_service = SendGridEmailService()
-                # Convert credit note to invoice format for email template
-                invoice_data = {
-                    "invoice_number": credit_note.get("credit_note_number"),
-                    "invoice_date": credit_note.get("credit_note_date"),
-                    "due_date": credit_note.get("credit_note_date"),
-                    "customer_name": credit_note.get("customer_name"),
-                    "customer_email": credit_note.get("customer_email"),
-                    "customer_phone": credit_note.get("customer_phone"),
-                    "customer_address": credit_note.get("customer_address"),
-                    "items": credit_note.get("items", []),
-                    "subtotal": credit_note.get("subtotal", 0),
-                    "tax_rate": credit_note.get("tax_rate", 18),
-                    "tax_amount": credit_note.get("tax_amount", 0),
-                    "discount_amount": credit_note.get("discount_amount", 0),
-                    "total_amount": credit_note.get("total_amount", 0)
-                }
-                
-                subject = f"Credit Note {credit_note.get('credit_note_number')} from GiLi ERP"
-                preface = f"Please find your credit note for {credit_note.get('reason', 'Return')}."
-                
-                # Generate PDF if requested (mock for now)
-                pdf_bytes = None
-                if attach_pdf:
-                    # TODO: Implement actual PDF generation using reportlab or similar
-                    pdf_bytes = None  # For now, email will be sent without PDF
-                
-                send_result = email_service.send_invoice(
-                    to_email=recipient,
-                    invoice=invoice_data,
-                    pdf_bytes=pdf_bytes,
-                    subject_override=subject,
-                    preface=preface
-                )
-                
-            except Exception as e:
-                send_result = {"success": False, "error": str(e)}
-        
-        elif method == "sms":
-            try:
-                sms_service = TwilioSmsService()
-                message = f"Credit Note {credit_note.get('credit_note_number')} for {credit_note.get('total_amount', 0)} INR has been issued for {credit_note.get('reason', 'Return')}. Contact us for details."
-                send_result = sms_service.send_sms(to=recipient, body=message)
-            except Exception as e:
-                send_result = {"success": False, "error": str(e)}
-        
-        else:
-            raise HTTPException(status_code=400, detail="Invalid method. Use 'email' or 'sms'")
-        
-        # Use uniform send tracking service
-        from services.send_tracking import create_uniform_send_update, get_uniform_send_response
-        
-        # Build send results in expected format
-        send_results = {method: send_result} if send_result else {}
-        
-        # Build errors dict
-        errors = {}
-        if send_result and not send_result.get("success"):
-            errors[method] = send_result.get("error", "Unknown error")
-        
-        # Determine sent_via list
-        sent_via = [method] if send_result and send_result.get("success") else []
-        
-        update_data = create_uniform_send_update(
-            send_results=send_results,
+        number = credit_note.get('credit_note_number')
+        reason = credit_note.get('reason', 'Return')
+        job = await queue_send(
+            "credit_note", credit_note,
+            email=recipient if method == "email" else None,
+            phone=recipient if method == "sms" else None,
+            include_pdf=bool(attach_pdf),
+            subject=f"Credit Note {number} from GiLi ERP",
+            preface=f"Please find your credit note for {reason}.",
+            sms_body=f"Credit Note {number} for {credit_note.get('total_amount', 0)} INR has been issued for {reason}. Contact us for details.",
             method=method,
-            recipient=recipient,
-            attach_pdf=attach_pdf
-        )
-        
-        await credit_notes_collection.update_one(
-            {"id": credit_note_id}, 
-            {"$set": update_data}
         )
-        
-        if send_result and send_result.get("success"):
-            return get_uniform_send_response(
-                send_results=send_results,
-                sent_via=sent_via,
-                errors=errors
-            )
-        else:
-            error_msg = send_result.get("error", "Unknown error") if send_result else "Unknown error"
-            raise HTTPException(status_code=500, detail=f"Failed to send credit note: {error_msg}")
-        
-    except HTTPException:
-        raise
+        return get_queued_send_response(job)
     except Exception as e:
-        # Update failed send attempt
-        await credit_notes_collection.update_one(
-            {"id": credit_note_id}, 
-            {"$set": {
-                "last_send_attempt_at": now_utc(),
-                "last_send_error": str(e),
-                "updated_at": now_utc()
-            }}
-        )
         raise HTTPException(status_code=500, detail=f"Failed to send credit note: {str(e)}")
 
-
 @router.get("/credit-notes/stats/overview")
 async def get_credit_notes_stats(
     search: Optional[str] = None,
@@ -604,13 +535,9 @@ async def get_credit_notes_stats(
     if status:
         query["status"] = status
     
-    if from_date or to_date:
-        date_query = {}
-        if from_date:
-            date_query["$gte"] = from_date
-        if to_date:
-            date_query["$lte"] = to_date
-        query["credit_note_date"] = date_query
+    date_query = date_range_match(from_date, to_date)
+    if date_query:
+        query["credit_note_date_sort"] = date_query
     
     pipeline = [
         {"$match": query} if query else {"$match": {}},
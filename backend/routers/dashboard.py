@@ -3,60 +3,19 @@ from typing import List
 from datetime import datetime, timedelta
 from database import (
     transactions_collection,
-    notifications_collection,
-    sales_orders_collection,
-    purchase_orders_collection,
-    customers_collection,
-    suppliers_collection,
-    items_collection
+    notifications_collection
 )
 from models import QuickStats, Transaction, Notification, MonthlyReport
+from services.dashboard_counters import COUNTER_FIELDS, DEFAULT_COMPANY_ID, get_counters
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
 @router.get("/stats", response_model=QuickStats)
-async def get_dashboard_stats():
-    """Get quick statistics for dashboard"""
+async def get_dashboard_stats(company_id: str = DEFAULT_COMPANY_ID):
+    """Get quick statistics for dashboard (counters maintained on write, see services/dashboard_counters.py)"""
     try:
-        # Calculate total sales orders
-        sales_pipeline = [
-            {"$group": {"_id": None, "total": {"$sum": "$total_amount"}}}
-        ]
-        sales_result = await sales_orders_collection.aggregate(sales_pipeline).to_list(1)
-        sales_total = sales_result[0]["total"] if sales_result else 0
-        
-        # Calculate total purchase orders
-        purchase_pipeline = [
-            {"$group": {"_id": None, "total": {"$sum": "$total_amount"}}}
-        ]
-        purchase_result = await purchase_orders_collection.aggregate(purchase_pipeline).to_list(1)
-        purchase_total = purchase_result[0]["total"] if purchase_result else 0
-        
-        # Calculate outstanding amount from invoices where not paid
-        try:
-            from database import sales_invoices_collection as inv_coll
-            inv_pipeline = [
-                {"$match": {"status": {"$ne": "paid"}}},
-                {"$group": {"_id": None, "total": {"$sum": {"$ifNull": ["$total_amount", 0]}}}}
-            ]
-            inv_result = await inv_coll.aggregate(inv_pipeline).to_list(1)
-            outstanding = inv_result[0]["total"] if inv_result else 0
-        except Exception:
-            outstanding = sales_total * 0.15
-        
-        # Calculate stock value
-        stock_pipeline = [
-            {"$group": {"_id": None, "total": {"$sum": {"$multiply": ["$unit_price", "$stock_qty"]}}}}
-        ]
-        stock_result = await items_collection.aggregate(stock_pipeline).to_list(1)
-        stock_value = stock_result[0]["total"] if stock_result else 0
-        
-        return QuickStats(
-            sales_orders=sales_total,
-            purchase_orders=purchase_total,
-            outstanding_amount=outstanding,
-            stock_value=stock_value
-        )
+        counters = await get_counters(company_id)
+        return QuickStats(**{field: counters[field] for field in COUNTER_FIELDS})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching dashboard stats: {str(e)}")
 
@@ -3,6 +3,15 @@ from typing import Optional, List, Dict, Any
 from datetime import datetime, timezone
 import uuid
 from database import db
+from services.sequence_service import next_document_number
+from services.account_roles import account_roles
+from services.general_ledger import record_entry
+from services.pagination import is_cursor_request, find_page
+from services.count_service import cached_count
+from services.document_send import email_configured, queue_send, sms_configured
+from services.send_tracking import get_queued_send_response
+from services.sort_keys import with_sort_key, with_sort_key_update, date_range_match
+from services.search_index import index_document, remove_document
 from validators import (
     validate_required_fields, validate_items, validate_amounts,
     validate_status_transition, validate_transaction_update, validate_transaction_delete,
@@ -26,11 +35,9 @@ def sanitize(doc: Dict[str, Any]):
     return d
 
 
-def generate_debit_note_number():
-    """Generate debit note number in format DN-YYYYMMDD-XXXX"""
-    now = datetime.now()
-    date_str = now.strftime('%Y%m%d')
-    return f"DN-{date_str}-{str(uuid.uuid4())[:4].upper()}"
+async def generate_debit_note_number():
+    """Generate debit note number in format DN-YYYYMMDD-NNNN"""
+    return await next_document_number("DN")
 
 
 async def create_debit_note_accounting_entries(debit_note: Dict[str, Any]):
@@ -41,12 +48,13 @@ async def create_debit_note_accounting_entries(debit_note: Dict[str, Any]):
     )
     from cn_dn_enhanced_helpers import adjust_invoice_for_debit_note
     
-    payables_account = await accounts_collection.find_one({"account_name": {"$regex": "Accounts Payable", "$options": "i"}})
-    purchase_return_account = await accounts_collection.find_one({"account_name": {"$regex": "Purchase Return|Returns Outward", "$options": "i"}})
+    roles = await account_roles(accounts_collection)
+    payables_account = roles["payable"]
+    purchase_return_account = roles["returns_outward"]
     # Use Output Tax Payable for debit note tax reversal (liability account)
     # When we return goods to supplier, we must reverse the GST input tax credit we claimed
     # This creates a liability to pay back that tax to the government
-    tax_payable_account = await accounts_collection.find_one({"account_name": {"$regex": "Output Tax|Tax Payable", "$options": "i"}})
+    tax_payable_account = roles["tax_payable"]
     
     if not payables_account or not purchase_return_account:
         return
@@ -100,7 +108,8 @@ async def create_debit_note_accounting_entries(debit_note: Dict[str, Any]):
         "created_at": now_utc(),
         "updated_at": now_utc()
     }
-    await journal_entries_collection.insert_one(journal_entry)
+    await journal_entries_collection.insert_one(with_sort_key("journal_entries", journal_entry))
+    await record_entry(journal_entry)
     
     # If linked to invoice, adjust invoice balance and handle refund workflow
     adjustment_je_id, refund_id = await adjust_invoice_for_debit_note(
@@ -140,7 +149,9 @@ async def get_debit_notes(
     limit: int = Query(50, ge=1, le=500),
     status: Optional[str] = None,
     from_date: Optional[str] = None,
-    to_date: Optional[str] = None
+    to_date: Optional[str] = None,
+    exact: bool = Query(False, description="Exact total_count instead of the cached/estimated one"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor ('start' for the first page); returns {items, next_cursor}")
 ):
     """Get list of debit notes with filtering"""
     query = {}
@@ -158,23 +169,23 @@ async def get_debit_notes(
         query["status"] = status
     
     # Date range filter
-    if from_date or to_date:
-        date_query = {}
-        if from_date:
-            date_query["$gte"] = from_date
-        if to_date:
-            date_query["$lte"] = to_date
-        query["debit_note_date"] = date_query
-    
-    cursor = debit_notes_collection.find(query).sort("created_at", -1).limit(limit)
-    rows = await cursor.to_list(length=limit)
-    
-    # Get total count for pagination
-    total_count = await debit_notes_collection.count_documents(query)
+    date_query = date_range_match(from_date, to_date)
+    if date_query:
+        query["debit_note_date_sort"] = date_query
+
+    if is_cursor_request(cursor):
+        return await find_page(debit_notes_collection, query, "created_at", -1, limit, cursor, sanitize)
+
+    rows = await debit_notes_collection.find(query).sort("created_at", -1).limit(limit).to_list(length=limit)
     
+    # Total for pagination (cached per filter, invalidated on writes)
+    total_count, total_is_estimate = await cached_count(
+        debit_notes_collection, [{"$match": query}] if query else [], exact
+    )
+
     result = [sanitize(row) for row in rows]
     if result:
-        result[0]["_meta"] = {"total_count": total_count}
+        result[0]["_meta"] = {"total_count": total_count, "total_is_estimate": total_is_estimate}
     
     return result
 
@@ -308,7 +319,7 @@ async def create_debit_note(body: Dict[str, Any]):
     
     doc = {
         "id": str(uuid.uuid4()),
-        "debit_note_number": generate_debit_note_number(),
+        "debit_note_number": await generate_debit_note_number(),
         "supplier_id": body.get("supplier_id"),
         "supplier_name": body.get("supplier_name"),
         "supplier_email": body.get("supplier_email"),
@@ -338,7 +349,9 @@ async def create_debit_note(body: Dict[str, Any]):
     # Validate amounts after calculation
     validate_amounts(doc, "Debit Note")
     
+    with_sort_key("debit_notes", doc)
     await debit_notes_collection.insert_one(doc)
+    await index_document("debit_notes", doc)
     
     # If created directly as submitted, create accounting entries
     if doc["status"] == "submitted":
@@ -408,6 +421,7 @@ async def update_debit_note(debit_note_id: str, body: Dict[str, Any]):
         # Validate amounts after recalculation
         validate_amounts(body, "Debit Note")
     
+    with_sort_key_update("debit_notes", body, existing)
     body["updated_at"] = now_utc()
     
     # If status changed to submitted, create accounting entries
@@ -424,6 +438,7 @@ async def update_debit_note(debit_note_id: str, body: Dict[str, Any]):
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Debit note not found")
         
+        await index_document("debit_notes", {**existing, **body})
         return {"success": True, "message": "Debit Note updated and accounting entries created"}
     
     result = await debit_notes_collection.update_one(
@@ -435,6 +450,7 @@ async def update_debit_note(debit_note_id: str, body: Dict[str, Any]):
         raise HTTPException(status_code=404, detail="Debit note not found")
     
     doc = await debit_notes_collection.find_one({"id": debit_note_id})
+    await index_document("debit_notes", doc)
     return sanitize(doc)
 
 
@@ -452,135 +468,50 @@ async def delete_debit_note(debit_note_id: str):
     result = await debit_notes_collection.delete_one({"id": debit_note_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Debit note not found")
+    await remove_document("debit_notes", debit_note_id)
     return {"success": True}
 
 
 @router.post("/debit-notes/{debit_note_id}/send")
 async def send_debit_note(debit_note_id: str, body: Dict[str, Any]):
-    """Send debit note via email/SMS"""
+    """Queue sending the debit note via email/SMS; poll status_url for the outcome"""
     # Get the debit note
     debit_note = await debit_notes_collection.find_one({"id": debit_note_id})
     if not debit_note:
         raise HTTPException(status_code=404, detail="Debit note not found")
     
+    method = body.get("method", "email")
+    attach_pdf = body.get("attach_pdf", True)
+    recipient = body.get("email") or body.get("phone")
+    
+    if not recipient:
+        raise HTTPException(status_code=400, detail="Email or phone number is required")
+    if method == "email":
+        if not email_configured():
+            raise HTTPException(status_code=503, detail="Email service not configured. Set SENDGRID_API_KEY.")
+    elif method == "sms":
+        if not sms_configured():
+            raise HTTPException(status_code=503, detail="SMS service not configured")
+    else:
+        raise HTTPException(status_code=400, detail="Invalid method. Use 'email' or 'sms'")
+    
     try:
-        # Update send status
-        now = now_utc()
-        method = body.get("method", "email")
-        attach_pdf = body.get("attach_pdf", True)
-        recipient = body.get("email") or body.get("phone")
-        
-        if not recipient:
-            raise HTTPException(status_code=400, detail="Email or phone number is required")
-        
-        # Import services
-        from services.email_service import SendGridEmailService
-        from services.sms_service import TwilioSmsService
-        
-        send_result = None
-        
-        if method == "email":
-            try:
-                email_service = SendGridEmailService()
-                # Convert debit note to invoice format for email template
-                invoice_data = {
-                    "invoice_number": debit_note.get("debit_note_number"),
-                    "invoice_date": debit_note.get("debit_note_date"),
-                    "due_date": debit_note.get("debit_note_date"),
-                    "customer_name": debit_note.get("supplier_name"),  # Use supplier as customer for template
-                    "customer_email": debit_note.get("supplier_email"),
-                    "customer_phone": debit_note.get("supplier_phone"),
-                    "customer_address": debit_note.get("supplier_address"),
-                    "items": debit_note.get("items", []),
-                    "subtotal": debit_note.get("subtotal", 0),
-                    "tax_rate": debit_note.get("tax_rate", 18),
-                    "tax_amount": debit_note.get("tax_amount", 0),
-                    "discount_amount": debit_note.get("discount_amount", 0),
-                    "total_amount": debit_note.get("total_amount", 0)
-                }
-                
-                subject = f"Debit Note {debit_note.get('debit_note_number')} from GiLi ERP"
-                preface = f"Please find your debit note for {debit_note.get('reason', 'Return')}."
-                
-                # Generate PDF if requested (mock for now)
-                pdf_bytes = None
-                if attach_pdf:
-                    # TODO: Implement actual PDF generation using reportlab or similar
-                    pdf_bytes = None  # For now, email will be sent without PDF
-                
-                send_result = email_service.send_invoice(
-                    to_email=recipient,
-                    invoice=invoice_data,
-                    pdf_bytes=pdf_bytes,
-                    subject_override=subject,
-                    preface=preface
-                )
-                
-            except Exception as e:
-                send_result = {"success": False, "error": str(e)}
-        
-        elif method == "sms":
-            try:
-                sms_service = TwilioSmsService()
-                message = f"Debit Note {debit_note.get('debit_note_number')} for {debit_note.get('total_amount', 0)} INR has been issued for {debit_note.get('reason', 'Return')}. Contact us for details."
-                send_result = sms_service.send_sms(to=recipient, body=message)
-            except Exception as e:
-                send_result = {"success": False, "error": str(e)}
-        
-        else:
-            raise HTTPException(status_code=400, detail="Invalid method. Use 'email' or 'sms'")
-        
-        # Use uniform send tracking service
-        from services.send_tracking import create_uniform_send_update, get_uniform_send_response
-        
-        # Build send results in expected format
-        send_results = {method: send_result} if send_result else {}
-        
-        # Build errors dict
-        errors = {}
-        if send_result and not send_result.get("success"):
-            errors[method] = send_result.get("error", "Unknown error")
-        
-        # Determine sent_via list
-        sent_via = [method] if send_result and send_result.get("success") else []
-        
-        update_data = create_uniform_send_update(
-            send_results=send_results,
+        number = debit_note.get('debit_note_number')
+        reason = debit_note.get('reason', 'Return')
+        job = await queue_send(
+            "debit_note", debit_note,
+            email=recipient if method == "email" else None,
+            phone=recipient if method == "sms" else None,
+            include_pdf=bool(attach_pdf),
+            subject=f"Debit Note {number} from GiLi ERP",
+            preface=f"Please find your debit note for {reason}.",
+            sms_body=f"Debit Note {number} for {debit_note.get('total_amount', 0)} INR has been issued for {reason}. Contact us for details.",
             method=method,
-            recipient=recipient,
-            attach_pdf=attach_pdf
-        )
-        
-        await debit_notes_collection.update_one(
-            {"id": debit_note_id}, 
-            {"$set": update_data}
         )
-        
-        if send_result and send_result.get("success"):
-            return get_uniform_send_response(
-                send_results=send_results,
-                sent_via=sent_via,
-                errors=errors
-            )
-        else:
-            error_msg = send_result.get("error", "Unknown error") if send_result else "Unknown error"
-            raise HTTPException(status_code=500, detail=f"Failed to send debit note: {error_msg}")
-        
-    except HTTPException:
-        raise
+        return get_queued_send_response(job)
     except Exception as e:
-        # Update failed send attempt
-        await debit_notes_collection.update_one(
-            {"id": debit_note_id}, 
-            {"$set": {
-                "last_send_attempt_at": now_utc(),
-                "last_send_error": str(e),
-                "updated_at": now_utc()
-            }}
-        )
         raise HTTPException(status_code=500, detail=f"Failed to send debit note: {str(e)}")
 
-
 @router.get("/debit-notes/stats/overview")
 async def get_debit_notes_stats(
     search: Optional[str] = None,
@@ -602,13 +533,9 @@ async def get_debit_notes_stats(
     if status:
         query["status"] = status
     
-    if from_date or to_date:
-        date_query = {}
-        if from_date:
-            date_query["$gte"] = from_date
-        if to_date:
-            date_query["$lte"] = to_date
-        query["debit_note_date"] = date_query
+    date_query = date_range_match(from_date, to_date)
+    if date_query:
+        query["debit_note_date_sort"] = date_query
     
     pipeline = [
         {"$match": query} if query else {"$match": {}},
@@ -1,5 +1,7 @@
 from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional, Dict, Any
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Dict, Any, Union
 from database import (
     accounts_collection, journal_entries_collection, payments_collection,
     bank_accounts_collection, bank_transactions_collection, tax_rates_collection,
@@ -10,9 +12,17 @@ from models import (
     Account, JournalEntry, JournalEntryAccount, Payment, BankAccount,
     BankTransaction, TaxRate, Currency, FinancialSettings
 )
+import json
 import uuid
 from datetime import datetime, timezone
 from bson import ObjectId
+from services.sequence_service import next_document_number
+from services.account_roles import invalidate as invalidate_account_roles
+from services.ledger_posting import post_journal_entries
+from services.general_ledger import BACKFILL_MIGRATION, backfilled, record_entry, remove_entries, opening_balance, account_lines
+from services.balance_snapshots import account_totals, account_movements, day_start, day_end
+from services.sort_keys import date_range_match, with_sort_key, with_sort_key_update
+from services.pagination import is_cursor_request, find_page
 
 router = APIRouter(prefix="/api/financial", tags=["financial"])
 
@@ -63,6 +73,7 @@ async def create_account(account_data: dict):
             raise HTTPException(status_code=400, detail="Account code already exists")
         
         result = await accounts_collection.insert_one(account_data)
+        invalidate_account_roles()
         if result.inserted_id:
             return {"success": True, "message": "Account created successfully", "account_id": account_data["id"]}
         else:
@@ -94,6 +105,7 @@ async def update_account(account_id: str, account_data: dict):
             {"id": account_id}, 
             {"$set": account_data}
         )
+        invalidate_account_roles()
         if result.modified_count > 0:
             return {"success": True, "message": "Account updated successfully"}
         else:
@@ -103,10 +115,11 @@ async def update_account(account_id: str, account_data: dict):
 
 # ==================== JOURNAL ENTRIES ====================
 
-@router.get("/journal-entries", response_model=List[dict])
+@router.get("/journal-entries", response_model=Union[List[dict], Dict[str, Any]])
 async def get_journal_entries(
     limit: int = Query(50, description="Number of entries to return"),
     skip: int = Query(0, description="Number of entries to skip"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor ('start' for the first page); returns {items, next_cursor}"),
     status: Optional[str] = Query(None, description="Filter by status"),
     voucher_type: Optional[str] = Query(None, description="Filter by voucher type"),
     from_date: Optional[str] = Query(None, description="From date (YYYY-MM-DD)"),
@@ -119,18 +132,18 @@ async def get_journal_entries(
             query["status"] = status
         if voucher_type:
             query["voucher_type"] = voucher_type
-        if from_date or to_date:
-            date_filter = {}
-            if from_date:
-                # Handle both date string and datetime
-                date_filter["$gte"] = from_date
-            if to_date:
-                # Add one day to include the entire end date
-                date_filter["$lte"] = to_date
-            query["posting_date"] = date_filter
-            
-        entries = await journal_entries_collection.find(query).sort("posting_date", -1).skip(skip).limit(limit).to_list(length=limit)
+        # posting_date is stored as strings and datetimes; posting_date_sort (services/sort_keys)
+        # is one canonical datetime, so ranges, sorts and cursors compare like with like
+        date_match = date_range_match(from_date, to_date)
+        if date_match:
+            query["posting_date_sort"] = date_match
+
+        if is_cursor_request(cursor):
+            return await find_page(journal_entries_collection, query, "posting_date_sort", -1, limit, cursor, sanitize)
+        entries = await journal_entries_collection.find(query).sort("posting_date_sort", -1).skip(skip).limit(limit).to_list(length=limit)
         return [sanitize(entry) for entry in entries]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching journal entries: {str(e)}")
 
@@ -161,29 +174,8 @@ async def create_journal_entry(entry_data: dict):
         
         # Generate entry number if not provided
         if not entry_data.get("entry_number"):
-            date_str = datetime.now().strftime('%Y%m%d')
-            prefix = "JE"
-            
-            # Find the highest entry number for this date
-            pattern = f"{prefix}-{date_str}-"
-            existing_entries = await journal_entries_collection.find({
-                "entry_number": {"$regex": f"^{pattern}"}
-            }).to_list(length=None)
-            
-            # Extract numbers and find max
-            max_num = 0
-            for entry in existing_entries:
-                try:
-                    num_part = entry.get("entry_number", "").split("-")[-1]
-                    num = int(num_part)
-                    if num > max_num:
-                        max_num = num
-                except (ValueError, IndexError):
-                    continue
-            
-            # Generate next number
-            next_num = max_num + 1
-            entry_data["entry_number"] = f"{prefix}-{date_str}-{next_num:04d}"
+            # Atomic counter allocation (no scan of the day's entries)
+            entry_data["entry_number"] = await next_document_number("JE")
         
         # Default status and voucher type
         if not entry_data.get("status"):
@@ -206,7 +198,8 @@ async def create_journal_entry(entry_data: dict):
         entry_data["created_at"] = now_utc()
         entry_data["updated_at"] = now_utc()
         
-        result = await journal_entries_collection.insert_one(entry_data)
+        result = await journal_entries_collection.insert_one(with_sort_key("journal_entries", entry_data))
+        await record_entry(entry_data)
         if result.inserted_id:
             return {"success": True, "message": "Journal entry created successfully", "entry_id": entry_data["id"]}
         else:
@@ -259,6 +252,7 @@ async def update_journal_entry(entry_id: str, entry_data: dict):
             entry_data["total_credit"] = total_credit
         
         entry_data["updated_at"] = now_utc()
+        with_sort_key_update("journal_entries", entry_data)
         
         result = await journal_entries_collection.update_one(
             {"id": entry_id},
@@ -299,42 +293,34 @@ async def delete_journal_entry(entry_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting journal entry: {str(e)}")
 
+@router.post("/journal-entries/post-batch")
+async def post_journal_entries_batch(payload: Dict[str, Any]):
+    """Post many journal entries to the ledger (e.g. month-end) in a few round trips"""
+    entry_ids = payload.get("entry_ids") or []
+    if not isinstance(entry_ids, list) or not entry_ids:
+        raise HTTPException(status_code=400, detail="entry_ids list is required")
+    try:
+        summary = await post_journal_entries([str(i) for i in entry_ids])
+        return {
+            "success": True,
+            "posted_count": len(summary["posted"]),
+            "already_posted_count": len(summary["already_posted"]),
+            "not_found_count": len(summary["not_found"]),
+            **summary,
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error posting journal entries: {str(e)}")
+
 @router.post("/journal-entries/{entry_id}/post")
 async def post_journal_entry(entry_id: str):
     """Post journal entry to ledger"""
     try:
-        entry = await journal_entries_collection.find_one({"id": entry_id})
-        if not entry:
+        summary = await post_journal_entries([entry_id])
+        if summary["not_found"]:
             raise HTTPException(status_code=404, detail="Journal entry not found")
-        
-        if entry["status"] == "posted":
+        if summary["already_posted"]:
             raise HTTPException(status_code=400, detail="Journal entry already posted")
         
-        # Update account balances
-        for account in entry.get("accounts", []):
-            debit_amount = float(account.get("debit_amount", 0))
-            credit_amount = float(account.get("credit_amount", 0))
-            
-            # Determine balance change based on account type
-            account_info = await accounts_collection.find_one({"id": account["account_id"]})
-            if account_info:
-                balance_change = 0
-                if account_info["root_type"] in ["Asset", "Expense"]:
-                    balance_change = debit_amount - credit_amount
-                else:  # Liability, Equity, Income
-                    balance_change = credit_amount - debit_amount
-                
-                await accounts_collection.update_one(
-                    {"id": account["account_id"]},
-                    {"$inc": {"account_balance": balance_change}}
-                )
-        
-        # Mark entry as posted
-        await journal_entries_collection.update_one(
-            {"id": entry_id},
-            {"$set": {"status": "posted", "updated_at": now_utc()}}
-        )
-        
         return {"success": True, "message": "Journal entry posted successfully"}
     except HTTPException:
         raise
@@ -343,10 +329,11 @@ async def post_journal_entry(entry_id: str):
 
 # ==================== PAYMENTS ====================
 
-@router.get("/payments", response_model=List[dict])
+@router.get("/payments", response_model=Union[List[dict], Dict[str, Any]])
 async def get_payments(
     limit: int = Query(50, description="Number of payments to return"),
     skip: int = Query(0, description="Number of payments to skip"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor ('start' for the first page); returns {items, next_cursor}"),
     payment_type: Optional[str] = Query(None, description="Filter by payment type"),
     status: Optional[str] = Query(None, description="Filter by status")
 ):
@@ -357,9 +344,13 @@ async def get_payments(
             query["payment_type"] = payment_type
         if status:
             query["status"] = status
-            
-        payments = await payments_collection.find(query).sort("payment_date", -1).skip(skip).limit(limit).to_list(length=limit)
+
+        if is_cursor_request(cursor):
+            return await find_page(payments_collection, query, "payment_date_sort", -1, limit, cursor, sanitize)
+        payments = await payments_collection.find(query).sort("payment_date_sort", -1).skip(skip).limit(limit).to_list(length=limit)
         return [sanitize(payment) for payment in payments]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching payments: {str(e)}")
 
@@ -388,28 +379,7 @@ async def create_payment(payment_data: dict):
         # Generate payment number if not provided
         if not payment_data.get("payment_number"):
             prefix = "REC" if payment_data.get("payment_type") == "Receive" else "PAY"
-            date_str = datetime.now().strftime('%Y%m%d')
-            
-            # Find the highest payment number for this prefix and date
-            pattern = f"{prefix}-{date_str}-"
-            existing_payments = await payments_collection.find({
-                "payment_number": {"$regex": f"^{pattern}"}
-            }).to_list(length=None)
-            
-            # Extract numbers and find max
-            max_num = 0
-            for payment in existing_payments:
-                try:
-                    num_part = payment.get("payment_number", "").split("-")[-1]
-                    num = int(num_part)
-                    if num > max_num:
-                        max_num = num
-                except (ValueError, IndexError):
-                    continue
-            
-            # Generate next number
-            next_num = max_num + 1
-            payment_data["payment_number"] = f"{prefix}-{date_str}-{next_num:04d}"
+            payment_data["payment_number"] = await next_document_number(prefix)
         
         # Default status to 'draft' 
         if not payment_data.get("status"):
@@ -423,7 +393,7 @@ async def create_payment(payment_data: dict):
         payment_data["created_at"] = now_utc()
         payment_data["updated_at"] = now_utc()
         
-        result = await payments_collection.insert_one(payment_data)
+        result = await payments_collection.insert_one(with_sort_key("payments", payment_data))
         if result.inserted_id:
             # Create journal entry for the payment
             await create_payment_journal_entry(payment_data)
@@ -473,6 +443,7 @@ async def update_payment(payment_id: str, payment_data: dict):
             payment_data["unallocated_amount"] = payment_data["base_amount"]
         
         payment_data["updated_at"] = now_utc()
+        with_sort_key_update("payments", payment_data, existing_payment)
         
         result = await payments_collection.update_one(
             {"id": payment_id},
@@ -505,8 +476,10 @@ async def delete_payment(payment_id: str):
         result = await payments_collection.delete_one({"id": payment_id})
         
         if result.deleted_count > 0:
-            # Also delete associated journal entry if exists
-            await journal_entries_collection.delete_one({"voucher_id": payment_id})
+            # Also delete associated journal entry (and its ledger lines) if exists
+            entry = await journal_entries_collection.find_one_and_delete({"voucher_id": payment_id}, {"id": 1})
+            if entry and entry.get("id"):
+                await remove_entries([entry["id"]])
             return {"success": True, "message": "Payment deleted successfully"}
         else:
             raise HTTPException(status_code=500, detail="Failed to delete payment")
@@ -585,12 +558,76 @@ async def create_payment_journal_entry(payment_data: dict):
             "updated_at": now_utc()
         }
         
-        await journal_entries_collection.insert_one(entry_data)
+        await journal_entries_collection.insert_one(with_sort_key("journal_entries", entry_data))
+        await record_entry(entry_data)
     except Exception as e:
         print(f"Error creating payment journal entry: {e}")
 
 # ==================== FINANCIAL REPORTS ====================
 
+async def require_ledger_lines():
+    """Reports read gl_entries; before migration 0004 has written lines for older
+    entries they would show empty or partial statements, so refuse instead"""
+    if not await backfilled():
+        raise HTTPException(
+            status_code=503,
+            detail=f"General ledger lines are still being backfilled (migration {BACKFILL_MIGRATION}); "
+                   "retry shortly, or check `python -m migrations status`",
+        )
+
+@router.get("/reports/general-ledger")
+async def get_general_ledger(
+    account_id: str = Query(..., description="Account ID"),
+    from_date: Optional[str] = Query(None, description="From date (YYYY-MM-DD)"),
+    to_date: Optional[str] = Query(None, description="To date (YYYY-MM-DD)")
+):
+    """
+    General ledger for one account from gl_entries: opening balance, every posted
+    line in date order with its running balance, and the closing balance.
+    The response is streamed, so long periods are never built in memory.
+    """
+    await require_ledger_lines()
+    try:
+        account = await accounts_collection.find_one({"id": account_id})
+        if not account:
+            raise HTTPException(status_code=404, detail="Account not found")
+        root_type = account.get("root_type") or account.get("account_type", "")
+        bounds = date_range_match(from_date, to_date)
+        opening = await opening_balance(account_id, root_type, bounds.get("$gte"))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating general ledger: {str(e)}")
+
+    header = {
+        "account_id": account_id,
+        "account_code": account.get("account_code", ""),
+        "account_name": account.get("account_name", ""),
+        "root_type": root_type,
+        "from_date": from_date,
+        "to_date": to_date,
+        "opening_balance": round(opening, 2),
+    }
+
+    async def body():
+        yield json.dumps(header)[:-1] + ', "lines": ['
+        total_debit = total_credit = 0.0
+        balance = opening
+        first = True
+        async for line in account_lines(account_id, root_type, bounds, opening):
+            total_debit += line["debit"]
+            total_credit += line["credit"]
+            balance = line["balance"]
+            yield ("" if first else ",") + json.dumps(jsonable_encoder(line))
+            first = False
+        yield "], " + json.dumps({
+            "total_debit": round(total_debit, 2),
+            "total_credit": round(total_credit, 2),
+            "closing_balance": round(balance, 2),
+        })[1:]
+
+    return StreamingResponse(body(), media_type="application/json")
+
 @router.get("/reports/trial-balance")
 async def get_trial_balance(
     as_of_date: Optional[str] = Query(None, description="As of date (YYYY-MM-DD)")
@@ -607,46 +644,30 @@ async def get_trial_balance(
     - Credit balances shown in credit_balance column
     - Total Debits must equal Total Credits
     """
+    await require_ledger_lines()
     try:
         target_date = as_of_date or datetime.now().strftime("%Y-%m-%d")
         
-        # Get all accounts
-        accounts = await accounts_collection.find({"is_active": True}).to_list(length=None)
+        # Posted debits/credits per account up to target date, summed server-side
+        # from the nearest month-end snapshot + delta and joined with account fields
+        totals = await account_totals(day_end(target_date))
         
-        # Calculate balances from journal entries up to target date
         account_balances = {}
-        for account in accounts:
-            # Skip group accounts (parent accounts with no transactions)
-            if account.get("is_group", False):
+        for account_id, account in totals.items():
+            # Skip inactive and group accounts (parent accounts with no transactions)
+            if account.get("is_active") is not True or account.get("is_group", False):
                 continue
                 
-            account_balances[account["id"]] = {
+            account_balances[account_id] = {
                 "account_code": account.get("account_code", ""),
-                "account_name": account["account_name"],
+                "account_name": account.get("account_name", ""),
                 "account_type": account.get("account_type", ""),
                 "root_type": account.get("root_type", ""),
-                "total_debit": 0.0,
-                "total_credit": 0.0,
+                "total_debit": account["debit"],
+                "total_credit": account["credit"],
                 "balance": 0.0
             }
         
-        # Get all posted journal entries up to target date
-        journal_entries = await journal_entries_collection.find({
-            "status": "posted",
-            "posting_date": {"$lte": target_date}
-        }).to_list(length=None)
-        
-        # Aggregate balances from journal entries
-        for entry in journal_entries:
-            for acc in entry.get("accounts", []):
-                account_id = acc.get("account_id")
-                if account_id in account_balances:
-                    debit = float(acc.get("debit_amount", 0))
-                    credit = float(acc.get("credit_amount", 0))
-                    
-                    account_balances[account_id]["total_debit"] += debit
-                    account_balances[account_id]["total_credit"] += credit
-        
         # Calculate final balances based on account type
         for account_id, acc_data in account_balances.items():
             total_debit = acc_data["total_debit"]
@@ -745,51 +766,40 @@ async def get_profit_loss_statement(
     
     Note: Tax accounts (Input Tax Credit, Output Tax Payable) are NOT included as they are balance sheet items
     """
+    await require_ledger_lines()
     try:
         start_date = from_date or datetime.now().replace(day=1).strftime("%Y-%m-%d")
         end_date = to_date or datetime.now().strftime("%Y-%m-%d")
         
-        # Get all accounts grouped by type
-        # Note: Using $ne instead of False to include accounts where is_group is None/null
-        all_accounts = await accounts_collection.find({
-            "is_active": True,
-            "is_group": {"$ne": True}  # Excludes only True, includes False and None
-        }).to_list(length=None)
+        # Posted movements per account in the date range (closing totals minus opening
+        # totals), summed server-side and joined with account fields
+        movements = await account_movements(day_start(start_date), day_end(end_date))
         
-        # Initialize balances
         account_balances = {}
-        for acc in all_accounts:
-            account_balances[acc["id"]] = {
-                "account_name": acc["account_name"],
+        for account_id, acc in movements.items():
+            # Note: is_group None/missing counts as a ledger account, only True is excluded
+            if acc.get("is_active") is not True or acc.get("is_group") is True:
+                continue
+            debit = acc["debit"]
+            credit = acc["credit"]
+            root_type = acc.get("root_type", "")
+            amount = 0.0
+            
+            # Income accounts: credit increases, debit decreases
+            if root_type == "Income":
+                amount = credit - debit
+            # Expense accounts: debit increases, credit decreases
+            elif root_type == "Expense":
+                amount = debit - credit
+            
+            account_balances[account_id] = {
+                "account_name": acc.get("account_name", ""),
                 "account_code": acc.get("account_code", ""),
-                "root_type": acc.get("root_type", ""),
+                "root_type": root_type,
                 "account_type": acc.get("account_type", ""),
-                "amount": 0.0
+                "amount": amount
             }
         
-        # Get all posted journal entries in date range
-        journal_entries = await journal_entries_collection.find({
-            "status": "posted",
-            "posting_date": {"$gte": start_date, "$lte": end_date}
-        }).to_list(length=None)
-        
-        # Aggregate amounts from journal entries
-        for entry in journal_entries:
-            for acc in entry.get("accounts", []):
-                account_id = acc.get("account_id")
-                if account_id in account_balances:
-                    debit = float(acc.get("debit_amount", 0))
-                    credit = float(acc.get("credit_amount", 0))
-                    
-                    root_type = account_balances[account_id]["root_type"]
-                    
-                    # Income accounts: credit increases, debit decreases
-                    if root_type == "Income":
-                        account_balances[account_id]["amount"] += (credit - debit)
-                    # Expense accounts: debit increases, credit decreases
-                    elif root_type == "Expense":
-                        account_balances[account_id]["amount"] += (debit - credit)
-        
         # Extract specific accounts for P&L structure
         sales_revenue = 0.0
         sales_returns = 0.0
@@ -888,75 +898,55 @@ async def get_balance_sheet(
     - Retained Earnings (accumulated profits from previous periods)
     - Current Period Net Profit/Loss (calculated from P&L up to target date)
     """
+    await require_ledger_lines()
     try:
         target_date = as_of_date or datetime.now().strftime("%Y-%m-%d")
         
-        # Get asset, liability, and equity accounts
-        # Note: Using {"$ne": True} to include accounts where is_group is False or None
-        asset_accounts = await accounts_collection.find({
-            "root_type": "Asset", "is_active": True, "is_group": {"$ne": True}
-        }).to_list(length=None)
-        
-        liability_accounts = await accounts_collection.find({
-            "root_type": "Liability", "is_active": True, "is_group": {"$ne": True}
-        }).to_list(length=None)
+        # Posted debits/credits per account up to target date, summed server-side
+        # from the nearest month-end snapshot + delta and joined with account fields
+        totals = await account_totals(day_end(target_date))
         
-        equity_accounts = await accounts_collection.find({
-            "root_type": "Equity", "is_active": True, "is_group": {"$ne": True}
-        }).to_list(length=None)
+        asset_balances = {}
+        liability_balances = {}
+        equity_balances = {}
         
-        # Initialize balances
-        asset_balances = {acc["id"]: {"account_name": acc["account_name"], "amount": 0.0} for acc in asset_accounts}
-        liability_balances = {acc["id"]: {"account_name": acc["account_name"], "amount": 0.0} for acc in liability_accounts}
-        equity_balances = {acc["id"]: {"account_name": acc["account_name"], "amount": 0.0} for acc in equity_accounts}
-        
-        # Get all posted journal entries up to target date
-        journal_entries = await journal_entries_collection.find({
-            "status": "posted",
-            "posting_date": {"$lte": target_date}
-        }).to_list(length=None)
-        
-        # Aggregate balances from journal entries
         # Also calculate net profit/loss from income and expense accounts
         income_total = 0.0
         expense_total = 0.0
         
-        for entry in journal_entries:
-            for acc in entry.get("accounts", []):
-                account_id = acc.get("account_id")
-                debit = float(acc.get("debit_amount", 0))
-                credit = float(acc.get("credit_amount", 0))
-                
-                # Asset accounts: debit increases, credit decreases
-                if account_id in asset_balances:
-                    asset_balances[account_id]["amount"] += (debit - credit)
-                
-                # Liability accounts: credit increases, debit decreases
-                elif account_id in liability_balances:
-                    liability_balances[account_id]["amount"] += (credit - debit)
+        for acc in sorted(totals.values(), key=lambda a: a.get("account_code") or ""):
+            debit = acc["debit"]
+            credit = acc["credit"]
+            root_type = acc.get("root_type", "")
+            # Note: is_group None/missing counts as a ledger account, only True is excluded
+            is_ledger = acc.get("is_active") is True and acc.get("is_group") is not True
+            
+            # Asset accounts: debit increases, credit decreases
+            if root_type == "Asset" and is_ledger:
+                asset_balances[acc["account_id"]] = {"account_name": acc.get("account_name", ""), "amount": debit - credit}
+            
+            # Liability accounts: credit increases, debit decreases
+            elif root_type == "Liability" and is_ledger:
+                liability_balances[acc["account_id"]] = {"account_name": acc.get("account_name", ""), "amount": credit - debit}
+            
+            # Equity accounts: credit increases, debit decreases
+            elif root_type == "Equity" and is_ledger:
+                equity_balances[acc["account_id"]] = {"account_name": acc.get("account_name", ""), "amount": credit - debit}
+            
+            # Calculate P&L for current period net profit
+            else:
+                account_name = (acc.get("account_name") or "").lower()
                 
-                # Equity accounts: credit increases, debit decreases
-                elif account_id in equity_balances:
-                    equity_balances[account_id]["amount"] += (credit - debit)
+                # Skip tax accounts from P&L calculation
+                if "input tax" in account_name or "output tax" in account_name or "tax credit" in account_name:
+                    continue
                 
-                # Calculate P&L for current period net profit
-                else:
-                    # Find account to determine if it's income or expense
-                    account_doc = await accounts_collection.find_one({"id": account_id})
-                    if account_doc:
-                        root_type = account_doc.get("root_type", "")
-                        account_name = account_doc.get("account_name", "").lower()
-                        
-                        # Skip tax accounts from P&L calculation
-                        if "input tax" in account_name or "output tax" in account_name or "tax credit" in account_name:
-                            continue
-                        
-                        # Income: credit increases, debit decreases
-                        if root_type == "Income":
-                            income_total += (credit - debit)
-                        # Expense: debit increases, credit decreases
-                        elif root_type == "Expense":
-                            expense_total += (debit - credit)
+                # Income: credit increases, debit decreases
+                if root_type == "Income":
+                    income_total += (credit - debit)
+                # Expense: debit increases, credit decreases
+                elif root_type == "Expense":
+                    expense_total += (debit - credit)
         
         # Calculate current period net profit/loss
         current_period_profit = income_total - expense_total
@@ -1095,6 +1085,7 @@ async def initialize_chart_of_accounts():
             account["updated_at"] = now_utc()
         
         await accounts_collection.insert_many(standard_accounts)
+        invalidate_account_roles()
         
         # Initialize default currencies
         default_currencies = [
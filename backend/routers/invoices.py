@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional
+from typing import Any, Dict, Optional
 from database import sales_invoices_collection, customers_collection, items_collection
 from models import SalesInvoice, SalesInvoiceCreate, SalesInvoiceItem
 from validators import (
@@ -10,21 +10,17 @@ from validators import (
 import uuid
 from datetime import datetime, timezone, time
 from bson import ObjectId
-import os
+from services.sequence_service import next_document_number
+from services.pagination import (
+    is_cursor_request, decode_cursor, keyset_match, keyset_sort, split_page, cursor_envelope, page_envelope
+)
+from services.count_service import cached_count
+from services.sort_keys import with_sort_key, with_sort_key_update, date_range_match
+from services.search_index import index_document, reindex, remove_document
 
-# Email + PDF + SMS services
-try:
-    from services.email_service import SendGridEmailService, BRAND_PLACEHOLDER
-    from services.pdf_service import generate_invoice_pdf
-except Exception:
-    SendGridEmailService = None
-    BRAND_PLACEHOLDER = {"company_name": "Your Company"}
-    def generate_invoice_pdf(invoice, brand):
-        return None
-try:
-    from services.sms_service import TwilioSmsService
-except Exception:
-    TwilioSmsService = None
+# Sends run as background jobs (services/document_send.py)
+from services.document_send import BRAND_PLACEHOLDER, email_configured, queue_send
+from services.send_tracking import get_queued_send_response
 
 router = APIRouter(prefix="/api/invoices", tags=["invoices"])
 
@@ -33,10 +29,12 @@ from workflow_helpers import (
     create_journal_entry_for_sales_invoice
 )
 
-@router.get("/", response_model=List[dict])
+@router.get("/", response_model=Dict[str, Any])
 async def get_sales_invoices(
     limit: int = Query(50, description="Number of invoices to return"),
     skip: int = Query(0, description="Number of invoices to skip"),
+    exact: bool = Query(False, description="Exact total_count instead of the cached/estimated one"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor ('start' for the first page); returns {items, next_cursor}"),
     status: Optional[str] = Query(None, description="Filter by status"),
     customer_id: Optional[str] = Query(None, description="Filter by customer"),
     search: Optional[str] = Query(None, description="Search in invoice number or customer name"),
@@ -45,7 +43,7 @@ async def get_sales_invoices(
     from_date: Optional[str] = Query(None, description='YYYY-MM-DD'),
     to_date: Optional[str] = Query(None, description='YYYY-MM-DD')
 ):
-    """Get sales invoices with filtering and pagination"""
+    """Get sales invoices with filtering and pagination (skip/limit, or keyset via cursor)"""
     try:
         query = {}
         if status:
@@ -58,7 +56,7 @@ async def get_sales_invoices(
                 {"customer_name": {"$regex": search, "$options": "i"}}
             ]
 
-        # Build pipeline for robust date sorting/filtering
+        # invoice_date_sort is stored on write (services/sort_keys), so filters and sorts use indexes
         sort_field = (sort_by or '').lower()
         sort_map = {
             'invoice_number': 'invoice_number',
@@ -68,47 +66,38 @@ async def get_sales_invoices(
         sort_key = sort_map.get(sort_field, 'created_at')
         sort_direction = -1 if (sort_dir or 'desc').lower() == 'desc' else 1
 
-        pipeline = [
-            { '$addFields': {
-                'invoice_date_sort': { '$toDate': { '$cond': [ { '$or': [ { '$eq': [ '$invoice_date', None ] }, { '$eq': [ '$invoice_date', '' ] } ] }, '$created_at', '$invoice_date' ] } }
-            }},
-        ]
+        date_match = date_range_match(from_date, to_date)
+        if date_match:
+            query['invoice_date_sort'] = date_match
+        pipeline = []
         if query:
             pipeline.append({ '$match': query })
-        if from_date or to_date:
-            date_match = {}
-            if from_date:
-                y,m,d = map(int, from_date.split('-'))
-                date_match['$gte'] = datetime(y,m,d,0,0,0,tzinfo=timezone.utc)
-            if to_date:
-                y,m,d = map(int, to_date.split('-'))
-                date_match['$lte'] = datetime(y,m,d,23,59,59,tzinfo=timezone.utc)
-            pipeline.append({ '$match': { 'invoice_date_sort': date_match } })
-        pipeline.extend([
-            { '$sort': { sort_key: sort_direction } },
-            { '$skip': skip },
-            { '$limit': limit },
-        ])
-
-        invoices = await sales_invoices_collection.aggregate(pipeline).to_list(length=limit)
-
-        # Count
-        count_pipeline = pipeline[:1]  # $addFields
-        count_match = []
-        if query:
-            count_match.append({ '$match': query })
-        if from_date or to_date:
-            date_match = {}
-            if from_date:
-                y,m,d = map(int, from_date.split('-'))
-                date_match['$gte'] = datetime(y,m,d,0,0,0,tzinfo=timezone.utc)
-            if to_date:
-                y,m,d = map(int, to_date.split('-'))
-                date_match['$lte'] = datetime(y,m,d,23,59,59,tzinfo=timezone.utc)
-            count_match.append({ '$match': { 'invoice_date_sort': date_match } })
-        count_pipeline = count_pipeline + count_match + [{ '$count': 'total' }]
-        total_docs = await sales_invoices_collection.aggregate(count_pipeline).to_list(length=1)
-        total_count = (total_docs[0]['total'] if total_docs else 0)
+        count_pipeline = list(pipeline)
+
+        cursor_mode = is_cursor_request(cursor)
+        next_cursor = None
+        if cursor_mode:
+            keyset = keyset_match(sort_key, sort_direction, decode_cursor(cursor, sort_key, sort_direction))
+            if keyset:
+                pipeline.append({ '$match': keyset })
+            pipeline.extend([
+                { '$sort': keyset_sort(sort_key, sort_direction) },
+                { '$limit': limit + 1 },
+            ])
+            rows = await sales_invoices_collection.aggregate(pipeline).to_list(length=limit + 1)
+            invoices, next_cursor = split_page(rows, limit, sort_key, sort_direction)
+        else:
+            pipeline.extend([
+                { '$sort': { sort_key: sort_direction } },
+                { '$skip': skip },
+                { '$limit': limit },
+            ])
+            invoices = await sales_invoices_collection.aggregate(pipeline).to_list(length=limit)
+
+        # Count (skipped for cursor pages, which stay O(limit))
+        total_count, total_is_estimate = 0, False
+        if not cursor_mode:
+            total_count, total_is_estimate = await cached_count(sales_invoices_collection, count_pipeline, exact)
 
         transformed_invoices = []
         for invoice in invoices:
@@ -127,15 +116,14 @@ async def get_sales_invoices(
                 invoice.setdefault("subtotal", 0.0)
                 invoice.setdefault("tax_amount", 0.0)
                 invoice.setdefault("discount_amount", 0.0)
-                invoice["_meta"] = {
-                    "total_count": total_count,
-                    "current_page": (skip // limit) + 1,
-                    "page_size": limit
-                }
                 transformed_invoices.append(invoice)
             except Exception:
                 continue
-        return transformed_invoices
+        if cursor_mode:
+            return cursor_envelope(transformed_invoices, next_cursor, limit)
+        return page_envelope(transformed_invoices, total_count, limit, skip, total_is_estimate)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching sales invoices: {str(e)}")
 
@@ -183,8 +171,7 @@ async def create_sales_invoice(invoice_data: dict):
                 )
         
         if not invoice_data.get("invoice_number"):
-            invoice_count = await sales_invoices_collection.count_documents({})
-            invoice_data["invoice_number"] = f"INV-{datetime.now(timezone.utc).strftime('%Y%m%d')}-{invoice_count + 1:04d}"
+            invoice_data["invoice_number"] = await next_document_number("INV")
         
         # Set default invoice_date if not provided (CRITICAL for journal entry posting_date)
         if not invoice_data.get("invoice_date"):
@@ -255,7 +242,9 @@ async def create_sales_invoice(invoice_data: dict):
         # Validate amounts after calculation
         validate_amounts(invoice_data, "Sales Invoice")
 
+        with_sort_key("sales_invoices", invoice_data)
         result = await sales_invoices_collection.insert_one(invoice_data)
+        await index_document("sales_invoices", invoice_data)
         if result.inserted_id:
             invoice_data["_id"] = str(result.inserted_id)
             invoice_id = invoice_data.get("id")
@@ -338,6 +327,8 @@ async def update_sales_invoice(invoice_id: str, invoice_data: dict):
             # Validate amounts after recalculation
             validate_amounts(invoice_data, "Sales Invoice")
 
+        with_sort_key_update("sales_invoices", invoice_data, existing)
+
         # If status changed to "submitted", create Journal Entry only (Payment Entry created separately)
         if invoice_data.get("status") == "submitted" and existing.get("status") != "submitted":
             from database import journal_entries_collection, accounts_collection
@@ -351,9 +342,11 @@ async def update_sales_invoice(invoice_id: str, invoice_data: dict):
             )
             
             result = await sales_invoices_collection.update_one({"_id": existing["_id"]}, {"$set": invoice_data})
+            await reindex("sales_invoices", {"_id": existing["_id"]})
             return {"success": True, "message": "Invoice updated and Journal Entry created", "journal_entry_id": je_id}
         
         result = await sales_invoices_collection.update_one({"_id": existing["_id"]}, {"$set": invoice_data})
+        await reindex("sales_invoices", {"_id": existing["_id"]})
         if result.modified_count > 0:
             return {"success": True, "message": "Invoice updated successfully"}
         else:
@@ -373,6 +366,7 @@ async def delete_sales_invoice(invoice_id: str):
             except Exception:
                 pass
         if result.deleted_count > 0:
+            await remove_document("sales_invoices", invoice_id)
             return {"success": True, "message": "Invoice deleted successfully"}
         else:
             raise HTTPException(status_code=404, detail="Invoice not found")
@@ -383,7 +377,8 @@ async def delete_sales_invoice(invoice_id: str):
 
 @router.post("/{invoice_id}/send")
 async def send_invoice_email(invoice_id: str, email_data: dict):
-    """Send invoice via email (SendGrid) and/or SMS (Twilio). Saves sent_at on success.
+    """Queue sending the invoice via email (SendGrid) and/or SMS (Twilio). The send job
+    saves sent_at on success; poll status_url for the outcome.
     Body: { email?: str, phone?: str, include_pdf?: bool }
     """
     try:
@@ -405,75 +400,19 @@ async def send_invoice_email(invoice_id: str, email_data: dict):
 
         if not to_email and not phone:
             raise HTTPException(status_code=400, detail="Provide at least an email or phone to send")
-
-        results = {"email": None, "sms": None}
-        sent_via = []
-
-        # Email send
-        if to_email:
-            if SendGridEmailService is None or not os.environ.get("SENDGRID_API_KEY"):
-                raise HTTPException(status_code=503, detail="Email service not configured. Set SENDGRID_API_KEY.")
-            pdf_bytes = None
-            if include_pdf:
-                try:
-                    pdf_bytes = generate_invoice_pdf(inv, BRAND_PLACEHOLDER)
-                except Exception:
-                    pdf_bytes = None
-            email_svc = SendGridEmailService()
-            subject = custom_subject or f"Invoice {inv.get('invoice_number','')} from {BRAND_PLACEHOLDER.get('company_name','Your Company')}"
-            preface = custom_message or f"Dear {inv.get('customer_name','Customer')}, Please find your invoice details below."
-            email_resp = email_svc.send_invoice(to_email, inv, BRAND_PLACEHOLDER, pdf_bytes=pdf_bytes, subject_override=subject, preface=preface)
-            results["email"] = email_resp
-            if email_resp.get("success"):
-                sent_via.append("email")
-
-        # SMS send
-        if phone:
-            if TwilioSmsService is None or not (os.environ.get("TWILIO_ACCOUNT_SID") and os.environ.get("TWILIO_AUTH_TOKEN") and os.environ.get("TWILIO_FROM_PHONE")):
-                results["sms"] = {"success": False, "configured": False, "message": "SMS not configured"}
-            else:
-                sms_svc = TwilioSmsService()
-                body = f"Invoice {inv.get('invoice_number','')} total ₹{inv.get('total_amount',0)}. Thank you."
-                sms_resp = sms_svc.send_sms(phone, body)
-                results["sms"] = sms_resp
-                if sms_resp.get("success"):
-                    sent_via.append("sms")
-
-        overall_success = len(sent_via) > 0
-
-        # Build human-friendly messages for failures
-        errors = {}
-        if results.get("email") and not results["email"].get("success"):
-            err = (results["email"].get("error") or "Email failed")
-            if any(x in str(err) for x in ["401", "Unauthorized", "unauthorized"]):
-                err = f"{err} - SendGrid unauthorized. Check API key and verify your sender email/domain."
-            errors["email"] = err
-        if results.get("sms") and not results["sms"].get("success"):
-            sms_code = str(results["sms"].get("code")) if isinstance(results["sms"], dict) and results["sms"].get("code") is not None else None
-            err = (results["sms"].get("error") or results["sms"].get("message") or "SMS failed") if isinstance(results["sms"], dict) else "SMS failed"
-            if sms_code == "21211":
-                err = f"{err} - Invalid phone format. Use E.164 e.g. +919876543210."
-            if sms_code == "21608":
-                err = f"{err} - Twilio trial can send only to verified numbers or upgrade your account."
-            errors["sms"] = err
-
-        # Use uniform send tracking service
-        from services.send_tracking import create_uniform_send_update, get_uniform_send_response
-        
-        update_fields = create_uniform_send_update(
-            send_results=results,
-            method="email" if to_email else "sms",  # Primary method
-            recipient=to_email or phone,
-            attach_pdf=include_pdf
-        )
-        
-        await sales_invoices_collection.update_one({"_id": inv["_id"]}, {"$set": update_fields})
-
-        return get_uniform_send_response(
-            send_results=results,
-            sent_via=sent_via,
-            errors=errors
+        if to_email and not email_configured():
+            raise HTTPException(status_code=503, detail="Email service not configured. Set SENDGRID_API_KEY.")
+
+        job = await queue_send(
+            "sales_invoice", inv,
+            email=to_email,
+            phone=phone,
+            include_pdf=include_pdf,
+            subject=custom_subject or f"Invoice {inv.get('invoice_number','')} from {BRAND_PLACEHOLDER.get('company_name','Your Company')}",
+            preface=custom_message or f"Dear {inv.get('customer_name','Customer')}, Please find your invoice details below.",
+            sms_body=f"Invoice {inv.get('invoice_number','')} total ₹{inv.get('total_amount',0)}. Thank you.",
         )
+        return get_queued_send_response(job)
 
     except HTTPException:
         raise
@@ -499,22 +438,12 @@ async def get_invoice_stats(
                 {"invoice_number": {"$regex": search, "$options": "i"}},
                 {"customer_name": {"$regex": search, "$options": "i"}},
             ]
-        pipeline = [
-            { '$addFields': {
-                'invoice_date_sort': { '$toDate': { '$cond': [ { '$or': [ { '$eq': [ '$invoice_date', None ] }, { '$eq': [ '$invoice_date', '' ] } ] }, '$created_at', '$invoice_date' ] } }
-            }},
-        ]
+        date_match = date_range_match(from_date, to_date)
+        if date_match:
+            match_stage['invoice_date_sort'] = date_match
+        pipeline = []
         if match_stage:
             pipeline.append({ '$match': match_stage })
-        if from_date or to_date:
-            date_match = {}
-            if from_date:
-                y,m,d = map(int, from_date.split('-'))
-                date_match['$gte'] = datetime(y,m,d,0,0,0,tzinfo=timezone.utc)
-            if to_date:
-                y,m,d = map(int, to_date.split('-'))
-                date_match['$lte'] = datetime(y,m,d,23,59,59,tzinfo=timezone.utc)
-            pipeline.append({ '$match': { 'invoice_date_sort': date_match } })
         pipeline.append({ '$group': {
             '_id': None,
             'total_count': { '$sum': 1 },
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from services.job_queue import get_job, list_jobs, retry_job, wait_for_job
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+MAX_WAIT_SECONDS = 30
+
+
+@router.get("")
+async def get_jobs(
+    status: Optional[str] = Query(None, description="queued, running, succeeded or dead"),
+    type: Optional[str] = Query(None, description="Job type, e.g. send_document"),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """Recent background jobs, newest first"""
+    return await list_jobs(status=status, job_type=type, limit=limit)
+
+
+@router.get("/{job_id}")
+async def get_job_status(job_id: str):
+    """Status, attempts, last error and (once succeeded) result of a job"""
+    job = await get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/{job_id}/wait")
+async def wait_for_job_status(job_id: str, timeout: float = Query(10, ge=0, le=MAX_WAIT_SECONDS)):
+    """Long poll: returns once the job has succeeded or been dead-lettered, or after `timeout` seconds"""
+    job = await wait_for_job(job_id, timeout)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/{job_id}/retry")
+async def retry_dead_job(job_id: str):
+    """Re-queue a dead-lettered job with a fresh attempt budget"""
+    job = await retry_job(job_id)
+    if not job:
+        if await get_job(job_id):
+            raise HTTPException(status_code=409, detail="Only dead-lettered jobs can be retried")
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -3,6 +3,7 @@ from typing import Optional, Dict, Any
 from datetime import datetime, timezone
 import uuid
 from database import db, customers_collection, suppliers_collection, items_collection
+from services.search_index import index_document, remove_document
 
 router = APIRouter(prefix="/api", tags=["master-data"])
 
@@ -80,6 +81,7 @@ async def create_customer(body: Dict[str, Any]):
         "updated_at": now_utc(),
     }
     await customers_collection.insert_one(doc)
+    await index_document("customers", doc)
     return sanitize(doc)
 
 @router.get("/master/customers/{cid}")
@@ -115,6 +117,7 @@ async def update_customer(cid: str, body: Dict[str, Any]):
     if res.matched_count == 0:
         raise HTTPException(status_code=404, detail="Customer not found")
     doc = await customers_collection.find_one({"id": cid})
+    await index_document("customers", doc)
     return sanitize(doc)
 
 @router.delete("/master/customers/{cid}")
@@ -122,6 +125,7 @@ async def delete_customer(cid: str):
     res = await customers_collection.delete_one({"id": cid})
     if res.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Customer not found")
+    await remove_document("customers", cid)
     return {"success": True}
 
 
@@ -170,6 +174,7 @@ async def create_supplier(body: Dict[str, Any]):
         "updated_at": now_utc(),
     }
     await suppliers_collection.insert_one(doc)
+    await index_document("suppliers", doc)
     return sanitize(doc)
 
 @router.get("/master/suppliers/{sid}")
@@ -203,6 +208,7 @@ async def update_supplier(sid: str, body: Dict[str, Any]):
     if res.matched_count == 0:
         raise HTTPException(status_code=404, detail="Supplier not found")
     doc = await suppliers_collection.find_one({"id": sid})
+    await index_document("suppliers", doc)
     return sanitize(doc)
 
 @router.delete("/master/suppliers/{sid}")
@@ -210,6 +216,7 @@ async def delete_supplier(sid: str):
     res = await suppliers_collection.delete_one({"id": sid})
     if res.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Supplier not found")
+    await remove_document("suppliers", sid)
     return {"success": True}
 
 
@@ -262,6 +269,7 @@ async def create_item(body: Dict[str, Any]):
         "updated_at": now_utc(),
     }
     await items_collection.insert_one(doc)
+    await index_document("items", doc)
     return sanitize(doc)
 
 @router.get("/stock/items/{iid}")
@@ -297,6 +305,7 @@ async def update_item(iid: str, body: Dict[str, Any]):
     if res.matched_count == 0:
         raise HTTPException(status_code=404, detail="Item not found")
     doc = await items_collection.find_one({"id": iid})
+    await index_document("items", doc)
     return sanitize(doc)
 
 @router.delete("/stock/items/{iid}")
@@ -304,4 +313,5 @@ async def delete_item(iid: str):
     res = await items_collection.delete_one({"id": iid})
     if res.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Item not found")
+    await remove_document("items", iid)
     return {"success": True}
\ No newline at end of file
@@ -2,6 +2,8 @@ from fastapi import APIRouter, HTTPException
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timezone
 from database import db
+from services.settings_service import payment_allocation_settings
+from services.search_index import reindex
 import uuid
 
 router = APIRouter(prefix="/api/financial/payment-allocation", tags=["payment_allocation"])
@@ -43,9 +45,7 @@ async def allocate_payment_to_invoices(payload: Dict[str, Any]):
         raise HTTPException(status_code=404, detail="Payment not found")
     
     # Get settings for validation
-    settings_coll = db.general_settings
-    settings = await settings_coll.find_one({"id": "general_settings"})
-    allow_partial = settings.get("financial", {}).get("payment_allocation", {}).get("allow_partial_allocation", True) if settings else True
+    allow_partial = (await payment_allocation_settings()).allow_partial_allocation
     
     # Calculate total allocation amount
     total_allocated = sum(float(a.get("allocated_amount", 0)) for a in allocations_list)
@@ -126,6 +126,7 @@ async def allocate_payment_to_invoices(payload: Dict[str, Any]):
                 {"id": invoice_id},
                 {"$set": {"status": "partially_paid", "payment_status": "Partially Paid", "updated_at": now_utc()}}
             )
+        await reindex(invoices_coll.name, {"id": invoice_id})
     
     # Update payment's unallocated amount
     new_total_allocated = existing_total + total_allocated
@@ -256,6 +257,7 @@ async def delete_allocation(allocation_id: str):
                 {"id": invoice_id},
                 {"$set": {"status": "partially_paid", "payment_status": "Partially Paid", "updated_at": now_utc()}}
             )
+        await reindex(invoices_coll_to_update.name, {"id": invoice_id})
     
     return {
         "success": True,
@@ -328,6 +330,7 @@ async def update_allocation(allocation_id: str, payload: Dict[str, Any]):
             {"id": invoice_id},
             {"$set": {"status": "partially_paid", "payment_status": "Partially Paid", "updated_at": now_utc()}}
         )
+    await reindex(invoices_coll_to_update.name, {"id": invoice_id})
     
     updated_allocation = await allocations_coll.find_one({"id": allocation_id})
     updated_allocation.pop("_id", None)
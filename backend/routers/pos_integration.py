@@ -7,6 +7,9 @@ import uuid
 from bson import ObjectId
 
 from database import get_database
+from services.sequence_service import next_document_number
+from services.sort_keys import with_sort_key
+from services.search_index import index_document, reindex
 from models import *
 
 router = APIRouter(prefix="/api/pos", tags=["PoS Integration"])
@@ -310,6 +313,7 @@ async def create_pos_customer(customer_data: dict):
         
         # Insert into main customers collection
         result = await db.customers.insert_one(new_customer)
+        await index_document("customers", new_customer)
         
         if result.inserted_id:
             # Return customer data for PoS
@@ -356,8 +360,7 @@ async def receive_pos_transaction(transaction: PoSTransaction):
                     customer_name = customer.get("name", "Unknown Customer")
         
         # Create Sales Invoice (FIRST) - This is the actual bill to customer
-        invoice_count = await db.sales_invoices.count_documents({})
-        invoice_number = f"SINV-{datetime.now().strftime('%Y%m%d')}-{invoice_count + 1:04d}"
+        invoice_number = await next_document_number("SINV")
         
         sales_invoice = {
             "id": str(uuid.uuid4()),
@@ -400,7 +403,9 @@ async def receive_pos_transaction(transaction: PoSTransaction):
         
         # Insert Sales Invoice with error handling
         try:
+            with_sort_key("sales_invoices", sales_invoice)
             result = await db.sales_invoices.insert_one(sales_invoice)
+            await index_document("sales_invoices", sales_invoice)
             if result.inserted_id:
                 print(f"✅ Created Sales Invoice: {invoice_number} for ₹{transaction.total_amount}")
             else:
@@ -416,8 +421,7 @@ async def receive_pos_transaction(transaction: PoSTransaction):
             # In production, this should be handled differently
         
         # Create Sales Order (SECOND) - This is for order tracking/fulfillment
-        order_count = await db.sales_orders.count_documents({})
-        order_number = f"SO-{datetime.now().strftime('%Y%m%d')}-{order_count + 1:04d}"
+        order_number = await next_document_number("SO")
         
         # Convert PoS items to SalesOrder items format
         sales_order_items = []
@@ -475,7 +479,9 @@ async def receive_pos_transaction(transaction: PoSTransaction):
         }
         
         # Insert sales order
+        with_sort_key("sales_orders", sales_order)
         result = await db.sales_orders.insert_one(sales_order)
+        await index_document("sales_orders", sales_order)
         
         # Update inventory
         for item in transaction.items:
@@ -485,12 +491,14 @@ async def receive_pos_transaction(transaction: PoSTransaction):
                     {"_id": ObjectId(item["product_id"])},
                     {"$inc": {"stock_qty": -item["quantity"]}}
                 )
+                await reindex("items", {"_id": ObjectId(item["product_id"])})
             except:
                 # Try string id
                 await db.items.update_one(
                     {"id": item["product_id"]},
                     {"$inc": {"stock_qty": -item["quantity"]}}
                 )
+                await reindex("items", {"id": item["product_id"]})
         
         # Update customer last purchase
         if transaction.customer_id:
@@ -664,6 +672,7 @@ async def create_pos_customer(customer: PoSCustomer):
         }
         
         result = await db.customers.insert_one(customer_doc)
+        await index_document("customers", customer_doc)
         
         # Also store in PoS cache
         pos_customer_doc = customer.dict()
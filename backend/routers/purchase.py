@@ -1,30 +1,26 @@
 from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional
+from typing import Any, Dict, Optional
 from datetime import datetime, timezone
 from bson import ObjectId
 from pymongo import ASCENDING, DESCENDING
-import os
 
 from database import purchase_orders_collection, suppliers_collection, items_collection
+from services.sequence_service import next_document_number
+from services.pagination import (
+    is_cursor_request, decode_cursor, keyset_match, keyset_sort, split_page, cursor_envelope, page_envelope
+)
+from services.count_service import cached_count
+from services.sort_keys import with_sort_key, with_sort_key_update, date_range_match
+from services.search_index import index_document, reindex, remove_document
 from validators import (
     validate_required_fields, validate_items, validate_amounts,
     validate_status_transition, validate_transaction_update, validate_transaction_delete,
     PURCHASE_ORDER_STATUS_TRANSITIONS
 )
 
-# Optional email/SMS/PDF services (reused pattern from invoices/sales)
-try:
-    from services.email_service import SendGridEmailService, BRAND_PLACEHOLDER
-    from services.pdf_service import generate_invoice_pdf
-except Exception:
-    SendGridEmailService = None
-    BRAND_PLACEHOLDER = {"company_name": "Your Company"}
-    def generate_invoice_pdf(doc, brand):
-        return None
-try:
-    from services.sms_service import TwilioSmsService
-except Exception:
-    TwilioSmsService = None
+# Sends run as background jobs (services/document_send.py)
+from services.document_send import BRAND_PLACEHOLDER, email_configured, queue_send
+from services.send_tracking import get_queued_send_response
 
 router = APIRouter(prefix="/api/purchase", tags=["purchase"])
 
@@ -37,7 +33,7 @@ async def create_purchase_invoice_from_order(order_id: str, order_data: dict):
     
     invoice_data = {
         'id': str(uuid.uuid4()),
-        'invoice_number': f"PINV-{datetime.now().strftime('%Y%m%d')}-{await purchase_invoices_collection.count_documents({}) + 1:04d}",
+        'invoice_number': await next_document_number("PINV"),
         'purchase_order_id': order_id,
         'order_number': order_data.get('order_number', ''),
         'supplier_id': order_data.get('supplier_id'),
@@ -56,13 +52,17 @@ async def create_purchase_invoice_from_order(order_id: str, order_data: dict):
         'updated_at': datetime.now(timezone.utc)
     }
     
+    with_sort_key("purchase_invoices", invoice_data)
     await purchase_invoices_collection.insert_one(invoice_data)
+    await index_document("purchase_invoices", invoice_data)
     return invoice_data
 
-@router.get("/orders", response_model=List[dict])
+@router.get("/orders", response_model=Dict[str, Any])
 async def list_purchase_orders(
     limit: int = Query(50, ge=1, le=200),
     skip: int = Query(0, ge=0),
+    exact: bool = Query(False, description="Exact total_count instead of the cached/estimated one"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor ('start' for the first page); returns {items, next_cursor}"),
     status: Optional[str] = Query(None),
     supplier_id: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
@@ -83,7 +83,7 @@ async def list_purchase_orders(
                 {"supplier_name": {"$regex": search, "$options": "i"}},
             ]
 
-        # Build aggregation pipeline with normalized date
+        # order_date_sort is stored on write (services/sort_keys), so filters and sorts use indexes
         sort_field = (sort_by or '').lower()
         sort_map = {
             'order_number': 'order_number',
@@ -93,46 +93,38 @@ async def list_purchase_orders(
         sort_key = sort_map.get(sort_field, 'created_at')
         sort_direction = DESCENDING if (sort_dir or 'desc').lower() == 'desc' else ASCENDING
 
-        pipeline = [
-            { '$addFields': {
-                'order_date_sort': { '$toDate': { '$cond': [ { '$or': [ { '$eq': [ '$order_date', None ] }, { '$eq': [ '$order_date', '' ] } ] }, '$created_at', '$order_date' ] } }
-            }},
-        ]
+        date_match = date_range_match(from_date, to_date)
+        if date_match:
+            query['order_date_sort'] = date_match
+        pipeline = []
         if query:
             pipeline.append({'$match': query})
-        if from_date or to_date:
-            date_match = {}
-            if from_date:
-                y,m,d = map(int, from_date.split('-'))
-                date_match['$gte'] = datetime(y,m,d,0,0,0,tzinfo=timezone.utc)
-            if to_date:
-                y,m,d = map(int, to_date.split('-'))
-                date_match['$lte'] = datetime(y,m,d,23,59,59,tzinfo=timezone.utc)
-            pipeline.append({'$match': {'order_date_sort': date_match}})
-        pipeline.extend([
-            {'$sort': { sort_key: -1 if sort_direction==DESCENDING else 1 }},
-            {'$skip': skip},
-            {'$limit': limit}
-        ])
+        count_pipeline = list(pipeline)
 
-        orders = await purchase_orders_collection.aggregate(pipeline).to_list(length=limit)
+        cursor_mode = is_cursor_request(cursor)
+        next_cursor = None
+        if cursor_mode:
+            keyset = keyset_match(sort_key, sort_direction, decode_cursor(cursor, sort_key, sort_direction))
+            if keyset:
+                pipeline.append({'$match': keyset})
+            pipeline.extend([
+                {'$sort': keyset_sort(sort_key, sort_direction)},
+                {'$limit': limit + 1}
+            ])
+            rows = await purchase_orders_collection.aggregate(pipeline).to_list(length=limit + 1)
+            orders, next_cursor = split_page(rows, limit, sort_key, sort_direction)
+        else:
+            pipeline.extend([
+                {'$sort': { sort_key: -1 if sort_direction==DESCENDING else 1 }},
+                {'$skip': skip},
+                {'$limit': limit}
+            ])
+            orders = await purchase_orders_collection.aggregate(pipeline).to_list(length=limit)
 
         # Count
-        count_pipeline = pipeline[:1]
-        if query:
-            count_pipeline.append({'$match': query})
-        if from_date or to_date:
-            date_match = {}
-            if from_date:
-                y,m,d = map(int, from_date.split('-'))
-                date_match['$gte'] = datetime(y,m,d,0,0,0,tzinfo=timezone.utc)
-            if to_date:
-                y,m,d = map(int, to_date.split('-'))
-                date_match['$lte'] = datetime(y,m,d,23,59,59,tzinfo=timezone.utc)
-            count_pipeline.append({'$match': {'order_date_sort': date_match}})
-        count_pipeline.append({'$count': 'total'})
-        total_docs = await purchase_orders_collection.aggregate(count_pipeline).to_list(length=1)
-        total_count = total_docs[0]['total'] if total_docs else 0
+        total_count, total_is_estimate = 0, False
+        if not cursor_mode:
+            total_count, total_is_estimate = await cached_count(purchase_orders_collection, count_pipeline, exact)
 
         transformed = []
         for o in orders:
@@ -144,9 +136,12 @@ async def list_purchase_orders(
             o.setdefault('status', 'draft')
             o.setdefault('total_amount', 0.0)
             o.setdefault('items', [])
-            o['_meta'] = { 'total_count': total_count, 'page_size': limit, 'current_page': (skip//limit)+1 }
             transformed.append(o)
-        return transformed
+        if cursor_mode:
+            return cursor_envelope(transformed, next_cursor, limit)
+        return page_envelope(transformed, total_count, limit, skip, total_is_estimate)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching purchase orders: {str(e)}")
 
@@ -190,8 +185,7 @@ async def create_purchase_order(payload: dict):
         payload['updated_at'] = now
         # order number
         if not payload.get('order_number'):
-            count = await purchase_orders_collection.count_documents({})
-            payload['order_number'] = f"PO-{now.strftime('%Y%m%d')}-{count+1:04d}"
+            payload['order_number'] = await next_document_number("PO", now)
         # supplier enrichment
         if payload.get('supplier_id'):
             s = await suppliers_collection.find_one({ 'id': payload['supplier_id'] })
@@ -230,7 +224,9 @@ async def create_purchase_order(payload: dict):
         # Validate amounts after calculation
         validate_amounts(payload, "Purchase Order")
         
+        with_sort_key("purchase_orders", payload)
         res = await purchase_orders_collection.insert_one(payload)
+        await index_document("purchase_orders", payload)
         if res.inserted_id:
             payload['id'] = str(res.inserted_id)
             if '_id' in payload:
@@ -312,6 +308,8 @@ async def update_purchase_order(order_id: str, payload: dict):
             # Validate amounts after recalculation
             validate_amounts(payload, "Purchase Order")
         
+        with_sort_key_update("purchase_orders", payload, existing)
+
         # If status changed to "submitted", create Purchase Invoice
         if payload.get('status') == 'submitted' and existing.get('status') != 'submitted':
             # Merge existing data with updates for workflow
@@ -319,9 +317,11 @@ async def update_purchase_order(order_id: str, payload: dict):
             invoice_data = await create_purchase_invoice_from_order(order_id, merged_data)
             
             res = await purchase_orders_collection.update_one({ '_id': existing['_id'] }, { '$set': payload })
+            await reindex('purchase_orders', { '_id': existing['_id'] })
             return { 'success': True, 'message': 'Purchase Order updated and Purchase Invoice created', 'invoice_id': invoice_data['id'], 'modified': res.modified_count }
         
         res = await purchase_orders_collection.update_one({ '_id': existing['_id'] }, { '$set': payload })
+        await reindex('purchase_orders', { '_id': existing['_id'] })
         return { 'success': True, 'modified': res.modified_count }
     except HTTPException:
         raise
@@ -355,6 +355,7 @@ async def delete_purchase_order(order_id: str):
         
         res = await purchase_orders_collection.delete_one({'id': order_id})
         if res.deleted_count > 0:
+            await remove_document('purchase_orders', order_id)
             return {'success': True, 'message': 'Purchase order deleted successfully'}
         raise HTTPException(status_code=500, detail='Failed to delete purchase order')
     except HTTPException:
@@ -364,7 +365,7 @@ async def delete_purchase_order(order_id: str):
 
 @router.post("/orders/{order_id}/send")
 async def send_purchase_order(order_id: str, body: dict):
-    """Send purchase order via email and/or SMS. Body: { email?: str, phone?: str, include_pdf?: bool, subject?, message? }"""
+    """Queue sending the purchase order via email and/or SMS. Body: { email?: str, phone?: str, include_pdf?: bool, subject?, message? }"""
     try:
         order = await purchase_orders_collection.find_one({"id": order_id})
         if not order:
@@ -383,60 +384,19 @@ async def send_purchase_order(order_id: str, body: dict):
 
         if not to_email and not phone:
             raise HTTPException(status_code=400, detail="Provide at least an email or phone to send")
+        if to_email and not email_configured():
+            raise HTTPException(status_code=503, detail="Email service not configured. Set SENDGRID_API_KEY.")
 
-        results = {"email": None, "sms": None}
-        sent_via = []
-
-        # Email
-        if to_email:
-            if SendGridEmailService is None or not os.environ.get("SENDGRID_API_KEY"):
-                raise HTTPException(status_code=503, detail="Email service not configured. Set SENDGRID_API_KEY.")
-            pdf_bytes = None
-            if include_pdf:
-                try:
-                    pdf_bytes = generate_invoice_pdf(order, BRAND_PLACEHOLDER)
-                except Exception:
-                    pdf_bytes = None
-            svc = SendGridEmailService()
-            email_resp = svc.send_invoice(to_email, order, BRAND_PLACEHOLDER, pdf_bytes=pdf_bytes, subject_override=subject, preface=preface)
-            results["email"] = email_resp
-            if email_resp.get("success"):
-                sent_via.append("email")
-
-        # SMS
-        if phone:
-            if TwilioSmsService is None or not (os.environ.get("TWILIO_ACCOUNT_SID") and os.environ.get("TWILIO_AUTH_TOKEN") and os.environ.get("TWILIO_FROM_PHONE")):
-                results["sms"] = {"success": False, "configured": False, "message": "SMS not configured"}
-            else:
-                sms = TwilioSmsService()
-                sms_resp = sms.send_sms(phone, f"Purchase Order {order.get('order_number','')} total ₹{order.get('total_amount',0)}.")
-                results["sms"] = sms_resp
-                if sms_resp.get("success"):
-                    sent_via.append("sms")
-
-        # Use uniform send tracking service
-        from services.send_tracking import create_uniform_send_update, get_uniform_send_response
-        
-        # Build errors dict for uniform response
-        errors = {}
-        if results.get("email") and not results["email"].get("success"):
-            errors["email"] = results["email"].get("error", "Unknown error")
-        if results.get("sms") and not results["sms"].get("success"):
-            errors["sms"] = results["sms"].get("error", results["sms"].get("message", "Unknown error"))
-        
-        update_fields = create_uniform_send_update(
-            send_results=results,
-            method="email" if to_email else "sms",  # Primary method
-            recipient=to_email or phone,
-            attach_pdf=include_pdf
-        )
-        await purchase_orders_collection.update_one({"_id": order["_id"]}, {"$set": update_fields})
-
-        return get_uniform_send_response(
-            send_results=results,
-            sent_via=sent_via,
-            errors=errors
+        job = await queue_send(
+            "purchase_order", order,
+            email=to_email,
+            phone=phone,
+            include_pdf=include_pdf,
+            subject=subject,
+            preface=preface,
+            sms_body=f"Purchase Order {order.get('order_number','')} total ₹{order.get('total_amount',0)}.",
         )
+        return get_queued_send_response(job)
     except HTTPException:
         raise
     except Exception as e:
@@ -461,22 +421,12 @@ async def purchase_order_stats(
                 {"order_number": {"$regex": search, "$options": "i"}},
                 {"supplier_name": {"$regex": search, "$options": "i"}},
             ]
-        pipeline = [
-            { '$addFields': {
-                'order_date_sort': { '$toDate': { '$cond': [ { '$or': [ { '$eq': [ '$order_date', None ] }, { '$eq': [ '$order_date', '' ] } ] }, '$created_at', '$order_date' ] } }
-            }},
-        ]
+        date_match = date_range_match(from_date, to_date)
+        if date_match:
+            match_stage['order_date_sort'] = date_match
+        pipeline = []
         if match_stage:
             pipeline.append({ '$match': match_stage })
-        if from_date or to_date:
-            date_match = {}
-            if from_date:
-                y,m,d = map(int, from_date.split('-'))
-                date_match['$gte'] = datetime(y,m,d,0,0,0,tzinfo=timezone.utc)
-            if to_date:
-                y,m,d = map(int, to_date.split('-'))
-                date_match['$lte'] = datetime(y,m,d,23,59,59,tzinfo=timezone.utc)
-            pipeline.append({ '$match': { 'order_date_sort': date_match } })
         pipeline.append({ '$group': {
             '_id': None,
             'total_count': { '$sum': 1 },
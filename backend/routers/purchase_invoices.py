@@ -1,11 +1,16 @@
 from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional
+from typing import Any, Dict, Optional
 from datetime import datetime, timezone
 from bson import ObjectId
 from pymongo import ASCENDING, DESCENDING
 import uuid
 
 from database import purchase_invoices_collection, suppliers_collection
+from services.sequence_service import next_document_number
+from services.pagination import page_envelope
+from services.count_service import cached_count
+from services.sort_keys import with_sort_key, with_sort_key_update, date_range_match
+from services.search_index import index_document, reindex, remove_document
 from validators import (
     validate_required_fields, validate_items, validate_amounts,
     validate_status_transition, validate_transaction_update,
@@ -19,10 +24,11 @@ from workflow_helpers import (
     create_journal_entry_for_purchase_invoice
 )
 
-@router.get("/invoices", response_model=List[dict])
+@router.get("/invoices", response_model=Dict[str, Any])
 async def list_purchase_invoices(
     limit: int = Query(50, ge=1, le=200),
     skip: int = Query(0, ge=0),
+    exact: bool = Query(False, description="Exact total_count instead of the cached/estimated one"),
     status: Optional[str] = Query(None),
     supplier_id: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
@@ -53,22 +59,14 @@ async def list_purchase_invoices(
         sort_key = sort_map.get(sort_field, 'created_at')
         sort_direction = DESCENDING if (sort_dir or 'desc').lower() == 'desc' else ASCENDING
 
-        pipeline = [
-            { '$addFields': {
-                'invoice_date_sort': { '$toDate': { '$cond': [ { '$or': [ { '$eq': [ '$invoice_date', None ] }, { '$eq': [ '$invoice_date', '' ] } ] }, '$created_at', '$invoice_date' ] } }
-            }},
-        ]
+        date_match = date_range_match(from_date, to_date)
+        if date_match:
+            query['invoice_date_sort'] = date_match
+        pipeline = []
         if query:
             pipeline.append({'$match': query})
-        if from_date or to_date:
-            date_match = {}
-            if from_date:
-                y,m,d = map(int, from_date.split('-'))
-                date_match['$gte'] = datetime(y,m,d,0,0,0,tzinfo=timezone.utc)
-            if to_date:
-                y,m,d = map(int, to_date.split('-'))
-                date_match['$lte'] = datetime(y,m,d,23,59,59,tzinfo=timezone.utc)
-            pipeline.append({'$match': {'invoice_date_sort': date_match}})
+        count_pipeline = list(pipeline)
+
         pipeline.extend([
             {'$sort': { sort_key: -1 if sort_direction==DESCENDING else 1 }},
             {'$skip': skip},
@@ -78,21 +76,7 @@ async def list_purchase_invoices(
         invoices = await purchase_invoices_collection.aggregate(pipeline).to_list(length=limit)
 
         # Count
-        count_pipeline = pipeline[:1]
-        if query:
-            count_pipeline.append({'$match': query})
-        if from_date or to_date:
-            date_match = {}
-            if from_date:
-                y,m,d = map(int, from_date.split('-'))
-                date_match['$gte'] = datetime(y,m,d,0,0,0,tzinfo=timezone.utc)
-            if to_date:
-                y,m,d = map(int, to_date.split('-'))
-                date_match['$lte'] = datetime(y,m,d,23,59,59,tzinfo=timezone.utc)
-            count_pipeline.append({'$match': {'invoice_date_sort': date_match}})
-        count_pipeline.append({'$count': 'total'})
-        total_docs = await purchase_invoices_collection.aggregate(count_pipeline).to_list(length=1)
-        total_count = total_docs[0]['total'] if total_docs else 0
+        total_count, total_is_estimate = await cached_count(purchase_invoices_collection, count_pipeline, exact)
 
         transformed = []
         for inv in invoices:
@@ -107,9 +91,8 @@ async def list_purchase_invoices(
             inv.setdefault('status', 'draft')
             inv.setdefault('total_amount', 0.0)
             inv.setdefault('items', [])
-            inv['_meta'] = { 'total_count': total_count, 'page_size': limit, 'current_page': (skip//limit)+1 }
             transformed.append(inv)
-        return transformed
+        return page_envelope(transformed, total_count, limit, skip, total_is_estimate)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching purchase invoices: {str(e)}")
 
@@ -169,8 +152,7 @@ async def create_purchase_invoice(payload: dict):
             payload['invoice_date'] = now.strftime('%Y-%m-%d')
         # invoice number
         if not payload.get('invoice_number'):
-            count = await purchase_invoices_collection.count_documents({})
-            payload['invoice_number'] = f"PINV-{now.strftime('%Y%m%d')}-{count+1:04d}"
+            payload['invoice_number'] = await next_document_number("PINV", now)
         # supplier enrichment
         if payload.get('supplier_id'):
             s = await suppliers_collection.find_one({ 'id': payload['supplier_id'] })
@@ -209,7 +191,9 @@ async def create_purchase_invoice(payload: dict):
         # Validate amounts after calculation
         validate_amounts(payload, "Purchase Invoice")
         
+        with_sort_key("purchase_invoices", payload)
         res = await purchase_invoices_collection.insert_one(payload)
+        await index_document("purchase_invoices", payload)
         if res.inserted_id:
             payload['id'] = str(res.inserted_id)
             if '_id' in payload:
@@ -275,6 +259,8 @@ async def update_purchase_invoice(invoice_id: str, payload: dict):
                 'discount_amount': discount_amount,
                 'total_amount': total_amount
             })
+        with_sort_key_update("purchase_invoices", payload, existing)
+
         # If status changed to "submitted", create Journal Entry only (Payment Entry created separately)
         if payload.get('status') == 'submitted' and existing.get('status') != 'submitted':
             from database import journal_entries_collection, accounts_collection
@@ -288,9 +274,11 @@ async def update_purchase_invoice(invoice_id: str, payload: dict):
             )
             
             res = await purchase_invoices_collection.update_one({ '_id': existing['_id'] }, { '$set': payload })
+            await reindex('purchase_invoices', { '_id': existing['_id'] })
             return { 'success': True, 'message': 'Purchase Invoice updated and Journal Entry created', 'journal_entry_id': je_id }
         
         res = await purchase_invoices_collection.update_one({ '_id': existing['_id'] }, { '$set': payload })
+        await reindex('purchase_invoices', { '_id': existing['_id'] })
         return { 'success': True, 'modified': res.modified_count }
     except HTTPException:
         raise
@@ -307,6 +295,7 @@ async def delete_purchase_invoice(invoice_id: str):
             except Exception:
                 pass
         if res.deleted_count > 0:
+            await remove_document('purchase_invoices', invoice_id)
             return { 'success': True }
         raise HTTPException(status_code=404, detail='Purchase invoice not found')
     except HTTPException:
@@ -418,22 +407,12 @@ async def purchase_invoice_stats(
                 {"invoice_number": {"$regex": search, "$options": "i"}},
                 {"supplier_name": {"$regex": search, "$options": "i"}},
             ]
-        pipeline = [
-            { '$addFields': {
-                'invoice_date_sort': { '$toDate': { '$cond': [ { '$or': [ { '$eq': [ '$invoice_date', None ] }, { '$eq': [ '$invoice_date', '' ] } ] }, '$created_at', '$invoice_date' ] } }
-            }},
-        ]
+        date_match = date_range_match(from_date, to_date)
+        if date_match:
+            match_stage['invoice_date_sort'] = date_match
+        pipeline = []
         if match_stage:
             pipeline.append({ '$match': match_stage })
-        if from_date or to_date:
-            date_match = {}
-            if from_date:
-                y,m,d = map(int, from_date.split('-'))
-                date_match['$gte'] = datetime(y,m,d,0,0,0,tzinfo=timezone.utc)
-            if to_date:
-                y,m,d = map(int, to_date.split('-'))
-                date_match['$lte'] = datetime(y,m,d,23,59,59,tzinfo=timezone.utc)
-            pipeline.append({ '$match': { 'invoice_date_sort': date_match } })
         pipeline.append({ '$group': {
             '_id': None,
             'total_count': { '$sum': 1 },
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional
+from typing import Any, Dict, Optional
 from database import sales_quotations_collection, customers_collection, items_collection
 from models import Quotation, QuotationCreate
 from validators import (
@@ -10,20 +10,17 @@ from validators import (
 import uuid
 from datetime import datetime, timezone
 from bson import ObjectId
+from services.sequence_service import next_document_number
+from services.pagination import (
+    is_cursor_request, decode_cursor, keyset_match, keyset_sort, split_page, cursor_envelope, page_envelope
+)
+from services.count_service import cached_count
+from services.sort_keys import with_sort_key, with_sort_key_update, date_range_match
+from services.search_index import index_document, reindex, remove_document
 
-# Email/SMS/PDF services
-try:
-    from services.email_service import SendGridEmailService, BRAND_PLACEHOLDER
-    from services.pdf_service import generate_invoice_pdf
-except Exception:
-    SendGridEmailService = None
-    BRAND_PLACEHOLDER = {"company_name": "Your Company"}
-    def generate_invoice_pdf(invoice, brand):
-        return None
-try:
-    from services.sms_service import TwilioSmsService
-except Exception:
-    TwilioSmsService = None
+# Sends run as background jobs (services/document_send.py)
+from services.document_send import BRAND_PLACEHOLDER, email_configured, queue_send
+from services.send_tracking import get_queued_send_response
 
 router = APIRouter(prefix="/api/quotations", tags=["quotations"])
 
@@ -34,7 +31,7 @@ async def create_sales_order_from_quotation(quotation_id: str, quotation_data: d
     
     order_data = {
         "id": str(uuid.uuid4()),
-        "order_number": f"SO-{datetime.now().strftime('%Y%m%d')}-{await sales_orders_collection.count_documents({}) + 1:04d}",
+        "order_number": await next_document_number("SO"),
         "quotation_id": quotation_id,
         "quotation_number": quotation_data.get("quotation_number", ""),
         "customer_id": quotation_data.get("customer_id"),
@@ -53,13 +50,17 @@ async def create_sales_order_from_quotation(quotation_id: str, quotation_data: d
         "updated_at": datetime.now(timezone.utc)
     }
     
+    with_sort_key("sales_orders", order_data)
     await sales_orders_collection.insert_one(order_data)
+    await index_document("sales_orders", order_data)
     return order_data
 
-@router.get("/", response_model=List[dict])
+@router.get("/", response_model=Dict[str, Any])
 async def list_quotations(
     limit: int = Query(50, ge=1, le=200),
     skip: int = Query(0, ge=0),
+    exact: bool = Query(False, description="Exact total_count instead of the cached/estimated one"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor ('start' for the first page); returns {items, next_cursor}"),
     status: Optional[str] = Query(None),
     customer_id: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
@@ -89,44 +90,38 @@ async def list_quotations(
         sort_key = sort_map.get(sort_field, 'created_at')
         sort_direction = -1 if (sort_dir or 'desc').lower() == 'desc' else 1
 
-        pipeline = [
-            { '$addFields': { 'quotation_date_sort': { '$toDate': { '$ifNull': [ '$quotation_date', '$created_at' ] } } } }
-        ]
+        date_match = date_range_match(from_date, to_date)
+        if date_match:
+            query['quotation_date_sort'] = date_match
+        pipeline = []
         if query:
             pipeline.append({ '$match': query })
-        if from_date or to_date:
-            date_match = {}
-            if from_date:
-                y,m,d = map(int, from_date.split('-'))
-                date_match['$gte'] = datetime(y,m,d,0,0,0,tzinfo=timezone.utc)
-            if to_date:
-                y,m,d = map(int, to_date.split('-'))
-                date_match['$lte'] = datetime(y,m,d,23,59,59,tzinfo=timezone.utc)
-            pipeline.append({ '$match': { 'quotation_date_sort': date_match } })
-        pipeline.extend([
-            { '$sort': { sort_key: sort_direction } },
-            { '$skip': skip },
-            { '$limit': limit },
-        ])
+        count_pipeline = list(pipeline)
 
-        quotes = await sales_quotations_collection.aggregate(pipeline).to_list(length=limit)
+        cursor_mode = is_cursor_request(cursor)
+        next_cursor = None
+        if cursor_mode:
+            keyset = keyset_match(sort_key, sort_direction, decode_cursor(cursor, sort_key, sort_direction))
+            if keyset:
+                pipeline.append({ '$match': keyset })
+            pipeline.extend([
+                { '$sort': keyset_sort(sort_key, sort_direction) },
+                { '$limit': limit + 1 },
+            ])
+            rows = await sales_quotations_collection.aggregate(pipeline).to_list(length=limit + 1)
+            quotes, next_cursor = split_page(rows, limit, sort_key, sort_direction)
+        else:
+            pipeline.extend([
+                { '$sort': { sort_key: sort_direction } },
+                { '$skip': skip },
+                { '$limit': limit },
+            ])
+            quotes = await sales_quotations_collection.aggregate(pipeline).to_list(length=limit)
 
         # Count
-        count_pipeline = [pipeline[0]]  # $addFields
-        if query:
-            count_pipeline.append({ '$match': query })
-        if from_date or to_date:
-            date_match = {}
-            if from_date:
-                y,m,d = map(int, from_date.split('-'))
-                date_match['$gte'] = datetime(y,m,d,0,0,0,tzinfo=timezone.utc)
-            if to_date:
-                y,m,d = map(int, to_date.split('-'))
-                date_match['$lte'] = datetime(y,m,d,23,59,59,tzinfo=timezone.utc)
-            count_pipeline.append({ '$match': { 'quotation_date_sort': date_match } })
-        count_pipeline.append({ '$count': 'total' })
-        total_docs = await sales_quotations_collection.aggregate(count_pipeline).to_list(length=1)
-        total_count = total_docs[0]['total'] if total_docs else 0
+        total_count, total_is_estimate = 0, False
+        if not cursor_mode:
+            total_count, total_is_estimate = await cached_count(sales_quotations_collection, count_pipeline, exact)
 
         transformed = []
         for q in quotes:
@@ -141,9 +136,12 @@ async def list_quotations(
             q.setdefault("subtotal", 0.0)
             q.setdefault("tax_amount", 0.0)
             q.setdefault("discount_amount", 0.0)
-            q["_meta"] = {"total_count": total_count, "page_size": limit, "current_page": (skip // limit) + 1}
             transformed.append(q)
-        return transformed
+        if cursor_mode:
+            return cursor_envelope(transformed, next_cursor, limit)
+        return page_envelope(transformed, total_count, limit, skip, total_is_estimate)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching quotations: {str(e)}")
 
@@ -186,8 +184,7 @@ async def create_quotation(payload: dict):
         payload["created_at"] = now
         payload["updated_at"] = now
         if not payload.get("quotation_number"):
-            count = await sales_quotations_collection.count_documents({})
-            payload["quotation_number"] = f"QTN-{now.strftime('%Y%m%d')}-{count + 1:04d}"
+            payload["quotation_number"] = await next_document_number("QTN", now)
         if not payload.get("quotation_date"):
             payload["quotation_date"] = now
         if payload.get("customer_id"):
@@ -224,7 +221,9 @@ async def create_quotation(payload: dict):
         # Validate amounts after calculation
         validate_amounts(payload, "Quotation")
         
+        with_sort_key("sales_quotations", payload)
         res = await sales_quotations_collection.insert_one(payload)
+        await index_document("sales_quotations", payload)
         if res.inserted_id:
             payload["_id"] = str(res.inserted_id)
             payload_id = payload.get("id")
@@ -305,6 +304,8 @@ async def update_quotation(quotation_id: str, payload: dict):
             # Validate amounts after recalculation
             validate_amounts(payload, "Quotation")
         
+        with_sort_key_update("sales_quotations", payload, existing)
+
         # If status changed to "submitted" or "accepted", create Sales Order
         if payload.get("status") in ["submitted", "accepted"] and existing.get("status") not in ["submitted", "accepted"]:
             # Merge existing data with updates for workflow
@@ -312,9 +313,11 @@ async def update_quotation(quotation_id: str, payload: dict):
             order_data = await create_sales_order_from_quotation(quotation_id, merged_data)
             
             res = await sales_quotations_collection.update_one({"_id": existing["_id"]}, {"$set": payload})
+            await reindex("sales_quotations", {"_id": existing["_id"]})
             return {"success": True, "message": "Quotation updated and Sales Order created", "sales_order_id": order_data["id"], "modified": res.modified_count}
         
         res = await sales_quotations_collection.update_one({"_id": existing["_id"]}, {"$set": payload})
+        await reindex("sales_quotations", {"_id": existing["_id"]})
         return {"success": True, "modified": res.modified_count}
     except HTTPException:
         raise
@@ -348,6 +351,7 @@ async def delete_quotation(quotation_id: str):
         
         res = await sales_quotations_collection.delete_one({"id": quotation_id})
         if res.deleted_count > 0:
+            await remove_document("sales_quotations", quotation_id)
             return {"success": True, "message": "Quotation deleted successfully"}
         raise HTTPException(status_code=500, detail="Failed to delete quotation")
     except HTTPException:
@@ -371,49 +375,21 @@ async def send_quotation(quotation_id: str, body: dict):
         include_pdf = bool((body or {}).get("include_pdf"))
         subject = (body or {}).get("subject") or f"Quotation {q.get('quotation_number','')} from {BRAND_PLACEHOLDER.get('company_name','Your Company')}"
         preface = (body or {}).get("message") or f"Dear {q.get('customer_name','Customer')}, Please find your quotation details below."
-        results = {"email": None, "sms": None}
-        sent_via = []
-        if to_email:
-            if SendGridEmailService is None:
-                raise HTTPException(status_code=503, detail="Email service not configured")
-            pdf_bytes = generate_invoice_pdf(q, BRAND_PLACEHOLDER) if include_pdf else None
-            svc = SendGridEmailService()
-            email_resp = svc.send_invoice(to_email, q, BRAND_PLACEHOLDER, pdf_bytes=pdf_bytes, subject_override=subject, preface=preface)
-            results["email"] = email_resp
-            if email_resp.get("success"):
-                sent_via.append("email")
-        if phone:
-            if TwilioSmsService is None:
-                results["sms"] = {"success": False, "message": "SMS not configured"}
-            else:
-                sms = TwilioSmsService()
-                sms_resp = sms.send_sms(phone, f"Quotation {q.get('quotation_number','')}: total ₹{q.get('total_amount',0)}")
-                results["sms"] = sms_resp
-                if sms_resp.get("success"):
-                    sent_via.append("sms")
-        # Use uniform send tracking service
-        from services.send_tracking import create_uniform_send_update, get_uniform_send_response
-        
-        # Build errors dict for uniform response
-        errors = {}
-        if results.get("email") and not results["email"].get("success"):
-            errors["email"] = results["email"].get("error", "Unknown error")
-        if results.get("sms") and not results["sms"].get("success"):
-            errors["sms"] = results["sms"].get("error", results["sms"].get("message", "Unknown error"))
-        
-        update_fields = create_uniform_send_update(
-            send_results=results,
-            method="email" if to_email else "sms",  # Primary method
-            recipient=to_email or phone,
-            attach_pdf=include_pdf
-        )
-        await sales_quotations_collection.update_one({"_id": q["_id"]}, {"$set": update_fields})
-        return get_uniform_send_response(
-            send_results=results,
-            sent_via=sent_via,
-            errors=errors
+        if not to_email and not phone:
+            raise HTTPException(status_code=400, detail="Provide at least an email or phone to send")
+        if to_email and not email_configured():
+            raise HTTPException(status_code=503, detail="Email service not configured")
+        job = await queue_send(
+            "quotation", q,
+            email=to_email,
+            phone=phone,
+            include_pdf=include_pdf,
+            subject=subject,
+            preface=preface,
+            sms_body=f"Quotation {q.get('quotation_number','')}: total ₹{q.get('total_amount',0)}",
         )
+        return get_queued_send_response(job)
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error sending quotation: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error sending quotation: {str(e)}")
@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Query, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 from models import Transaction, Customer, Supplier, Item, SalesOrder, PurchaseOrder
 from database import db
-import uuid
+from services.report_export import (
+    ExportError, resolve, export_chunks, export_filename, start_export, get_export, artefact_chunks
+)
 from collections import defaultdict
 import calendar
 
@@ -455,41 +458,73 @@ async def get_performance_metrics_report(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating performance metrics: {str(e)}")
 
+@router.get("/export/{report_type}")
+async def stream_report_export(
+    report_type: str,
+    format: str = Query("csv", description="Export format: csv, xlsx (excel) or pdf"),
+    days: int = Query(30, description="Number of days to analyze"),
+    company_id: str = Query("default", description="Company ID")
+):
+    """
+    Stream the report as a file download; rows are read and written in batches
+    """
+    try:
+        key, source, fmt, ext, media_type = resolve(report_type, format)
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        export_chunks(source, fmt, days),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(key, ext)}"'},
+    )
+
 @router.post("/export/{report_type}")
 async def export_report(
     report_type: str,
-    format: str = Query("pdf", description="Export format: pdf or excel"),
+    format: str = Query("pdf", description="Export format: csv, xlsx (excel) or pdf"),
     days: int = Query(30, description="Number of days to analyze"),
     company_id: str = Query("default", description="Company ID")
 ):
     """
-    Export report in specified format (PDF or Excel)
+    Export report in the background; poll or fetch the file at download_url
     """
     try:
-        # For now, return a mock response
-        # In a real implementation, this would generate actual PDF/Excel files
-        export_id = str(uuid.uuid4())
-        
+        export = await start_export(report_type, format, days)
         return {
             "message": f"Report export initiated for {report_type}",
-            "export_id": export_id,
-            "format": format,
-            "status": "processing",
-            "download_url": f"/api/reports/download/{export_id}",
-            "estimated_completion": (datetime.utcnow() + timedelta(seconds=30)).isoformat()
+            "export_id": export["id"],
+            "format": export["format"],
+            "status": export["status"],
+            "download_url": f"/api/reports/download/{export['id']}",
+            "job_id": export["job_id"],
         }
-        
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error exporting report: {str(e)}")
 
 @router.get("/download/{export_id}")
 async def download_report(export_id: str):
     """
-    Download exported report file
+    Download exported report file; returns the export status (202) while it is still running
     """
-    # Mock implementation
-    return {
-        "message": "File download would start here",
-        "export_id": export_id,
-        "note": "This is a mock endpoint. In production, this would return the actual file."
-    }
\ No newline at end of file
+    export = await get_export(export_id)
+    if not export:
+        raise HTTPException(status_code=404, detail="Export not found")
+    if export["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"Export failed: {export.get('error', 'unknown error')}")
+    if export["status"] != "completed":
+        return JSONResponse(status_code=202, content={
+            "export_id": export_id,
+            "status": export["status"],
+            "job_id": export.get("job_id"),
+            "message": "Export is still being generated",
+        })
+    return StreamingResponse(
+        artefact_chunks(export["file_id"]),
+        media_type=export["content_type"],
+        headers={
+            "Content-Disposition": f'attachment; filename="{export["filename"]}"',
+            "Content-Length": str(export["size"]),
+        },
+    )
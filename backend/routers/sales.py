@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional
+from typing import Any, Dict, Optional
 from database import sales_orders_collection, customers_collection, items_collection
 from models import SalesOrder, SalesOrderCreate
 from validators import (
@@ -11,21 +11,17 @@ import uuid
 from datetime import datetime, timezone, timedelta, time
 from bson import ObjectId
 from pymongo import ASCENDING, DESCENDING
-import os
+from services.sequence_service import next_document_number
+from services.pagination import (
+    is_cursor_request, decode_cursor, keyset_match, keyset_sort, split_page, cursor_envelope, page_envelope
+)
+from services.count_service import cached_count
+from services.sort_keys import with_sort_key, with_sort_key_update, date_range_match
+from services.search_index import index_document, reindex, remove_document
 
-# Email/SMS/PDF services reused from invoices
-try:
-    from services.email_service import SendGridEmailService, BRAND_PLACEHOLDER
-    from services.pdf_service import generate_invoice_pdf
-except Exception:
-    SendGridEmailService = None
-    BRAND_PLACEHOLDER = {"company_name": "Your Company"}
-    def generate_invoice_pdf(invoice, brand):
-        return None
-try:
-    from services.sms_service import TwilioSmsService
-except Exception:
-    TwilioSmsService = None
+# Sends run as background jobs (services/document_send.py)
+from services.document_send import BRAND_PLACEHOLDER, email_configured, queue_send
+from services.send_tracking import get_queued_send_response
 
 router = APIRouter(prefix="/api/sales", tags=["sales"])
 
@@ -36,7 +32,7 @@ async def create_sales_invoice_from_order(order_id: str, order_data: dict):
     
     invoice_data = {
         "id": str(uuid.uuid4()),
-        "invoice_number": f"INV-{datetime.now().strftime('%Y%m%d')}-{await sales_invoices_collection.count_documents({}) + 1:04d}",
+        "invoice_number": await next_document_number("INV"),
         "sales_order_id": order_id,
         "order_number": order_data.get("order_number", ""),
         "customer_id": order_data.get("customer_id"),
@@ -55,14 +51,18 @@ async def create_sales_invoice_from_order(order_id: str, order_data: dict):
         "updated_at": datetime.now(timezone.utc)
     }
     
+    with_sort_key("sales_invoices", invoice_data)
     await sales_invoices_collection.insert_one(invoice_data)
+    await index_document("sales_invoices", invoice_data)
     return invoice_data
 
 # ============ LIST WITH FILTERS/PAGINATION ============
-@router.get("/orders", response_model=List[dict])
+@router.get("/orders", response_model=Dict[str, Any])
 async def get_sales_orders(
     limit: int = Query(50, ge=1, le=200),
     skip: int = Query(0, ge=0),
+    exact: bool = Query(False, description="Exact total_count instead of the cached/estimated one"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor ('start' for the first page); returns {items, next_cursor}"),
     status: Optional[str] = Query(None),
     customer_id: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
@@ -82,28 +82,11 @@ async def get_sales_orders(
                 {"order_number": {"$regex": search, "$options": "i"}},
                 {"customer_name": {"$regex": search, "$options": "i"}},
             ]
-        # Date filtering (assume stored as UTC datetimes)
-        if from_date or to_date:
-            date_query = {}
-            if from_date:
-                try:
-                    y,m,d = map(int, from_date.split('-'))
-                    start_dt = datetime(y,m,d,0,0,0,tzinfo=timezone.utc)
-                except Exception:
-                    start_dt = None
-                if start_dt:
-                    date_query["$gte"] = start_dt
-            if to_date:
-                try:
-                    y,m,d = map(int, to_date.split('-'))
-                    end_dt = datetime(y,m,d,23,59,59,tzinfo=timezone.utc)
-                except Exception:
-                    end_dt = None
-                if end_dt:
-                    date_query["$lte"] = end_dt
-            if date_query:
-                query["order_date"] = date_query
-        # Sorting & retrieval using aggregation for robust date handling and count
+        # order_date_sort is stored on write (services/sort_keys), so filters and sorts use indexes
+        date_match = date_range_match(from_date, to_date)
+        if date_match:
+            query["order_date_sort"] = date_match
+        # Sorting & retrieval
         sort_field = (sort_by or '').lower()
         sort_map = {
             'order_number': 'order_number',
@@ -113,64 +96,35 @@ async def get_sales_orders(
         sort_key = sort_map.get(sort_field, 'created_at')
         sort_direction = DESCENDING if (sort_dir or 'desc').lower() == 'desc' else ASCENDING
 
-        # Build pipeline
-        match_stage = query.copy()
-        pipeline = [
-            { '$addFields': {
-                'order_date_sort': { '$toDate': { '$ifNull': [ '$order_date', '$created_at' ] } }
-            }},
-        ]
-        if match_stage:
-            pipeline.append({ '$match': match_stage })
-        # Apply date range on normalized field if provided
-        if from_date or to_date:
-            date_match = {}
-            if from_date:
-                try:
-                    y,m,d = map(int, from_date.split('-'))
-                    date_match['$gte'] = datetime(y,m,d,0,0,0,tzinfo=timezone.utc)
-                except Exception:
-                    pass
-            if to_date:
-                try:
-                    y,m,d = map(int, to_date.split('-'))
-                    date_match['$lte'] = datetime(y,m,d,23,59,59,tzinfo=timezone.utc)
-                except Exception:
-                    pass
-            if date_match:
-                pipeline.append({ '$match': { 'order_date_sort': date_match } })
-        pipeline.extend([
-            { '$sort': { sort_key: sort_direction } },
-            { '$skip': skip },
-            { '$limit': limit }
-        ])
+        pipeline = []
+        if query:
+            pipeline.append({ '$match': query })
+        count_pipeline = list(pipeline)
 
-        orders = await sales_orders_collection.aggregate(pipeline).to_list(length=limit)
+        cursor_mode = is_cursor_request(cursor)
+        next_cursor = None
+        if cursor_mode:
+            keyset = keyset_match(sort_key, sort_direction, decode_cursor(cursor, sort_key, sort_direction))
+            if keyset:
+                pipeline.append({ '$match': keyset })
+            pipeline.extend([
+                { '$sort': keyset_sort(sort_key, sort_direction) },
+                { '$limit': limit + 1 }
+            ])
+            rows = await sales_orders_collection.aggregate(pipeline).to_list(length=limit + 1)
+            orders, next_cursor = split_page(rows, limit, sort_key, sort_direction)
+        else:
+            pipeline.extend([
+                { '$sort': { sort_key: sort_direction } },
+                { '$skip': skip },
+                { '$limit': limit }
+            ])
+            orders = await sales_orders_collection.aggregate(pipeline).to_list(length=limit)
 
-        # Count pipeline
-        count_pipeline = pipeline[:1]  # $addFields
-        count_match = []
-        if match_stage:
-            count_match.append({ '$match': match_stage })
-        if from_date or to_date:
-            date_match = {}
-            if from_date:
-                try:
-                    y,m,d = map(int, from_date.split('-'))
-                    date_match['$gte'] = datetime(y,m,d,0,0,0,tzinfo=timezone.utc)
-                except Exception:
-                    pass
-            if to_date:
-                try:
-                    y,m,d = map(int, to_date.split('-'))
-                    date_match['$lte'] = datetime(y,m,d,23,59,59,tzinfo=timezone.utc)
-                except Exception:
-                    pass
-            if date_match:
-                count_match.append({ '$match': { 'order_date_sort': date_match } })
-        count_pipeline = count_pipeline + count_match + [{ '$count': 'total' }]
-        total_docs = await sales_orders_collection.aggregate(count_pipeline).to_list(length=1)
-        total_count = (total_docs[0]['total'] if total_docs else 0)
+        # Count (skipped for cursor pages, which stay O(limit))
+        total_count, total_is_estimate = 0, False
+        if not cursor_mode:
+            total_count, total_is_estimate = await cached_count(sales_orders_collection, count_pipeline, exact)
 
         transformed = []
         for order in orders:
@@ -184,9 +138,12 @@ async def get_sales_orders(
             order.setdefault("status", "draft")
             order.setdefault("items", [])
             order.setdefault("company_id", "default_company")
-            order["_meta"] = {"total_count": total_count, "page_size": limit, "current_page": (skip // limit) + 1}
             transformed.append(order)
-        return transformed
+        if cursor_mode:
+            return cursor_envelope(transformed, next_cursor, limit)
+        return page_envelope(transformed, total_count, limit, skip, total_is_estimate)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching sales orders: {str(e)}")
 
@@ -245,8 +202,7 @@ async def create_sales_order(order_data: dict):
             order_data["order_date"] = now
         # generate order number
         if not order_data.get("order_number"):
-            count = await sales_orders_collection.count_documents({})
-            order_data["order_number"] = f"SO-{now.strftime('%Y%m%d')}-{count + 1:04d}"
+            order_data["order_number"] = await next_document_number("SO", now)
         # customer enrichment
         if order_data.get("customer_id"):
             customer = await customers_collection.find_one({"id": order_data["customer_id"]})
@@ -284,7 +240,9 @@ async def create_sales_order(order_data: dict):
         validate_amounts(order_data, "Sales Order")
         
         # save
+        with_sort_key("sales_orders", order_data)
         result = await sales_orders_collection.insert_one(order_data)
+        await index_document("sales_orders", order_data)
         if result.inserted_id:
             order_data["_id"] = str(result.inserted_id)
             order_id = order_data.get("id")
@@ -366,6 +324,8 @@ async def update_sales_order(order_id: str, order_data: dict):
             # Validate amounts after recalculation
             validate_amounts(order_data, "Sales Order")
         
+        with_sort_key_update("sales_orders", order_data, existing)
+
         # If status changed to "submitted", create Sales Invoice
         if order_data.get("status") == "submitted" and existing.get("status") != "submitted":
             # Merge existing data with updates for workflow
@@ -373,9 +333,11 @@ async def update_sales_order(order_id: str, order_data: dict):
             invoice_data = await create_sales_invoice_from_order(order_id, merged_data)
             
             result = await sales_orders_collection.update_one({"_id": existing["_id"]}, {"$set": order_data})
+            await reindex("sales_orders", {"_id": existing["_id"]})
             return {"success": True, "message": "Sales Order updated and Sales Invoice created", "invoice_id": invoice_data["id"], "modified": result.modified_count}
         
         result = await sales_orders_collection.update_one({"_id": existing["_id"]}, {"$set": order_data})
+        await reindex("sales_orders", {"_id": existing["_id"]})
         return {"success": True, "modified": result.modified_count}
     except HTTPException:
         raise
@@ -410,6 +372,7 @@ async def delete_sales_order(order_id: str):
         
         result = await sales_orders_collection.delete_one({"id": order_id})
         if result.deleted_count > 0:
+            await remove_document("sales_orders", order_id)
             return {"success": True, "message": "Sales order deleted successfully"}
         raise HTTPException(status_code=500, detail="Failed to delete sales order")
     except HTTPException:
@@ -434,59 +397,25 @@ async def send_sales_order(order_id: str, body: dict):
         include_pdf = bool((body or {}).get("include_pdf"))
         subject = (body or {}).get("subject") or f"Sales Order {order.get('order_number','')} from {BRAND_PLACEHOLDER.get('company_name','Your Company')}"
         preface = (body or {}).get("message") or f"Dear {order.get('customer_name','Customer')}, Please find your sales order details below."
-        results = {"email": None, "sms": None}
-        sent_via = []
-        # email
-        if to_email:
-            if SendGridEmailService is None or not os.environ.get("SENDGRID_API_KEY"):
-                raise HTTPException(status_code=503, detail="Email service not configured.")
-            pdf_bytes = None
-            if include_pdf:
-                pdf_bytes = generate_invoice_pdf(order, BRAND_PLACEHOLDER)
-            svc = SendGridEmailService()
-            email_resp = svc.send_invoice(to_email, order, BRAND_PLACEHOLDER, pdf_bytes=pdf_bytes, subject_override=subject, preface=preface)
-            results["email"] = email_resp
-            if email_resp.get("success"):
-                sent_via.append("email")
-        # sms
-        if phone:
-            if TwilioSmsService is None or not (os.environ.get("TWILIO_ACCOUNT_SID") and os.environ.get("TWILIO_AUTH_TOKEN") and os.environ.get("TWILIO_FROM_PHONE")):
-                results["sms"] = {"success": False, "message": "SMS not configured"}
-            else:
-                sms = TwilioSmsService()
-                sms_resp = sms.send_sms(phone, f"Sales Order {order.get('order_number','')}: total ₹{order.get('total_amount',0)}")
-                results["sms"] = sms_resp
-                if sms_resp.get("success"):
-                    sent_via.append("sms")
-        # Use uniform send tracking service
-        from services.send_tracking import create_uniform_send_update, get_uniform_send_response
-        
-        # Build errors dict for uniform response
-        errors = {}
-        if results.get("email") and not results["email"].get("success"):
-            errors["email"] = results["email"].get("error", "Unknown error")
-        if results.get("sms") and not results["sms"].get("success"):
-            errors["sms"] = results["sms"].get("error", results["sms"].get("message", "Unknown error"))
-        
-        update_fields = create_uniform_send_update(
-            send_results=results,
-            method="email" if to_email else "sms",  # Primary method
-            recipient=to_email or phone,
-            attach_pdf=include_pdf
-        )
-        filter_query = ({"_id": order["_id"]} if order.get("_id") else ( {"_id": ObjectId(order["__mongo_id"]) } if order.get("__mongo_id") else {"id": order_id} ))
-        await sales_orders_collection.update_one(filter_query, {"$set": update_fields})
-        return get_uniform_send_response(
-            send_results=results,
-            sent_via=sent_via,
-            errors=errors
+        if not to_email and not phone:
+            raise HTTPException(status_code=400, detail="Provide at least an email or phone to send")
+        if to_email and not email_configured():
+            raise HTTPException(status_code=503, detail="Email service not configured.")
+        job = await queue_send(
+            "sales_order", order,
+            email=to_email,
+            phone=phone,
+            include_pdf=include_pdf,
+            subject=subject,
+            preface=preface,
+            sms_body=f"Sales Order {order.get('order_number','')}: total ₹{order.get('total_amount',0)}",
         )
+        return get_queued_send_response(job)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error sending sales order: {str(e)}")
 
-# ============ STATS ============
 @router.get("/orders/stats/overview")
 async def sales_order_stats(
     status: Optional[str] = Query(None),
@@ -506,22 +435,12 @@ async def sales_order_stats(
                 {"order_number": {"$regex": search, "$options": "i"}},
                 {"customer_name": {"$regex": search, "$options": "i"}},
             ]
-        pipeline = [
-            { '$addFields': {
-                'order_date_sort': { '$toDate': { '$cond': [ { '$or': [ { '$eq': [ '$order_date', None ] }, { '$eq': [ '$order_date', '' ] } ] }, '$created_at', '$order_date' ] } }
-            }},
-        ]
+        date_match = date_range_match(from_date, to_date)
+        if date_match:
+            match_stage['order_date_sort'] = date_match
+        pipeline = []
         if match_stage:
             pipeline.append({ '$match': match_stage })
-        if from_date or to_date:
-            date_match = {}
-            if from_date:
-                y,m,d = map(int, from_date.split('-'))
-                date_match['$gte'] = datetime(y,m,d,0,0,0,tzinfo=timezone.utc)
-            if to_date:
-                y,m,d = map(int, to_date.split('-'))
-                date_match['$lte'] = datetime(y,m,d,23,59,59,tzinfo=timezone.utc)
-            pipeline.append({ '$match': { 'order_date_sort': date_match } })
         pipeline.append({ '$group': {
             '_id': None,
             'total_count': { '$sum': 1 },
@@ -2,7 +2,9 @@ from fastapi import APIRouter, HTTPException, Query
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timezone
 import uuid
+from dataclasses import asdict
 from database import db, items_collection
+from services.settings_service import get_settings_doc, stock_settings, update_settings
 
 router = APIRouter(prefix="/api/stock", tags=["stock"])
 
@@ -14,7 +16,7 @@ stock_layers = db.stock_layers
 batches = db.batches
 serials = db.serials
 # Deprecated: stock_settings = db.stock_settings
-settings_coll = db.general_settings
+# Stock settings live in general_settings.stock (see services/settings_service.py)
 
 
 def now_utc():
@@ -22,35 +24,11 @@ def now_utc():
 
 
 async def get_general_settings() -> Dict[str, Any]:
-    doc = await settings_coll.find_one({"id": "general_settings"})
-    if not doc:
-        # initialize defaults
-        doc = {
-            "id": "general_settings",
-            "stock": {
-                "valuation_method": "FIFO",
-                "allow_negative_stock": False,
-                "enable_batches": True,
-                "enable_serials": True,
-            },
-            "created_at": now_utc(),
-            "updated_at": now_utc(),
-        }
-        await settings_coll.insert_one(doc)
-    if "_id" in doc:
-        doc.pop("_id", None)
-    return doc
+    return await get_settings_doc()
 
 
 async def get_settings() -> Dict[str, Any]:
-    doc = await get_general_settings()
-    stock = doc.get("stock", {})
-    return {
-        "valuation_method": stock.get("valuation_method", "FIFO"),
-        "allow_negative_stock": bool(stock.get("allow_negative_stock", False)),
-        "enable_batches": bool(stock.get("enable_batches", True)),
-        "enable_serials": bool(stock.get("enable_serials", True)),
-    }
+    return asdict(await stock_settings())
 
 
 @router.get("/settings")
@@ -66,7 +44,7 @@ async def api_update_settings(body: Dict[str, Any]):
     for k in ["valuation_method", "allow_negative_stock", "enable_batches", "enable_serials"]:
         if k in body:
             stock[k] = body[k]
-    await settings_coll.update_one({"id": "general_settings"}, {"$set": {"stock": stock, "updated_at": now_utc()}})
+    await update_settings({"stock": stock})
     return await get_settings()
 
 
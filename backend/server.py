@@ -1,8 +1,9 @@
 from fastapi import FastAPI, APIRouter
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
@@ -22,15 +23,23 @@ from routers.debit_notes import router as debit_notes_router
 from routers.financial import get_financial_router
 from routers.payment_allocation import router as payment_allocation_router
 from routers.bank_reconciliation import router as bank_reconciliation_router
-from database import init_sample_data
+from routers.admin import router as admin_router
+from routers.jobs import router as jobs_router
+from database import init_sample_data, client, db
+from services.index_registry import ensure_indexes
+from migrations.runner import run_migrations
+from services.metrics import MetricsMiddleware, render_prometheus
+from services.query_accounting import QueryAccountingMiddleware
+from services.job_queue import JOB_WORKERS_IN_PROCESS, JobWorkerPool
+from services.pdf_renderer import POOL as pdf_render_pool
+from services import outbound_http
+from services import suggest_index
+from services import dashboard_counters
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection: the shared client/pool from database.py (one pool per worker)
 
 # Create the main app without a prefix
 app = FastAPI(title="GiLi API", version="1.0.0")
@@ -51,6 +60,12 @@ app.add_middleware(
     max_age=3600,  # Cache preflight requests for 1 hour
 )
 
+# Per-request Mongo query counts, budget warnings and N+1 detection (X-DB-Queries debug header)
+app.add_middleware(QueryAccountingMiddleware)
+
+# Per-route latency/size/error metrics; added last so it wraps CORS and all routers
+app.add_middleware(MetricsMiddleware)
+
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
@@ -107,6 +122,11 @@ async def create_demo_users():
 async def root():
     return {"message": "GiLi API is running"}
 
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @api_router.post("/status", response_model=List[StatusCheck])
 async def create_status_check(input: StatusCheckCreate):
     status_dict = input.dict()
@@ -139,6 +159,8 @@ app.include_router(get_financial_router())
 app.include_router(payment_allocation_router)
 app.include_router(bank_reconciliation_router)
 app.include_router(get_pos_router())
+app.include_router(admin_router)
+app.include_router(jobs_router)
 
 # Configure logging
 logging.basicConfig(
@@ -147,14 +169,61 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Background job workers (services/job_queue.py); JOB_WORKERS_IN_PROCESS=0 leaves the queue to job_worker.py
+job_workers = JobWorkerPool(JOB_WORKERS_IN_PROCESS)
+
+# Apply pending data migrations (migrations/) in the background on startup; reads that
+# need one (financial statements need 0004's ledger lines) refuse until it completed
+MIGRATIONS_ON_STARTUP = os.environ.get("MIGRATIONS_ON_STARTUP", "1") in ("1", "true", "yes")
+migration_task = None
+
+async def run_pending_migrations():
+    try:
+        summaries = await run_migrations(db)
+    except Exception as e:
+        logger.error(f"Startup migrations failed: {e}")
+        return
+    for summary in summaries:
+        if summary["status"] == "failed":
+            logger.error(f"Migration {summary['id']} failed: {summary['error']}; see `python -m migrations status`")
+    if any(s["status"] == "completed" for s in summaries):
+        logger.info(f"🧱 Migrations applied: {', '.join(s['id'] for s in summaries if s['status'] == 'completed')}")
+        # Unique indexes that fell back to non-unique because of duplicates can build now
+        await ensure_indexes(db)
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize sample data on startup"""
+    """Create indexes and initialize sample data on startup"""
+    try:
+        summary = await ensure_indexes(db)
+        logger.info(f"🗂️ Index bootstrap: {summary['indexes']} indexes on {summary['collections']} collections, {summary['issues']} issues")
+    except Exception as e:
+        logger.error(f"Index bootstrap failed: {e}")
     await init_sample_data()
+    global migration_task
+    if MIGRATIONS_ON_STARTUP:
+        migration_task = asyncio.create_task(run_pending_migrations())
+    try:
+        await suggest_index.start()
+    except Exception as e:
+        logger.error(f"Suggestion index load failed: {e}")
+    dashboard_counters.start()
+    if JOB_WORKERS_IN_PROCESS > 0:
+        await outbound_http.start()
+        await pdf_render_pool.start()
+        job_workers.start()
     logger.info("✅ GiLi API started successfully")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if migration_task is not None and not migration_task.done():
+        # Runs are checkpointed; the next start resumes (or takes over the lease)
+        migration_task.cancel()
+    await job_workers.stop()
+    await suggest_index.stop()
+    await dashboard_counters.stop()
+    pdf_render_pool.stop()
+    await outbound_http.close()
     client.close()
 
 # Railway-compatible server startup
@@ -0,0 +1,83 @@
+"""
+Account Role Resolution
+Auto-generated journal entries (invoices, credit/debit notes) need a handful of
+ledger accounts picked by name. Instead of one case-insensitive $regex lookup per
+account per posting, the chart of accounts is read once and every role below is
+resolved in memory, so posting a document needs no account queries.
+
+A role resolves to the first account (in insertion order) whose name matches its
+pattern, exactly as find_one({"account_name": {"$regex": ..., "$options": "i"}})
+did. The map is dropped by create_account/update_account/initialize and is
+rebuilt after ACCOUNT_ROLE_CACHE_TTL_SECONDS, which bounds how long chart
+changes made by other workers or scripts go unseen.
+"""
+import asyncio
+import os
+import re
+import time
+from typing import Any, Dict, Optional
+
+from database import accounts_collection
+
+ACCOUNT_ROLE_CACHE_TTL_SECONDS = float(os.environ.get("ACCOUNT_ROLE_CACHE_TTL_SECONDS", "300"))
+
+# role -> account_name pattern (case-insensitive, unanchored)
+ACCOUNT_ROLES: Dict[str, str] = {
+    "receivable": "Accounts Receivable",
+    "payable": "Accounts Payable",
+    "sales": "Sales",
+    "purchases": "Purchases",
+    "output_tax": "Output Tax",
+    "input_tax": "Input Tax",
+    "tax": "Tax",
+    "tax_payable": "Output Tax|Tax Payable",
+    "sales_returns": "Sales Returns",
+    "purchase_returns": "Purchase Returns",
+    # Wider patterns used by the credit/debit note posting in routers/
+    "returns_inward": "Sales Return|Returns",
+    "returns_outward": "Purchase Return|Returns Outward",
+}
+
+_PATTERNS = {role: re.compile(pattern, re.IGNORECASE) for role, pattern in ACCOUNT_ROLES.items()}
+
+_lock = asyncio.Lock()
+_roles: Optional[Dict[str, Optional[Dict[str, Any]]]] = None
+_loaded_at = 0.0
+
+
+def invalidate() -> None:
+    """Forget the resolved roles; the next posting re-reads the chart of accounts"""
+    global _roles
+    _roles = None
+
+
+def _fresh() -> bool:
+    return _roles is not None and time.monotonic() - _loaded_at < ACCOUNT_ROLE_CACHE_TTL_SECONDS
+
+
+async def _load(collection) -> Dict[str, Optional[Dict[str, Any]]]:
+    resolved: Dict[str, Optional[Dict[str, Any]]] = {role: None for role in ACCOUNT_ROLES}
+    cursor = collection.find({}, {"_id": 0, "id": 1, "account_name": 1, "account_code": 1, "account_type": 1}).sort("_id", 1)
+    async for account in cursor:
+        name = account.get("account_name")
+        if not isinstance(name, str):
+            continue
+        for role, pattern in _PATTERNS.items():
+            if resolved[role] is None and pattern.search(name):
+                resolved[role] = account
+    return resolved
+
+
+async def account_roles(collection=None) -> Dict[str, Optional[Dict[str, Any]]]:
+    """role -> {id, account_name, account_code, account_type} or None; treat as read-only"""
+    global _roles, _loaded_at
+    if not _fresh():
+        async with _lock:
+            if not _fresh():
+                _roles = await _load(collection if collection is not None else accounts_collection)
+                _loaded_at = time.monotonic()
+    return _roles
+
+
+async def account_for(role: str, collection=None) -> Optional[Dict[str, Any]]:
+    return (await account_roles(collection))[role]
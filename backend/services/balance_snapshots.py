@@ -0,0 +1,308 @@
+"""
+Account Balance Snapshots
+Financial statements used to re-add every posted journal entry since the
+beginning of time on each request. `account_snapshots` stores every account's
+cumulative debit and credit at each month end, so a balance as of any date is
+the last snapshot before it plus the gl_entries lines dated after that snapshot:
+O(accounts) snapshot rows and at most about a month of lines, however many years
+the ledger holds.
+
+- snapshots are built month by month up to the last month a report needs; each
+  month is the previous month's closing plus that month's lines per account
+- the state document records the last month built (`built_through`) and a
+  `generation`. general_ledger calls invalidate_from() when it writes or removes
+  lines dated in a closed month; that moves `built_through` back before the
+  line's month and bumps the generation, so back-dated entries are rebuilt
+  from their month on the next read; a build first deletes the rows after
+  `built_through`, so accounts left without lines do not keep stale totals
+- reads sum the snapshot and the delta lines and join account fields in one
+  aggregation ($unionWith, MongoDB 4.4+; $group; $lookup), so only per-account
+  rows come back
+- a build or read that overlaps an invalidation sees the generation change and
+  retries instead of trusting what it computed; after MAX_SNAPSHOT_ATTEMPTS it
+  sums the lines directly
+- one build runs at a time across all workers: the builder holds a lease on the
+  state document (SNAPSHOT_BUILD_LEASE_SECONDS, renewed every month built), and
+  built_through only advances while it still holds the lease, after that month's
+  rows are written. Other workers wait up to SNAPSHOT_BUILD_WAIT_SECONDS for the
+  build, then sum the lines directly
+"""
+import asyncio
+import os
+import socket
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError
+
+from database import account_snapshots_collection, gl_entries_collection
+from services.sort_keys import to_sort_datetime
+
+STATE_ID = "state"
+# built_through before any month has been built
+NO_PERIOD = "0000-00"
+MAX_SNAPSHOT_ATTEMPTS = 3
+SNAPSHOT_BUILD_LEASE_SECONDS = float(os.environ.get("SNAPSHOT_BUILD_LEASE_SECONDS", "120"))
+SNAPSHOT_BUILD_WAIT_SECONDS = float(os.environ.get("SNAPSHOT_BUILD_WAIT_SECONDS", "10"))
+BUILD_POLL_SECONDS = 0.2
+
+Totals = Dict[str, Dict[str, float]]
+AccountRows = Dict[str, Dict[str, Any]]
+
+# Account fields joined onto every per-account total
+ACCOUNT_FIELDS = ("account_code", "account_name", "account_type", "root_type", "is_active", "is_group")
+
+# Serializes this worker's builds; the lease on the state document serializes workers
+_build_lock = asyncio.Lock()
+_builder_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def now_utc():
+    return datetime.now(timezone.utc)
+
+
+def period_of(when: datetime) -> str:
+    return f"{when.year:04d}-{when.month:02d}"
+
+
+def period_start(period: str) -> datetime:
+    year, month = map(int, period.split("-"))
+    return datetime(year, month, 1, tzinfo=timezone.utc)
+
+
+def next_period(period: str) -> str:
+    year, month = map(int, period.split("-"))
+    return f"{year + month // 12:04d}-{month % 12 + 1:02d}"
+
+
+def previous_period(period: str) -> str:
+    year, month = map(int, period.split("-"))
+    return f"{year - 1:04d}-12" if month == 1 else f"{year:04d}-{month - 1:02d}"
+
+
+def period_end(period: str) -> datetime:
+    """Exclusive upper bound of the month"""
+    return period_start(next_period(period))
+
+
+def day_end(day: str) -> datetime:
+    """Exclusive upper bound of a YYYY-MM-DD day, as used for "as of" report dates"""
+    start = to_sort_datetime(day)
+    if start is None:
+        raise ValueError(f"Invalid date: {day}")
+    return start.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+
+def day_start(day: str) -> datetime:
+    return day_end(day) - timedelta(days=1)
+
+
+async def invalidate_from(when: Optional[datetime], session=None) -> None:
+    """Lines dated `when` were written or removed; drop the snapshots they change"""
+    if when is None:
+        return
+    period = period_of(when)
+    if period >= period_of(now_utc()):
+        # The open month is never snapshotted; reads add its lines as the delta
+        return
+    await account_snapshots_collection.update_one(
+        {"_id": STATE_ID},
+        {"$min": {"built_through": previous_period(period)}, "$inc": {"generation": 1}, "$set": {"updated_at": now_utc()}},
+        session=session,
+    )
+
+
+async def _state() -> Dict:
+    state = await account_snapshots_collection.find_one({"_id": STATE_ID})
+    if state is None:
+        try:
+            state = {"_id": STATE_ID, "built_through": NO_PERIOD, "generation": 0, "updated_at": now_utc()}
+            await account_snapshots_collection.insert_one(state)
+        except DuplicateKeyError:
+            state = await account_snapshots_collection.find_one({"_id": STATE_ID})
+    return state
+
+
+async def _movements(start: Optional[datetime], end: datetime, totals: Optional[Totals] = None) -> Totals:
+    """Add the debit/credit of lines dated in [start, end) to totals, per account"""
+    totals = totals if totals is not None else defaultdict(lambda: {"debit": 0.0, "credit": 0.0})
+    bounds = {"$lt": end}
+    if start is not None:
+        bounds["$gte"] = start
+    pipeline = [
+        {"$match": {"posting_date": bounds}},
+        {"$group": {"_id": "$account_id", "debit": {"$sum": "$debit"}, "credit": {"$sum": "$credit"}}},
+    ]
+    async for row in gl_entries_collection.aggregate(pipeline):
+        totals[row["_id"]]["debit"] += row["debit"]
+        totals[row["_id"]]["credit"] += row["credit"]
+    return totals
+
+
+async def _closing(period: str) -> Totals:
+    totals: Totals = defaultdict(lambda: {"debit": 0.0, "credit": 0.0})
+    async for snap in account_snapshots_collection.find({"period": period}, {"_id": 0, "account_id": 1, "debit": 1, "credit": 1}):
+        totals[snap["account_id"]] = {"debit": snap["debit"], "credit": snap["credit"]}
+    return totals
+
+
+async def _first_line_from(start: Optional[datetime]) -> Optional[datetime]:
+    query = {"posting_date": {"$gte": start}} if start is not None else {}
+    first = await gl_entries_collection.find(query, {"_id": 0, "posting_date": 1}).sort("posting_date", 1).limit(1).to_list(length=1)
+    return to_sort_datetime(first[0]["posting_date"]) if first else None
+
+
+def _lease_until() -> datetime:
+    return now_utc() + timedelta(seconds=SNAPSHOT_BUILD_LEASE_SECONDS)
+
+
+async def _acquire_build() -> bool:
+    """Take the build lease unless another worker holds a live one"""
+    taken = await account_snapshots_collection.update_one(
+        {"_id": STATE_ID, "$or": [
+            {"build_owner": {"$in": [None, _builder_id]}},
+            {"build_lease_expires_at": {"$lt": now_utc()}},
+        ]},
+        {"$set": {"build_owner": _builder_id, "build_lease_expires_at": _lease_until()}},
+    )
+    return taken.matched_count == 1
+
+
+async def _release_build() -> None:
+    await account_snapshots_collection.update_one(
+        {"_id": STATE_ID, "build_owner": _builder_id},
+        {"$set": {"build_owner": None}, "$unset": {"build_lease_expires_at": ""}},
+    )
+
+
+async def _advance(period: str, generation: int) -> bool:
+    """Move built_through to `period` (rows written) and renew the lease; False if
+    invalidated meanwhile or the lease was lost to another worker"""
+    advanced = await account_snapshots_collection.update_one(
+        {"_id": STATE_ID, "generation": generation, "build_owner": _builder_id},
+        {"$max": {"built_through": period}, "$set": {"build_lease_expires_at": _lease_until(), "updated_at": now_utc()}},
+    )
+    return advanced.matched_count == 1
+
+
+async def _build(built: str, through: str, generation: int) -> bool:
+    """Snapshot the months after `built` up to `through`; False if invalidated meanwhile.
+    Only called while holding the build lease, so no other worker writes rows meanwhile."""
+    # Rows left from before an invalidation: accounts whose lines were all removed
+    # would otherwise keep their old totals, since the rebuild only writes accounts it sees
+    await account_snapshots_collection.delete_many({"period": {"$gt": built}})
+    closing = await _closing(built)
+    start = period_end(built) if built != NO_PERIOD else None
+    while True:
+        if not closing:
+            # No history yet: skip straight to the month of the next line
+            first = await _first_line_from(start)
+            if first is None:
+                break
+            start = period_start(period_of(first))
+        period = period_of(start)
+        if period > through:
+            break
+        await _movements(start, period_end(period), closing)
+        if closing:
+            await account_snapshots_collection.bulk_write([
+                ReplaceOne(
+                    {"account_id": account_id, "period": period},
+                    {
+                        "account_id": account_id,
+                        "period": period,
+                        "period_end": period_end(period),
+                        "debit": t["debit"],
+                        "credit": t["credit"],
+                        "built_at": now_utc(),
+                    },
+                    upsert=True,
+                )
+                for account_id, t in closing.items()
+            ], ordered=False)
+        if not await _advance(period, generation):
+            return False
+        start = period_end(period)
+    # Every month up to `through` is either snapshotted or has no history
+    return await _advance(through, generation)
+
+
+async def ensure_built(through: str) -> Optional[int]:
+    """Make sure snapshots exist up to `through`; the generation they are valid for, or None"""
+    async with _build_lock:
+        attempts = 0
+        waited_until = now_utc() + timedelta(seconds=SNAPSHOT_BUILD_WAIT_SECONDS)
+        while attempts < MAX_SNAPSHOT_ATTEMPTS:
+            state = await _state()
+            if state["built_through"] >= through:
+                return state["generation"]
+            if not await _acquire_build():
+                # Another worker is building; its rows become visible as built_through advances
+                if now_utc() >= waited_until:
+                    return None
+                await asyncio.sleep(BUILD_POLL_SECONDS)
+                continue
+            attempts += 1
+            try:
+                # Re-read under the lease: the previous holder may have built meanwhile
+                state = await _state()
+                if state["built_through"] >= through:
+                    return state["generation"]
+                if await _build(state["built_through"], through, state["generation"]):
+                    return state["generation"]
+            finally:
+                await _release_build()
+    return None
+
+
+def _with_accounts(pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Sum the debit/credit rows per account and join the account fields the statements need"""
+    return pipeline + [
+        {"$group": {"_id": "$account_id", "debit": {"$sum": "$debit"}, "credit": {"$sum": "$credit"}}},
+        {"$lookup": {"from": "accounts", "localField": "_id", "foreignField": "id", "as": "account"}},
+        # Lines of deleted accounts drop out here, as they did when reports looked accounts up by id
+        {"$unwind": "$account"},
+        {"$project": {
+            "_id": 0, "account_id": "$_id", "debit": 1, "credit": 1,
+            **{field: f"$account.{field}" for field in ACCOUNT_FIELDS},
+        }},
+    ]
+
+
+async def account_totals(as_of: datetime) -> AccountRows:
+    """Cumulative debit and credit over the lines dated before `as_of`, one row per
+    account with its ACCOUNT_FIELDS. Summed and joined server-side, so only those
+    rows cross the wire."""
+    snapshot_period = previous_period(min(period_of(as_of), period_of(now_utc())))
+    for _ in range(MAX_SNAPSHOT_ATTEMPTS):
+        generation = await ensure_built(snapshot_period)
+        if generation is None:
+            break
+        pipeline = _with_accounts([
+            {"$match": {"period": snapshot_period}},
+            {"$project": {"_id": 0, "account_id": 1, "debit": 1, "credit": 1}},
+            {"$unionWith": {"coll": gl_entries_collection.name, "pipeline": [
+                {"$match": {"posting_date": {"$gte": period_end(snapshot_period), "$lt": as_of}}},
+                {"$project": {"_id": 0, "account_id": 1, "debit": 1, "credit": 1}},
+            ]}},
+        ])
+        rows = {row["account_id"]: row async for row in account_snapshots_collection.aggregate(pipeline)}
+        state = await account_snapshots_collection.find_one({"_id": STATE_ID}, {"generation": 1})
+        if state and state["generation"] == generation:
+            return rows
+    pipeline = _with_accounts([{"$match": {"posting_date": {"$lt": as_of}}}])
+    return {row["account_id"]: row async for row in gl_entries_collection.aggregate(pipeline)}
+
+
+async def account_movements(start: datetime, end: datetime) -> AccountRows:
+    """Debit and credit over the lines dated in [start, end), rows as in account_totals()"""
+    closing = await account_totals(end)
+    opening = await account_totals(start)
+    for account_id, row in opening.items():
+        moved = closing.setdefault(account_id, dict(row, debit=0.0, credit=0.0))
+        moved["debit"] -= row["debit"]
+        moved["credit"] -= row["credit"]
+    return closing
@@ -0,0 +1,131 @@
+"""
+Bank Statement Auto-Match
+Matches a statement's unmatched bank transactions against paid payments and
+posted journal entries within the configured date and amount tolerances. A
+statement can hold thousands of lines, each needing its own lookups, so
+POST /api/financial/bank/auto-match runs this as a "bank_auto_match" job and
+only waits briefly for it (see routers/bank_reconciliation.py).
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from database import db, jobs_collection
+from services.job_queue import enqueue, job_handler
+from services.settings_service import bank_reconciliation_settings
+
+JOB_TYPE = "bank_auto_match"
+
+statements_coll = db.bank_statements
+transactions_coll = db.bank_transactions
+payments_coll = db.payments
+journal_entries_coll = db.journal_entries
+
+
+def now_utc():
+    return datetime.now(timezone.utc)
+
+
+async def auto_match_statement(statement_id: str) -> Dict[str, Any]:
+    """Match the statement's unmatched transactions; returns the counts"""
+    # Get settings (cached in-process)
+    recon_settings = await bank_reconciliation_settings()
+    date_tolerance = recon_settings.date_tolerance_days
+    amount_tolerance = recon_settings.amount_tolerance_percent
+
+    matched_count = 0
+
+    async for txn in transactions_coll.find({"statement_id": statement_id, "is_matched": False}):
+        txn_date = txn.get("transaction_date")
+        txn_amount = abs(float(txn.get("amount", 0)))
+
+        if not txn_date or txn_amount == 0:
+            continue
+
+        # Calculate date range for matching
+        date_start = txn_date - timedelta(days=date_tolerance)
+        date_end = txn_date + timedelta(days=date_tolerance)
+
+        # Calculate amount range for matching
+        amount_min = txn_amount * (1 - amount_tolerance)
+        amount_max = txn_amount * (1 + amount_tolerance)
+
+        # Try to match with payments
+        matching_payment = await payments_coll.find_one({
+            "payment_date": {"$gte": date_start, "$lte": date_end},
+            "amount": {"$gte": amount_min, "$lte": amount_max},
+            "status": "paid"
+        })
+
+        if matching_payment:
+            # Mark as matched
+            await transactions_coll.update_one(
+                {"id": txn.get("id")},
+                {"$set": {
+                    "is_matched": True,
+                    "matched_entry_id": matching_payment.get("id"),
+                    "matched_entry_type": "payment",
+                    "matched_entry_number": matching_payment.get("payment_number"),
+                    "matched_date": now_utc()
+                }}
+            )
+            matched_count += 1
+            continue
+
+        # Try to match with journal entries if no payment match
+        matching_entry = await journal_entries_coll.find_one({
+            "posting_date": {"$gte": date_start, "$lte": date_end},
+            "$or": [
+                {"total_debit": {"$gte": amount_min, "$lte": amount_max}},
+                {"total_credit": {"$gte": amount_min, "$lte": amount_max}}
+            ],
+            "status": "posted"
+        })
+
+        if matching_entry:
+            await transactions_coll.update_one(
+                {"id": txn.get("id")},
+                {"$set": {
+                    "is_matched": True,
+                    "matched_entry_id": matching_entry.get("id"),
+                    "matched_entry_type": "journal_entry",
+                    "matched_entry_number": matching_entry.get("entry_number"),
+                    "matched_date": now_utc()
+                }}
+            )
+            matched_count += 1
+
+    # Update statement matched counts
+    total = await transactions_coll.count_documents({"statement_id": statement_id})
+    matched = await transactions_coll.count_documents({"statement_id": statement_id, "is_matched": True})
+    unmatched_count = total - matched
+
+    await statements_coll.update_one(
+        {"id": statement_id},
+        {"$set": {
+            "matched_count": matched,
+            "unmatched_count": unmatched_count,
+            "status": "partially_matched" if unmatched_count > 0 else "fully_matched"
+        }}
+    )
+
+    return {
+        "success": True,
+        "message": f"Auto-matched {matched_count} transactions",
+        "matched_count": matched_count,
+        "total_matched": matched,
+        "total_unmatched": unmatched_count
+    }
+
+
+@job_handler(JOB_TYPE)
+async def run_auto_match(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return await auto_match_statement(payload["statement_id"])
+
+
+async def queue_auto_match(statement_id: str) -> Dict[str, Any]:
+    """Queue an auto-match, or return the one already pending for the statement"""
+    pending: Optional[Dict[str, Any]] = await jobs_collection.find_one(
+        {"type": JOB_TYPE, "payload.statement_id": statement_id, "status": {"$in": ["queued", "running"]}},
+        {"_id": 0},
+    )
+    return pending or await enqueue(JOB_TYPE, {"statement_id": statement_id})
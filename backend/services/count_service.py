@@ -0,0 +1,113 @@
+"""
+List Count Service
+Answers list totals without re-running a full $count aggregation on every page:
+
+- unfiltered lists use estimated_document_count() (collection metadata, O(1))
+- filtered lists are counted once per filter signature and cached until a write
+  touches the collection (or COUNT_CACHE_TTL_SECONDS passes, which bounds how long
+  writes made by other workers can go unseen)
+- callers pass exact=True to bypass both and refresh the cache
+
+Writes are observed by a pymongo CommandListener on the shared client, so every
+insert/update/delete in this process invalidates the counts of its collection
+without the routers having to remember to do it.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from pymongo import monitoring
+
+COUNT_CACHE_TTL_SECONDS = float(os.environ.get("COUNT_CACHE_TTL_SECONDS", "60"))
+COUNT_CACHE_MAX_ENTRIES = int(os.environ.get("COUNT_CACHE_MAX_ENTRIES", "1024"))
+
+_WRITE_COMMANDS = {"insert", "update", "delete", "findAndModify", "drop"}
+
+_lock = threading.Lock()
+# collection name -> write generation
+_generations: Dict[str, int] = {}
+# (collection name, signature) -> (total, generation, stored_at)
+_cache: "OrderedDict[Tuple[str, str], Tuple[int, int, float]]" = OrderedDict()
+
+
+def generation(collection_name: str) -> int:
+    return _generations.get(collection_name, 0)
+
+
+def invalidate(collection_name: str) -> None:
+    with _lock:
+        _generations[collection_name] = _generations.get(collection_name, 0) + 1
+
+
+def clear_cache() -> None:
+    with _lock:
+        _cache.clear()
+
+
+def filter_signature(pipeline: List[Dict[str, Any]]) -> str:
+    return json.dumps(pipeline, sort_keys=True, default=str, separators=(",", ":"))
+
+
+async def cached_count(collection, pipeline: List[Dict[str, Any]], exact: bool = False) -> Tuple[int, bool]:
+    """Total for the rows `pipeline` selects (stages before $count).
+    Returns (total, is_estimate)."""
+    has_filter = any("$match" in stage for stage in pipeline)
+    if not has_filter and not exact:
+        return await collection.estimated_document_count(), True
+
+    name = collection.name
+    key = (name, filter_signature(pipeline))
+    current = generation(name)
+    if not exact:
+        with _lock:
+            hit = _cache.get(key)
+            if hit and hit[1] == current and time.monotonic() - hit[2] < COUNT_CACHE_TTL_SECONDS:
+                _cache.move_to_end(key)
+                return hit[0], False
+
+    docs = await collection.aggregate(list(pipeline) + [{"$count": "total"}]).to_list(length=1)
+    total = docs[0]["total"] if docs else 0
+    with _lock:
+        # Stored under the generation read before counting: a write that lands
+        # mid-count bumps the generation and makes this entry stale at once.
+        _cache[key] = (total, current, time.monotonic())
+        _cache.move_to_end(key)
+        while len(_cache) > COUNT_CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return total, False
+
+
+class CountInvalidationListener(monitoring.CommandListener):
+    """Bumps a collection's generation when a write command on it succeeds"""
+
+    def __init__(self) -> None:
+        self._pending: Dict[Tuple[Any, int], str] = {}
+        self._pending_lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name in _WRITE_COMMANDS:
+            with self._pending_lock:
+                self._pending[(event.connection_id, event.request_id)] = event.command.get(event.command_name)
+
+    def succeeded(self, event):
+        if event.command_name not in _WRITE_COMMANDS:
+            return
+        with self._pending_lock:
+            name = self._pending.pop((event.connection_id, event.request_id), None)
+        if name:
+            invalidate(name)
+
+    def failed(self, event):
+        if event.command_name not in _WRITE_COMMANDS:
+            return
+        with self._pending_lock:
+            name = self._pending.pop((event.connection_id, event.request_id), None)
+        # A failed write (e.g. one bulk batch) may still have applied part of it
+        if name:
+            invalidate(name)
+
+
+count_invalidation_listener = CountInvalidationListener()
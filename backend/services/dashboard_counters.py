@@ -0,0 +1,239 @@
+"""
+Dashboard Counters
+Pre-aggregated totals behind /api/dashboard/stats, one dashboard_counters
+document per company, so the dashboard is a single document read instead of
+four full-collection aggregations:
+
+- sales_orders / purchase_orders: sum of total_amount of all orders
+- outstanding_amount: sum of total_amount of sales invoices not "paid"
+- stock_value: sum of unit_price * stock_qty over items
+
+Counters move with $inc on the writes that create, update, cancel, pay or
+delete orders, invoices and items. Those paths already report every write to
+the search index (services/search_index.py); this module listens to it. A
+document's last counted values are kept in dashboard_contributions, so a write
+adds (new - previously counted) whatever the write was, and counters always
+equal the sum of the contribution rows.
+
+Writes that bypass those paths (bulk loads, other tools, a failed counter
+update) make counters drift; the dashboard_reconcile job recomputes rows and
+counters from source. start() enqueues it every DASHBOARD_RECONCILE_SECONDS
+(at most one pending across processes), and POST
+/api/admin/dashboard-counters/reconcile runs it on demand. Writes landing while
+a reconcile runs can be counted from a stale read; the next run settles them.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo import ReplaceOne, ReturnDocument
+
+from database import db, jobs_collection
+from services.job_queue import PRIORITY_LOW, enqueue, job_handler
+from services.search_index import register_write_listener
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_RECONCILE_SECONDS = float(os.environ.get("DASHBOARD_RECONCILE_SECONDS", "3600"))
+COUNTERS_COLLECTION = "dashboard_counters"
+CONTRIBUTIONS_COLLECTION = "dashboard_contributions"
+RECONCILE_BATCH_SIZE = 1000
+JOB_TYPE = "dashboard_reconcile"
+DEFAULT_COMPANY_ID = "default_company"
+
+COUNTER_FIELDS = ("sales_orders", "purchase_orders", "outstanding_amount", "stock_value")
+
+
+def now_utc():
+    return datetime.now(timezone.utc)
+
+
+def _number(value: Any) -> float:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else 0.0
+
+
+def _order_total(counter: str) -> Callable[[Dict[str, Any]], Dict[str, float]]:
+    return lambda doc: {counter: _number(doc.get("total_amount"))}
+
+
+def _outstanding(doc: Dict[str, Any]) -> Dict[str, float]:
+    return {"outstanding_amount": 0.0 if doc.get("status") == "paid" else _number(doc.get("total_amount"))}
+
+
+def _stock_value(doc: Dict[str, Any]) -> Dict[str, float]:
+    return {"stock_value": _number(doc.get("unit_price")) * _number(doc.get("stock_qty"))}
+
+
+# Source collection -> what one of its documents adds to the counters
+CONTRIBUTIONS: Dict[str, Callable[[Dict[str, Any]], Dict[str, float]]] = {
+    "sales_orders": _order_total("sales_orders"),
+    "purchase_orders": _order_total("purchase_orders"),
+    "sales_invoices": _outstanding,
+    "items": _stock_value,
+}
+# Fields the contributions read, for reconcile scans
+SOURCE_PROJECTION = {"_id": 1, "id": 1, "company_id": 1, "total_amount": 1, "status": 1, "unit_price": 1, "stock_qty": 1}
+
+
+def _company(doc: Dict[str, Any]) -> str:
+    return doc.get("company_id") or DEFAULT_COMPANY_ID
+
+
+def contribution_row(collection_name: str, doc_id: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "_id": f"{collection_name}:{doc_id}",
+        "collection": collection_name,
+        "company_id": _company(doc),
+        "values": CONTRIBUTIONS[collection_name](doc),
+        "updated_at": now_utc(),
+    }
+
+
+def _deltas(old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """company -> counter -> change, from the previous and the new contribution row"""
+    deltas: Dict[str, Dict[str, float]] = {}
+    for row, sign in ((old, -1.0), (new, 1.0)):
+        if row is None:
+            continue
+        company = deltas.setdefault(row["company_id"], {})
+        for counter, value in row["values"].items():
+            company[counter] = company.get(counter, 0.0) + sign * value
+    return {company: {k: v for k, v in values.items() if v} for company, values in deltas.items()}
+
+
+async def _apply(deltas: Dict[str, Dict[str, float]]) -> None:
+    for company_id, inc in deltas.items():
+        if inc:
+            await db[COUNTERS_COLLECTION].update_one(
+                {"_id": company_id},
+                {"$inc": inc, "$set": {"updated_at": now_utc()}},
+                upsert=True,
+            )
+
+
+async def _on_write(collection_name: str, doc_id: str, doc: Optional[Dict[str, Any]]) -> None:
+    """Move the counters by what the written document (doc None: deleted) now adds"""
+    if collection_name not in CONTRIBUTIONS:
+        return
+    rows = db[CONTRIBUTIONS_COLLECTION]
+    row_id = f"{collection_name}:{doc_id}"
+    if doc is None:
+        old = await rows.find_one_and_delete({"_id": row_id})
+        new = None
+    else:
+        new = contribution_row(collection_name, doc_id, doc)
+        old = await rows.find_one_and_replace({"_id": row_id}, new, upsert=True, return_document=ReturnDocument.BEFORE)
+    await _apply(_deltas(old, new))
+
+
+register_write_listener(_on_write)
+
+
+def _public(doc: Optional[Dict[str, Any]], company_id: str) -> Dict[str, Any]:
+    doc = doc or {}
+    return {
+        "company_id": company_id,
+        **{counter: doc.get(counter, 0.0) for counter in COUNTER_FIELDS},
+        "updated_at": doc.get("updated_at"),
+        "reconciled_at": doc.get("reconciled_at"),
+    }
+
+
+async def reconcile() -> Dict[str, Any]:
+    """Recompute every contribution row and company counter from the source collections"""
+    started = now_utc()
+    rows = db[CONTRIBUTIONS_COLLECTION]
+    totals: Dict[str, Dict[str, float]] = {}
+    scanned: Dict[str, int] = {}
+    for collection_name in CONTRIBUTIONS:
+        count = 0
+        batch: List[ReplaceOne] = []
+        async for doc in db[collection_name].find({}, SOURCE_PROJECTION):
+            row = contribution_row(collection_name, doc.get("id") or str(doc.get("_id")), doc)
+            company = totals.setdefault(row["company_id"], {counter: 0.0 for counter in COUNTER_FIELDS})
+            for counter, value in row["values"].items():
+                company[counter] += value
+            batch.append(ReplaceOne({"_id": row["_id"]}, row, upsert=True))
+            count += 1
+            if len(batch) >= RECONCILE_BATCH_SIZE:
+                await rows.bulk_write(batch, ordered=False)
+                batch = []
+        if batch:
+            await rows.bulk_write(batch, ordered=False)
+        # Rows of documents deleted without a hook
+        await rows.delete_many({"collection": collection_name, "updated_at": {"$lt": started}})
+        scanned[collection_name] = count
+
+    counters = db[COUNTERS_COLLECTION]
+    reconciled_at = now_utc()
+    for company_id, values in totals.items():
+        await counters.update_one(
+            {"_id": company_id},
+            {"$set": {**values, "updated_at": reconciled_at, "reconciled_at": reconciled_at}},
+            upsert=True,
+        )
+    # Companies with no documents left
+    await counters.update_many(
+        {"_id": {"$nin": list(totals)}},
+        {"$set": {**{counter: 0.0 for counter in COUNTER_FIELDS}, "updated_at": reconciled_at, "reconciled_at": reconciled_at}},
+    )
+    return {
+        "companies": len(totals),
+        "scanned": scanned,
+        "seconds": round((reconciled_at - started).total_seconds(), 2),
+    }
+
+
+@job_handler(JOB_TYPE)
+async def run_reconcile_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return await reconcile()
+
+
+async def get_counters(company_id: str = DEFAULT_COMPANY_ID) -> Dict[str, Any]:
+    """The company's counters; reconciles first when none were ever written"""
+    doc = await db[COUNTERS_COLLECTION].find_one({"_id": company_id})
+    if doc is None and not await db[COUNTERS_COLLECTION].find_one({}, {"_id": 1}):
+        await reconcile()
+        doc = await db[COUNTERS_COLLECTION].find_one({"_id": company_id})
+    return _public(doc, company_id)
+
+
+async def queue_reconcile() -> Optional[Dict[str, Any]]:
+    """Enqueue a reconcile unless one is pending or finished within the last interval"""
+    recent = await jobs_collection.find_one({
+        "type": JOB_TYPE,
+        "$or": [
+            {"status": {"$in": ["queued", "running"]}},
+            {"status": "succeeded", "updated_at": {"$gte": now_utc() - timedelta(seconds=DASHBOARD_RECONCILE_SECONDS)}},
+        ],
+    }, {"_id": 1})
+    if recent is not None:
+        return None
+    return await enqueue(JOB_TYPE, {}, priority=PRIORITY_LOW, max_attempts=2)
+
+
+_schedule_task: Optional[asyncio.Task] = None
+
+
+async def _schedule_loop() -> None:
+    while True:
+        await asyncio.sleep(DASHBOARD_RECONCILE_SECONDS)
+        try:
+            await queue_reconcile()
+        except Exception as e:
+            logger.warning(f"Dashboard counter reconcile could not be queued: {e}")
+
+
+def start() -> None:
+    global _schedule_task
+    if _schedule_task is None and DASHBOARD_RECONCILE_SECONDS > 0:
+        _schedule_task = asyncio.create_task(_schedule_loop())
+
+
+async def stop() -> None:
+    global _schedule_task
+    if _schedule_task is not None:
+        _schedule_task.cancel()
+        _schedule_task = None
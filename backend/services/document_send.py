@@ -0,0 +1,249 @@
+"""
+Document Send Jobs
+The /send endpoints of invoices, quotations, sales/purchase orders and credit/
+debit notes validate the request, then queue a "send_document" job and return
+its id. The job renders the PDF (when asked), sends the email and/or SMS, and
+records the outcome on the document with the uniform send tracking fields.
+
+- the payload carries everything the endpoint resolved (recipients, subject,
+  preface, SMS text); the document itself is re-read when the job runs, so the
+  message reflects its state at send time
+- email and SMS go out through the async clients on the shared connection
+  pool of services/outbound_http.py; PDFs come from services/pdf_cache.py,
+  rendered in the process pool of services/pdf_renderer.py only when the
+  printed content changed, so the event loop keeps serving requests
+- every attempt records its channel results under its send_id (the last
+  SEND_RESULTS_KEPT sends per document), and a channel already sent under the
+  same send_id is not sent again when the job retries
+- the tracking fields only follow the document's latest send: an older send
+  retried after a newer one was queued does not overwrite them
+- if nothing was sent the job raises so the queue retries it with backoff;
+  missing configuration is not retried, and a dead-lettered send is marked
+  send_status "failed"
+"""
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+from bson import ObjectId
+
+from database import (
+    credit_notes_collection,
+    debit_notes_collection,
+    purchase_orders_collection,
+    sales_invoices_collection,
+    sales_orders_collection,
+    sales_quotations_collection,
+)
+from services.job_queue import PRIORITY_HIGH, PermanentJobError, enqueue, job_handler
+from services.pdf_cache import document_pdf
+from services.pdf_renderer import PdfRenderBusy
+from services.send_tracking import create_queued_send_update, create_uniform_send_update
+
+try:
+    from services.email_service import SendGridEmailService, BRAND_PLACEHOLDER
+except Exception:
+    SendGridEmailService = None
+    BRAND_PLACEHOLDER = {"company_name": "Your Company"}
+try:
+    from services.sms_service import TwilioSmsService
+except Exception:
+    TwilioSmsService = None
+
+logger = logging.getLogger(__name__)
+
+JOB_TYPE = "send_document"
+# Per-send channel results kept on a document, newest last
+SEND_RESULTS_KEPT = 10
+
+
+def now_utc():
+    return datetime.now(timezone.utc)
+
+
+def _note_as_invoice(number_field: str, date_field: str, party: str) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """Credit/debit notes are emailed with the invoice template"""
+    def convert(note: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "invoice_number": note.get(number_field),
+            "invoice_date": note.get(date_field),
+            "due_date": note.get(date_field),
+            "customer_name": note.get(f"{party}_name"),
+            "customer_email": note.get(f"{party}_email"),
+            "customer_phone": note.get(f"{party}_phone"),
+            "customer_address": note.get(f"{party}_address"),
+            "items": note.get("items", []),
+            "subtotal": note.get("subtotal", 0),
+            "tax_rate": note.get("tax_rate", 18),
+            "tax_amount": note.get("tax_amount", 0),
+            "discount_amount": note.get("discount_amount", 0),
+            "total_amount": note.get("total_amount", 0),
+        }
+    return convert
+
+
+def _as_is(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return doc
+
+
+# kind -> (collection, email/PDF template document, PDF title)
+SEND_KINDS = {
+    "sales_invoice": (sales_invoices_collection, _as_is, "Invoice"),
+    "sales_order": (sales_orders_collection, _as_is, "Sales Order"),
+    "purchase_order": (purchase_orders_collection, _as_is, "Purchase Order"),
+    "quotation": (sales_quotations_collection, _as_is, "Quotation"),
+    "credit_note": (credit_notes_collection, _note_as_invoice("credit_note_number", "credit_note_date", "customer"), "Credit Note"),
+    "debit_note": (debit_notes_collection, _note_as_invoice("debit_note_number", "debit_note_date", "supplier"), "Debit Note"),
+}
+
+
+def email_configured() -> bool:
+    return SendGridEmailService is not None and bool(os.environ.get("SENDGRID_API_KEY"))
+
+
+def sms_configured() -> bool:
+    return TwilioSmsService is not None and bool(
+        os.environ.get("TWILIO_ACCOUNT_SID") and os.environ.get("TWILIO_AUTH_TOKEN") and os.environ.get("TWILIO_FROM_PHONE")
+    )
+
+
+def _doc_filter(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": doc["id"]} if doc.get("id") else {"_id": doc["_id"]}
+
+
+async def queue_send(
+    kind: str,
+    doc: Dict[str, Any],
+    *,
+    email: Optional[str] = None,
+    phone: Optional[str] = None,
+    include_pdf: bool = False,
+    subject: Optional[str] = None,
+    preface: Optional[str] = None,
+    sms_body: Optional[str] = None,
+    method: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Queue a send of `doc` (already validated by the endpoint); returns the job"""
+    collection = SEND_KINDS[kind][0]
+    send_id = str(uuid.uuid4())
+    method = method or ("email" if email else "sms")
+    job = await enqueue(JOB_TYPE, {
+        "kind": kind,
+        "document": {"id": doc["id"]} if doc.get("id") else {"_id": str(doc["_id"])},
+        "send_id": send_id,
+        "email": email,
+        "phone": phone,
+        "include_pdf": include_pdf,
+        "subject": subject,
+        "preface": preface,
+        "sms_body": sms_body,
+        "method": method,
+    }, priority=PRIORITY_HIGH)
+    await collection.update_one(_doc_filter(doc), {"$set": create_queued_send_update(
+        job_id=job["id"], send_id=send_id, method=method, recipient=email or phone,
+    )})
+    return job
+
+
+def _load_filter(payload: Dict[str, Any]) -> Dict[str, Any]:
+    ref = payload["document"]
+    return {"id": ref["id"]} if ref.get("id") else {"_id": ObjectId(ref["_id"])}
+
+
+def _previous_results(doc: Dict[str, Any], send_id: str) -> Dict[str, Any]:
+    """Channel results an earlier attempt of this send recorded"""
+    for entry in reversed(doc.get("send_results") or []):
+        if entry.get("send_id") == send_id:
+            return entry.get("results") or {}
+    # Attempts recorded before per-send results were kept
+    return (doc.get("last_send_result") or {}) if doc.get("send_id") == send_id else {}
+
+
+async def _send(payload: Dict[str, Any], doc: Dict[str, Any], to_template: Callable, pdf_title: str) -> Dict[str, Any]:
+    previous = _previous_results(doc, payload["send_id"])
+    results: Dict[str, Any] = {"email": None, "sms": None}
+
+    if payload.get("email"):
+        if (previous.get("email") or {}).get("success"):
+            results["email"] = previous["email"]
+        elif not email_configured():
+            results["email"] = {"success": False, "configured": False, "error": "Email service not configured"}
+        else:
+            template = to_template(doc)
+            pdf_bytes = None
+            if payload.get("include_pdf"):
+                try:
+                    owner = f"{payload['kind']}:{doc.get('id') or doc['_id']}"
+                    pdf_bytes = await document_pdf(owner, template, BRAND_PLACEHOLDER, title=pdf_title)
+                except PdfRenderBusy:
+                    # Retry the job later rather than send without the attachment
+                    raise
+                except Exception as e:
+                    logger.warning(f"PDF render failed, sending without attachment: {e}")
+                    pdf_bytes = None
+            try:
+                results["email"] = await SendGridEmailService().send_invoice(
+                    payload["email"], template, BRAND_PLACEHOLDER, pdf_bytes=pdf_bytes,
+                    subject_override=payload.get("subject"), preface=payload.get("preface"),
+                )
+            except Exception as e:
+                results["email"] = {"success": False, "error": str(e)}
+
+    if payload.get("phone"):
+        if (previous.get("sms") or {}).get("success"):
+            results["sms"] = previous["sms"]
+        elif not sms_configured():
+            results["sms"] = {"success": False, "configured": False, "message": "SMS not configured"}
+        else:
+            try:
+                results["sms"] = await TwilioSmsService().send_sms(payload["phone"], payload.get("sms_body") or "")
+            except Exception as e:
+                results["sms"] = {"success": False, "error": str(e)}
+
+    return results
+
+
+async def _mark_failed(payload: Dict[str, Any], error: str) -> None:
+    collection = SEND_KINDS[payload["kind"]][0]
+    await collection.update_one(
+        {**_load_filter(payload), "send_id": payload["send_id"]},
+        {"$set": {"send_status": "failed", "last_send_error": error, "updated_at": now_utc().isoformat()}},
+    )
+
+
+@job_handler(JOB_TYPE, on_dead=_mark_failed)
+async def send_document(payload: Dict[str, Any]) -> Dict[str, Any]:
+    if payload.get("kind") not in SEND_KINDS:
+        raise PermanentJobError(f"Unknown document kind: {payload.get('kind')}")
+    collection, to_template, pdf_title = SEND_KINDS[payload["kind"]]
+    doc_filter = _load_filter(payload)
+    doc = await collection.find_one(doc_filter)
+    if not doc:
+        raise PermanentJobError("Document not found")
+
+    results = await _send(payload, doc, to_template, pdf_title)
+    sent_via = [channel for channel, result in results.items() if result and result.get("success")]
+    update_fields = create_uniform_send_update(
+        send_results=results,
+        method=payload["method"],
+        recipient=payload.get("email") or payload.get("phone"),
+        attach_pdf=bool(payload.get("include_pdf")),
+    )
+    if sent_via:
+        update_fields["send_status"] = "sent"
+    await collection.update_one(doc_filter, {"$push": {"send_results": {
+        "$each": [{"send_id": payload["send_id"], "results": results, "at": now_utc().isoformat()}],
+        "$slice": -SEND_RESULTS_KEPT,
+    }}})
+    await collection.update_one({**doc_filter, "send_id": payload["send_id"]}, {"$set": update_fields})
+
+    if not sent_via:
+        errors = update_fields.get("last_send_errors") or {}
+        message = "; ".join(f"{channel}: {error}" for channel, error in errors.items()) or "Nothing was sent"
+        attempted = [result for result in results.values() if result]
+        if attempted and all(result.get("configured") is False for result in attempted):
+            raise PermanentJobError(message)
+        raise RuntimeError(message)
+    return {"sent_via": sent_via, "errors": update_fields.get("last_send_errors") or {}}
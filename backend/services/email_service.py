@@ -1,10 +1,10 @@
+import base64
 import os
 import logging
 from typing import Dict, Any, Optional
 from datetime import datetime
 
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email, To, HtmlContent, Attachment, FileContent, FileName, FileType, Disposition
+from services import outbound_http
 
 logger = logging.getLogger(__name__)
 
@@ -162,42 +162,45 @@ def generate_invoice_html(invoice: Dict[str, Any], brand: Optional[Dict[str, Any
 
 
 class SendGridEmailService:
+    """SendGrid v3 mail/send over the shared outbound HTTP pool (services/outbound_http.py)"""
+
     def __init__(self) -> None:
-        api_key = os.environ.get("SENDGRID_API_KEY")
-        if not api_key:
+        self.api_key = os.environ.get("SENDGRID_API_KEY")
+        if not self.api_key:
             raise RuntimeError("SENDGRID_API_KEY is not configured")
-        self.client = SendGridAPIClient(api_key)
         self.default_from = os.environ.get("SENDGRID_FROM_EMAIL", "no-reply@example.com")
 
-    def send_invoice(self, to_email: str, invoice: Dict[str, Any], brand: Optional[Dict[str, Any]] = None, pdf_bytes: Optional[bytes] = None, subject_override: Optional[str] = None, preface: Optional[str] = None) -> Dict[str, Any]:
+    async def send_invoice(self, to_email: str, invoice: Dict[str, Any], brand: Optional[Dict[str, Any]] = None, pdf_bytes: Optional[bytes] = None, subject_override: Optional[str] = None, preface: Optional[str] = None) -> Dict[str, Any]:
         html = generate_invoice_html(invoice, brand, preface=preface)
         subject = subject_override or f"Invoice {invoice.get('invoice_number', '')} from {BRAND_PLACEHOLDER['company_name']}"
-        mail = Mail(
-            from_email=Email(self.default_from),
-            to_emails=To(to_email),
-            subject=subject,
-            html_content=HtmlContent(html)
-        )
+        mail: Dict[str, Any] = {
+            "personalizations": [{"to": [{"email": to_email}]}],
+            "from": {"email": self.default_from},
+            "subject": subject,
+            "content": [{"type": "text/html", "value": html}],
+        }
         if pdf_bytes:
-            try:
-                import base64
-                encoded = base64.b64encode(pdf_bytes).decode()
-                attachment = Attachment(
-                    FileContent(encoded),
-                    FileName(f"Invoice-{invoice.get('invoice_number','') or 'invoice'}.pdf"),
-                    FileType('application/pdf'),
-                    Disposition('attachment')
-                )
-                mail.add_attachment(attachment)
-            except Exception:
-                logger.exception('Failed to attach PDF; sending without attachment')
+            mail["attachments"] = [{
+                "content": base64.b64encode(pdf_bytes).decode(),
+                "filename": f"Invoice-{invoice.get('invoice_number','') or 'invoice'}.pdf",
+                "type": "application/pdf",
+                "disposition": "attachment",
+            }]
         try:
-            resp = self.client.send(mail)
-            return {
-                "success": True,
-                "status_code": resp.status_code,
-                "message_id": resp.headers.get('X-Message-Id')
-            }
+            resp = await outbound_http.request(
+                "sendgrid", "POST", "/v3/mail/send",
+                json=mail, headers={"Authorization": f"Bearer {self.api_key}"},
+            )
         except Exception as e:
             logger.exception("SendGrid send failed")
-            return {"success": False, "error": str(e)}
\ No newline at end of file
+            return {"success": False, "error": str(e) or type(e).__name__}
+        if resp.status >= 400:
+            errors = resp.body.get("errors") if isinstance(resp.body, dict) else None
+            detail = "; ".join(err.get("message", "") for err in errors or []) or str(resp.body)[:200]
+            logger.error(f"SendGrid send failed: HTTP {resp.status}: {detail}")
+            return {"success": False, "status_code": resp.status, "error": f"HTTP Error {resp.status}: {detail}"}
+        return {
+            "success": True,
+            "status_code": resp.status,
+            "message_id": resp.headers.get("X-Message-Id")
+        }
@@ -0,0 +1,155 @@
+"""
+General Ledger Lines
+`gl_entries` holds one document per posted journal entry line (account, posting
+date as a datetime, debit, credit, voucher references), indexed on
+(account_id, posting_date), so per-account reports read an index range instead
+of loading every journal entry and walking its embedded `accounts` array.
+
+Lines are written by the same code paths that create or post journal entries and
+removed when an entry is deleted. Writes are idempotent (line id is
+"<entry id>:<line no>"), so re-recording an entry or running the backfill
+migration (0004) alongside live posting is safe. Reports over the lines check
+backfilled() first, since before 0004 has run they would miss older entries. Writing or removing lines dated
+in a closed month invalidates the account balance snapshots from that month on
+(services/balance_snapshots.py).
+"""
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+from pymongo import DeleteMany, ReplaceOne
+
+from database import db, gl_entries_collection
+from services.balance_snapshots import invalidate_from
+from services.sort_keys import to_sort_datetime
+
+# Writes gl_entries lines for entries posted before the collection existed
+BACKFILL_MIGRATION = "0004_backfill_gl_entries"
+
+# Debit-normal root types; everything else (Liability, Equity, Income) is credit-normal
+DEBIT_NORMAL = {"Asset", "Expense"}
+
+
+def now_utc():
+    return datetime.now(timezone.utc)
+
+
+def balance_change(root_type: Optional[str], debit: float, credit: float) -> float:
+    if root_type in DEBIT_NORMAL:
+        return debit - credit
+    return credit - debit
+
+
+def line_date(entry: Dict[str, Any]) -> datetime:
+    """posting_date stored on the entry's lines"""
+    return to_sort_datetime(entry.get("posting_date")) or to_sort_datetime(entry.get("created_at")) or now_utc()
+
+
+def gl_lines(entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The gl_entries documents for one journal entry"""
+    posting_date = line_date(entry)
+    lines = []
+    for line_no, line in enumerate(entry.get("accounts", []) or []):
+        if not line.get("account_id"):
+            continue
+        lines.append({
+            "id": f"{entry['id']}:{line_no}",
+            "journal_entry_id": entry["id"],
+            "line_no": line_no,
+            "entry_number": entry.get("entry_number"),
+            "account_id": line["account_id"],
+            "account_name": line.get("account_name"),
+            "posting_date": posting_date,
+            "debit": float(line.get("debit_amount", 0) or 0),
+            "credit": float(line.get("credit_amount", 0) or 0),
+            "description": line.get("description") or entry.get("description"),
+            "reference": entry.get("reference"),
+            "voucher_type": entry.get("voucher_type"),
+            "voucher_id": entry.get("voucher_id"),
+            "company_id": entry.get("company_id", "default_company"),
+            "recorded_at": now_utc(),
+        })
+    return lines
+
+
+def gl_write_ops(entry: Dict[str, Any]) -> List[Any]:
+    """Upsert this entry's lines and drop any left over from a longer earlier version"""
+    lines = gl_lines(entry)
+    ops: List[Any] = [ReplaceOne({"id": line["id"]}, line, upsert=True) for line in lines]
+    ops.append(DeleteMany({"journal_entry_id": entry["id"], "line_no": {"$gte": len(entry.get("accounts", []) or [])}}))
+    return ops
+
+
+async def _earliest_line_date(journal_entry_ids: List[str], session=None) -> Optional[datetime]:
+    earliest = await gl_entries_collection.find(
+        {"journal_entry_id": {"$in": journal_entry_ids}}, {"_id": 0, "posting_date": 1}, session=session
+    ).sort("posting_date", 1).limit(1).to_list(length=1)
+    return to_sort_datetime(earliest[0]["posting_date"]) if earliest else None
+
+
+async def record_entries(entries: Iterable[Dict[str, Any]], session=None) -> None:
+    """Write the lines of entries that are (now) posted"""
+    entries = list(entries)
+    ops = [op for entry in entries for op in gl_write_ops(entry)]
+    if ops:
+        # Lines being replaced may carry an older date than the new ones
+        dates = [line_date(e) for e in entries]
+        replaced = await _earliest_line_date([e["id"] for e in entries], session=session)
+        if replaced:
+            dates.append(replaced)
+        await gl_entries_collection.bulk_write(ops, ordered=False, session=session)
+        await invalidate_from(min(dates), session=session)
+
+
+async def record_entry(entry: Dict[str, Any], session=None) -> None:
+    if entry.get("status") == "posted":
+        await record_entries([entry], session=session)
+
+
+async def remove_entries(journal_entry_ids: List[str], session=None) -> None:
+    if journal_entry_ids:
+        earliest = await _earliest_line_date(journal_entry_ids, session=session)
+        await gl_entries_collection.delete_many({"journal_entry_id": {"$in": journal_entry_ids}}, session=session)
+        await invalidate_from(earliest, session=session)
+
+
+async def backfilled() -> bool:
+    """Whether every posted entry has its lines; until then reports over gl_entries miss older entries"""
+    # migrations imports this module (0004 writes through gl_write_ops)
+    from migrations.runner import is_applied
+
+    return await is_applied(db, BACKFILL_MIGRATION)
+
+
+async def opening_balance(account_id: str, root_type: Optional[str], before: Optional[datetime]) -> float:
+    """Signed balance of the account's lines dated before `before`"""
+    if before is None:
+        return 0.0
+    pipeline = [
+        {"$match": {"account_id": account_id, "posting_date": {"$lt": before}}},
+        {"$group": {"_id": None, "debit": {"$sum": "$debit"}, "credit": {"$sum": "$credit"}}},
+    ]
+    totals = await gl_entries_collection.aggregate(pipeline).to_list(length=1)
+    if not totals:
+        return 0.0
+    return balance_change(root_type, totals[0]["debit"], totals[0]["credit"])
+
+
+async def account_lines(
+    account_id: str,
+    root_type: Optional[str],
+    date_bounds: Optional[Dict[str, datetime]] = None,
+    opening: float = 0.0,
+    batch_size: int = 1000,
+) -> AsyncIterator[Dict[str, Any]]:
+    """The account's lines in posting order, each with the running balance after it"""
+    query: Dict[str, Any] = {"account_id": account_id}
+    if date_bounds:
+        query["posting_date"] = date_bounds
+    balance = opening
+    cursor = gl_entries_collection.find(query, {"_id": 0, "recorded_at": 0}).sort(
+        [("posting_date", 1), ("id", 1)]
+    ).batch_size(batch_size)
+    async for line in cursor:
+        balance += balance_change(root_type, line["debit"], line["credit"])
+        line["balance"] = round(balance, 2)
+        yield line
@@ -0,0 +1,124 @@
+"""
+Global Search
+Runs the search bar's category lookups (customers, suppliers, items, sales
+orders, invoices, quotations, purchase orders, purchase invoices, credit notes,
+debit notes, transactions) against the search index (services/search_index.py)
+concurrently, so a search costs about as much as its slowest category rather
+than the sum of all.
+
+- every category reads at most SEARCH_CANDIDATE_FACTOR times its share of
+  `limit` (all of `limit` when the search is filtered to that category)
+  confirmed matches
+- all categories share one deadline of SEARCH_DEADLINE_SECONDS, also sent to
+  Mongo as maxTimeMS; categories still running at the deadline are cancelled,
+  keep the matches they already streamed and are reported in
+  `timed_out_categories`
+- once `limit` matches that start with the term (in any field) have been
+  collected across all categories, the remaining cursors stop reading
+- the matches of all categories are scored together and the best `limit`
+  picked with a heap (services/search_ranking.py)
+- until the index has been built (migration 0006) categories query their own
+  collections and score the entries built in memory, so older documents are
+  still found
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from database import db
+from services.search_index import (
+    CATEGORIES, CATEGORY_NAMES, SEARCH_INDEX_COLLECTION, SearchCategory, contains, index_built, lookup_filter,
+    normalize, search_entry, source_filter,
+)
+from services.search_ranking import score_batch, top_k
+
+logger = logging.getLogger(__name__)
+
+SEARCH_DEADLINE_SECONDS = float(os.environ.get("SEARCH_DEADLINE_SECONDS", "1.5"))
+SEARCH_CANDIDATE_FACTOR = int(os.environ.get("SEARCH_CANDIDATE_FACTOR", "10"))
+
+
+class _SearchRun:
+    """State shared by the category tasks of one search"""
+
+    def __init__(self, term: str, limit: int) -> None:
+        self.term = term
+        self.compact = normalize(term)
+        self.limit = limit
+        self.prefix_matches = 0
+        self.matches: Dict[str, List[Dict[str, Any]]] = {}
+
+    @property
+    def filled(self) -> bool:
+        return self.prefix_matches >= self.limit
+
+    async def search(self, category: SearchCategory, budget: int, deadline_ms: int, indexed: bool = True) -> None:
+        matches = self.matches.setdefault(category.name, [])
+        if indexed:
+            filt = lookup_filter(category.name, self.term)
+            collection = db[SEARCH_INDEX_COLLECTION]
+            projection = {"_id": 0, "result": 1, "fields": 1, "compact": 1, "date": 1}
+        else:
+            filt = source_filter(category, self.term)
+            collection = db[category.collection]
+            projection = None
+        if filt is None:
+            return
+        cursor = collection.find(filt, projection).max_time_ms(deadline_ms)
+        try:
+            async for doc in cursor:
+                if self.filled or len(matches) >= budget:
+                    break
+                entry = doc if indexed else search_entry(category.collection, doc)
+                if not contains(entry, self.term):
+                    continue
+                matches.append(entry)
+                if any(value.startswith(self.compact) for value in entry["compact"].values()):
+                    self.prefix_matches += 1
+        finally:
+            await cursor.close()
+
+
+async def global_search(term: str, limit: int, category: Optional[str] = None,
+                        deadline: float = SEARCH_DEADLINE_SECONDS) -> Dict[str, Any]:
+    """Search every category (or just `category`) for `term`.
+    Returns the best `limit` results by relevance, per-category match counts and the categories
+    cut off by the deadline."""
+    run = _SearchRun(term, limit)
+    indexed = await index_built()
+    selected = [c for c in CATEGORIES if not category or c.name == category]
+    deadline_ms = max(1, int(deadline * 1000))
+    tasks = {
+        asyncio.create_task(run.search(c, c.budget(limit, bool(category)) * SEARCH_CANDIDATE_FACTOR, deadline_ms, indexed)): c.name
+        for c in selected
+    }
+    timed_out: List[str] = []
+    if tasks:
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+            timed_out.append(tasks[task])
+        if pending:
+            await asyncio.wait(pending)
+        for task in done:
+            error = task.exception()
+            if error is not None:
+                # A Mongo-side maxTimeMS expiry is a timeout like any other
+                if getattr(error, "code", None) == 50:
+                    timed_out.append(tasks[task])
+                    continue
+                raise error
+        if timed_out:
+            logger.warning(f"Search for {term!r} hit the {deadline}s deadline in {', '.join(sorted(timed_out))}")
+
+    # Category order keeps ties in a stable order, however the tasks interleaved
+    entries = [entry for c in CATEGORIES for entry in run.matches.get(c.name, [])]
+    scores = score_batch(term, entries)
+    results = top_k(({**entry["result"], "relevance": round(score, 4)} for entry, score in zip(entries, scores)), limit)
+    return {
+        "total_results": len(results),
+        "results": results,
+        "categories": {c.name: len(run.matches.get(c.name, [])) for c in CATEGORIES},
+        "timed_out_categories": [name for name in CATEGORY_NAMES if name in timed_out],
+    }
@@ -0,0 +1,411 @@
+"""
+Declarative MongoDB Index Registry
+Declares the indexes every collection needs for the lookups, filters and sorts the
+routers actually run, creates them idempotently on startup, and reports index usage
+($indexStats) and collection scans on hot routes (explain()).
+
+A registry index whose definition changed is dropped and recreated under the same
+name; the `_nonunique` stand-in created while duplicates blocked a unique index is
+dropped once the unique index builds.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Error codes returned by createIndexes / dropIndexes
+INDEX_NOT_FOUND = 27
+DUPLICATE_KEY = 11000
+INDEX_OPTIONS_CONFLICT = 85
+INDEX_KEY_SPECS_CONFLICT = 86
+
+
+def _unique(field: str, name: Optional[str] = None) -> IndexModel:
+    # Partial so documents from older code paths that lack the field stay out of the index.
+    # Only $exists: the planner uses a partial index when the query implies its filter, and
+    # an equality lookup ({"id": x}) implies $exists but not a $type.
+    return IndexModel(
+        [(field, ASCENDING)],
+        name=name or f"uniq_{field}",
+        unique=True,
+        partialFilterExpression={field: {"$exists": True}},
+    )
+
+
+def _idx(keys: List[Tuple[str, int]], name: str) -> IndexModel:
+    return IndexModel(keys, name=name)
+
+
+def _document_indexes(number_field: str, party_field: str, date_field: str) -> List[IndexModel]:
+    """Standard set for transactional documents (invoices, orders, quotations, notes)"""
+    return [
+        _unique("id"),
+        _unique(number_field),
+        _idx([("created_at", DESCENDING), ("_id", DESCENDING)], "created_at_id_desc"),
+        _idx([("status", ASCENDING), ("created_at", DESCENDING)], "status_created_at"),
+        _idx([(party_field, ASCENDING), ("created_at", DESCENDING)], f"{party_field}_created_at"),
+        # stored by services/sort_keys; serves date-range filters and date sorts
+        _idx([(f"{date_field}_sort", DESCENDING), ("_id", DESCENDING)], f"{date_field}_sort_id_desc"),
+        _idx([("status", ASCENDING), (f"{date_field}_sort", DESCENDING)], f"status_{date_field}_sort"),
+    ]
+
+
+INDEX_REGISTRY: Dict[str, List[IndexModel]] = {
+    # Sales
+    "sales_invoices": _document_indexes("invoice_number", "customer_id", "invoice_date") + [
+        _idx([("sales_order_id", ASCENDING)], "sales_order_id"),
+    ],
+    "sales_orders": _document_indexes("order_number", "customer_id", "order_date") + [
+        _idx([("quotation_id", ASCENDING)], "quotation_id"),
+    ],
+    "sales_quotations": _document_indexes("quotation_number", "customer_id", "quotation_date"),
+    "credit_notes": _document_indexes("credit_note_number", "customer_id", "credit_note_date") + [
+        _idx([("reference_invoice_id", ASCENDING)], "reference_invoice_id"),
+    ],
+    # Purchase
+    "purchase_orders": _document_indexes("order_number", "supplier_id", "order_date"),
+    "purchase_invoices": _document_indexes("invoice_number", "supplier_id", "invoice_date") + [
+        _idx([("purchase_order_id", ASCENDING)], "purchase_order_id"),
+    ],
+    "debit_notes": _document_indexes("debit_note_number", "supplier_id", "debit_note_date") + [
+        _idx([("reference_invoice_id", ASCENDING)], "reference_invoice_id"),
+    ],
+    # Financial
+    "accounts": [
+        _unique("id"),
+        _unique("account_code"),
+        _idx([("is_active", ASCENDING), ("account_code", ASCENDING)], "is_active_account_code"),
+        _idx([("root_type", ASCENDING), ("is_active", ASCENDING)], "root_type_is_active"),
+        _idx([("account_name", ASCENDING)], "account_name"),
+    ],
+    "journal_entries": [
+        _unique("id"),
+        _unique("entry_number"),
+        # posting_date_sort is stored by services/sort_keys (posting_date mixes strings and datetimes)
+        _idx([("status", ASCENDING), ("posting_date_sort", DESCENDING)], "status_posting_date_sort"),
+        _idx([("posting_date_sort", DESCENDING), ("_id", DESCENDING)], "posting_date_sort_id_desc"),
+        _idx([("voucher_id", ASCENDING)], "voucher_id"),
+        _idx([("voucher_type", ASCENDING), ("posting_date_sort", DESCENDING)], "voucher_type_posting_date_sort"),
+    ],
+    "gl_entries": [
+        _unique("id"),
+        # serves the general ledger's per-account date range in line order
+        _idx([("account_id", ASCENDING), ("posting_date", ASCENDING), ("id", ASCENDING)], "account_id_posting_date"),
+        _idx([("journal_entry_id", ASCENDING), ("line_no", ASCENDING)], "journal_entry_id_line_no"),
+        # serves balance snapshot builds and as-of deltas across all accounts
+        _idx([("posting_date", ASCENDING)], "posting_date"),
+    ],
+    "account_snapshots": [
+        IndexModel(
+            [("period", ASCENDING), ("account_id", ASCENDING)],
+            name="uniq_period_account_id",
+            unique=True,
+            partialFilterExpression={"account_id": {"$exists": True}},
+        ),
+    ],
+    "payments": [
+        _unique("id"),
+        _unique("payment_number"),
+        # payment_date_sort is stored by services/sort_keys (payment_date mixes strings and datetimes)
+        _idx([("payment_date_sort", DESCENDING), ("_id", DESCENDING)], "payment_date_sort_id_desc"),
+        _idx([("payment_type", ASCENDING), ("payment_date_sort", DESCENDING)], "payment_type_payment_date_sort"),
+        _idx([("status", ASCENDING), ("payment_date_sort", DESCENDING)], "status_payment_date_sort"),
+        _idx([("party_id", ASCENDING), ("payment_date", DESCENDING)], "party_id_payment_date"),
+    ],
+    "report_exports": [
+        _unique("id"),
+        _idx([("created_at", DESCENDING)], "created_at_desc"),
+    ],
+    # GridFS files of services/pdf_cache.py (GridFS adds filename_1_uploadDate_1 itself)
+    "pdf_cache.files": [
+        _idx([("metadata.owner", ASCENDING)], "metadata_owner"),
+        _idx([("metadata.last_used", ASCENDING)], "metadata_last_used"),
+    ],
+    # services/search_index.py: one entry per searchable document
+    "search_index": [
+        _unique("id"),
+        # multikey; serves trigram lookups (grams: $all) and short-term word prefixes
+        _idx([("category", ASCENDING), ("grams", ASCENDING)], "category_grams"),
+        _idx([("category", ASCENDING), ("tokens", ASCENDING)], "category_tokens"),
+        # rebuilds drop the entries they did not rewrite
+        _idx([("category", ASCENDING), ("indexed_at", ASCENDING)], "category_indexed_at"),
+    ],
+    # services/dashboard_counters.py: per-document contributions (counters are keyed by _id)
+    "dashboard_contributions": [
+        # reconciles drop the rows they did not rewrite
+        _idx([("collection", ASCENDING), ("updated_at", ASCENDING)], "collection_updated_at"),
+    ],
+    "jobs": [
+        _unique("id"),
+        # Claim order: due queued jobs, highest priority first
+        _idx([("status", ASCENDING), ("priority", DESCENDING), ("run_at", ASCENDING)], "status_priority_run_at"),
+        _idx([("status", ASCENDING), ("lease_expires_at", ASCENDING)], "status_lease_expires_at"),
+        _idx([("type", ASCENDING), ("created_at", DESCENDING)], "type_created_at"),
+        _idx([("created_at", DESCENDING)], "created_at_desc"),
+    ],
+    "payment_allocations": [
+        _unique("id"),
+        _idx([("invoice_id", ASCENDING)], "invoice_id"),
+        _idx([("payment_id", ASCENDING)], "payment_id"),
+    ],
+    "bank_statements": [
+        _unique("id"),
+        _idx([("upload_date", DESCENDING)], "upload_date_desc"),
+    ],
+    "bank_transactions": [
+        _unique("id"),
+        _idx([("statement_id", ASCENDING), ("transaction_date", DESCENDING)], "statement_id_transaction_date"),
+        _idx([("is_matched", ASCENDING), ("transaction_date", DESCENDING)], "is_matched_transaction_date"),
+    ],
+    # Master data
+    "customers": [
+        _unique("id"),
+        _idx([("created_at", DESCENDING), ("_id", DESCENDING)], "created_at_id_desc"),
+        _idx([("name", ASCENDING)], "name"),
+        _idx([("active", ASCENDING), ("updated_at", DESCENDING)], "active_updated_at"),
+    ],
+    "suppliers": [
+        _unique("id"),
+        _idx([("created_at", DESCENDING), ("_id", DESCENDING)], "created_at_id_desc"),
+        _idx([("name", ASCENDING)], "name"),
+    ],
+    "items": [
+        _unique("id"),
+        _idx([("created_at", DESCENDING), ("_id", DESCENDING)], "created_at_id_desc"),
+        _idx([("item_code", ASCENDING)], "item_code"),
+        _idx([("barcode", ASCENDING)], "barcode"),
+        _idx([("active", ASCENDING), ("category", ASCENDING)], "active_category"),
+    ],
+    "users": [
+        _unique("email", "uniq_email"),
+    ],
+    "notifications": [
+        _idx([("user_id", ASCENDING), ("created_at", DESCENDING)], "user_id_created_at"),
+    ],
+    "general_settings": [
+        _unique("id"),
+    ],
+    # Stock
+    "warehouses": [_unique("id")],
+    "stock_layers": [
+        _idx([("item_id", ASCENDING), ("warehouse_id", ASCENDING), ("created_at", ASCENDING)], "item_warehouse_created_at"),
+    ],
+    "stock_ledger": [
+        _idx([("item_id", ASCENDING), ("warehouse_id", ASCENDING), ("timestamp", DESCENDING)], "item_warehouse_timestamp"),
+        _idx([("voucher_id", ASCENDING)], "voucher_id"),
+    ],
+    # PoS
+    "pos_products": [
+        _idx([("id", ASCENDING)], "id"),
+        _idx([("active", ASCENDING), ("category", ASCENDING)], "active_category"),
+    ],
+    "pos_customers": [
+        _idx([("id", ASCENDING)], "id"),
+        _idx([("pos_customer_id", ASCENDING)], "pos_customer_id"),
+    ],
+    "pos_transactions": [
+        _idx([("transaction_timestamp", DESCENDING)], "transaction_timestamp_desc"),
+        _idx([("pos_transaction_id", ASCENDING)], "pos_transaction_id"),
+    ],
+    "pos_devices": [_unique("device_id", "uniq_device_id")],
+    "sync_log": [
+        _idx([("device_id", ASCENDING), ("sync_timestamp", DESCENDING)], "device_id_sync_timestamp"),
+    ],
+}
+
+# Fixed bound for date-range probes (only the plan matters, not the result)
+_PROBE_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+# Representative queries of hot routes, checked with explain() by the index report:
+# (route, collection, filter, sort)
+HOT_ROUTE_QUERIES: List[Tuple[str, str, Dict[str, Any], Optional[List[Tuple[str, int]]]]] = [
+    ("GET /api/invoices/{invoice_id}", "sales_invoices", {"id": "__probe__"}, None),
+    ("GET /api/invoices/", "sales_invoices", {"status": "submitted"}, [("created_at", DESCENDING)]),
+    ("GET /api/invoices/?from_date", "sales_invoices", {"invoice_date_sort": {"$gte": _PROBE_DATE}}, [("invoice_date_sort", DESCENDING)]),
+    ("GET /api/invoices/?customer_id", "sales_invoices", {"customer_id": "__probe__"}, [("created_at", DESCENDING)]),
+    ("GET /api/sales/orders", "sales_orders", {"status": "draft"}, [("created_at", DESCENDING)]),
+    ("GET /api/sales/orders?from_date", "sales_orders", {"order_date_sort": {"$gte": _PROBE_DATE}}, [("order_date_sort", DESCENDING)]),
+    ("GET /api/quotations/", "sales_quotations", {"status": "draft"}, [("created_at", DESCENDING)]),
+    ("GET /api/purchase/orders", "purchase_orders", {"supplier_id": "__probe__"}, [("created_at", DESCENDING)]),
+    ("GET /api/sales/credit-notes", "credit_notes", {"status": "submitted"}, [("created_at", DESCENDING)]),
+    ("GET /api/buying/debit-notes", "debit_notes", {"status": "submitted"}, [("created_at", DESCENDING)]),
+    ("GET /api/financial/journal-entries", "journal_entries", {"status": "posted"}, [("posting_date_sort", DESCENDING)]),
+    ("GET /api/financial/reports/trial-balance", "account_snapshots", {"period": "2024-01"}, None),
+    ("GET /api/financial/reports/trial-balance (delta)", "gl_entries", {"posting_date": {"$gte": _PROBE_DATE}}, None),
+    ("GET /api/financial/reports/general-ledger", "gl_entries", {"account_id": "__probe__", "posting_date": {"$gte": _PROBE_DATE}}, [("posting_date", ASCENDING)]),
+    ("GET /api/financial/payments", "payments", {"payment_type": "Receive"}, [("payment_date_sort", DESCENDING)]),
+    ("GET /api/financial/accounts", "accounts", {"is_active": True}, [("account_code", ASCENDING)]),
+    ("GET /api/financial/bank/statements", "bank_statements", {}, [("upload_date", DESCENDING)]),
+    ("GET /api/financial/bank/unmatched", "bank_transactions", {"is_matched": False}, [("transaction_date", DESCENDING)]),
+    ("GET /api/search/global", "search_index", {"category": "customers", "grams": {"$all": ["pro", "rob", "obe"]}}, None),
+    ("GET /api/search/global (2 chars)", "search_index", {"category": "items", "tokens": {"$regex": "^pr"}}, None),
+    ("GET /api/master/customers", "customers", {}, [("created_at", DESCENDING)]),
+    ("GET /api/master/items", "items", {}, [("created_at", DESCENDING)]),
+    ("GET /api/pos/products", "pos_products", {"active": True, "category": "__probe__"}, None),
+    ("GET /api/pos/sync-status/{device_id}", "sync_log", {"device_id": "__probe__"}, [("sync_timestamp", DESCENDING)]),
+]
+
+# Result of the last ensure_indexes() run, surfaced by the report endpoint
+last_sync: Dict[str, Any] = {}
+
+
+async def _drop_if_exists(coll, name: str) -> bool:
+    try:
+        await coll.drop_index(name)
+        return True
+    except OperationFailure as e:
+        if e.code == INDEX_NOT_FOUND:
+            return False
+        raise
+
+
+async def _create_one(coll, model: IndexModel) -> Dict[str, Any]:
+    doc = model.document
+    name = doc["name"]
+    try:
+        try:
+            await coll.create_indexes([model])
+        except OperationFailure as e:
+            existing = await coll.index_information() if e.code in (INDEX_OPTIONS_CONFLICT, INDEX_KEY_SPECS_CONFLICT) else {}
+            if name not in existing:
+                raise
+            # Our own index from an older registry definition (e.g. a changed partial
+            # filter): replace it
+            await coll.drop_index(name)
+            await coll.create_indexes([model])
+            logger.info("Index %s.%s recreated with its current definition", coll.name, name)
+        if doc.get("unique") and await _drop_if_exists(coll, f"{name}_nonunique"):
+            # Duplicates were cleaned up since the fallback was created
+            logger.info("Fallback index %s.%s_nonunique dropped", coll.name, name)
+        return {"name": name, "status": "ok"}
+    except OperationFailure as e:
+        if e.code == DUPLICATE_KEY and doc.get("unique"):
+            # Existing data violates uniqueness (legacy duplicate numbers); keep lookups
+            # fast with a non-unique index until the data is cleaned up.
+            fallback = IndexModel(list(doc["key"].items()), name=f"{name}_nonunique")
+            await coll.create_indexes([fallback])
+            logger.warning("Unique index %s.%s skipped: duplicate values exist", coll.name, name)
+            return {"name": name, "status": "unique_violation", "fallback": fallback.document["name"]}
+        if e.code in (INDEX_OPTIONS_CONFLICT, INDEX_KEY_SPECS_CONFLICT):
+            logger.warning("Index %s.%s conflicts with an existing index: %s", coll.name, name, e)
+            return {"name": name, "status": "conflict", "error": str(e)}
+        raise
+
+
+async def ensure_indexes(db) -> Dict[str, Any]:
+    """Create every registered index. Safe to run on every startup (createIndexes is idempotent)."""
+    started = datetime.now(timezone.utc)
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    failures = 0
+    for coll_name, models in INDEX_REGISTRY.items():
+        coll = db[coll_name]
+        results[coll_name] = []
+        for model in models:
+            try:
+                res = await _create_one(coll, model)
+            except Exception as e:
+                logger.error("Failed to create index %s.%s: %s", coll_name, model.document["name"], e)
+                res = {"name": model.document["name"], "status": "error", "error": str(e)}
+            if res["status"] != "ok":
+                failures += 1
+            results[coll_name].append(res)
+
+    last_sync.clear()
+    last_sync.update({
+        "started_at": started,
+        "finished_at": datetime.now(timezone.utc),
+        "collections": len(results),
+        "indexes": sum(len(v) for v in results.values()),
+        "issues": failures,
+        "results": results,
+    })
+    return last_sync
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    stages = []
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, dict):
+            continue
+        if node.get("stage"):
+            stages.append(node["stage"])
+        if "inputStage" in node:
+            stack.append(node["inputStage"])
+        stack.extend(node.get("inputStages", []))
+        if "queryPlan" in node:  # SBE plans wrap the classic tree
+            stack.append(node["queryPlan"])
+    return stages
+
+
+async def explain_hot_routes(db) -> List[Dict[str, Any]]:
+    """queryPlanner explain() of each hot route query; flags COLLSCAN and in-memory SORT"""
+    findings = []
+    for route, coll_name, filt, sort in HOT_ROUTE_QUERIES:
+        find_cmd: Dict[str, Any] = {"find": coll_name, "filter": filt, "limit": 50}
+        if sort:
+            find_cmd["sort"] = dict(sort)
+        try:
+            explained = await db.command({"explain": find_cmd, "verbosity": "queryPlanner"})
+            winning = explained.get("queryPlanner", {}).get("winningPlan", {})
+            stages = _plan_stages(winning)
+            findings.append({
+                "route": route,
+                "collection": coll_name,
+                "stages": stages,
+                "collection_scan": "COLLSCAN" in stages,
+                "in_memory_sort": "SORT" in stages,
+            })
+        except Exception as e:
+            findings.append({"route": route, "collection": coll_name, "error": str(e)})
+    return findings
+
+
+async def index_usage(db) -> Dict[str, Any]:
+    """$indexStats for each registered collection; lists indexes with zero accesses"""
+    per_collection: Dict[str, List[Dict[str, Any]]] = {}
+    unused = []
+    for coll_name in INDEX_REGISTRY:
+        try:
+            stats = await db[coll_name].aggregate([{"$indexStats": {}}]).to_list(length=None)
+        except Exception as e:
+            per_collection[coll_name] = [{"error": str(e)}]
+            continue
+        rows = []
+        for s in stats:
+            accesses = s.get("accesses", {})
+            row = {
+                "name": s.get("name"),
+                "key": s.get("key"),
+                "ops": int(accesses.get("ops", 0)),
+                "since": accesses.get("since"),
+            }
+            rows.append(row)
+            if row["name"] != "_id_" and row["ops"] == 0:
+                unused.append({"collection": coll_name, **row})
+        per_collection[coll_name] = rows
+    return {"collections": per_collection, "unused": unused}
+
+
+async def index_report(db) -> Dict[str, Any]:
+    usage = await index_usage(db)
+    hot_routes = await explain_hot_routes(db)
+    return {
+        "generated_at": datetime.now(timezone.utc),
+        "last_sync": {k: v for k, v in last_sync.items() if k != "results"},
+        "sync_issues": {
+            coll: [r for r in res if r["status"] != "ok"]
+            for coll, res in last_sync.get("results", {}).items()
+            if any(r["status"] != "ok" for r in res)
+        },
+        "unused_indexes": usage["unused"],
+        "collection_scans": [f for f in hot_routes if f.get("collection_scan")],
+        "in_memory_sorts": [f for f in hot_routes if f.get("in_memory_sort")],
+        "hot_routes": hot_routes,
+        "index_usage": usage["collections"],
+    }
@@ -0,0 +1,310 @@
+"""
+Background Job Queue
+Durable jobs in the `jobs` collection, run by asyncio worker pools, so slow side
+effects (email/SMS sends, PDF renders, exports, bank auto-match, dashboard
+counter reconciles) leave the request path.
+
+- enqueue() stores a job as "queued" with a priority (higher runs first) and a
+  run_at time; workers claim the best due job with one findOneAndUpdate
+- a claimed job is "running" under a lease (JOB_LEASE_SECONDS) that the worker
+  extends with heartbeats while the handler runs; leases of crashed workers
+  expire and the job is queued again by whichever worker notices first
+- a handler that raises is retried with exponential backoff plus jitter until
+  max_attempts, then the job is dead-lettered ("dead") with its last error;
+  PermanentJobError skips the remaining attempts; a handler's on_dead callback
+  lets the owning record (send tracking, export status) show the failure
+- handlers register with @job_handler("type") in their own service modules,
+  listed in HANDLER_MODULES so a standalone worker (python job_worker.py) loads
+  the same set as the API process
+
+The API process runs JOB_WORKERS_IN_PROCESS workers (0 disables them when a
+standalone worker handles the queue).
+"""
+import asyncio
+import importlib
+import logging
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+from database import jobs_collection
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS_IN_PROCESS = int(os.environ.get("JOB_WORKERS_IN_PROCESS", "2"))
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "60"))
+JOB_POLL_INTERVAL_SECONDS = float(os.environ.get("JOB_POLL_INTERVAL_SECONDS", "1"))
+JOB_TIMEOUT_SECONDS = float(os.environ.get("JOB_TIMEOUT_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "5"))
+JOB_BACKOFF_BASE_SECONDS = float(os.environ.get("JOB_BACKOFF_BASE_SECONDS", "5"))
+JOB_BACKOFF_MAX_SECONDS = float(os.environ.get("JOB_BACKOFF_MAX_SECONDS", "900"))
+
+# Modules whose @job_handler registrations every worker needs
+HANDLER_MODULES = [
+    "services.document_send",
+    "services.report_export",
+    "services.bank_matching",
+    "services.dashboard_counters",
+]
+
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = -10
+
+FINISHED_STATUSES = ("succeeded", "dead")
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Any]]
+DeadHandler = Callable[[Dict[str, Any], str], Awaitable[None]]
+_handlers: Dict[str, Tuple[Handler, Optional[DeadHandler]]] = {}
+
+# Set by enqueue() so this process's idle workers pick a new job up without waiting a poll interval
+_wakeup = asyncio.Event()
+
+
+class PermanentJobError(Exception):
+    """Retrying cannot help (bad payload, missing document); dead-letter right away"""
+
+
+def now_utc():
+    return datetime.now(timezone.utc)
+
+
+def job_handler(job_type: str, on_dead: Optional[DeadHandler] = None) -> Callable[[Handler], Handler]:
+    """Register an async handler(payload) -> result for a job type; on_dead(payload, error)
+    runs once the job is dead-lettered"""
+    def register(fn: Handler) -> Handler:
+        _handlers[job_type] = (fn, on_dead)
+        return fn
+    return register
+
+
+def load_handlers() -> None:
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+
+
+def backoff_seconds(attempts: int) -> float:
+    delay = min(JOB_BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)), JOB_BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _public(job: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if job is not None:
+        job.pop("_id", None)
+    return job
+
+
+async def enqueue(
+    job_type: str,
+    payload: Dict[str, Any],
+    priority: int = PRIORITY_NORMAL,
+    max_attempts: int = JOB_MAX_ATTEMPTS,
+    delay_seconds: float = 0,
+) -> Dict[str, Any]:
+    """Store a job for the workers; returns the job document"""
+    now = now_utc()
+    job = {
+        "id": str(uuid.uuid4()),
+        "type": job_type,
+        "payload": payload,
+        "status": "queued",
+        "priority": priority,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "run_at": now + timedelta(seconds=delay_seconds),
+        "created_at": now,
+        "updated_at": now,
+    }
+    await jobs_collection.insert_one(job)
+    _wakeup.set()
+    return _public(job)
+
+
+async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    return await jobs_collection.find_one({"id": job_id}, {"_id": 0})
+
+
+async def list_jobs(status: Optional[str] = None, job_type: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+    query: Dict[str, Any] = {}
+    if status:
+        query["status"] = status
+    if job_type:
+        query["type"] = job_type
+    return await jobs_collection.find(query, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(length=limit)
+
+
+async def wait_for_job(job_id: str, timeout: float, interval: float = 0.25) -> Optional[Dict[str, Any]]:
+    """Poll until the job finishes or `timeout` passes; returns its latest state"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        job = await get_job(job_id)
+        if job is None or job["status"] in FINISHED_STATUSES or loop.time() >= deadline:
+            return job
+        await asyncio.sleep(min(interval, max(deadline - loop.time(), 0)))
+
+
+async def retry_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Put a dead-lettered job back in the queue with a fresh attempt budget"""
+    job = await jobs_collection.find_one_and_update(
+        {"id": job_id, "status": "dead"},
+        {"$set": {"status": "queued", "attempts": 0, "run_at": now_utc(), "updated_at": now_utc()},
+         "$unset": {"dead_at": "", "lease_owner": "", "lease_expires_at": ""}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    if job:
+        _wakeup.set()
+    return job
+
+
+async def requeue_expired() -> int:
+    """Jobs whose worker stopped heartbeating go back to the queue (or the dead letters)"""
+    now = now_utc()
+    expired = {"status": "running", "lease_expires_at": {"$lt": now}}
+    released = {"$unset": {"lease_owner": "", "lease_expires_at": ""}}
+    count = 0
+    while True:
+        job = await jobs_collection.find_one_and_update(
+            {**expired, "$expr": {"$gte": ["$attempts", "$max_attempts"]}},
+            {"$set": {"status": "dead", "dead_at": now, "last_error": "lease expired", "updated_at": now}, **released},
+            projection={"_id": 0, "id": 1, "type": 1, "payload": 1},
+        )
+        if job is None:
+            break
+        count += 1
+        _, on_dead = _handlers.get(job["type"], (None, None))
+        if on_dead is not None:
+            try:
+                await on_dead(job.get("payload") or {}, "lease expired")
+            except Exception as hook_error:
+                logger.error(f"Dead-letter hook for job {job['id']} failed: {hook_error}")
+    requeued = await jobs_collection.update_many(
+        expired,
+        {"$set": {"status": "queued", "run_at": now, "last_error": "lease expired", "updated_at": now}, **released},
+    )
+    return count + requeued.modified_count
+
+
+async def claim(worker_id: str, job_types: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    now = now_utc()
+    query: Dict[str, Any] = {"status": "queued", "run_at": {"$lte": now}}
+    if job_types:
+        query["type"] = {"$in": job_types}
+    return await jobs_collection.find_one_and_update(
+        query,
+        {"$set": {
+            "status": "running",
+            "lease_owner": worker_id,
+            "lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS),
+            "started_at": now,
+            "updated_at": now,
+        }, "$inc": {"attempts": 1}},
+        sort=[("priority", -1), ("run_at", 1)],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def _heartbeat(job_id: str, worker_id: str) -> None:
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+        result = await jobs_collection.update_one(
+            {"id": job_id, "lease_owner": worker_id, "status": "running"},
+            {"$set": {"lease_expires_at": now_utc() + timedelta(seconds=JOB_LEASE_SECONDS), "heartbeat_at": now_utc()}},
+        )
+        if result.matched_count == 0:
+            logger.warning(f"Job {job_id} lost its lease; another worker may run it again")
+            return
+
+
+async def _finish(job: Dict[str, Any], worker_id: str, fields: Dict[str, Any]) -> None:
+    fields["updated_at"] = now_utc()
+    await jobs_collection.update_one(
+        {"id": job["id"], "lease_owner": worker_id},
+        {"$set": fields, "$unset": {"lease_owner": "", "lease_expires_at": ""}},
+    )
+
+
+async def run_job(job: Dict[str, Any], worker_id: str) -> None:
+    handler, on_dead = _handlers.get(job["type"], (None, None))
+    payload = job.get("payload") or {}
+    heartbeat = asyncio.create_task(_heartbeat(job["id"], worker_id))
+    try:
+        if handler is None:
+            raise PermanentJobError(f"No handler registered for job type '{job['type']}'")
+        result = await asyncio.wait_for(handler(payload), timeout=JOB_TIMEOUT_SECONDS)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        if isinstance(e, PermanentJobError) or job["attempts"] >= job["max_attempts"]:
+            logger.error(f"Job {job['id']} ({job['type']}) dead after {job['attempts']} attempts: {error}")
+            await _finish(job, worker_id, {"status": "dead", "last_error": error, "dead_at": now_utc(), "finished_at": now_utc()})
+            if on_dead is not None:
+                try:
+                    await on_dead(payload, error)
+                except Exception as hook_error:
+                    logger.error(f"Dead-letter hook for job {job['id']} failed: {hook_error}")
+        else:
+            delay = backoff_seconds(job["attempts"])
+            logger.warning(f"Job {job['id']} ({job['type']}) attempt {job['attempts']} failed, retrying in {delay:.0f}s: {error}")
+            await _finish(job, worker_id, {"status": "queued", "last_error": error, "run_at": now_utc() + timedelta(seconds=delay)})
+    else:
+        await _finish(job, worker_id, {"status": "succeeded", "result": result, "finished_at": now_utc()})
+    finally:
+        heartbeat.cancel()
+
+
+class JobWorkerPool:
+    """`concurrency` asyncio workers claiming and running jobs until stopped"""
+
+    def __init__(self, concurrency: int = JOB_WORKERS_IN_PROCESS, job_types: Optional[List[str]] = None) -> None:
+        self.concurrency = concurrency
+        self.job_types = job_types
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+
+    async def _worker(self, n: int) -> None:
+        worker_id = f"{self.worker_prefix}:{n}"
+        while not self._stopping.is_set():
+            try:
+                if n == 0:
+                    await requeue_expired()
+                job = await claim(worker_id, self.job_types)
+                if job is not None:
+                    await run_job(job, worker_id)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker {worker_id} error: {e}")
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        load_handlers()
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self.concurrency)]
+        logger.info(f"Started {self.concurrency} job workers ({self.worker_prefix})")
+
+    async def stop(self, grace_seconds: float = 10) -> None:
+        """Let running jobs finish for up to grace_seconds; unfinished ones are re-run after their lease expires"""
+        self._stopping.set()
+        _wakeup.set()
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(self._tasks, timeout=grace_seconds)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+    async def wait(self) -> None:
+        await asyncio.gather(*self._tasks)
@@ -0,0 +1,149 @@
+"""
+Ledger Posting Engine
+Posts journal entries to account balances in a fixed number of round trips per
+chunk of entries, instead of one find_one and one $inc per line:
+
+1. one $in query for the entries, one $in query for every account they touch
+2. balance changes are summed per account in memory
+3. inside one multi-document transaction: the entries are flipped to "posted"
+   (only those not posted yet, so a concurrent post aborts instead of double
+   counting) and all balances move with a single unordered bulk_write
+
+A standalone mongod cannot run transactions; there each call claims the entries
+with its own token and balances only what it claimed, which keeps double posting
+out but is not atomic. Month-end batches are split into LEDGER_POSTING_CHUNK_SIZE entries
+per transaction.
+"""
+import logging
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+
+from database import client, accounts_collection, journal_entries_collection
+from services.general_ledger import balance_change, record_entries
+
+logger = logging.getLogger(__name__)
+
+LEDGER_POSTING_CHUNK_SIZE = int(os.environ.get("LEDGER_POSTING_CHUNK_SIZE", "500"))
+
+# "IllegalOperation": transactions need a replica set or mongos
+_NO_TRANSACTIONS_CODE = 20
+_transactions_supported = True
+
+
+class PostingConflict(Exception):
+    """Another request posted some of the entries while this one was running"""
+
+
+def now_utc():
+    return datetime.now(timezone.utc)
+
+
+def _balance_deltas(entries: List[Dict[str, Any]], accounts: Dict[str, Dict[str, Any]]) -> Dict[str, float]:
+    deltas: Dict[str, float] = defaultdict(float)
+    for entry in entries:
+        for line in entry.get("accounts", []):
+            account = accounts.get(line.get("account_id"))
+            if not account:
+                continue
+            root_type = account.get("root_type") or account.get("account_type")
+            deltas[account["id"]] += balance_change(
+                root_type,
+                float(line.get("debit_amount", 0) or 0),
+                float(line.get("credit_amount", 0) or 0),
+            )
+    return deltas
+
+
+async def _apply(entries: List[Dict[str, Any]], accounts: Dict[str, Dict[str, Any]], session=None) -> Tuple[List[str], int]:
+    """Claim the entries and move the balances; returns (posted ids, accounts changed)"""
+    entry_ids = [e["id"] for e in entries]
+    token = str(uuid.uuid4())
+    claimed = await journal_entries_collection.update_many(
+        {"id": {"$in": entry_ids}, "status": {"$ne": "posted"}},
+        {"$set": {"status": "posted", "posting_batch": token, "posted_at": now_utc(), "updated_at": now_utc()}},
+        session=session,
+    )
+    if claimed.modified_count != len(entry_ids):
+        if session is not None:
+            raise PostingConflict(f"{len(entry_ids) - claimed.modified_count} entries were posted concurrently")
+        # No transaction to roll back: only balance the entries this call claimed
+        mine = set(await journal_entries_collection.distinct("id", {"posting_batch": token}))
+        entries = [e for e in entries if e["id"] in mine]
+    await record_entries(entries, session=session)
+    deltas = _balance_deltas(entries, accounts)
+    ops = [UpdateOne({"id": account_id}, {"$inc": {"account_balance": delta}}) for account_id, delta in deltas.items() if delta]
+    if ops:
+        await accounts_collection.bulk_write(ops, ordered=False, session=session)
+    return [e["id"] for e in entries], len(ops)
+
+
+async def _apply_atomically(entries: List[Dict[str, Any]], accounts: Dict[str, Dict[str, Any]]) -> Tuple[List[str], int]:
+    global _transactions_supported
+    if _transactions_supported:
+        try:
+            async with await client.start_session() as session:
+                result: List[Tuple[List[str], int]] = []
+
+                async def txn(s):
+                    # with_transaction may re-run this on transient errors
+                    result[:] = [await _apply(entries, accounts, session=s)]
+                await session.with_transaction(txn)
+            return result[0]
+        except OperationFailure as e:
+            if e.code != _NO_TRANSACTIONS_CODE:
+                raise
+            _transactions_supported = False
+            logger.warning("MongoDB deployment does not support transactions; ledger posting is not atomic")
+    return await _apply(entries, accounts)
+
+
+async def _post_chunk(entry_ids: List[str], summary: Dict[str, Any], retry: bool = True) -> None:
+    entries = await journal_entries_collection.find(
+        {"id": {"$in": entry_ids}}, {"_id": 0}
+    ).to_list(length=None)
+    found = {e["id"]: e for e in entries}
+    pending = []
+    for entry_id in entry_ids:
+        entry = found.get(entry_id)
+        if entry is None:
+            summary["not_found"].append(entry_id)
+        elif entry.get("status") == "posted":
+            summary["already_posted"].append(entry_id)
+        else:
+            pending.append(entry)
+    if not pending:
+        return
+
+    account_ids = {line.get("account_id") for e in pending for line in e.get("accounts", [])}
+    accounts = await accounts_collection.find(
+        {"id": {"$in": list(account_ids)}}, {"_id": 0, "id": 1, "root_type": 1, "account_type": 1}
+    ).to_list(length=None)
+    by_id = {a["id"]: a for a in accounts}
+
+    try:
+        posted, accounts_updated = await _apply_atomically(pending, by_id)
+    except PostingConflict:
+        if not retry:
+            raise
+        # The transaction rolled back; re-read so the concurrently posted entries are skipped
+        await _post_chunk([e["id"] for e in pending], summary, retry=False)
+        return
+    summary["posted"].extend(posted)
+    posted_ids = set(posted)
+    summary["already_posted"].extend(e["id"] for e in pending if e["id"] not in posted_ids)
+    summary["accounts_updated"] += accounts_updated
+
+
+async def post_journal_entries(entry_ids: List[str], chunk_size: int = LEDGER_POSTING_CHUNK_SIZE) -> Dict[str, Any]:
+    """Post entries in chunks; each chunk is all-or-nothing when transactions are available"""
+    unique_ids = list(dict.fromkeys(entry_ids))
+    summary: Dict[str, Any] = {"posted": [], "already_posted": [], "not_found": [], "accounts_updated": 0}
+    for start in range(0, len(unique_ids), chunk_size):
+        await _post_chunk(unique_ids[start:start + chunk_size], summary)
+    return summary
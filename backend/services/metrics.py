@@ -0,0 +1,196 @@
+"""
+HTTP Metrics (Prometheus text format)
+Pure ASGI middleware recording per-route latency histograms, request/response sizes,
+status codes, errors and in-flight requests. Series are keyed by (method, route
+template) tuples and label strings are only built when /api/metrics is scraped, so
+the per-request cost is a few integer/float increments.
+
+Each uvicorn worker keeps its own registry; Prometheus sums across worker targets.
+"""
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple
+
+# Latency histogram bucket upper bounds (seconds)
+LATENCY_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Body size histogram bucket upper bounds (bytes)
+SIZE_BUCKETS: Tuple[float, ...] = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RouteSeries:
+    __slots__ = (
+        "requests", "errors", "status_counts",
+        "latency_sum", "latency_buckets",
+        "request_bytes_sum", "request_size_buckets",
+        "response_bytes_sum", "response_size_buckets",
+    )
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.errors = 0
+        self.status_counts: Dict[int, int] = {}
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.request_bytes_sum = 0
+        self.request_size_buckets = [0] * (len(SIZE_BUCKETS) + 1)
+        self.response_bytes_sum = 0
+        self.response_size_buckets = [0] * (len(SIZE_BUCKETS) + 1)
+
+    def observe(self, status: int, elapsed: float, request_bytes: int, response_bytes: int, failed: bool) -> None:
+        self.requests += 1
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        if failed or status >= 500:
+            self.errors += 1
+        self.latency_sum += elapsed
+        self.latency_buckets[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        self.request_bytes_sum += request_bytes
+        self.request_size_buckets[bisect_left(SIZE_BUCKETS, request_bytes)] += 1
+        self.response_bytes_sum += response_bytes
+        self.response_size_buckets[bisect_left(SIZE_BUCKETS, response_bytes)] += 1
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self.series: Dict[Tuple[str, str], RouteSeries] = {}
+        self.in_flight = 0
+        self.started_at = time.time()
+
+    def series_for(self, method: str, route: str) -> RouteSeries:
+        key = (method, route)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = RouteSeries()
+        return series
+
+    def reset(self) -> None:
+        self.series.clear()
+        self.in_flight = 0
+
+
+REGISTRY = MetricsRegistry()
+
+# Extra series from other services (e.g. the PDF render pool), appended to each scrape
+_collectors: List[Callable[[List[str]], None]] = []
+
+
+def register_collector(collect: Callable[[List[str]], None]) -> None:
+    """collect(lines) appends Prometheus text lines when /api/metrics is scraped"""
+    _collectors.append(collect)
+
+
+def _route_template(scope) -> str:
+    # FastAPI's APIRoute.matches() puts the matched route into the (shared) scope
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path_format", None) or getattr(route, "path", UNMATCHED_ROUTE)
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """ASGI middleware; add it last so it wraps CORS and every router"""
+
+    def __init__(self, app, registry: MetricsRegistry = REGISTRY) -> None:
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.registry
+        start = time.perf_counter()
+        request_bytes = 0
+        for name, value in scope.get("headers", ()):
+            if name == b"content-length":
+                try:
+                    request_bytes = int(value)
+                except ValueError:
+                    pass
+                break
+        state = [500, 0]  # status, response bytes
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                state[1] += len(message.get("body", b""))
+            await send(message)
+
+        registry.in_flight += 1
+        failed = False
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            registry.in_flight -= 1
+            elapsed = time.perf_counter() - start
+            registry.series_for(scope["method"], _route_template(scope)).observe(
+                state[0], elapsed, request_bytes, state[1], failed
+            )
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def append_histogram(lines: List[str], name: str, labels: str, bounds: Tuple[float, ...], counts: List[int], total: float) -> None:
+    cumulative = 0
+    for bound, count in zip(bounds, counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    cumulative += counts[-1]
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+    lines.append(f'{name}_sum{{{labels}}} {total}')
+    lines.append(f'{name}_count{{{labels}}} {cumulative}')
+
+
+def render_prometheus(registry: MetricsRegistry = REGISTRY) -> str:
+    """Prometheus text exposition format 0.0.4"""
+    lines: List[str] = []
+    items = sorted(registry.series.items())
+
+    lines.append("# HELP http_requests_in_flight Requests currently being served")
+    lines.append("# TYPE http_requests_in_flight gauge")
+    lines.append(f"http_requests_in_flight {registry.in_flight}")
+
+    lines.append("# HELP http_requests_total Requests by route template and status")
+    lines.append("# TYPE http_requests_total counter")
+    for (method, route), s in items:
+        base = f'method="{method}",route="{_escape(route)}"'
+        for status, count in sorted(s.status_counts.items()):
+            lines.append(f'http_requests_total{{{base},status="{status}"}} {count}')
+
+    lines.append("# HELP http_request_errors_total Requests that raised or returned 5xx")
+    lines.append("# TYPE http_request_errors_total counter")
+    for (method, route), s in items:
+        lines.append(f'http_request_errors_total{{method="{method}",route="{_escape(route)}"}} {s.errors}')
+
+    lines.append("# HELP http_request_duration_seconds Request latency")
+    lines.append("# TYPE http_request_duration_seconds histogram")
+    for (method, route), s in items:
+        append_histogram(lines, "http_request_duration_seconds", f'method="{method}",route="{_escape(route)}"',
+                   LATENCY_BUCKETS, s.latency_buckets, s.latency_sum)
+
+    lines.append("# HELP http_request_size_bytes Request body size (Content-Length)")
+    lines.append("# TYPE http_request_size_bytes histogram")
+    for (method, route), s in items:
+        append_histogram(lines, "http_request_size_bytes", f'method="{method}",route="{_escape(route)}"',
+                   SIZE_BUCKETS, s.request_size_buckets, s.request_bytes_sum)
+
+    lines.append("# HELP http_response_size_bytes Response body size")
+    lines.append("# TYPE http_response_size_bytes histogram")
+    for (method, route), s in items:
+        append_histogram(lines, "http_response_size_bytes", f'method="{method}",route="{_escape(route)}"',
+                   SIZE_BUCKETS, s.response_size_buckets, s.response_bytes_sum)
+
+    lines.append("# HELP process_start_time_seconds Start time of the metrics registry")
+    lines.append("# TYPE process_start_time_seconds gauge")
+    lines.append(f"process_start_time_seconds {registry.started_at}")
+    for collect in _collectors:
+        collect(lines)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,191 @@
+"""
+Outbound HTTP Transport
+Shared aiohttp client for the email (SendGrid) and SMS (Twilio) providers. The
+SDK clients were synchronous and built a new connection per send; this keeps
+one session per process so sends reuse keep-alive connections and never block
+the event loop.
+
+- one ClientSession (and TCPConnector pool of OUTBOUND_POOL_SIZE connections,
+  idle ones kept for OUTBOUND_KEEPALIVE_SECONDS) per process, created on the
+  first request and closed at shutdown
+- every request has a total timeout of OUTBOUND_TIMEOUT_SECONDS
+- each provider runs at most OUTBOUND_MAX_CONCURRENCY requests at once; more
+  wait for a slot
+- connection errors, timeouts, 429 and 5xx are retried (up to
+  OUTBOUND_MAX_ATTEMPTS, exponential backoff with jitter, Retry-After honoured
+  up to the backoff cap) while the provider's retry budget allows: every request
+  earns OUTBOUND_RETRY_BUDGET_RATIO of a retry, so an outage cannot multiply
+  traffic by the attempt count
+- OUTBOUND_TRANSPORT=stub points both providers at the in-process fake server
+  of services/outbound_stub.py (see benchmarks/outbound_messages.py)
+"""
+import asyncio
+import logging
+import os
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+OUTBOUND_POOL_SIZE = int(os.environ.get("OUTBOUND_POOL_SIZE", "50"))
+OUTBOUND_KEEPALIVE_SECONDS = float(os.environ.get("OUTBOUND_KEEPALIVE_SECONDS", "30"))
+OUTBOUND_TIMEOUT_SECONDS = float(os.environ.get("OUTBOUND_TIMEOUT_SECONDS", "15"))
+OUTBOUND_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("OUTBOUND_CONNECT_TIMEOUT_SECONDS", "5"))
+OUTBOUND_MAX_CONCURRENCY = int(os.environ.get("OUTBOUND_MAX_CONCURRENCY", "20"))
+OUTBOUND_MAX_ATTEMPTS = int(os.environ.get("OUTBOUND_MAX_ATTEMPTS", "3"))
+OUTBOUND_BACKOFF_SECONDS = float(os.environ.get("OUTBOUND_BACKOFF_SECONDS", "0.25"))
+OUTBOUND_BACKOFF_MAX_SECONDS = float(os.environ.get("OUTBOUND_BACKOFF_MAX_SECONDS", "5"))
+OUTBOUND_RETRY_BUDGET_RATIO = float(os.environ.get("OUTBOUND_RETRY_BUDGET_RATIO", "0.2"))
+OUTBOUND_RETRY_BUDGET_MIN = float(os.environ.get("OUTBOUND_RETRY_BUDGET_MIN", "10"))
+OUTBOUND_TRANSPORT = os.environ.get("OUTBOUND_TRANSPORT", "live")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RetryBudget:
+    """Token bucket: each request deposits `ratio` tokens, each retry spends one"""
+
+    def __init__(self, ratio: float = OUTBOUND_RETRY_BUDGET_RATIO, minimum: float = OUTBOUND_RETRY_BUDGET_MIN) -> None:
+        self.ratio = ratio
+        self.capacity = minimum
+        self.tokens = minimum
+
+    def deposit(self) -> None:
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+@dataclass
+class Provider:
+    name: str
+    base_url: str
+    semaphore: asyncio.Semaphore
+    budget: RetryBudget
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0
+
+
+@dataclass
+class Response:
+    status: int
+    headers: Mapping[str, str]
+    body: Any
+
+
+def _provider(name: str, base_url: str) -> Provider:
+    return Provider(name, base_url, asyncio.Semaphore(OUTBOUND_MAX_CONCURRENCY), RetryBudget())
+
+
+PROVIDERS: Dict[str, Provider] = {
+    "sendgrid": _provider("sendgrid", os.environ.get("SENDGRID_API_BASE", "https://api.sendgrid.com")),
+    "twilio": _provider("twilio", os.environ.get("TWILIO_API_BASE", "https://api.twilio.com")),
+}
+
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def set_base_url(provider: str, base_url: str) -> None:
+    PROVIDERS[provider].base_url = base_url.rstrip("/")
+
+
+def session() -> aiohttp.ClientSession:
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=OUTBOUND_POOL_SIZE, keepalive_timeout=OUTBOUND_KEEPALIVE_SECONDS),
+            timeout=aiohttp.ClientTimeout(total=OUTBOUND_TIMEOUT_SECONDS, connect=OUTBOUND_CONNECT_TIMEOUT_SECONDS),
+        )
+    return _session
+
+
+async def start() -> None:
+    if OUTBOUND_TRANSPORT == "stub":
+        from services.outbound_stub import start_stub_transport
+        await start_stub_transport()
+        logger.info("Outbound email/SMS routed to the in-process stub")
+
+
+async def close() -> None:
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    if OUTBOUND_TRANSPORT == "stub":
+        from services.outbound_stub import stop_stub_transport
+        await stop_stub_transport()
+
+
+def _backoff(attempt: int, retry_after: Optional[str]) -> float:
+    delay = min(OUTBOUND_BACKOFF_SECONDS * (2 ** (attempt - 1)), OUTBOUND_BACKOFF_MAX_SECONDS)
+    if retry_after:
+        try:
+            delay = max(delay, min(float(retry_after), OUTBOUND_BACKOFF_MAX_SECONDS))
+        except ValueError:
+            pass
+    return delay * random.uniform(0.8, 1.2)
+
+
+async def _read(resp: aiohttp.ClientResponse) -> Any:
+    if "json" in (resp.content_type or ""):
+        try:
+            return await resp.json()
+        except (aiohttp.ContentTypeError, ValueError):
+            pass
+    return await resp.text()
+
+
+async def request(provider: str, method: str, path: str, **kwargs) -> Response:
+    """Send a request to a provider with its concurrency cap, timeouts and retries.
+    Raises the last aiohttp.ClientError/asyncio.TimeoutError when every attempt failed to connect."""
+    p = PROVIDERS[provider]
+    p.requests += 1
+    p.budget.deposit()
+    url = f"{p.base_url}{path}"
+    attempt = 0
+    while True:
+        attempt += 1
+        retry_after = None
+        try:
+            async with p.semaphore:
+                async with session().request(method, url, **kwargs) as resp:
+                    body = await _read(resp)
+                    result = Response(resp.status, resp.headers.copy(), body)
+            if result.status not in RETRY_STATUSES:
+                return result
+            retry_after = result.headers.get("Retry-After")
+            error: Optional[BaseException] = None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            result, error = None, e
+        if attempt >= OUTBOUND_MAX_ATTEMPTS or not p.budget.withdraw():
+            p.failures += 1
+            if error is not None:
+                raise error
+            return result
+        p.retries += 1
+        logger.warning(f"{provider} {method} {path} attempt {attempt} failed ({error or result.status}); retrying")
+        await asyncio.sleep(_backoff(attempt, retry_after))
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "transport": OUTBOUND_TRANSPORT,
+        "providers": {
+            name: {
+                "base_url": p.base_url,
+                "requests": p.requests,
+                "retries": p.retries,
+                "failures": p.failures,
+                "retry_tokens": round(p.budget.tokens, 2),
+            }
+            for name, p in PROVIDERS.items()
+        },
+    }
@@ -0,0 +1,101 @@
+"""
+Outbound Stub Transport
+In-process fake of the SendGrid and Twilio endpoints the outbound clients call,
+for running sends (and benchmarks/outbound_messages.py) without credentials or
+network. Started by the API and job worker when OUTBOUND_TRANSPORT=stub, which
+also points services/outbound_http.py at it; nothing is delivered anywhere.
+
+- POST /v3/mail/send answers 202 with an X-Message-Id, as SendGrid does
+- POST /2010-04-01/Accounts/{sid}/Messages.json answers 201 with a queued message
+- OUTBOUND_STUB_LATENCY_MS delays every answer; OUTBOUND_STUB_FAILURE_RATE
+  answers that fraction of requests with 503, to exercise retries
+- counts requests and distinct client connections, so keep-alive reuse shows up
+"""
+import asyncio
+import os
+import random
+import uuid
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+from services import outbound_http
+
+OUTBOUND_STUB_LATENCY_MS = float(os.environ.get("OUTBOUND_STUB_LATENCY_MS", "0"))
+OUTBOUND_STUB_FAILURE_RATE = float(os.environ.get("OUTBOUND_STUB_FAILURE_RATE", "0"))
+
+
+class StubServer:
+    def __init__(self, latency_ms: float = OUTBOUND_STUB_LATENCY_MS, failure_rate: float = OUTBOUND_STUB_FAILURE_RATE) -> None:
+        self.latency = latency_ms / 1000
+        self.failure_rate = failure_rate
+        self.requests = {"email": 0, "sms": 0, "failed": 0}
+        self.connections: set = set()
+        self.base_url: Optional[str] = None
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _answer(self, request: web.Request, kind: str) -> Optional[web.Response]:
+        self.connections.add(request.transport.get_extra_info("peername") if request.transport else None)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            self.requests["failed"] += 1
+            return web.json_response({"errors": [{"message": "stub failure"}]}, status=503)
+        self.requests[kind] += 1
+        return None
+
+    async def _mail_send(self, request: web.Request) -> web.Response:
+        await request.json()
+        failed = await self._answer(request, "email")
+        return failed or web.Response(status=202, headers={"X-Message-Id": uuid.uuid4().hex})
+
+    async def _messages(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        failed = await self._answer(request, "sms")
+        return failed or web.json_response({
+            "sid": f"SM{uuid.uuid4().hex}",
+            "status": "queued",
+            "to": form.get("To"),
+            "from": form.get("From"),
+        }, status=201)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_post("/v3/mail/send", self._mail_send)
+        app.router.add_post("/2010-04-01/Accounts/{sid}/Messages.json", self._messages)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{bound_port}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"requests": dict(self.requests), "connections": len(self.connections)}
+
+
+_stub: Optional[StubServer] = None
+
+
+async def start_stub_transport(**options) -> StubServer:
+    """Start the fake server and route both providers to it"""
+    global _stub
+    if _stub is None:
+        _stub = StubServer(**options)
+        base_url = await _stub.start()
+        outbound_http.set_base_url("sendgrid", base_url)
+        outbound_http.set_base_url("twilio", base_url)
+    return _stub
+
+
+async def stop_stub_transport() -> None:
+    global _stub
+    if _stub is not None:
+        await _stub.stop()
+        _stub = None
@@ -0,0 +1,141 @@
+"""
+Keyset (Cursor) Pagination
+Opt-in alternative to skip/limit for list endpoints. Pages are walked on the
+(sort_key, _id) pair, so fetching page N costs the same as page 1 when the sort
+key is indexed. The continuation token is opaque to clients: URL-safe base64 of
+the last row's sort value and _id, bound to the sort key and direction it was
+issued for.
+
+Clients pass `cursor=` (empty) or `cursor=start` for the first page, then the
+returned `next_cursor` until it comes back null.
+
+MongoDB's $lt/$gt only match values of the same BSON type, so the sort key must
+hold one type: page date-ordered lists on the datetime keys services/sort_keys
+stores (invoice_date_sort, posting_date_sort, ...), never on raw date fields
+that mix strings and datetimes.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+START_TOKENS = ("", "start")
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$d": value.isoformat()}
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "$d" in value:
+            return datetime.fromisoformat(value["$d"])
+        if "$oid" in value:
+            return ObjectId(value["$oid"])
+    return value
+
+
+def is_cursor_request(cursor: Optional[str]) -> bool:
+    return cursor is not None
+
+
+def encode_cursor(sort_key: str, direction: int, value: Any, doc_id: Any) -> str:
+    payload = {"k": sort_key, "d": direction, "v": _encode_value(value), "i": _encode_value(doc_id)}
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], sort_key: str, direction: int) -> Optional[Tuple[Any, Any]]:
+    """(last sort value, last _id) or None for the first page; 400 on a bad token"""
+    if cursor is None or cursor in START_TOKENS:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload.get("k") != sort_key or payload.get("d") != direction:
+            raise ValueError("cursor was issued for a different sort")
+        return _decode_value(payload.get("v")), _decode_value(payload["i"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid or expired cursor; restart from cursor=start")
+
+
+def keyset_match(sort_key: str, direction: int, after: Optional[Tuple[Any, Any]]) -> Optional[Dict[str, Any]]:
+    """Filter selecting rows strictly after `after` in (sort_key, _id) order.
+    Missing/null sort values sort lowest in MongoDB, so they come last when
+    descending and first when ascending."""
+    if after is None:
+        return None
+    value, doc_id = after
+    id_op = "$lt" if direction < 0 else "$gt"
+    if value is None:
+        branches = [{sort_key: None, "_id": {id_op: doc_id}}]
+        if direction > 0:
+            branches.append({sort_key: {"$ne": None}})
+        return {"$or": branches}
+    branches = [
+        {sort_key: {id_op: value}},
+        {sort_key: value, "_id": {id_op: doc_id}},
+    ]
+    if direction < 0:
+        branches.append({sort_key: None})
+    return {"$or": branches}
+
+
+def keyset_sort(sort_key: str, direction: int) -> Dict[str, int]:
+    return {sort_key: direction, "_id": direction}
+
+
+def split_page(rows: List[Dict[str, Any]], limit: int, sort_key: str, direction: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Rows are fetched with limit + 1; the extra row only signals another page.
+    Call before the rows are transformed (their _id is needed for the token)."""
+    page = rows[:limit]
+    if len(rows) <= limit or not page:
+        return page, None
+    last = page[-1]
+    return page, encode_cursor(sort_key, direction, last.get(sort_key), last.get("_id"))
+
+
+def page_envelope(items: List[Any], total_count: int, limit: int, skip: int, total_is_estimate: bool = False) -> Dict[str, Any]:
+    """skip/limit page with its pagination metadata stated once"""
+    return {
+        "items": items,
+        "total_count": total_count,
+        "total_is_estimate": total_is_estimate,
+        "page_size": limit,
+        "current_page": (skip // limit) + 1 if limit else 1,
+    }
+
+
+def cursor_envelope(items: List[Any], next_cursor: Optional[str], limit: int) -> Dict[str, Any]:
+    return {
+        "items": items,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
+        "page_size": limit,
+    }
+
+
+async def find_page(
+    collection,
+    query: Dict[str, Any],
+    sort_key: str,
+    direction: int,
+    limit: int,
+    cursor: Optional[str],
+    transform: Callable[[Dict[str, Any]], Any],
+) -> Dict[str, Any]:
+    """Keyset page for plain find()-based lists"""
+    after = decode_cursor(cursor, sort_key, direction)
+    keyset = keyset_match(sort_key, direction, after)
+    if keyset:
+        query = {"$and": [query, keyset]} if query else keyset
+    rows = await collection.find(query).sort(list(keyset_sort(sort_key, direction).items())).limit(limit + 1).to_list(length=limit + 1)
+    page, next_cursor = split_page(rows, limit, sort_key, direction)
+    return cursor_envelope([transform(row) for row in page], next_cursor, limit)
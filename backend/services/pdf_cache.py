@@ -0,0 +1,208 @@
+"""
+Document PDF Cache
+Content-addressed cache of rendered document PDFs, so sending a document again
+costs a lookup instead of a render.
+
+- the key is a SHA-256 of exactly what the PDF shows: the fields
+  generate_invoice_pdf reads, the brand, the title and PDF_TEMPLATE_VERSION
+  (bump it when the layout in services/pdf_service.py changes). Status, send
+  tracking and other fields the PDF does not print do not change the key
+- PDFs are stored in the `pdf_cache` GridFS bucket (filename = key, metadata
+  owner = "<kind>:<document id>") and fronted by an in-process LRU of at most
+  PDF_CACHE_MEMORY_BYTES
+- storing a new key for an owner deletes that owner's older PDFs, so an edit
+  that changes the document invalidates its cached PDF
+- the bucket is kept under PDF_CACHE_MAX_BYTES by deleting the least recently
+  used files
+- concurrent requests for the same key in one process share a single render
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+from database import db
+from services.metrics import register_collector
+from services.pdf_renderer import render_invoice_pdf
+
+logger = logging.getLogger(__name__)
+
+PDF_CACHE_BUCKET = "pdf_cache"
+PDF_CACHE_MAX_BYTES = int(os.environ.get("PDF_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+PDF_CACHE_MEMORY_BYTES = int(os.environ.get("PDF_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+
+# Bump when generate_invoice_pdf's layout changes so every cached PDF is re-rendered
+PDF_TEMPLATE_VERSION = "1"
+
+# Document and item fields generate_invoice_pdf prints
+RENDERED_FIELDS = (
+    "invoice_number", "customer_name", "customer_email", "customer_phone",
+    "subtotal", "discount_amount", "tax_rate", "tax_amount", "total_amount",
+)
+RENDERED_ITEM_FIELDS = ("item_name", "description", "quantity", "rate", "amount")
+
+
+def now_utc():
+    return datetime.now(timezone.utc)
+
+
+def pdf_key(template: Dict[str, Any], brand: Dict[str, Any], title: str) -> str:
+    rendered = {
+        "version": PDF_TEMPLATE_VERSION,
+        "title": title,
+        "brand": brand,
+        "fields": {field: template.get(field) for field in RENDERED_FIELDS},
+        "items": [{field: item.get(field) for field in RENDERED_ITEM_FIELDS} for item in template.get("items") or []],
+    }
+    payload = json.dumps(rendered, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class MemoryLRU:
+    """Byte-bounded LRU of key -> PDF bytes"""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        data = self._items.get(key)
+        if data is not None:
+            self._items.move_to_end(key)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        self.discard(key)
+        self._items[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted)
+
+    def discard(self, key: str) -> None:
+        data = self._items.pop(key, None)
+        if data is not None:
+            self.size -= len(data)
+
+
+_memory = MemoryLRU(PDF_CACHE_MEMORY_BYTES)
+_inflight: Dict[str, "asyncio.Future[Optional[bytes]]"] = {}
+stats = {"memory_hits": 0, "store_hits": 0, "renders": 0, "evictions": 0}
+
+
+def _bucket() -> AsyncIOMotorGridFSBucket:
+    return AsyncIOMotorGridFSBucket(db, bucket_name=PDF_CACHE_BUCKET)
+
+
+def _files():
+    return db[f"{PDF_CACHE_BUCKET}.files"]
+
+
+async def _load(key: str) -> Optional[bytes]:
+    stored = await _files().find_one_and_update(
+        {"filename": key}, {"$set": {"metadata.last_used": now_utc()}}, projection={"_id": 1}
+    )
+    if stored is None:
+        return None
+    download = await _bucket().open_download_stream(stored["_id"])
+    return await download.read()
+
+
+async def _store(key: str, owner: str, title: str, data: bytes) -> None:
+    bucket = _bucket()
+    await bucket.upload_from_stream(key, data, metadata={"owner": owner, "title": title, "last_used": now_utc()})
+    # The owner's PDFs under other keys show a previous version of the document
+    async for stale in _files().find({"metadata.owner": owner, "filename": {"$ne": key}}, {"_id": 1, "filename": 1}):
+        await bucket.delete(stale["_id"])
+        _memory.discard(stale["filename"])
+    await _evict()
+
+
+async def _evict() -> None:
+    totals = await _files().aggregate([{"$group": {"_id": None, "bytes": {"$sum": "$length"}}}]).to_list(length=1)
+    excess = (totals[0]["bytes"] if totals else 0) - PDF_CACHE_MAX_BYTES
+    if excess <= 0:
+        return
+    bucket = _bucket()
+    async for old in _files().find({}, {"_id": 1, "filename": 1, "length": 1}).sort("metadata.last_used", 1):
+        await bucket.delete(old["_id"])
+        _memory.discard(old["filename"])
+        stats["evictions"] += 1
+        excess -= old["length"]
+        if excess <= 0:
+            break
+
+
+async def _fetch(key: str, owner: str, template: Dict[str, Any], brand: Dict[str, Any], title: str) -> Optional[bytes]:
+    try:
+        data = await _load(key)
+    except Exception as e:
+        logger.warning(f"PDF cache read failed for {owner}: {e}")
+        data = None
+    if data is not None:
+        stats["store_hits"] += 1
+        return data
+    data = await render_invoice_pdf(template, brand, title=title)
+    stats["renders"] += 1
+    if data:
+        try:
+            await _store(key, owner, title, data)
+        except Exception as e:
+            logger.warning(f"PDF cache write failed for {owner}: {e}")
+    return data
+
+
+async def document_pdf(owner: str, template: Dict[str, Any], brand: Dict[str, Any], title: str = "Invoice") -> Optional[bytes]:
+    """The PDF of `template` as rendered by generate_invoice_pdf, from the cache when its
+    printed content is unchanged. `owner` ("<kind>:<id>") scopes invalidation."""
+    key = pdf_key(template, brand, title)
+    data = _memory.get(key)
+    if data is not None:
+        stats["memory_hits"] += 1
+        return data
+    pending = _inflight.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending)
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        data = await _fetch(key, owner, template, brand, title)
+        future.set_result(data)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Retrieve it here so a failure nobody else awaited is not logged as unhandled
+        future.exception()
+        raise
+    finally:
+        _inflight.pop(key, None)
+    if data:
+        _memory.put(key, data)
+    return data
+
+
+def _collect(lines: List[str]) -> None:
+    lines.append("# HELP pdf_cache_requests_total Document PDF requests by where they were served from")
+    lines.append("# TYPE pdf_cache_requests_total counter")
+    for source, stat in (("memory", "memory_hits"), ("store", "store_hits"), ("render", "renders")):
+        lines.append(f'pdf_cache_requests_total{{source="{source}"}} {stats[stat]}')
+    lines.append("# HELP pdf_cache_evictions_total Cached PDFs deleted to stay under PDF_CACHE_MAX_BYTES")
+    lines.append("# TYPE pdf_cache_evictions_total counter")
+    lines.append(f"pdf_cache_evictions_total {stats['evictions']}")
+    lines.append("# HELP pdf_cache_memory_bytes Bytes held by the in-process PDF LRU")
+    lines.append("# TYPE pdf_cache_memory_bytes gauge")
+    lines.append(f"pdf_cache_memory_bytes {_memory.size}")
+
+
+register_collector(_collect)
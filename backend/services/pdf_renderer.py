@@ -0,0 +1,191 @@
+"""
+PDF Rendering Pool
+generate_invoice_pdf (services/pdf_service.py) draws on a reportlab canvas in
+pure Python; called on the event loop, or even in a thread holding the GIL, a
+multi-page render stalls every other request in the process. render_invoice_pdf
+runs it in a ProcessPoolExecutor instead and awaits the result.
+
+- PDF_RENDER_WORKERS processes, started with "spawn" (forking a process that
+  runs Motor's threads is unsafe) and warmed at startup: each imports reportlab
+  and renders a throwaway page, so the first real render pays no import cost
+- at most PDF_RENDER_MAX_QUEUE renders are queued or running; beyond that
+  PdfRenderBusy is raised at once instead of letting the backlog grow
+- a render taking longer than PDF_RENDER_TIMEOUT_SECONDS raises PdfRenderTimeout;
+  a process cannot be interrupted mid-render, so the pool is recycled (its
+  processes terminated) and the next render starts a fresh one
+- counts by outcome, render time in the worker, time spent queued and output
+  size are exported with the HTTP metrics on /api/metrics
+"""
+import asyncio
+import importlib.util
+import logging
+import multiprocessing
+import os
+import time
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.metrics import LATENCY_BUCKETS, SIZE_BUCKETS, append_histogram, register_collector
+
+logger = logging.getLogger(__name__)
+
+PDF_RENDER_WORKERS = int(os.environ.get("PDF_RENDER_WORKERS", str(min(2, os.cpu_count() or 1))))
+PDF_RENDER_MAX_QUEUE = int(os.environ.get("PDF_RENDER_MAX_QUEUE", "32"))
+PDF_RENDER_TIMEOUT_SECONDS = float(os.environ.get("PDF_RENDER_TIMEOUT_SECONDS", "30"))
+
+PDF_AVAILABLE = importlib.util.find_spec("reportlab") is not None
+
+OUTCOMES = ("ok", "error", "timeout", "rejected")
+
+
+class PdfRenderBusy(RuntimeError):
+    """The render queue is full"""
+
+
+class PdfRenderTimeout(RuntimeError):
+    """A render exceeded PDF_RENDER_TIMEOUT_SECONDS"""
+
+
+def _render(invoice: Dict[str, Any], brand: Dict[str, Any], title: str) -> Tuple[bytes, float]:
+    """Runs in a pool process: the PDF and the seconds spent rendering it"""
+    from services.pdf_service import generate_invoice_pdf
+    started = time.perf_counter()
+    pdf_bytes = generate_invoice_pdf(invoice, brand, title=title)
+    return pdf_bytes, time.perf_counter() - started
+
+
+def _warm() -> None:
+    _render({"invoice_number": "WARMUP", "items": [{"item_name": "Warmup", "quantity": 1, "rate": 1}]}, {}, "Invoice")
+
+
+class RenderStats:
+    def __init__(self) -> None:
+        self.outcomes: Dict[str, int] = {outcome: 0 for outcome in OUTCOMES}
+        self.render_sum = 0.0
+        self.render_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.wait_sum = 0.0
+        self.wait_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.bytes_sum = 0
+        self.size_buckets = [0] * (len(SIZE_BUCKETS) + 1)
+        self.recycles = 0
+
+    def observe(self, render_seconds: float, wait_seconds: float, size: int) -> None:
+        self.outcomes["ok"] += 1
+        self.render_sum += render_seconds
+        self.render_buckets[bisect_left(LATENCY_BUCKETS, render_seconds)] += 1
+        self.wait_sum += wait_seconds
+        self.wait_buckets[bisect_left(LATENCY_BUCKETS, wait_seconds)] += 1
+        self.bytes_sum += size
+        self.size_buckets[bisect_left(SIZE_BUCKETS, size)] += 1
+
+
+class PdfRenderPool:
+    def __init__(self, workers: int = PDF_RENDER_WORKERS, max_queue: int = PDF_RENDER_MAX_QUEUE,
+                 timeout: float = PDF_RENDER_TIMEOUT_SECONDS) -> None:
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.pending = 0
+        self.stats = RenderStats()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def start(self) -> None:
+        """Start and warm every worker process"""
+        if not PDF_AVAILABLE:
+            return
+        loop = asyncio.get_running_loop()
+        pool = self._pool()
+        try:
+            await asyncio.gather(*(loop.run_in_executor(pool, _warm) for _ in range(self.workers)))
+            logger.info(f"PDF render pool warmed ({self.workers} processes)")
+        except Exception as e:
+            logger.error(f"PDF render pool warmup failed: {e}")
+
+    def _recycle(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        self.stats.recycles += 1
+        # Stuck renders cannot be cancelled; end their processes so they stop holding CPU
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def render(self, invoice: Dict[str, Any], brand: Dict[str, Any], title: str = "Invoice") -> Optional[bytes]:
+        """Render in a pool process; None when reportlab is not installed"""
+        if not PDF_AVAILABLE:
+            return None
+        if self.pending >= self.max_queue:
+            self.stats.outcomes["rejected"] += 1
+            raise PdfRenderBusy(f"PDF render queue is full ({self.max_queue} pending)")
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self._pool(), _render, invoice, brand, title)
+            pdf_bytes, render_seconds = await asyncio.wait_for(future, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.stats.outcomes["timeout"] += 1
+            self._recycle()
+            raise PdfRenderTimeout(f"PDF render took longer than {self.timeout:.0f}s")
+        except BrokenProcessPool:
+            self.stats.outcomes["error"] += 1
+            self._recycle()
+            raise
+        except Exception:
+            self.stats.outcomes["error"] += 1
+            raise
+        finally:
+            self.pending -= 1
+        wall = time.perf_counter() - started
+        self.stats.observe(render_seconds, max(wall - render_seconds, 0.0), len(pdf_bytes))
+        return pdf_bytes
+
+    def stop(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+POOL = PdfRenderPool()
+
+
+async def render_invoice_pdf(invoice: Dict[str, Any], brand: Dict[str, Any], title: str = "Invoice") -> Optional[bytes]:
+    return await POOL.render(invoice, brand, title)
+
+
+def _collect(lines: List[str]) -> None:
+    stats = POOL.stats
+    lines.append("# HELP pdf_render_total PDF renders by outcome")
+    lines.append("# TYPE pdf_render_total counter")
+    for outcome, count in stats.outcomes.items():
+        lines.append(f'pdf_render_total{{outcome="{outcome}"}} {count}')
+    lines.append("# HELP pdf_render_pending PDF renders queued or running")
+    lines.append("# TYPE pdf_render_pending gauge")
+    lines.append(f"pdf_render_pending {POOL.pending}")
+    lines.append("# HELP pdf_render_pool_recycles_total Render pools replaced after a timeout or crash")
+    lines.append("# TYPE pdf_render_pool_recycles_total counter")
+    lines.append(f"pdf_render_pool_recycles_total {stats.recycles}")
+    lines.append("# HELP pdf_render_duration_seconds Time spent rendering in the worker process")
+    lines.append("# TYPE pdf_render_duration_seconds histogram")
+    append_histogram(lines, "pdf_render_duration_seconds", 'pool="invoice"', LATENCY_BUCKETS,
+                     stats.render_buckets, stats.render_sum)
+    lines.append("# HELP pdf_render_queue_seconds Time a render waited for a worker process")
+    lines.append("# TYPE pdf_render_queue_seconds histogram")
+    append_histogram(lines, "pdf_render_queue_seconds", 'pool="invoice"', LATENCY_BUCKETS,
+                     stats.wait_buckets, stats.wait_sum)
+    lines.append("# HELP pdf_render_size_bytes Size of rendered PDFs")
+    lines.append("# TYPE pdf_render_size_bytes histogram")
+    append_histogram(lines, "pdf_render_size_bytes", 'pool="invoice"', SIZE_BUCKETS,
+                     stats.size_buckets, stats.bytes_sum)
+
+
+register_collector(_collect)
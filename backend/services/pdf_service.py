@@ -7,7 +7,7 @@ from typing import Dict, Any
 from .email_service import format_inr
 
 
-def generate_invoice_pdf(invoice: Dict[str, Any], brand: Dict[str, Any]) -> bytes:
+def generate_invoice_pdf(invoice: Dict[str, Any], brand: Dict[str, Any], title: str = 'Invoice') -> bytes:
     buffer = BytesIO()
     c = canvas.Canvas(buffer, pagesize=A4)
     width, height = A4
@@ -16,7 +16,7 @@ def generate_invoice_pdf(invoice: Dict[str, Any], brand: Dict[str, Any]) -> byte
     c.setFont('Helvetica-Bold', 16)
     c.drawString(20*mm, (height-20*mm), brand.get('company_name', 'Your Company'))
     c.setFont('Helvetica', 10)
-    c.drawString(20*mm, (height-26*mm), 'Invoice')
+    c.drawString(20*mm, (height-26*mm), title)
     c.drawString(20*mm, (height-31*mm), f"No: {invoice.get('invoice_number', '-')}")
 
     # Bill To
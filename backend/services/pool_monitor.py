@@ -0,0 +1,142 @@
+"""
+MongoDB Connection Pool Monitor
+pymongo ConnectionPoolListener that tracks wait-queue depth, checkout latency and
+connection churn for the shared Motor client, so the pool can be sized for peak
+PoS traffic.
+"""
+import threading
+import time
+from typing import Any, Dict, List
+
+from pymongo import monitoring
+
+# Upper bounds (ms) of the checkout latency histogram buckets
+CHECKOUT_BUCKETS_MS: List[float] = [0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000]
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Aggregates pool events. pymongo fires checkout events on the thread doing the
+    checkout (Motor's executor thread), so the start time is kept thread-local."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.pool_options: Dict[str, Any] = {}
+        self.waiting = 0
+        self.max_waiting = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures: Dict[str, int] = {}
+        self.connections_open = 0
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.pool_clears = 0
+        self.latency_sum_ms = 0.0
+        self.latency_max_ms = 0.0
+        self.latency_buckets = [0] * (len(CHECKOUT_BUCKETS_MS) + 1)
+
+    # ---- pool lifecycle ----
+    def pool_created(self, event):
+        self.pool_options = dict(event.options or {})
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    # ---- connections ----
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+            self.connections_open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+            self.connections_open = max(0, self.connections_open - 1)
+
+    # ---- checkouts ----
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+            if self.waiting > self.max_waiting:
+                self.max_waiting = self.waiting
+
+    def connection_check_out_failed(self, event):
+        self._local.started = None
+        with self._lock:
+            self.waiting = max(0, self.waiting - 1)
+            reason = str(event.reason)
+            self.checkout_failures[reason] = self.checkout_failures.get(reason, 0) + 1
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        elapsed_ms = (time.perf_counter() - started) * 1000 if started else 0.0
+        bucket = len(CHECKOUT_BUCKETS_MS)
+        for i, bound in enumerate(CHECKOUT_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                bucket = i
+                break
+        with self._lock:
+            self.waiting = max(0, self.waiting - 1)
+            self.checked_out += 1
+            if self.checked_out > self.max_checked_out:
+                self.max_checked_out = self.checked_out
+            self.checkouts += 1
+            self.latency_sum_ms += elapsed_ms
+            if elapsed_ms > self.latency_max_ms:
+                self.latency_max_ms = elapsed_ms
+            self.latency_buckets[bucket] += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    # ---- reporting ----
+    def _percentile(self, q: float) -> float:
+        total = sum(self.latency_buckets)
+        if not total:
+            return 0.0
+        target = q * total
+        running = 0
+        for i, count in enumerate(self.latency_buckets):
+            running += count
+            if running >= target:
+                return CHECKOUT_BUCKETS_MS[i] if i < len(CHECKOUT_BUCKETS_MS) else self.latency_max_ms
+        return self.latency_max_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            buckets = {f"le_{b}ms": c for b, c in zip(CHECKOUT_BUCKETS_MS, self.latency_buckets)}
+            buckets["gt_max"] = self.latency_buckets[-1]
+            return {
+                "pool_options": self.pool_options,
+                "wait_queue": {"current": self.waiting, "max": self.max_waiting},
+                "checked_out": {"current": self.checked_out, "max": self.max_checked_out},
+                "connections": {
+                    "open": self.connections_open,
+                    "created": self.connections_created,
+                    "closed": self.connections_closed,
+                },
+                "checkouts": self.checkouts,
+                "checkout_failures": dict(self.checkout_failures),
+                "pool_clears": self.pool_clears,
+                "checkout_latency_ms": {
+                    "avg": round(self.latency_sum_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                    "p50_le": self._percentile(0.50),
+                    "p99_le": self._percentile(0.99),
+                    "max": round(self.latency_max_ms, 3),
+                    "buckets": buckets,
+                },
+            }
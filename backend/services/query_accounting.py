@@ -0,0 +1,210 @@
+"""
+Per-Request MongoDB Query Accounting
+A pymongo CommandListener attributes every command (name, collection, duration,
+documents returned) to the HTTP request that issued it. The request's stats object
+lives in a ContextVar set by QueryAccountingMiddleware; Motor copies the context
+into its executor threads, so listener callbacks see the right request.
+
+Requests over the query budget are logged, and the same query shape repeated many
+times in one request is flagged as an N+1 suspect. With QUERY_DEBUG_HEADER=1 (or a
+request header `X-Debug-Queries: 1`) the response carries an `X-DB-Queries` summary.
+"""
+import logging
+import os
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUDGET = int(os.environ.get("QUERY_BUDGET", "25"))
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("QUERY_N_PLUS_ONE_THRESHOLD", "5"))
+DEBUG_HEADER_ENABLED = os.environ.get("QUERY_DEBUG_HEADER", "0") in ("1", "true", "yes")
+
+# Cursor plumbing and session housekeeping are not distinct queries
+_NOT_QUERIES = {"getMore", "killCursors", "endSessions", "hello", "isMaster", "ismaster", "ping", "buildInfo"}
+# Where the filter lives for each command
+_FILTER_KEYS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+}
+
+
+def query_shape(value: Any, depth: int = 0) -> Any:
+    """Filter structure with literal values replaced, e.g. {"id": "?"}"""
+    if depth > 6:
+        return "?"
+    if isinstance(value, dict):
+        return tuple((k, query_shape(v, depth + 1)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        # operator arrays ($or/$and) keep their shape, value lists ($in) collapse
+        if value and isinstance(value[0], dict):
+            return tuple(query_shape(v, depth + 1) for v in value)
+        return "[?]"
+    return "?"
+
+
+def command_shape(command_name: str, command: Dict[str, Any]) -> Tuple:
+    collection = command.get(command_name)
+    if command_name in _FILTER_KEYS:
+        return (command_name, collection, query_shape(command.get(_FILTER_KEYS[command_name]) or {}))
+    if command_name == "aggregate":
+        stages = []
+        for stage in command.get("pipeline", []):
+            name = next(iter(stage), "")
+            stages.append((name, query_shape(stage[name]) if name == "$match" else "?"))
+        return (command_name, collection, tuple(stages))
+    if command_name in ("update", "delete"):
+        ops = command.get("updates" if command_name == "update" else "deletes") or []
+        first = ops[0].get("q", {}) if ops else {}
+        return (command_name, collection, query_shape(first), len(ops) > 1)
+    return (command_name, collection)
+
+
+def _docs_returned(command_name: str, reply: Dict[str, Any]) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        batch = cursor.get("firstBatch")
+        if batch is None:
+            batch = cursor.get("nextBatch")
+        return len(batch or [])
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") else 0
+    if command_name == "distinct":
+        return len(reply.get("values") or [])
+    if command_name in ("count", "insert", "update", "delete"):
+        return int(reply.get("n", 0) or 0)
+    return 0
+
+
+class RequestQueryStats:
+    __slots__ = ("lock", "commands", "queries", "duration_ms", "docs", "failures", "shapes", "pending")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.commands = 0
+        self.queries = 0
+        self.duration_ms = 0.0
+        self.docs = 0
+        self.failures = 0
+        # shape -> [count, total_ms]
+        self.shapes: Dict[Tuple, List[float]] = {}
+        # request_id -> (command_name, shape)
+        self.pending: Dict[int, Tuple[str, Optional[Tuple]]] = {}
+
+    def n_plus_one_suspects(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [
+                {"shape": repr(shape), "count": int(count), "total_ms": round(total, 2)}
+                for shape, (count, total) in self.shapes.items()
+                if count >= threshold
+            ]
+
+    def summary(self) -> str:
+        suspects = len(self.n_plus_one_suspects())
+        return f"queries={self.queries}; commands={self.commands}; time_ms={self.duration_ms:.1f}; docs={self.docs}; n_plus_one={suspects}"
+
+
+_current: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+
+
+def current_stats() -> Optional[RequestQueryStats]:
+    return _current.get()
+
+
+class QueryAccountingListener(monitoring.CommandListener):
+    """Registered on the shared client in database.py; a no-op outside HTTP requests"""
+
+    def started(self, event):
+        stats = _current.get()
+        if stats is None:
+            return
+        name = event.command_name
+        shape = None if name in _NOT_QUERIES else command_shape(name, event.command)
+        with stats.lock:
+            stats.pending[event.request_id] = (name, shape)
+
+    def _finish(self, event, reply: Optional[Dict[str, Any]]):
+        stats = _current.get()
+        if stats is None:
+            return
+        duration_ms = event.duration_micros / 1000.0
+        with stats.lock:
+            name, shape = stats.pending.pop(event.request_id, (event.command_name, None))
+            stats.commands += 1
+            stats.duration_ms += duration_ms
+            if reply is None:
+                stats.failures += 1
+            else:
+                stats.docs += _docs_returned(name, reply)
+            if shape is not None:
+                stats.queries += 1
+                entry = stats.shapes.get(shape)
+                if entry is None:
+                    stats.shapes[shape] = [1, duration_ms]
+                else:
+                    entry[0] += 1
+                    entry[1] += duration_ms
+
+    def succeeded(self, event):
+        self._finish(event, event.reply or {})
+
+    def failed(self, event):
+        self._finish(event, None)
+
+
+query_listener = QueryAccountingListener()
+
+
+class QueryAccountingMiddleware:
+    """ASGI middleware creating one RequestQueryStats per HTTP request"""
+
+    def __init__(self, app, budget: int = QUERY_BUDGET, debug_header: bool = DEBUG_HEADER_ENABLED) -> None:
+        self.app = app
+        self.budget = budget
+        self.debug_header = debug_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats()
+        token = _current.set(stats)
+        want_header = self.debug_header or any(
+            name == b"x-debug-queries" and value in (b"1", b"true") for name, value in scope.get("headers", ())
+        )
+
+        async def send_wrapper(message):
+            if want_header and message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", stats.summary().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self._report(scope, stats)
+
+    def _report(self, scope, stats: RequestQueryStats) -> None:
+        suspects = stats.n_plus_one_suspects()
+        if stats.queries <= self.budget and not suspects:
+            return
+        route = scope.get("route")
+        path = getattr(route, "path_format", None) or scope.get("path", "")
+        if stats.queries > self.budget:
+            logger.warning(
+                "Query budget exceeded: %s %s issued %d queries (budget %d) in %.1f ms, %d docs",
+                scope.get("method"), path, stats.queries, self.budget, stats.duration_ms, stats.docs,
+            )
+        for suspect in suspects:
+            logger.warning(
+                "N+1 suspect on %s %s: %d x %s (%.1f ms total)",
+                scope.get("method"), path, suspect["count"], suspect["shape"], suspect["total_ms"],
+            )
@@ -0,0 +1,370 @@
+"""
+Report Export Engine
+Exports report datasets as CSV, XLSX or PDF. Rows are read from an async Mongo
+cursor in batches and pushed through a writer generator, so memory stays flat
+however many rows a report has:
+
+- CSV is encoded and yielded every EXPORT_CHUNK_ROWS rows
+- XLSX uses an openpyxl write-only workbook (rows are serialized as they are
+  appended); the finished zip is spooled to a temp file and streamed back
+- PDF draws a fixed number of rows per page on a reportlab canvas written to a
+  temp file. reportlab keeps finished pages (compressed) until save, so PDF
+  exports are capped at EXPORT_PDF_MAX_ROWS rows
+- openpyxl and reportlab are synchronous: appending/drawing each batch and the
+  final save run in the default thread pool (_off_loop), one step at a time,
+  so neither the streaming GET nor the job stalls the event loop
+
+GET /api/reports/export/{type} streams the file in the response. POST queues a
+"report_export" job (services/job_queue.py) whose artefact is written to the
+`report_exports` GridFS bucket and recorded in `report_exports`;
+/api/reports/download/{id} serves it. A failed job is retried with backoff and
+the export is marked failed once it is dead-lettered.
+"""
+import asyncio
+import csv
+import functools
+import io
+import os
+import tempfile
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+from database import db, report_exports_collection
+from services.job_queue import PermanentJobError, enqueue, job_handler
+
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", "500"))
+EXPORT_CURSOR_BATCH_SIZE = int(os.environ.get("EXPORT_CURSOR_BATCH_SIZE", "1000"))
+EXPORT_PDF_MAX_ROWS = int(os.environ.get("EXPORT_PDF_MAX_ROWS", "50000"))
+FILE_CHUNK_BYTES = 64 * 1024
+
+EXPORT_BUCKET = "report_exports"
+JOB_TYPE = "report_export"
+
+# format (as requested) -> (canonical format, file extension, media type)
+EXPORT_FORMATS: Dict[str, Tuple[str, str, str]] = {
+    "csv": ("csv", "csv", "text/csv"),
+    "xlsx": ("xlsx", "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "excel": ("xlsx", "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "pdf": ("pdf", "pdf", "application/pdf"),
+}
+
+
+class ExportError(ValueError):
+    """Unknown report type or format, or a format whose library is not installed"""
+
+
+@dataclass(frozen=True)
+class ExportSource:
+    title: str
+    # (row key, column header)
+    columns: List[Tuple[str, str]]
+    rows: Callable[[int], AsyncIterator[Dict[str, Any]]]
+
+
+def now_utc():
+    return datetime.now(timezone.utc)
+
+
+def _window(days: int) -> Dict[str, datetime]:
+    # transactions store naive UTC datetimes (see routers/reporting.py)
+    end = datetime.utcnow()
+    return {"$gte": end - timedelta(days=days), "$lte": end}
+
+
+async def _transactions(days: int, types: Optional[List[str]] = None) -> AsyncIterator[Dict[str, Any]]:
+    query: Dict[str, Any] = {"date": _window(days)}
+    if types:
+        query["type"] = {"$in": types}
+    cursor = db.transactions.find(
+        query, {"_id": 0, "date": 1, "type": 1, "reference_number": 1, "party_name": 1, "amount": 1, "status": 1}
+    ).sort("date", 1).batch_size(EXPORT_CURSOR_BATCH_SIZE)
+    async for row in cursor:
+        yield row
+
+
+def _sales_rows(days: int) -> AsyncIterator[Dict[str, Any]]:
+    return _transactions(days, ["sales_invoice"])
+
+
+def _performance_rows(days: int) -> AsyncIterator[Dict[str, Any]]:
+    return _transactions(days, ["sales_invoice", "purchase_order"])
+
+
+async def _customer_rows(days: int) -> AsyncIterator[Dict[str, Any]]:
+    pipeline = [
+        {"$match": {"type": "sales_invoice", "date": _window(days), "party_id": {"$ne": None}}},
+        {"$group": {
+            "_id": "$party_id",
+            "party_name": {"$first": "$party_name"},
+            "invoices": {"$sum": 1},
+            "revenue": {"$sum": "$amount"},
+            "last_invoice": {"$max": "$date"},
+        }},
+        {"$sort": {"revenue": -1}},
+    ]
+    async for row in db.transactions.aggregate(pipeline, allowDiskUse=True, batchSize=EXPORT_CURSOR_BATCH_SIZE):
+        yield row
+
+
+async def _inventory_rows(days: int) -> AsyncIterator[Dict[str, Any]]:
+    cursor = db.items.find(
+        {}, {"_id": 0, "item_code": 1, "name": 1, "stock_qty": 1, "unit_price": 1}
+    ).sort("item_code", 1).batch_size(EXPORT_CURSOR_BATCH_SIZE)
+    async for item in cursor:
+        item["total_value"] = (item.get("unit_price") or 0) * (item.get("stock_qty") or 0)
+        yield item
+
+
+_TRANSACTION_COLUMNS = [
+    ("date", "Date"), ("type", "Type"), ("reference_number", "Reference"),
+    ("party_name", "Party"), ("amount", "Amount"), ("status", "Status"),
+]
+
+REPORT_SOURCES: Dict[str, ExportSource] = {
+    "sales_overview": ExportSource("Sales Overview", _TRANSACTION_COLUMNS, _sales_rows),
+    "financial_summary": ExportSource("Financial Summary", _TRANSACTION_COLUMNS, _transactions),
+    "performance_metrics": ExportSource("Performance Metrics", _TRANSACTION_COLUMNS, _performance_rows),
+    "customer_analysis": ExportSource("Customer Analysis", [
+        ("party_name", "Customer"), ("invoices", "Invoices"), ("revenue", "Revenue"), ("last_invoice", "Last Invoice"),
+    ], _customer_rows),
+    "inventory_report": ExportSource("Inventory", [
+        ("item_code", "Item Code"), ("name", "Item"), ("stock_qty", "Stock Qty"),
+        ("unit_price", "Unit Price"), ("total_value", "Total Value"),
+    ], _inventory_rows),
+}
+
+
+def resolve(report_type: str, fmt: str) -> Tuple[str, ExportSource, str, str, str]:
+    """(report key, source, format, file extension, media type); raises ExportError"""
+    key = report_type.strip().lower().replace("-", "_")
+    source = REPORT_SOURCES.get(key)
+    if source is None:
+        raise ExportError(f"Unknown report type '{report_type}'. Available: {', '.join(REPORT_SOURCES)}")
+    if (fmt or "").lower() not in EXPORT_FORMATS:
+        raise ExportError(f"Unsupported format '{fmt}'. Use csv, xlsx or pdf")
+    canonical, ext, media_type = EXPORT_FORMATS[fmt.lower()]
+    if canonical == "xlsx":
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            raise ExportError("XLSX export needs the openpyxl package")
+    return key, source, canonical, ext, media_type
+
+
+def _cell(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M")
+    if isinstance(value, float):
+        return round(value, 2)
+    return "" if value is None else value
+
+
+async def _batches(source: ExportSource, days: int, stats: Dict[str, int], limit: Optional[int] = None) -> AsyncIterator[List[List[Any]]]:
+    batch: List[List[Any]] = []
+    async for row in source.rows(days):
+        if limit is not None and stats["rows"] >= limit:
+            stats["truncated"] = 1
+            break
+        batch.append([_cell(row.get(key)) for key, _ in source.columns])
+        stats["rows"] += 1
+        if len(batch) >= EXPORT_CHUNK_ROWS:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _csv(source: ExportSource, days: int, stats: Dict[str, int]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for _, header in source.columns])
+    async for batch in _batches(source, days, stats):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _off_loop(fn: Callable[..., Any], *args: Any) -> "asyncio.Future[Any]":
+    """Run a blocking writer step in the default thread pool"""
+    return asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args))
+
+
+def _append_rows(sheet, batch: List[List[Any]]) -> None:
+    for row in batch:
+        sheet.append(row)
+
+
+def _file_chunks(handle) -> Iterator[bytes]:
+    handle.seek(0)
+    return iter(lambda: handle.read(FILE_CHUNK_BYTES), b"")
+
+
+async def _xlsx(source: ExportSource, days: int, stats: Dict[str, int]) -> AsyncIterator[bytes]:
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(source.title[:31])
+    sheet.append([header for _, header in source.columns])
+    async for batch in _batches(source, days, stats):
+        await _off_loop(_append_rows, sheet, batch)
+    with tempfile.TemporaryFile() as handle:
+        await _off_loop(workbook.save, handle)
+        for chunk in _file_chunks(handle):
+            yield chunk
+
+
+async def _pdf(source: ExportSource, days: int, stats: Dict[str, int]) -> AsyncIterator[bytes]:
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.units import mm
+    from reportlab.pdfgen import canvas
+
+    width, height = landscape(A4)
+    margin = 12 * mm
+    line = 5.5 * mm
+    col_width = (width - 2 * margin) / len(source.columns)
+    max_chars = max(int(col_width / 1.9 / mm), 4)
+
+    with tempfile.TemporaryFile() as handle:
+        c = canvas.Canvas(handle, pagesize=(width, height))
+        page = 1
+        y = 0.0
+
+        def header() -> float:
+            c.setFont("Helvetica-Bold", 13)
+            c.drawString(margin, height - margin, source.title)
+            c.setFont("Helvetica", 8)
+            c.drawRightString(width - margin, height - margin, f"Generated {now_utc().strftime('%Y-%m-%d %H:%M')} UTC - Page {page}")
+            y = height - margin - 9 * mm
+            c.setFont("Helvetica-Bold", 9)
+            for i, (_, title) in enumerate(source.columns):
+                c.drawString(margin + i * col_width, y, title)
+            c.line(margin, y - 2 * mm, width - margin, y - 2 * mm)
+            c.setFont("Helvetica", 8)
+            return y - line - 1 * mm
+
+        def draw(batch: List[List[Any]]) -> None:
+            nonlocal page, y
+            for row in batch:
+                if y < margin:
+                    c.showPage()
+                    page += 1
+                    y = header()
+                for i, value in enumerate(row):
+                    c.drawString(margin + i * col_width, y, str(value)[:max_chars])
+                y -= line
+
+        def finish() -> None:
+            if stats.get("truncated"):
+                c.setFont("Helvetica-Oblique", 8)
+                c.drawString(margin, max(y, margin / 2), f"Truncated at {EXPORT_PDF_MAX_ROWS} rows; export CSV or XLSX for the full report")
+            c.save()
+
+        y = await _off_loop(header)
+        async for batch in _batches(source, days, stats, limit=EXPORT_PDF_MAX_ROWS):
+            await _off_loop(draw, batch)
+        await _off_loop(finish)
+        for chunk in _file_chunks(handle):
+            yield chunk
+
+
+_WRITERS = {"csv": _csv, "xlsx": _xlsx, "pdf": _pdf}
+
+
+def export_chunks(source: ExportSource, fmt: str, days: int, stats: Optional[Dict[str, int]] = None) -> AsyncIterator[bytes]:
+    """The export file as a stream of byte chunks; `stats` receives the row count"""
+    return _WRITERS[fmt](source, days, stats if stats is not None else {"rows": 0})
+
+
+def export_filename(report_key: str, ext: str) -> str:
+    return f"{report_key}_{now_utc().strftime('%Y%m%d_%H%M%S')}.{ext}"
+
+
+def _bucket() -> AsyncIOMotorGridFSBucket:
+    return AsyncIOMotorGridFSBucket(db, bucket_name=EXPORT_BUCKET)
+
+
+async def _mark_failed(payload: Dict[str, Any], error: str) -> None:
+    await report_exports_collection.update_one(
+        {"id": payload["export_id"]}, {"$set": {"status": "failed", "error": error, "completed_at": now_utc()}}
+    )
+
+
+@job_handler(JOB_TYPE, on_dead=_mark_failed)
+async def run_export(payload: Dict[str, Any]) -> Dict[str, Any]:
+    record = await report_exports_collection.find_one({"id": payload["export_id"]}, {"_id": 0})
+    if record is None:
+        raise PermanentJobError("Export record not found")
+    try:
+        _, source, fmt, _, media_type = resolve(record["report_type"], record["format"])
+    except ExportError as e:
+        raise PermanentJobError(str(e))
+    await report_exports_collection.update_one(
+        {"id": record["id"]}, {"$set": {"status": "running", "started_at": now_utc()}}
+    )
+    stats = {"rows": 0}
+    upload = _bucket().open_upload_stream(
+        record["filename"], metadata={"export_id": record["id"], "content_type": media_type}
+    )
+    size = 0
+    try:
+        async for chunk in export_chunks(source, fmt, record["days"], stats):
+            size += len(chunk)
+            await upload.write(chunk)
+    except BaseException:
+        await upload.abort()
+        raise
+    await upload.close()
+    await report_exports_collection.update_one(
+        {"id": record["id"]},
+        {"$set": {
+            "status": "completed",
+            "file_id": upload._id,
+            "size": size,
+            "rows": stats["rows"],
+            "truncated": bool(stats.get("truncated")),
+            "completed_at": now_utc(),
+        }},
+    )
+    return {"export_id": record["id"], "rows": stats["rows"], "size": size}
+
+
+async def start_export(report_type: str, fmt: str, days: int) -> Dict[str, Any]:
+    """Record an export and queue the job that writes it; returns the export record"""
+    key, _, canonical, ext, media_type = resolve(report_type, fmt)
+    record = {
+        "id": str(uuid.uuid4()),
+        "report_type": key,
+        "format": canonical,
+        "days": days,
+        "filename": export_filename(key, ext),
+        "content_type": media_type,
+        "status": "queued",
+        "created_at": now_utc(),
+    }
+    await report_exports_collection.insert_one(record)
+    job = await enqueue(JOB_TYPE, {"export_id": record["id"]})
+    await report_exports_collection.update_one({"id": record["id"]}, {"$set": {"job_id": job["id"]}})
+    record.pop("_id", None)
+    record["job_id"] = job["id"]
+    return record
+
+
+async def get_export(export_id: str) -> Optional[Dict[str, Any]]:
+    return await report_exports_collection.find_one({"id": export_id}, {"_id": 0})
+
+
+async def artefact_chunks(file_id: Any) -> AsyncIterator[bytes]:
+    """Stream a stored export out of GridFS chunk by chunk"""
+    download = await _bucket().open_download_stream(file_id)
+    while True:
+        chunk = await download.readchunk()
+        if not chunk:
+            break
+        yield chunk
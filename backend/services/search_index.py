@@ -0,0 +1,370 @@
+"""
+Global Search Index
+`search_index` holds one entry per searchable document (customers, suppliers,
+items, sales orders, invoices, quotations, purchase orders, purchase invoices,
+credit notes, debit notes, transactions) so the search bar reads one indexed
+collection instead of running unanchored regexes over eleven.
+
+- each searched field is normalized to lowercase letters and digits only
+  ("SO-2025/0924" -> "so20250924"); the entry stores those values, their
+  trigrams (`grams`) and the field's words (`tokens`), plus the ready-made
+  result (title, subtitle, description, url)
+- a term of three or more characters is looked up by its trigrams
+  ({category, grams: $all}, a multikey index scan) and confirmed by a substring
+  check on the normalized fields, since sharing trigrams does not imply
+  containing the term; shorter terms match word prefixes through
+  {category, tokens} with an anchored regex
+- the search term is matched literally, punctuation and spacing ignored
+
+Entries are written by the same code paths that create, update or delete the
+documents (index_document / reindex / remove_document), which also tell
+registered write listeners. Index writes never fail
+the business write: errors are logged and the next write of the document, or
+rebuild_search_index() (POST /api/admin/search-index/rebuild, migration 0006),
+repairs the entry.
+
+Until migration 0006 has completed (the API runs pending migrations at
+startup) the index lacks older documents, so searches query the source
+collections with source_filter() instead.
+"""
+import inspect
+import logging
+import math
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo import ReplaceOne
+
+from database import db
+from services.sort_keys import to_sort_datetime
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_COLLECTION = "search_index"
+# Indexes the documents written before the index existed
+BUILD_MIGRATION = "0006_build_search_index"
+REBUILD_BATCH_SIZE = 500
+# Longer terms are looked up by this many of their trigrams (spread over the term);
+# the substring check still compares the whole term
+MAX_QUERY_GRAMS = 8
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+# Called with (collection name, document id, document or None when deleted) on every
+# index write, e.g. by services/suggest_index.py; a coroutine listener is awaited
+WriteListener = Callable[[str, str, Optional[Dict[str, Any]]], Optional[Awaitable[None]]]
+_write_listeners: List[WriteListener] = []
+
+
+def now_utc():
+    return datetime.now(timezone.utc)
+
+
+def normalize(text: Any) -> str:
+    """Lowercase letters and digits only"""
+    return _NON_ALNUM.sub("", str(text).lower()) if text is not None else ""
+
+
+def words(text: Any) -> List[str]:
+    return [w for w in _NON_ALNUM.split(str(text).lower()) if w] if text is not None else []
+
+
+def trigrams(compact: str) -> List[str]:
+    return [compact[i:i + 3] for i in range(len(compact) - 2)]
+
+
+def _money(doc: Dict[str, Any], field: str = "total_amount") -> str:
+    return f"₹{doc.get(field, 0)}"
+
+
+@dataclass(frozen=True)
+class SearchCategory:
+    name: str
+    collection: str
+    type: str
+    fields: Tuple[str, ...]
+    # Fraction of `limit` this category may return in an unfiltered search
+    share: float
+    build: Callable[[Dict[str, Any]], Dict[str, Any]]
+    # Document date used for recency (falls back to created_at)
+    date_field: Optional[str] = None
+
+    def budget(self, limit: int, filtered: bool) -> int:
+        return limit if filtered else max(1, math.floor(limit * self.share))
+
+
+CATEGORIES: Tuple[SearchCategory, ...] = (
+    SearchCategory(
+        "customers", "customers", "customer", ("name", "email", "phone"), 1.0,
+        lambda d: {
+            "title": d.get("name", "Customer"),
+            "subtitle": d.get("email", ""),
+            "description": d.get("phone", ""),
+            "url": f"/sales/customers/{d.get('id')}",
+        },
+    ),
+    SearchCategory(
+        "suppliers", "suppliers", "supplier", ("name", "email", "phone"), 1 / 6,
+        lambda d: {
+            "title": d.get("name", ""),
+            "subtitle": d.get("email", ""),
+            "description": d.get("phone", ""),
+            "url": f"/buying/suppliers/{d.get('id')}",
+        },
+    ),
+    SearchCategory(
+        "items", "items", "item", ("name", "item_code", "description"), 1 / 6,
+        lambda d: {
+            "title": d.get("name", ""),
+            "subtitle": f"Code: {d.get('item_code', 'N/A')}",
+            "description": f"{_money(d, 'unit_price')} - Stock: {d.get('stock_qty', 0)}",
+            "url": f"/stock/items/{d.get('id')}",
+        },
+    ),
+    SearchCategory(
+        "sales_orders", "sales_orders", "sales_order", ("order_number", "customer_name"), 1.0,
+        lambda d: {
+            "title": f"Sales Order {d.get('order_number', '')}",
+            "subtitle": d.get("customer_name", ""),
+            "description": f"{_money(d)} - {d.get('status', 'draft')}",
+            "url": f"/sales/orders/{d.get('id')}",
+        },
+        date_field="order_date",
+    ),
+    SearchCategory(
+        "invoices", "sales_invoices", "invoice", ("invoice_number", "customer_name"), 1 / 6,
+        lambda d: {
+            "title": f"Invoice {d.get('invoice_number', '')}",
+            "subtitle": d.get("customer_name", ""),
+            "description": f"{_money(d)} - {d.get('status', 'draft')}",
+            "url": f"/sales/invoices/{d.get('id')}",
+        },
+        date_field="invoice_date",
+    ),
+    SearchCategory(
+        "quotations", "sales_quotations", "quotation", ("quotation_number", "customer_name"), 1 / 10,
+        lambda d: {
+            "title": f"Quotation {d.get('quotation_number', '')}",
+            "subtitle": d.get("customer_name", ""),
+            "description": f"{_money(d)} - {d.get('status', 'draft')}",
+            "url": f"/sales/quotations/{d.get('id')}",
+        },
+        date_field="quotation_date",
+    ),
+    SearchCategory(
+        "purchase_orders", "purchase_orders", "purchase_order", ("order_number", "supplier_name"), 1 / 10,
+        lambda d: {
+            "title": f"Purchase Order {d.get('order_number', '')}",
+            "subtitle": d.get("supplier_name", ""),
+            "description": f"{_money(d)} - {d.get('status', 'draft')}",
+            "url": f"/buying/orders/{d.get('id')}",
+        },
+        date_field="order_date",
+    ),
+    SearchCategory(
+        "purchase_invoices", "purchase_invoices", "purchase_invoice", ("invoice_number", "supplier_name"), 1 / 10,
+        lambda d: {
+            "title": f"Purchase Invoice {d.get('invoice_number', '')}",
+            "subtitle": d.get("supplier_name", ""),
+            "description": f"{_money(d)} - {d.get('status', 'draft')}",
+            "url": f"/buying/purchase-invoices/{d.get('id')}",
+        },
+        date_field="invoice_date",
+    ),
+    SearchCategory(
+        "credit_notes", "credit_notes", "credit_note", ("credit_note_number", "customer_name"), 1 / 10,
+        lambda d: {
+            "title": f"Credit Note {d.get('credit_note_number', '')}",
+            "subtitle": d.get("customer_name", ""),
+            "description": f"{_money(d)} - {d.get('reason', 'Return')}",
+            "url": f"/sales/credit-notes/{d.get('id')}",
+        },
+        date_field="credit_note_date",
+    ),
+    SearchCategory(
+        "debit_notes", "debit_notes", "debit_note", ("debit_note_number", "supplier_name"), 1 / 10,
+        lambda d: {
+            "title": f"Debit Note {d.get('debit_note_number', '')}",
+            "subtitle": d.get("supplier_name", ""),
+            "description": f"{_money(d)} - {d.get('reason', 'Return')}",
+            "url": f"/buying/debit-notes/{d.get('id')}",
+        },
+        date_field="debit_note_date",
+    ),
+    SearchCategory(
+        "transactions", "transactions", "transaction", ("reference_number", "party_name"), 1 / 6,
+        lambda d: {
+            "title": f"{d.get('type', '').replace('_', ' ').title()} {d.get('reference_number', '')}",
+            "subtitle": d.get("party_name", ""),
+            "description": f"{_money(d, 'amount')} - {d.get('status', 'completed')}",
+            "url": f"/accounts/transactions/{d.get('id')}",
+        },
+        date_field="date",
+    ),
+)
+
+CATEGORY_NAMES = tuple(c.name for c in CATEGORIES)
+CATEGORIES_BY_COLLECTION: Dict[str, SearchCategory] = {c.collection: c for c in CATEGORIES}
+
+
+def _index():
+    return db[SEARCH_INDEX_COLLECTION]
+
+
+def _doc_id(doc: Dict[str, Any]) -> str:
+    return doc.get("id") or str(doc.get("_id"))
+
+
+def search_entry(collection_name: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+    """The search_index document for one source document"""
+    category = CATEGORIES_BY_COLLECTION[collection_name]
+    doc_id = _doc_id(doc)
+    compact = {field: normalize(doc.get(field)) for field in category.fields}
+    grams = sorted({g for value in compact.values() for g in trigrams(value)})
+    tokens = sorted({w for field in category.fields for w in words(doc.get(field))})
+    date = (to_sort_datetime(doc.get(category.date_field)) if category.date_field else None) or to_sort_datetime(doc.get("created_at"))
+    return {
+        "id": f"{category.name}:{doc_id}",
+        "category": category.name,
+        "doc_id": doc_id,
+        "fields": {field: doc.get(field) if isinstance(doc.get(field), str) else "" for field in category.fields},
+        "compact": compact,
+        "grams": grams,
+        "tokens": tokens,
+        "result": {"id": doc_id, "type": category.type, **category.build(doc)},
+        "date": date,
+        "indexed_at": now_utc(),
+    }
+
+
+def register_write_listener(listener: WriteListener) -> None:
+    _write_listeners.append(listener)
+
+
+async def _notify(collection_name: str, doc_id: str, doc: Optional[Dict[str, Any]]) -> None:
+    for listener in _write_listeners:
+        try:
+            result = listener(collection_name, doc_id, doc)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            logger.warning(f"Search write listener failed for {collection_name} {doc_id}: {e}")
+
+
+def index_write_op(collection_name: str, doc: Dict[str, Any]) -> ReplaceOne:
+    entry = search_entry(collection_name, doc)
+    return ReplaceOne({"id": entry["id"]}, entry, upsert=True)
+
+
+async def index_document(collection_name: str, doc: Optional[Dict[str, Any]]) -> None:
+    """(Re)index a document just written to `collection_name`"""
+    if not doc or collection_name not in CATEGORIES_BY_COLLECTION:
+        return
+    await _notify(collection_name, _doc_id(doc), doc)
+    try:
+        entry = search_entry(collection_name, doc)
+        await _index().replace_one({"id": entry["id"]}, entry, upsert=True)
+    except Exception as e:
+        logger.warning(f"Search index write failed for {collection_name} {_doc_id(doc)}: {e}")
+
+
+async def reindex(collection_name: str, query: Dict[str, Any]) -> None:
+    """Re-read the document matching `query` (after an update) and index it"""
+    try:
+        doc = await db[collection_name].find_one(query)
+    except Exception as e:
+        logger.warning(f"Search index refresh failed for {collection_name} {query}: {e}")
+        return
+    await index_document(collection_name, doc)
+
+
+async def remove_document(collection_name: str, doc_id: Optional[str]) -> None:
+    category = CATEGORIES_BY_COLLECTION.get(collection_name)
+    if category is None or not doc_id:
+        return
+    await _notify(collection_name, doc_id, None)
+    try:
+        await _index().delete_one({"id": f"{category.name}:{doc_id}"})
+    except Exception as e:
+        logger.warning(f"Search index delete failed for {collection_name} {doc_id}: {e}")
+
+
+def query_grams(compact: str) -> List[str]:
+    grams = list(dict.fromkeys(trigrams(compact)))
+    if len(grams) <= MAX_QUERY_GRAMS:
+        return grams
+    step = (len(grams) - 1) / (MAX_QUERY_GRAMS - 1)
+    return [grams[round(i * step)] for i in range(MAX_QUERY_GRAMS)]
+
+
+def lookup_filter(category: str, term: str) -> Optional[Dict[str, Any]]:
+    """Index filter for entries of `category` that may contain `term`; None when the
+    term has no letters or digits"""
+    compact = normalize(term)
+    if not compact:
+        return None
+    if len(compact) >= 3:
+        return {"category": category, "grams": {"$all": query_grams(compact)}}
+    return {"category": category, "tokens": {"$regex": f"^{re.escape(compact)}"}}
+
+
+async def index_built() -> bool:
+    """Whether migration 0006 has indexed the documents written before the index existed"""
+    # migrations imports this module (0006 writes through index_write_op)
+    from migrations.runner import is_applied
+
+    return await is_applied(db, BUILD_MIGRATION)
+
+
+def source_filter(category: SearchCategory, term: str) -> Optional[Dict[str, Any]]:
+    """Unindexed query on the category's own collection with the index's matching rules
+    (the term's letters and digits in order, punctuation and spacing ignored); None when
+    the term has no letters or digits"""
+    compact = normalize(term)
+    if not compact:
+        return None
+    pattern = "[^0-9a-z]*".join(re.escape(ch) for ch in compact)
+    return {"$or": [{field: {"$regex": pattern, "$options": "i"}} for field in category.fields]}
+
+
+def contains(entry: Dict[str, Any], term: str) -> bool:
+    """Whether a candidate entry really contains the term in one of its fields"""
+    compact = normalize(term)
+    return any(compact in value for value in (entry.get("compact") or {}).values())
+
+
+async def rebuild_collection(collection_name: str, batch_size: int = REBUILD_BATCH_SIZE) -> Dict[str, Any]:
+    """Index every document of one source collection and drop entries whose document is gone"""
+    category = CATEGORIES_BY_COLLECTION[collection_name]
+    started = now_utc()
+    indexed = 0
+    ops: List[Any] = []
+    async for doc in db[collection_name].find({}, batch_size=batch_size):
+        ops.append(index_write_op(collection_name, doc))
+        if len(ops) >= batch_size:
+            await _index().bulk_write(ops, ordered=False)
+            indexed += len(ops)
+            ops = []
+    if ops:
+        await _index().bulk_write(ops, ordered=False)
+        indexed += len(ops)
+    removed = await _index().delete_many({"category": category.name, "indexed_at": {"$lt": started}})
+    return {"collection": collection_name, "indexed": indexed, "removed": removed.deleted_count}
+
+
+async def rebuild_search_index(batch_size: int = REBUILD_BATCH_SIZE) -> Dict[str, Any]:
+    """Re-index every searchable collection (idempotent)"""
+    results = []
+    for collection_name in CATEGORIES_BY_COLLECTION:
+        try:
+            results.append(await rebuild_collection(collection_name, batch_size))
+        except Exception as e:
+            logger.error(f"Search index rebuild failed for {collection_name}: {e}")
+            results.append({"collection": collection_name, "error": str(e)})
+    return {
+        "indexed": sum(r.get("indexed", 0) for r in results),
+        "removed": sum(r.get("removed", 0) for r in results),
+        "results": results,
+    }
@@ -0,0 +1,141 @@
+"""
+Search Ranking
+Scores global search candidates (search_index entries) in batches, BM25 style,
+instead of grading the title of each fetched row on its own:
+
+- every field has a weight (FIELD_WEIGHTS): document numbers and codes count
+  more than names, names more than email/phone, descriptions least
+- each query word contributes idf * saturated term frequency per field, with
+  the usual k1/b length normalization against the batch's average field
+  length; a word counts fully when it equals a field word, partly when it
+  prefixes one or only appears inside the field
+- a field equal to the whole term gets EXACT_BOOST, one starting with it
+  PREFIX_BOOST (both times the field weight)
+- dated documents decay towards (1 - SEARCH_RECENCY_WEIGHT) of their score with
+  a half-life of SEARCH_RECENCY_HALF_LIFE_DAYS; master data does not decay
+
+IDF is computed over the candidate batch of one search (the documents that
+contain the term), which is what separates common from rare query words here.
+top_k merges scored batches of all categories with a heap.
+"""
+import heapq
+import math
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from services.search_index import normalize, words
+
+SEARCH_RECENCY_WEIGHT = float(os.environ.get("SEARCH_RECENCY_WEIGHT", "0.2"))
+SEARCH_RECENCY_HALF_LIFE_DAYS = float(os.environ.get("SEARCH_RECENCY_HALF_LIFE_DAYS", "180"))
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+EXACT_BOOST = 3.0
+PREFIX_BOOST = 1.5
+# Credit for a query word that only prefixes a field word / only appears inside the field
+PREFIX_MATCH = 0.7
+INFIX_MATCH = 0.3
+
+_NUMBER_WEIGHT = 4.0
+_NAME_WEIGHT = 2.5
+_CONTACT_WEIGHT = 1.5
+_DESCRIPTION_WEIGHT = 0.75
+
+FIELD_WEIGHTS: Dict[str, float] = {
+    "invoice_number": _NUMBER_WEIGHT,
+    "order_number": _NUMBER_WEIGHT,
+    "quotation_number": _NUMBER_WEIGHT,
+    "credit_note_number": _NUMBER_WEIGHT,
+    "debit_note_number": _NUMBER_WEIGHT,
+    "reference_number": _NUMBER_WEIGHT,
+    "item_code": _NUMBER_WEIGHT,
+    "name": _NAME_WEIGHT,
+    "customer_name": _NAME_WEIGHT,
+    "supplier_name": _NAME_WEIGHT,
+    "party_name": _NAME_WEIGHT,
+    "email": _CONTACT_WEIGHT,
+    "phone": _CONTACT_WEIGHT,
+    "description": _DESCRIPTION_WEIGHT,
+}
+DEFAULT_FIELD_WEIGHT = 1.0
+
+
+def now_utc():
+    return datetime.now(timezone.utc)
+
+
+def _word_credit(query_word: str, field_words: List[str], compact: str) -> float:
+    """Term frequency of one query word in one field, partial matches counted fractionally"""
+    tf = 0.0
+    for word in field_words:
+        if word == query_word:
+            tf += 1.0
+        elif word.startswith(query_word):
+            tf += PREFIX_MATCH
+    if tf == 0.0 and query_word in compact:
+        tf = INFIX_MATCH
+    return tf
+
+
+def recency(date: Optional[datetime], now: datetime) -> float:
+    if date is None:
+        return 1.0
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    age_days = max(0.0, (now - date).total_seconds() / 86400)
+    decay = 0.5 ** (age_days / SEARCH_RECENCY_HALF_LIFE_DAYS)
+    return 1.0 - SEARCH_RECENCY_WEIGHT + SEARCH_RECENCY_WEIGHT * decay
+
+
+def score_batch(term: str, entries: List[Dict[str, Any]], now: Optional[datetime] = None) -> List[float]:
+    """Scores of `entries` (search_index entries with fields, compact and date) for `term`"""
+    if not entries:
+        return []
+    now = now or now_utc()
+    query_words = list(dict.fromkeys(words(term))) or [normalize(term)]
+    term_compact = normalize(term)
+
+    # Tokenize every field once; lengths and document frequencies come from the batch
+    tokenized = []
+    lengths: Dict[str, List[int]] = {}
+    doc_freq = {w: 0 for w in query_words}
+    for entry in entries:
+        fields = {}
+        for field, text in (entry.get("fields") or {}).items():
+            fields[field] = words(text)
+            lengths.setdefault(field, []).append(len(fields[field]))
+        tokenized.append(fields)
+        compact_values = (entry.get("compact") or {}).values()
+        for w in query_words:
+            if any(w in value for value in compact_values):
+                doc_freq[w] += 1
+    n = len(entries)
+    idf = {w: math.log(1 + (n - df + 0.5) / (df + 0.5)) for w, df in doc_freq.items()}
+    avg_length = {field: (sum(ls) / len(ls)) or 1.0 for field, ls in lengths.items()}
+
+    scores = []
+    for entry, fields in zip(entries, tokenized):
+        compact = entry.get("compact") or {}
+        score = 0.0
+        for field, field_words in fields.items():
+            weight = FIELD_WEIGHTS.get(field, DEFAULT_FIELD_WEIGHT)
+            value = compact.get(field, "")
+            norm = 1 - BM25_B + BM25_B * len(field_words) / avg_length[field]
+            for w in query_words:
+                tf = _word_credit(w, field_words, value)
+                if tf:
+                    score += weight * idf[w] * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+            if term_compact and value == term_compact:
+                score += weight * EXACT_BOOST
+            elif term_compact and value.startswith(term_compact):
+                score += weight * PREFIX_BOOST
+        scores.append(score * recency(entry.get("date"), now))
+    return scores
+
+
+def top_k(scored: Iterable[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+    """The k highest `relevance` hits, best first; ties keep their input order"""
+    return [hit for _, _, hit in heapq.nlargest(
+        k, ((hit["relevance"], -i, hit) for i, hit in enumerate(scored))
+    )]
@@ -116,4 +116,55 @@ def get_uniform_send_response(
         "errors": errors,
         "sent_via": sent_via,
         "sent_at": current_time_iso,
-    }
\ No newline at end of file
+    }
+
+def create_queued_send_update(
+    job_id: str,
+    send_id: str,
+    method: str,
+    recipient: str
+) -> Dict[str, Any]:
+    """
+    Creates the tracking fields set when a send is queued as a background job
+    (see services/document_send.py); the job sets the uniform fields above
+    when it runs
+    
+    Args:
+        job_id: Id of the queued send job (GET /api/jobs/{job_id})
+        send_id: Id of this send request, repeated in the job payload
+        method: "email" or "sms"
+        recipient: Email or phone number
+    
+    Returns:
+        Dictionary of fields for database update
+    """
+    current_time_iso = datetime.now(timezone.utc).isoformat()
+    return {
+        "send_status": "queued",
+        "send_job_id": job_id,
+        "send_id": send_id,
+        "send_method": method,
+        "sent_to": recipient,
+        "send_queued_at": current_time_iso,
+        "updated_at": current_time_iso,
+    }
+
+
+def get_queued_send_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Creates the API response for a send that was queued as a background job
+    
+    Args:
+        job: The queued job document
+    
+    Returns:
+        Standardized API response dictionary; poll status_url for the outcome
+    """
+    return {
+        "success": True,
+        "queued": True,
+        "message": "Send queued",
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": f"/api/jobs/{job['id']}",
+    }
@@ -0,0 +1,198 @@
+"""
+Document Number Sequence Service
+Allocates document numbers (INV, SO, PO, QTN, CN, DN, JE, REC/PAY, ...) from the
+`counters` collection with an atomic findOneAndUpdate $inc, so numbering is O(1)
+per insert and two concurrent creates can never receive the same number.
+
+Numbers keep the existing PREFIX-YYYYMMDD-NNNN format. Each prefix/day pair has
+its own counter document. Workers may pre-reserve a block of numbers
+(DOC_SEQUENCE_BLOCK_SIZE) and hand them out from memory; blocks never overlap
+across workers, at the cost of gaps when a worker exits with unused numbers.
+
+Dates are UTC days. Per-counter worker state (blocks, locks, seeded keys) is
+dropped once its day is past, and a counter document that disappears (e.g. the
+counters collection was reset) is re-seeded from the issued numbers instead of
+restarting at 1.
+"""
+import asyncio
+import os
+import re
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from database import db, counters_collection
+
+# prefix -> (collection holding the numbered documents, number field)
+# Used to seed a new day's counter from numbers already issued by the old
+# count-based generators, so the switch-over never reissues a number.
+DOCUMENT_SEQUENCES: Dict[str, Tuple[str, str]] = {
+    "INV": ("sales_invoices", "invoice_number"),
+    "SINV": ("sales_invoices", "invoice_number"),
+    "SO": ("sales_orders", "order_number"),
+    "QTN": ("sales_quotations", "quotation_number"),
+    "PO": ("purchase_orders", "order_number"),
+    "PINV": ("purchase_invoices", "invoice_number"),
+    "CN": ("credit_notes", "credit_note_number"),
+    "DN": ("debit_notes", "debit_note_number"),
+    "JE": ("journal_entries", "entry_number"),
+    "REC": ("payments", "payment_number"),
+    "PAY": ("payments", "payment_number"),
+}
+
+DEFAULT_BLOCK_SIZE = int(os.environ.get("DOC_SEQUENCE_BLOCK_SIZE", "1"))
+
+
+class _ReservedBlock:
+    """Numbers [next_value, end_value] reserved by this worker for one counter"""
+
+    __slots__ = ("next_value", "end_value")
+
+    def __init__(self, start: int, end: int) -> None:
+        self.next_value = start
+        self.end_value = end
+
+    def take(self) -> Optional[int]:
+        if self.next_value > self.end_value:
+            return None
+        value = self.next_value
+        self.next_value += 1
+        return value
+
+
+_blocks: Dict[str, _ReservedBlock] = {}
+_locks: Dict[str, asyncio.Lock] = {}
+_seeded_keys: set = set()
+_pruned_day: Optional[str] = None
+
+
+def counter_key(prefix: str, date_str: str) -> str:
+    return f"{prefix}-{date_str}"
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime('%Y%m%d')
+
+
+def _prune_past_days() -> None:
+    """Forget blocks, locks and seeded keys of days before today (UTC), once per day"""
+    global _pruned_day
+    today = _today()
+    if _pruned_day == today:
+        return
+    for key in [k for k in _seeded_keys | set(_blocks) | set(_locks) if k.rsplit("-", 1)[-1] < today]:
+        _seeded_keys.discard(key)
+        _blocks.pop(key, None)
+        lock = _locks.get(key)
+        if lock is not None and not lock.locked():
+            del _locks[key]
+    _pruned_day = today
+
+
+def format_document_number(prefix: str, date_str: str, seq: int) -> str:
+    return f"{prefix}-{date_str}-{seq:04d}"
+
+
+async def _highest_issued(prefix: str, date_str: str) -> int:
+    """Highest suffix already used for prefix/date (anchored prefix lookup, index friendly)"""
+    target = DOCUMENT_SEQUENCES.get(prefix)
+    if not target:
+        return 0
+    coll_name, field = target
+    base = f"^{re.escape(prefix)}-{date_str}-"
+    coll = db[coll_name]
+    # Past 9999 the suffix grows a digit and "...-10000" sorts below "...-9999" as a
+    # string. Find the longest suffix in use, then the largest of that length, where
+    # string order is numeric order. Only runs when a day's counter is (re)seeded.
+    digits = 0
+    while await coll.find_one({field: {"$regex": f"{base}[0-9]{{{digits + 1},}}$"}}, {"_id": 1}):
+        digits += 1
+    if not digits:
+        return 0
+    cursor = coll.find({field: {"$regex": f"{base}[0-9]{{{digits}}}$"}}, {field: 1, "_id": 0}).sort(field, -1).limit(1)
+    async for doc in cursor:
+        return int(doc[field].rsplit("-", 1)[-1])
+    return 0
+
+
+async def _ensure_counter(prefix: str, date_str: str) -> None:
+    key = counter_key(prefix, date_str)
+    if key in _seeded_keys:
+        return
+    existing = await counters_collection.find_one({"_id": key}, {"_id": 1})
+    if not existing:
+        start = await _highest_issued(prefix, date_str)
+        try:
+            await counters_collection.insert_one({
+                "_id": key,
+                "prefix": prefix,
+                "date": date_str,
+                "seq": start,
+                "created_at": datetime.now(timezone.utc),
+            })
+        except DuplicateKeyError:
+            # Another worker seeded it first
+            pass
+    _seeded_keys.add(key)
+
+
+async def reserve_block(prefix: str, size: int = 1, date_str: Optional[str] = None) -> Tuple[int, int]:
+    """Atomically reserve `size` consecutive numbers; returns (first, last)"""
+    if size < 1:
+        raise ValueError("Block size must be at least 1")
+    date_str = date_str or _today()
+    key = counter_key(prefix, date_str)
+    while True:
+        await _ensure_counter(prefix, date_str)
+        # No upsert: a counter created here would restart at 1 and reissue numbers
+        doc = await counters_collection.find_one_and_update(
+            {"_id": key},
+            {"$inc": {"seq": size}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc is not None:
+            break
+        # Counter removed since we seeded it; seed again from the issued numbers
+        _seeded_keys.discard(key)
+    end = int(doc["seq"])
+    return end - size + 1, end
+
+
+async def next_sequence(prefix: str, date_str: Optional[str] = None, block_size: Optional[int] = None) -> int:
+    """Next integer in the prefix/date sequence, served from the worker's reserved block"""
+    date_str = date_str or _today()
+    _prune_past_days()
+    size = block_size or DEFAULT_BLOCK_SIZE
+    if size <= 1:
+        first, _ = await reserve_block(prefix, 1, date_str)
+        return first
+
+    key = counter_key(prefix, date_str)
+    lock = _locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        block = _blocks.get(key)
+        value = block.take() if block else None
+        if value is None:
+            first, last = await reserve_block(prefix, size, date_str)
+            block = _ReservedBlock(first, last)
+            _blocks[key] = block
+            value = block.take()
+        return value
+
+
+async def next_document_number(prefix: str, when: Optional[datetime] = None, block_size: Optional[int] = None) -> str:
+    """Allocate the next document number, e.g. INV-20250115-0042"""
+    if when is not None and when.tzinfo is not None:
+        when = when.astimezone(timezone.utc)
+    date_str = when.strftime('%Y%m%d') if when is not None else _today()
+    seq = await next_sequence(prefix, date_str, block_size)
+    return format_document_number(prefix, date_str, seq)
+
+
+def reset_local_blocks() -> None:
+    """Drop this worker's reserved blocks and seed cache (used by tests/maintenance scripts)"""
+    _blocks.clear()
+    _locks.clear()
+    _seeded_keys.clear()
@@ -0,0 +1,245 @@
+"""
+General Settings Service
+Keeps the single `general_settings` document in process memory so hot paths
+(stock valuation, bank auto-match, payment allocation) stop re-reading it from
+Mongo on every call.
+
+- reads never insert; missing sections fall back to DEFAULTS, merged key by key
+- every write goes through update_settings(), which upserts, bumps the
+  document's `settings_version` and refreshes this worker's cache
+- once SETTINGS_CACHE_TTL_SECONDS has passed, the next read asks Mongo for
+  `settings_version` only and reloads the document if another worker changed it,
+  so all uvicorn workers converge within that TTL
+"""
+import asyncio
+import copy
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from database import general_settings_collection
+
+SETTINGS_ID = "general_settings"
+SETTINGS_CACHE_TTL_SECONDS = float(os.environ.get("SETTINGS_CACHE_TTL_SECONDS", "5"))
+
+DEFAULTS: Dict[str, Any] = {
+    "id": SETTINGS_ID,
+    "tax_country": "IN",
+    "gst_enabled": True,
+    "default_gst_percent": 18,
+    "enable_variants": True,
+    "uoms": ["NOS", "PCS", "PCK", "KG", "G", "L", "ML"],
+    "payment_terms": ["Net 0", "Net 15", "Net 30", "Net 45"],
+    "timezone": "Asia/Kolkata",
+    "date_format": "DD/MM/YYYY",
+    "time_format": "12",
+    "stock": {
+        "valuation_method": "FIFO",
+        "allow_negative_stock": False,
+        "enable_batches": True,
+        "enable_serials": True,
+    },
+    "financial": {
+        "base_currency": "INR",
+        "accounting_standard": "Indian GAAP",
+        "fiscal_year_start": "April",
+        "multi_currency_enabled": False,
+        "auto_exchange_rate_update": False,
+        "enable_auto_journal_entries": True,
+        "require_payment_approval": False,
+        "enable_budget_control": False,
+        "gst_categories": ["Taxable", "Exempt", "Zero Rated", "Nil Rated"],
+        "gstin": "",
+        "auto_create_accounts": True,
+        "default_payment_terms": "Net 30",
+        "bank_reconciliation": {
+            "supported_statement_formats": ["CSV", "Excel"],
+            "date_tolerance_days": 3,
+            "amount_tolerance_percent": 0.01,
+            "enable_auto_matching": True,
+            "enable_notifications": True
+        },
+        "payment_allocation": {
+            "allow_partial_allocation": True,
+            "require_allocation_approval": False,
+            "auto_allocate_to_oldest": True
+        }
+    },
+    "currencies": [
+        {"code": "INR", "name": "Indian Rupee", "symbol": "₹", "rate": 1.0, "is_base": True},
+        {"code": "USD", "name": "US Dollar", "symbol": "$", "rate": 83.0, "is_base": False},
+        {"code": "EUR", "name": "Euro", "symbol": "€", "rate": 90.0, "is_base": False},
+        {"code": "GBP", "name": "British Pound", "symbol": "£", "rate": 105.0, "is_base": False}
+    ],
+    "accounting_standards": [
+        {"code": "IN_GAAP", "name": "Indian GAAP", "country": "India"},
+        {"code": "IFRS", "name": "International Financial Reporting Standards", "country": "International"},
+        {"code": "US_GAAP", "name": "US Generally Accepted Accounting Principles", "country": "USA"}
+    ],
+}
+
+
+@dataclass(frozen=True)
+class StockConfig:
+    valuation_method: str
+    allow_negative_stock: bool
+    enable_batches: bool
+    enable_serials: bool
+
+
+@dataclass(frozen=True)
+class BankReconciliationConfig:
+    supported_statement_formats: List[str]
+    date_tolerance_days: int
+    amount_tolerance_percent: float
+    enable_auto_matching: bool
+    enable_notifications: bool
+
+
+@dataclass(frozen=True)
+class PaymentAllocationConfig:
+    allow_partial_allocation: bool
+    require_allocation_approval: bool
+    auto_allocate_to_oldest: bool
+
+
+@dataclass(frozen=True)
+class FinancialConfig:
+    base_currency: str
+    accounting_standard: str
+    fiscal_year_start: str
+    multi_currency_enabled: bool
+    enable_auto_journal_entries: bool
+    require_payment_approval: bool
+    enable_budget_control: bool
+    gstin: str
+    default_payment_terms: str
+    bank_reconciliation: BankReconciliationConfig
+    payment_allocation: PaymentAllocationConfig
+
+
+_lock = asyncio.Lock()
+_cached: Optional[Dict[str, Any]] = None
+_version = 0
+_checked_at = 0.0
+
+
+def now_utc():
+    return datetime.now(timezone.utc)
+
+
+def _merge(defaults: Dict[str, Any], stored: Dict[str, Any]) -> Dict[str, Any]:
+    merged = copy.deepcopy(defaults)
+    for key, value in stored.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _fresh() -> bool:
+    return _cached is not None and time.monotonic() - _checked_at < SETTINGS_CACHE_TTL_SECONDS
+
+
+async def _refresh() -> None:
+    global _cached, _version, _checked_at
+    if _cached is not None:
+        probe = await general_settings_collection.find_one({"id": SETTINGS_ID}, {"_id": 0, "settings_version": 1})
+        if int((probe or {}).get("settings_version", 0)) == _version:
+            _checked_at = time.monotonic()
+            return
+    doc = await general_settings_collection.find_one({"id": SETTINGS_ID}, {"_id": 0})
+    _cached = _merge(DEFAULTS, doc or {})
+    _version = int((doc or {}).get("settings_version", 0))
+    _checked_at = time.monotonic()
+
+
+def invalidate() -> None:
+    """Drop this worker's copy; the next read reloads the full document"""
+    global _cached
+    _cached = None
+
+
+async def _current() -> Dict[str, Any]:
+    """The shared cached document; callers must not modify it"""
+    if not _fresh():
+        async with _lock:
+            if not _fresh():
+                await _refresh()
+    return _cached
+
+
+async def get_settings_doc() -> Dict[str, Any]:
+    """The merged settings document (a copy, safe for callers to modify)"""
+    return copy.deepcopy(await _current())
+
+
+async def update_settings(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """$set top-level fields, bump the version and return the refreshed document"""
+    update = dict(fields)
+    update["updated_at"] = now_utc()
+    async with _lock:
+        await general_settings_collection.update_one(
+            {"id": SETTINGS_ID},
+            {"$set": update, "$inc": {"settings_version": 1}, "$setOnInsert": {"created_at": now_utc()}},
+            upsert=True,
+        )
+        invalidate()
+        await _refresh()
+    return copy.deepcopy(_cached)
+
+
+async def stock_settings() -> StockConfig:
+    stock = (await _current()).get("stock") or {}
+    return StockConfig(
+        valuation_method=stock.get("valuation_method") or "FIFO",
+        allow_negative_stock=bool(stock.get("allow_negative_stock", False)),
+        enable_batches=bool(stock.get("enable_batches", True)),
+        enable_serials=bool(stock.get("enable_serials", True)),
+    )
+
+
+def _bank_reconciliation(section: Dict[str, Any]) -> BankReconciliationConfig:
+    return BankReconciliationConfig(
+        supported_statement_formats=list(section.get("supported_statement_formats") or []),
+        date_tolerance_days=int(section.get("date_tolerance_days", 3)),
+        amount_tolerance_percent=float(section.get("amount_tolerance_percent", 0.01)),
+        enable_auto_matching=bool(section.get("enable_auto_matching", True)),
+        enable_notifications=bool(section.get("enable_notifications", True)),
+    )
+
+
+def _payment_allocation(section: Dict[str, Any]) -> PaymentAllocationConfig:
+    return PaymentAllocationConfig(
+        allow_partial_allocation=bool(section.get("allow_partial_allocation", True)),
+        require_allocation_approval=bool(section.get("require_allocation_approval", False)),
+        auto_allocate_to_oldest=bool(section.get("auto_allocate_to_oldest", True)),
+    )
+
+
+async def financial_settings() -> FinancialConfig:
+    fin = (await _current()).get("financial") or {}
+    return FinancialConfig(
+        base_currency=fin.get("base_currency") or "INR",
+        accounting_standard=fin.get("accounting_standard") or "Indian GAAP",
+        fiscal_year_start=fin.get("fiscal_year_start") or "April",
+        multi_currency_enabled=bool(fin.get("multi_currency_enabled", False)),
+        enable_auto_journal_entries=bool(fin.get("enable_auto_journal_entries", True)),
+        require_payment_approval=bool(fin.get("require_payment_approval", False)),
+        enable_budget_control=bool(fin.get("enable_budget_control", False)),
+        gstin=fin.get("gstin") or "",
+        default_payment_terms=fin.get("default_payment_terms") or "Net 30",
+        bank_reconciliation=_bank_reconciliation(fin.get("bank_reconciliation") or {}),
+        payment_allocation=_payment_allocation(fin.get("payment_allocation") or {}),
+    )
+
+
+async def bank_reconciliation_settings() -> BankReconciliationConfig:
+    return (await financial_settings()).bank_reconciliation
+
+
+async def payment_allocation_settings() -> PaymentAllocationConfig:
+    return (await financial_settings()).payment_allocation
@@ -1,33 +1,41 @@
 import os
 import logging
 from typing import Dict, Any
-from twilio.rest import Client
-from twilio.base.exceptions import TwilioRestException
+
+import aiohttp
+
+from services import outbound_http
 
 logger = logging.getLogger(__name__)
 
 class TwilioSmsService:
+    """Twilio Messages API over the shared outbound HTTP pool (services/outbound_http.py)"""
+
     def __init__(self) -> None:
         self.account_sid = os.environ.get('TWILIO_ACCOUNT_SID')
         self.auth_token = os.environ.get('TWILIO_AUTH_TOKEN')
         self.from_phone = os.environ.get('TWILIO_FROM_PHONE')
         if not (self.account_sid and self.auth_token and self.from_phone):
             raise RuntimeError('Twilio not configured: set TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_FROM_PHONE')
-        self.client = Client(self.account_sid, self.auth_token)
+        self.auth = aiohttp.BasicAuth(self.account_sid, self.auth_token)
 
-    def send_sms(self, to: str, body: str) -> Dict[str, Any]:
+    async def send_sms(self, to: str, body: str) -> Dict[str, Any]:
         try:
-            msg = self.client.messages.create(from_=self.from_phone, to=to, body=body)
-            return {
-                'success': True,
-                'sid': msg.sid,
-                'status': msg.status,
-                'to': msg.to,
-                'from': msg.from_,
-            }
-        except TwilioRestException as e:
-            logger.exception('Twilio send failed')
-            return {'success': False, 'error': e.msg, 'code': e.code, 'status': e.status}
+            resp = await outbound_http.request(
+                'twilio', 'POST', f'/2010-04-01/Accounts/{self.account_sid}/Messages.json',
+                data={'From': self.from_phone, 'To': to, 'Body': body}, auth=self.auth,
+            )
         except Exception as e:
             logger.exception('Twilio unexpected error')
-            return {'success': False, 'error': str(e)}
\ No newline at end of file
+            return {'success': False, 'error': str(e) or type(e).__name__}
+        msg = resp.body if isinstance(resp.body, dict) else {}
+        if resp.status >= 400:
+            logger.error(f"Twilio send failed: HTTP {resp.status}: {msg.get('message') or resp.body}")
+            return {'success': False, 'error': msg.get('message') or f'HTTP Error {resp.status}', 'code': msg.get('code'), 'status': resp.status}
+        return {
+            'success': True,
+            'sid': msg.get('sid'),
+            'status': msg.get('status'),
+            'to': msg.get('to'),
+            'from': msg.get('from'),
+        }
@@ -0,0 +1,149 @@
+"""
+Document Date Sort Keys
+Document dates arrive as 'YYYY-MM-DD' strings, ISO timestamps or BSON datetimes.
+List endpoints used to reconcile them per request with $addFields/$toDate, which
+defeats every index. Instead each write stores a canonical UTC datetime next to
+the raw date (invoice_date -> invoice_date_sort, ...), falling back to created_at
+exactly like the old $toDate/$ifNull expression did. Date-range filters and sorts
+then run on the stored key as plain index scans.
+
+Migration 0008 (or POST /api/admin/sort-keys/backfill, via backfill_sort_keys())
+fills the key on rows written before this existed; it only touches rows whose key
+is missing. Rows with no usable date get a null key, which sorts and filters like
+a missing one, so they are not picked up again.
+"""
+import logging
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# collection -> (raw date field, stored sort key)
+SORT_KEY_FIELDS: Dict[str, Tuple[str, str]] = {
+    "sales_invoices": ("invoice_date", "invoice_date_sort"),
+    "sales_orders": ("order_date", "order_date_sort"),
+    "sales_quotations": ("quotation_date", "quotation_date_sort"),
+    "purchase_orders": ("order_date", "order_date_sort"),
+    "purchase_invoices": ("invoice_date", "invoice_date_sort"),
+    "credit_notes": ("credit_note_date", "credit_note_date_sort"),
+    "debit_notes": ("debit_note_date", "debit_note_date_sort"),
+    "journal_entries": ("posting_date", "posting_date_sort"),
+    "payments": ("payment_date", "payment_date_sort"),
+}
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def to_sort_datetime(value: Any) -> Optional[datetime]:
+    """Canonical UTC datetime for a stored date value, None if it is empty/unparseable"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+    if isinstance(value, str):
+        text = value.strip()
+        if text.endswith("Z"):
+            text = text[:-1] + "+00:00"
+        try:
+            parsed = datetime.fromisoformat(text)
+        except ValueError:
+            return None
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    return None
+
+
+def sort_key_for(collection_name: str, doc: Dict[str, Any], fallback: Any = None) -> Optional[datetime]:
+    date_field, _ = SORT_KEY_FIELDS[collection_name]
+    return (
+        to_sort_datetime(doc.get(date_field))
+        or to_sort_datetime(doc.get("created_at"))
+        or to_sort_datetime(fallback)
+    )
+
+
+def with_sort_key(collection_name: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Set the sort key on a document about to be inserted (returns the same dict)"""
+    _, sort_field = SORT_KEY_FIELDS[collection_name]
+    doc[sort_field] = sort_key_for(collection_name, doc) or datetime.now(timezone.utc)
+    return doc
+
+
+def with_sort_key_update(collection_name: str, fields: Dict[str, Any], existing: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Refresh the sort key in a $set payload when it changes the document date"""
+    date_field, sort_field = SORT_KEY_FIELDS[collection_name]
+    if date_field in fields:
+        key = sort_key_for(collection_name, fields, (existing or {}).get("created_at"))
+        if key is not None:
+            fields[sort_field] = key
+    return fields
+
+
+def date_range_match(from_date: Optional[str], to_date: Optional[str]) -> Dict[str, datetime]:
+    """$gte/$lte bounds (whole UTC days) for a YYYY-MM-DD range; unparseable ends are ignored"""
+    bounds: Dict[str, datetime] = {}
+    if from_date:
+        try:
+            y, m, d = map(int, from_date.split('-'))
+            bounds['$gte'] = datetime(y, m, d, 0, 0, 0, tzinfo=timezone.utc)
+        except Exception:
+            pass
+    if to_date:
+        try:
+            y, m, d = map(int, to_date.split('-'))
+            bounds['$lte'] = datetime(y, m, d, 23, 59, 59, tzinfo=timezone.utc)
+        except Exception:
+            pass
+    return bounds
+
+
+def missing_sort_key(collection_name: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Query and projection for the rows a backfill has to visit"""
+    date_field, sort_field = SORT_KEY_FIELDS[collection_name]
+    return {sort_field: {"$exists": False}}, {date_field: 1, "created_at": 1}
+
+
+def sort_key_backfill_op(collection_name: str, doc: Dict[str, Any]) -> UpdateOne:
+    """Store the row's key; null when it has no usable date, so it is not visited again"""
+    _, sort_field = SORT_KEY_FIELDS[collection_name]
+    return UpdateOne({"_id": doc["_id"]}, {"$set": {sort_field: sort_key_for(collection_name, doc)}})
+
+
+async def backfill_collection(db, collection_name: str, batch_size: int = BACKFILL_BATCH_SIZE) -> Dict[str, Any]:
+    coll = db[collection_name]
+    scanned = updated = unparseable = 0
+    ops = []
+    query, projection = missing_sort_key(collection_name)
+    cursor = coll.find(query, projection, batch_size=batch_size)
+    async for doc in cursor:
+        scanned += 1
+        if sort_key_for(collection_name, doc) is None:
+            unparseable += 1
+        ops.append(sort_key_backfill_op(collection_name, doc))
+        if len(ops) >= batch_size:
+            result = await coll.bulk_write(ops, ordered=False)
+            updated += result.modified_count
+            ops = []
+    if ops:
+        result = await coll.bulk_write(ops, ordered=False)
+        updated += result.modified_count
+    return {"collection": collection_name, "scanned": scanned, "updated": updated, "unparseable": unparseable}
+
+
+async def backfill_sort_keys(db, batch_size: int = BACKFILL_BATCH_SIZE) -> Dict[str, Any]:
+    """Fill missing sort keys on every document collection"""
+    results = []
+    for collection_name in SORT_KEY_FIELDS:
+        try:
+            results.append(await backfill_collection(db, collection_name, batch_size))
+        except Exception as e:
+            logger.error(f"Sort key backfill failed for {collection_name}: {e}")
+            results.append({"collection": collection_name, "error": str(e)})
+    return {
+        "updated": sum(r.get("updated", 0) for r in results),
+        "unparseable": sum(r.get("unparseable", 0) for r in results),
+        "results": results,
+    }
@@ -0,0 +1,309 @@
+"""
+Type-ahead Suggestions
+In-memory prefix index behind /api/search/suggest, so the invoice, order and
+POS pickers do not run a three-field case-insensitive $regex (and a sort) on
+every keystroke.
+
+- keys are normalized (services/search_index.normalize: lowercase letters and
+  digits) customer names and phones, item names, codes and barcodes, and
+  document numbers; names are also keyed by each word, so "corp" finds
+  "Acme Corp"
+- keys live in one sorted array per group (customers, items, documents); a
+  prefix is answered with a bisect and a short scan, no database round trip
+- the write paths that maintain the search index (services/search_index.py)
+  update the affected entries in place; every SUGGEST_REFRESH_SECONDS the
+  whole index is reloaded from Mongo, which picks up writes made by other
+  processes and by code that bypasses those paths
+- a reload builds a new index beside the live one, sorting SUGGEST_BUILD_CHUNK
+  keys at a time and merging the sorted runs, yielding to the event loop
+  between chunks; writes seen while it runs are applied to the live index and
+  queued, then replayed on the new one right before it replaces the live one,
+  so a reload never brings back a deleted or outdated entry
+"""
+import asyncio
+import bisect
+import heapq
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from database import db
+from services.search_index import normalize, register_write_listener, words
+
+logger = logging.getLogger(__name__)
+
+SUGGEST_REFRESH_SECONDS = float(os.environ.get("SUGGEST_REFRESH_SECONDS", "300"))
+# Keys scanned per request before ranking; bounds the work of very short prefixes
+SUGGEST_SCAN_LIMIT = 200
+# Keys sorted or merged per event loop turn during a reload
+SUGGEST_BUILD_CHUNK = 5_000
+
+KeyRow = Tuple[str, bool, str]
+
+
+def _money(doc: Dict[str, Any], field_name: str) -> Optional[float]:
+    value = doc.get(field_name)
+    return float(value) if isinstance(value, (int, float)) else None
+
+
+@dataclass(frozen=True)
+class SuggestSource:
+    collection: str
+    type: str
+    # Fields keyed whole and word by word / whole only
+    name_fields: Tuple[str, ...]
+    code_fields: Tuple[str, ...]
+    text_field: str
+    payload: Callable[[Dict[str, Any]], Dict[str, Any]]
+    # Fields the payload reads
+    payload_fields: Tuple[str, ...]
+    group: str
+
+    def projection(self) -> Dict[str, int]:
+        return {name: 1 for name in ("_id", "id", self.text_field) + self.name_fields + self.code_fields + self.payload_fields}
+
+
+def _document(collection: str, type_: str, number_field: str, party_field: str) -> SuggestSource:
+    return SuggestSource(
+        collection, type_, (), (number_field,), number_field,
+        lambda d: {"subtitle": d.get(party_field, ""), "amount": _money(d, "total_amount"), "status": d.get("status")},
+        (party_field, "total_amount", "status"),
+        "documents",
+    )
+
+
+SOURCES: Tuple[SuggestSource, ...] = (
+    SuggestSource(
+        "customers", "customer", ("name",), ("phone",), "name",
+        lambda d: {"subtitle": d.get("email", ""), "phone": d.get("phone", "")},
+        ("email",),
+        "customers",
+    ),
+    SuggestSource(
+        "items", "item", ("name",), ("item_code", "barcode"), "name",
+        lambda d: {"subtitle": d.get("item_code", ""), "barcode": d.get("barcode"), "price": _money(d, "unit_price")},
+        ("unit_price",),
+        "items",
+    ),
+    _document("sales_invoices", "sales_invoice", "invoice_number", "customer_name"),
+    _document("sales_orders", "sales_order", "order_number", "customer_name"),
+    _document("sales_quotations", "quotation", "quotation_number", "customer_name"),
+    _document("purchase_orders", "purchase_order", "order_number", "supplier_name"),
+    _document("purchase_invoices", "purchase_invoice", "invoice_number", "supplier_name"),
+    _document("credit_notes", "credit_note", "credit_note_number", "customer_name"),
+    _document("debit_notes", "debit_note", "debit_note_number", "supplier_name"),
+)
+
+SOURCES_BY_COLLECTION: Dict[str, SuggestSource] = {s.collection: s for s in SOURCES}
+GROUPS = ("customers", "items", "documents")
+
+
+@dataclass
+class Suggestion:
+    ref: str
+    data: Dict[str, Any]
+    group: str
+    keys: List[Tuple[str, bool]] = field(default_factory=list)
+
+
+def suggestion_for(source: SuggestSource, doc: Dict[str, Any]) -> Optional[Suggestion]:
+    doc_id = doc.get("id") or str(doc.get("_id"))
+    text = doc.get(source.text_field)
+    if not text:
+        return None
+    keys: List[Tuple[str, bool]] = []
+    for name in source.name_fields:
+        whole = normalize(doc.get(name))
+        if whole:
+            keys.append((whole, False))
+        for word in words(doc.get(name))[1:]:
+            keys.append((word, True))
+    for name in source.code_fields:
+        code = normalize(doc.get(name))
+        if code:
+            keys.append((code, False))
+    data = {"id": doc_id, "type": source.type, "text": text, **source.payload(doc)}
+    return Suggestion(f"{source.collection}:{doc_id}", data, source.group, list(dict.fromkeys(keys)))
+
+
+class SuggestIndex:
+    """Per group, a sorted (key, is_word_key, ref) array; plus ref -> Suggestion"""
+
+    def __init__(self) -> None:
+        self._keys: Dict[str, List[KeyRow]] = {group: [] for group in GROUPS}
+        self._entries: Dict[str, Suggestion] = {}
+        self.loaded_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _install(self, entries: Dict[str, Suggestion], keys: Dict[str, List[KeyRow]]) -> None:
+        self._entries, self._keys = entries, keys
+        self.loaded_at = time.monotonic()
+
+    def replace_all(self, suggestions: List[Suggestion]) -> None:
+        """Build in one go (blocks for the whole sort; build_index() is the async variant)"""
+        entries = {s.ref: s for s in suggestions}
+        keys: Dict[str, List[KeyRow]] = {group: [] for group in GROUPS}
+        for s in entries.values():
+            keys[s.group].extend((key, word, s.ref) for key, word in s.keys)
+        for group_keys in keys.values():
+            group_keys.sort()
+        self._install(entries, keys)
+
+    def remove(self, ref: str) -> None:
+        old = self._entries.pop(ref, None)
+        if old is None:
+            return
+        group_keys = self._keys[old.group]
+        for key, word in old.keys:
+            i = bisect.bisect_left(group_keys, (key, word, ref))
+            if i < len(group_keys) and group_keys[i] == (key, word, ref):
+                del group_keys[i]
+
+    def put(self, suggestion: Suggestion) -> None:
+        self.remove(suggestion.ref)
+        self._entries[suggestion.ref] = suggestion
+        for key, word in suggestion.keys:
+            bisect.insort(self._keys[suggestion.group], (key, word, suggestion.ref))
+
+    def lookup(self, prefix: str, limit: int, groups: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Up to `limit` suggestions whose key starts with the normalized `prefix`: exact keys
+        first, then whole-name/code keys before word keys, shorter keys first"""
+        if not prefix:
+            return []
+        candidates: Dict[str, Tuple[bool, bool, int, str]] = {}
+        for group in groups or GROUPS:
+            group_keys = self._keys[group]
+            start = bisect.bisect_left(group_keys, (prefix,))
+            for key, word, ref in group_keys[start:start + SUGGEST_SCAN_LIMIT]:
+                if not key.startswith(prefix):
+                    break
+                rank = (key != prefix, word, len(key), key)
+                if ref not in candidates or rank < candidates[ref]:
+                    candidates[ref] = rank
+        best = sorted(candidates.items(), key=lambda item: item[1])[:limit]
+        return [self._entries[ref].data for ref, _ in best]
+
+
+async def build_index(suggestions: List[Suggestion]) -> SuggestIndex:
+    """A new index over `suggestions`, built in SUGGEST_BUILD_CHUNK slices so the
+    event loop keeps serving requests: sorted runs, then a k-way merge per group"""
+    entries: Dict[str, Suggestion] = {}
+    for n, s in enumerate(suggestions, 1):
+        entries[s.ref] = s
+        if n % SUGGEST_BUILD_CHUNK == 0:
+            await asyncio.sleep(0)
+    runs: Dict[str, List[List[KeyRow]]] = {group: [] for group in GROUPS}
+    pending: Dict[str, List[KeyRow]] = {group: [] for group in GROUPS}
+    for s in entries.values():
+        group_keys = pending[s.group]
+        group_keys.extend((key, word, s.ref) for key, word in s.keys)
+        if len(group_keys) >= SUGGEST_BUILD_CHUNK:
+            group_keys.sort()
+            runs[s.group].append(group_keys)
+            pending[s.group] = []
+            await asyncio.sleep(0)
+    keys: Dict[str, List[KeyRow]] = {}
+    for group in GROUPS:
+        if pending[group]:
+            pending[group].sort()
+            runs[group].append(pending[group])
+        merged: List[KeyRow] = []
+        for n, row in enumerate(heapq.merge(*runs[group]), 1):
+            merged.append(row)
+            if n % SUGGEST_BUILD_CHUNK == 0:
+                await asyncio.sleep(0)
+        keys[group] = merged
+    index = SuggestIndex()
+    index._install(entries, keys)
+    return index
+
+
+INDEX = SuggestIndex()
+_refresh_task: Optional[asyncio.Task] = None
+_load_lock = asyncio.Lock()
+# Writes seen while a reload runs, replayed on the new index before it goes live
+_pending_writes: Optional[List[Tuple[str, str, Optional[Dict[str, Any]]]]] = None
+
+
+def _apply_write(index: SuggestIndex, collection_name: str, doc_id: str, doc: Optional[Dict[str, Any]]) -> None:
+    source = SOURCES_BY_COLLECTION[collection_name]
+    suggestion = suggestion_for(source, doc) if doc else None
+    if suggestion is None:
+        index.remove(f"{collection_name}:{doc_id}")
+    else:
+        index.put(suggestion)
+
+
+async def _load() -> int:
+    global INDEX, _pending_writes
+    _pending_writes = []
+    try:
+        suggestions = []
+        for source in SOURCES:
+            async for doc in db[source.collection].find({}, source.projection()):
+                suggestion = suggestion_for(source, doc)
+                if suggestion is not None:
+                    suggestions.append(suggestion)
+        fresh = await build_index(suggestions)
+        # No await from here to the swap: nothing can slip between replay and swap
+        for write in _pending_writes:
+            _apply_write(fresh, *write)
+        INDEX = fresh
+    finally:
+        _pending_writes = None
+    return len(INDEX)
+
+
+async def load() -> int:
+    """(Re)build the whole index from Mongo"""
+    async with _load_lock:
+        return await _load()
+
+
+def _on_write(collection_name: str, doc_id: str, doc: Optional[Dict[str, Any]]) -> None:
+    """Refresh the suggestions of a document just written (doc None: deleted)"""
+    if collection_name not in SOURCES_BY_COLLECTION:
+        return
+    if _pending_writes is not None:
+        _pending_writes.append((collection_name, doc_id, doc))
+    if INDEX.loaded_at is not None:
+        _apply_write(INDEX, collection_name, doc_id, doc)
+
+
+register_write_listener(_on_write)
+
+
+async def _refresh_loop() -> None:
+    while True:
+        await asyncio.sleep(SUGGEST_REFRESH_SECONDS)
+        try:
+            await load()
+        except Exception as e:
+            logger.warning(f"Suggestion index refresh failed: {e}")
+
+
+async def start() -> None:
+    global _refresh_task
+    count = await load()
+    logger.info(f"Suggestion index loaded with {count} entries")
+    if _refresh_task is None:
+        _refresh_task = asyncio.create_task(_refresh_loop())
+
+
+async def stop() -> None:
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        _refresh_task = None
+
+
+async def suggest(prefix: str, limit: int, groups: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    if INDEX.loaded_at is None:
+        async with _load_lock:
+            if INDEX.loaded_at is None:
+                await _load()
+    return INDEX.lookup(normalize(prefix), limit, groups)
@@ -6,6 +6,11 @@ from datetime import datetime, timezone, timedelta
 import uuid
 from typing import Dict, Optional
 
+from services.account_roles import account_roles
+from services.general_ledger import record_entry
+from services.sequence_service import next_document_number
+from services.sort_keys import with_sort_key
+
 
 async def create_journal_entry_for_sales_invoice(
     invoice_id: str,
@@ -20,10 +25,11 @@ async def create_journal_entry_for_sales_invoice(
     Cr: Output Tax Payable (tax amount)
     """
     # Get accounts
-    receivables_account = await accounts_collection.find_one({"account_name": {"$regex": "Accounts Receivable", "$options": "i"}})
-    sales_account = await accounts_collection.find_one({"account_name": {"$regex": "Sales", "$options": "i"}})
+    roles = await account_roles(accounts_collection)
+    receivables_account = roles["receivable"]
+    sales_account = roles["sales"]
     # Use Output Tax Payable for sales tax (liability account)
-    output_tax_account = await accounts_collection.find_one({"account_name": {"$regex": "Output Tax", "$options": "i"}})
+    output_tax_account = roles["output_tax"]
     
     total_amt = invoice_data.get("total_amount", 0)
     tax_amt = invoice_data.get("tax_amount", 0)
@@ -75,7 +81,8 @@ async def create_journal_entry_for_sales_invoice(
             "created_at": datetime.now(timezone.utc),
             "updated_at": datetime.now(timezone.utc)
         }
-        await journal_entries_collection.insert_one(journal_entry)
+        await journal_entries_collection.insert_one(with_sort_key("journal_entries", journal_entry))
+        await record_entry(journal_entry)
         return je_id
     return None
 
@@ -89,7 +96,7 @@ async def create_payment_entry_for_sales_invoice(
     total_amt = invoice_data.get("total_amount", 0)
     payment_entry = {
         "id": payment_id,
-        "payment_number": f"REC-{datetime.now().strftime('%Y%m%d')}-{await payments_collection.count_documents({}) + 1:04d}",
+        "payment_number": await next_document_number("REC"),
         "payment_type": "Receive",
         "party_type": "Customer",
         "party_id": invoice_data.get("customer_id"),
@@ -108,7 +115,7 @@ async def create_payment_entry_for_sales_invoice(
         "created_at": datetime.now(timezone.utc),
         "updated_at": datetime.now(timezone.utc)
     }
-    await payments_collection.insert_one(payment_entry)
+    await payments_collection.insert_one(with_sort_key("payments", payment_entry))
     return payment_id
 
 
@@ -125,10 +132,11 @@ async def create_journal_entry_for_purchase_invoice(
     Cr: Accounts Payable (total)
     """
     # Get accounts
-    payables_account = await accounts_collection.find_one({"account_name": {"$regex": "Accounts Payable", "$options": "i"}})
-    purchases_account = await accounts_collection.find_one({"account_name": {"$regex": "Purchases", "$options": "i"}})
+    roles = await account_roles(accounts_collection)
+    payables_account = roles["payable"]
+    purchases_account = roles["purchases"]
     # Use Input Tax Credit for purchase tax (asset account)
-    input_tax_account = await accounts_collection.find_one({"account_name": {"$regex": "Input Tax", "$options": "i"}})
+    input_tax_account = roles["input_tax"]
     
     total_amt = invoice_data.get("total_amount", 0)
     tax_amt = invoice_data.get("tax_amount", 0)
@@ -180,7 +188,8 @@ async def create_journal_entry_for_purchase_invoice(
             "created_at": datetime.now(timezone.utc),
             "updated_at": datetime.now(timezone.utc)
         }
-        await journal_entries_collection.insert_one(journal_entry)
+        await journal_entries_collection.insert_one(with_sort_key("journal_entries", journal_entry))
+        await record_entry(journal_entry)
         return je_id
     return None
 
@@ -194,7 +203,7 @@ async def create_payment_entry_for_purchase_invoice(
     total_amt = invoice_data.get("total_amount", 0)
     payment_entry = {
         "id": payment_id,
-        "payment_number": f"PAY-{datetime.now().strftime('%Y%m%d')}-{await payments_collection.count_documents({}) + 1:04d}",
+        "payment_number": await next_document_number("PAY"),
         "payment_type": "Pay",
         "party_type": "Supplier",
         "party_id": invoice_data.get("supplier_id"),
@@ -213,7 +222,7 @@ async def create_payment_entry_for_purchase_invoice(
         "created_at": datetime.now(timezone.utc),
         "updated_at": datetime.now(timezone.utc)
     }
-    await payments_collection.insert_one(payment_entry)
+    await payments_collection.insert_one(with_sort_key("payments", payment_entry))
     return payment_id
 
 
@@ -225,9 +234,10 @@ async def create_journal_entry_for_credit_note(
 ) -> Optional[str]:
     """Create Journal Entry for Credit Note"""
     # Get accounts
-    sales_return_account = await accounts_collection.find_one({"account_name": {"$regex": "Sales Returns", "$options": "i"}})
-    receivables_account = await accounts_collection.find_one({"account_name": {"$regex": "Accounts Receivable", "$options": "i"}})
-    tax_account = await accounts_collection.find_one({"account_name": {"$regex": "Tax", "$options": "i"}})
+    roles = await account_roles(accounts_collection)
+    sales_return_account = roles["sales_returns"]
+    receivables_account = roles["receivable"]
+    tax_account = roles["tax"]
     
     total_amt = note_data.get("total_amount", 0)
     tax_amt = note_data.get("tax_amount", 0)
@@ -279,7 +289,8 @@ async def create_journal_entry_for_credit_note(
             "created_at": datetime.now(timezone.utc),
             "updated_at": datetime.now(timezone.utc)
         }
-        await journal_entries_collection.insert_one(journal_entry)
+        await journal_entries_collection.insert_one(with_sort_key("journal_entries", journal_entry))
+        await record_entry(journal_entry)
         return je_id
     return None
 
@@ -292,9 +303,10 @@ async def create_journal_entry_for_debit_note(
 ) -> Optional[str]:
     """Create Journal Entry for Debit Note"""
     # Get accounts
-    purchase_return_account = await accounts_collection.find_one({"account_name": {"$regex": "Purchase Returns", "$options": "i"}})
-    payables_account = await accounts_collection.find_one({"account_name": {"$regex": "Accounts Payable", "$options": "i"}})
-    tax_account = await accounts_collection.find_one({"account_name": {"$regex": "Tax", "$options": "i"}})
+    roles = await account_roles(accounts_collection)
+    purchase_return_account = roles["purchase_returns"]
+    payables_account = roles["payable"]
+    tax_account = roles["tax"]
     
     total_amt = note_data.get("total_amount", 0)
     tax_amt = note_data.get("tax_amount", 0)
@@ -346,6 +358,7 @@ async def create_journal_entry_for_debit_note(
             "created_at": datetime.now(timezone.utc),
             "updated_at": datetime.now(timezone.utc)
         }
-        await journal_entries_collection.insert_one(journal_entry)
+        await journal_entries_collection.insert_one(with_sort_key("journal_entries", journal_entry))
+        await record_entry(journal_entry)
         return je_id
     return None
@@ -39,7 +39,7 @@ const CreditNoteForm = ({ creditNoteId, onBack, onSave }) => {
         // Handle different response structures
         const items = Array.isArray(itemsRes) ? itemsRes : (itemsRes?.data || []);
         const customersList = Array.isArray(customersRes) ? customersRes : (customersRes?.data || []);
-        const invoicesList = Array.isArray(invoicesRes) ? invoicesRes : (invoicesRes?.data || []);
+        const invoicesList = Array.isArray(invoicesRes) ? invoicesRes : (invoicesRes?.data?.items || invoicesRes?.data || []);
         
         console.log('Loaded customers:', customersList);
         console.log('Loaded invoices:', invoicesList);
@@ -1,6 +1,6 @@
 import React from 'react';
 import { ChevronLeft, FileText, Search, Plus, Edit, Trash2, Eye, Calendar, User, DollarSign, ChevronUp, ChevronDown, Send, Mail, MessageSquare } from 'lucide-react';
-import { api } from '../services/api';
+import { api, sendUtils } from '../services/api';
 
 const CreditNotesList = ({ onBack, onViewCreditNote, onEditCreditNote, onCreateCreditNote }) => {
   const [search, setSearch] = React.useState('');
@@ -101,8 +101,9 @@ const CreditNotesList = ({ onBack, onViewCreditNote, onEditCreditNote, onCreateC
       const response = await api.post(`/sales/credit-notes/${sendingNote.id}/send`, payload);
       setShowSendModal(false);
       
-      // Show appropriate message based on response
-      const message = response.data?.message || 'Credit note sent successfully!';
+      // Queued sends: report the job's outcome, not the queueing
+      const job = await sendUtils.waitForSend(response.data);
+      const message = job ? sendUtils.describe(job, 'Credit note') : (response.data?.message || 'Credit note sent successfully!');
       alert(message);
       
       // Force reload after a short delay to ensure backend update is complete
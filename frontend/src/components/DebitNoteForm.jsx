@@ -39,7 +39,7 @@ const DebitNoteForm = ({ debitNoteId, onBack, onSave }) => {
         // Handle different response structures
         const items = Array.isArray(itemsRes) ? itemsRes : (itemsRes?.data || []);
         const suppliersList = Array.isArray(suppliersRes) ? suppliersRes : (suppliersRes?.data || []);
-        const invoicesList = Array.isArray(invoicesRes) ? invoicesRes : (invoicesRes?.data || []);
+        const invoicesList = Array.isArray(invoicesRes) ? invoicesRes : (invoicesRes?.data?.items || invoicesRes?.data || []);
         
         console.log('Loaded suppliers:', suppliersList);
         setMasterItems(items);
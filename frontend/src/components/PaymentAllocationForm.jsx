@@ -43,19 +43,21 @@ const PaymentAllocationForm = ({ payment, onClose, onSuccess }) => {
       
       // Debug: Log the invoices structure
       console.log('Raw invoice data:', data);
-      if (Array.isArray(data) && data.length > 0) {
+      // List endpoints return {items, total_count, ...}
+      const invoiceRows = Array.isArray(data) ? data : (data?.items || data?.invoices || []);
+      if (invoiceRows.length > 0) {
         console.log('First invoice sample:', {
-          id: data[0].id,
-          _id: data[0]._id,
-          invoice_number: data[0].invoice_number,
-          hasProperUUID: data[0].id && data[0].id.length > 30
+          id: invoiceRows[0].id,
+          _id: invoiceRows[0]._id,
+          invoice_number: invoiceRows[0].invoice_number,
+          hasProperUUID: invoiceRows[0].id && invoiceRows[0].id.length > 30
         });
       }
       
       // Filter for unpaid or partially paid invoices
       // Include invoices without payment_status field (default to unpaid)
       // Exclude invoices with 0 or null total_amount (nothing to allocate)
-      const unpaidInvoices = (Array.isArray(data) ? data : data.invoices || []).filter(
+      const unpaidInvoices = invoiceRows.filter(
         inv => {
           // Check payment status
           const isUnpaid = !inv.payment_status || inv.payment_status === 'Unpaid' || inv.payment_status === 'Partially Paid';
@@ -65,7 +67,7 @@ const PaymentAllocationForm = ({ payment, onClose, onSuccess }) => {
         }
       );
       
-      console.log('Loaded invoices:', unpaidInvoices.length, 'from', (Array.isArray(data) ? data : data.invoices || []).length, 'total (filtered out 0 amount invoices)');
+      console.log('Loaded invoices:', unpaidInvoices.length, 'from', invoiceRows.length, 'total (filtered out 0 amount invoices)');
       setInvoices(unpaidInvoices);
     } catch (err) {
       console.error('Failed to load invoices:', err);
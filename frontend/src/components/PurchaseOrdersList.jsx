@@ -1,7 +1,7 @@
 import React, { useState } from 'react';
 import { Plus, Search, Filter, Eye, Edit, Trash2, Calendar, User, DollarSign, ChevronLeft, Send, X, Info, RefreshCcw, FileText, TrendingUp } from 'lucide-react';
 import { useApi } from '../hooks/useApi';
-import { api } from '../services/api';
+import { api, sendUtils } from '../services/api';
 
 const PurchaseOrdersList = ({ onBack, onViewOrder, onEditOrder, onCreateOrder }) => {
   const [searchInput, setSearchInput] = useState('');
@@ -84,7 +84,10 @@ const PurchaseOrdersList = ({ onBack, onViewOrder, onEditOrder, onCreateOrder })
     setSending(true);
     try {
       const { data } = await api.post(`/purchase/orders/${sendTarget.id}/send`, { email: sendEmail, phone: sendPhone, include_pdf: includePdf, subject: emailSubject || undefined, message: emailMessage || undefined });
-      if (data && (data.success || data.message)) { alert('Purchase order sent successfully'); setSendOpen(false); refetch && refetch(); } else { alert(data?.detail || data?.message || 'Failed to send'); }
+      if (data && (data.success || data.message)) {
+        const job = await sendUtils.waitForSend(data);
+        alert(job ? sendUtils.describe(job, 'Purchase order') : 'Purchase order sent successfully'); setSendOpen(false); refetch && refetch();
+      } else { alert(data?.detail || data?.message || 'Failed to send'); }
     } catch (e) { console.error(e); alert('Error sending'); } finally { setSending(false); }
   };
 
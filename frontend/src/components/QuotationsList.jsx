@@ -1,7 +1,7 @@
 import React, { useState } from 'react';
 import { Plus, Search, Eye, Edit, Trash2, Calendar, User, DollarSign, ChevronLeft, Send, X } from 'lucide-react';
 import { useApi } from '../hooks/useApi';
-import { api } from '../services/api';
+import { api, sendUtils } from '../services/api';
 
 const QuotationsList = ({ onBack, onViewQuotation, onEditQuotation, onCreateQuotation }) => {
   const [searchTerm, setSearchTerm] = useState('');
@@ -68,7 +68,10 @@ const QuotationsList = ({ onBack, onViewQuotation, onEditQuotation, onCreateQuot
     setSending(true);
     try {
       const { data } = await api.post(`/quotations/${sendTarget.id}/send`, { email: sendEmail, phone: sendPhone, include_pdf: includePdf, subject: emailSubject||undefined, message: emailMessage||undefined });
-      if (data && (data.success || data.message)) { alert('Quotation sent successfully'); setSendOpen(false); refetch && refetch(); } else { alert((data?.detail || data?.message || 'Failed to send') + ((data?.errors && (data.errors.email||data.errors.sms)) ? ` ${data.errors.email||''} ${data.errors.sms||''}` : '')); refetch && refetch(); }
+      if (data && (data.success || data.message)) {
+        const job = await sendUtils.waitForSend(data);
+        alert(job ? sendUtils.describe(job, 'Quotation') : 'Quotation sent successfully'); setSendOpen(false); refetch && refetch();
+      } else { alert((data?.detail || data?.message || 'Failed to send') + ((data?.errors && (data.errors.email||data.errors.sms)) ? ` ${data.errors.email||''} ${data.errors.sms||''}` : '')); refetch && refetch(); }
     } catch(e){ console.error(e); alert('Error sending'); } finally { setSending(false); }
   };
 
@@ -16,7 +16,7 @@ import {
   X
 } from 'lucide-react';
 import { useApi } from '../hooks/useApi';
-import { api } from '../services/api';
+import { api, sendUtils } from '../services/api';
 
 const SalesInvoicesList = ({ onBack, onViewInvoice, onEditInvoice, onCreateInvoice }) => {
   const [searchTerm, setSearchTerm] = useState('');
@@ -114,7 +114,8 @@ const SalesInvoicesList = ({ onBack, onViewInvoice, onEditInvoice, onCreateInvoi
       });
       const data = await res.json();
       if (res.ok && data.success) {
-        alert('Invoice sent successfully via email' + (sendPhone ? ' (SMS sent if configured)' : ''));
+        const job = await sendUtils.waitForSend(data);
+        alert(job ? sendUtils.describe(job, 'Invoice') : 'Invoice sent successfully via email' + (sendPhone ? ' (SMS sent if configured)' : ''));
         setSendOpen(false);
         refetch && refetch();
       } else {
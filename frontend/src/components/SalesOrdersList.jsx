@@ -1,7 +1,7 @@
 import React, { useState } from 'react';
 import { Plus, Search, Filter, Eye, Edit, Trash2, Calendar, User, DollarSign, ChevronLeft, Send, X, FileText, TrendingUp } from 'lucide-react';
 import { useApi } from '../hooks/useApi';
-import { api } from '../services/api';
+import { api, sendUtils } from '../services/api';
 
 const SalesOrdersList = ({ onBack, onViewOrder, onEditOrder, onCreateOrder }) => {
   const [searchTerm, setSearchTerm] = useState('');
@@ -92,7 +92,10 @@ const SalesOrdersList = ({ onBack, onViewOrder, onEditOrder, onCreateOrder }) =>
     setSending(true);
     try {
       const { data } = await api.post(`/sales/orders/${sendTarget.id}/send`, { email: sendEmail, phone: sendPhone, include_pdf: includePdf, subject: emailSubject || undefined, message: emailMessage || undefined });
-      if (data && (data.success || data.message)) { alert('Order sent successfully'); setSendOpen(false); refetch && refetch(); } else { alert(data?.detail || data?.message || 'Failed to send'); }
+      if (data && (data.success || data.message)) {
+        const job = await sendUtils.waitForSend(data);
+        alert(job ? sendUtils.describe(job, 'Order') : 'Order sent successfully'); setSendOpen(false); refetch && refetch();
+      } else { alert(data?.detail || data?.message || 'Failed to send'); }
     } catch (e) { console.error(e); alert('Error sending'); } finally { setSending(false); }
   };
 
@@ -89,6 +89,40 @@ export const networkUtils = {
   }
 };
 
+// Document sends are queued as background jobs: the /send response only says
+// "queued" and carries the job id. Wait for the job before telling the user
+// the document went out.
+export const sendUtils = {
+  // The finished (or, after maxSeconds, still pending) job; null when the send was not queued
+  waitForSend: async (sendResponse, maxSeconds = 30) => {
+    if (!sendResponse?.queued || !sendResponse.job_id) return null;
+    const deadline = Date.now() + maxSeconds * 1000;
+    let job = { status: sendResponse.status || 'queued' };
+    while (Date.now() < deadline) {
+      const timeout = Math.max(1, Math.min(10, Math.ceil((deadline - Date.now()) / 1000)));
+      const { data } = await api.jobs.wait(sendResponse.job_id, timeout);
+      job = data;
+      if (job.status === 'succeeded' || job.status === 'dead') break;
+    }
+    return job;
+  },
+  // User-facing outcome of a send job for `label` (e.g. "Invoice")
+  describe: (job, label) => {
+    if (job.status === 'succeeded') {
+      const via = job.result?.sent_via || [];
+      const errors = job.result?.errors || {};
+      const failed = Object.entries(errors).filter(([channel]) => !via.includes(channel));
+      return `${label} sent${via.length ? ` via ${via.join(' and ')}` : ''}`
+        + failed.map(([channel, error]) => `. ${channel} failed: ${error}`).join('');
+    }
+    if (job.status === 'dead') {
+      return `${label} could not be sent: ${job.last_error || 'unknown error'}`;
+    }
+    return `${label} queued for sending${job.last_error ? ` (retrying after: ${job.last_error})` : ''}. `
+      + 'The send status on the list updates once it completes.';
+  },
+};
+
 // Enhanced API call wrapper with retry logic and better error handling
 const sleep = (ms) => new Promise(res => setTimeout(res, ms));
 const makeRequest = async (requestFn, retries = 2, attempt = 0) => {
@@ -280,6 +314,13 @@ export const api = {
     // Initialization
     initialize: () => makeRequest(() => apiClient.post('/financial/initialize')),
   },
+
+  // Background jobs (document sends, report exports)
+  jobs: {
+    get: (id) => makeRequest(() => apiClient.get(`/jobs/${id}`)),
+    // Long poll: returns once the job succeeded or was dead-lettered, or after `timeout` seconds
+    wait: (id, timeout = 10) => makeRequest(() => apiClient.get(`/jobs/${id}/wait`, { params: { timeout }, timeout: (timeout + 10) * 1000 })),
+  },
   get: (endpoint, config = {}) => makeRequest(() => apiClient.get(endpoint, config)),
   post: (endpoint, data, config = {}) => makeRequest(() => apiClient.post(endpoint, data, config)),
   put: (endpoint, data, config = {}) => makeRequest(() => apiClient.put(endpoint, data, config)),
@@ -0,0 +1,152 @@
+"""
+Month-end balance snapshots (backend/services/balance_snapshots.py) against an
+in-memory mongomock database wrapped to look like the Motor collections.
+"""
+import asyncio
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import mongomock
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from services import balance_snapshots  # noqa: E402
+
+
+class _Cursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, n):
+        self._cursor = self._cursor.limit(n)
+        return self
+
+    async def to_list(self, length=None):
+        return list(self._cursor)[:length] if length else list(self._cursor)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._cursor:
+            yield doc
+
+
+class _AsyncCollection:
+    """The subset of the Motor collection API balance_snapshots uses"""
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.name = collection.name
+
+    async def find_one(self, *args, session=None, **kwargs):
+        return self._collection.find_one(*args, **kwargs)
+
+    async def insert_one(self, doc, session=None):
+        return self._collection.insert_one(doc)
+
+    async def insert_many(self, docs, session=None):
+        return self._collection.insert_many(docs)
+
+    async def update_one(self, *args, session=None, **kwargs):
+        return self._collection.update_one(*args, **kwargs)
+
+    async def delete_many(self, query, session=None):
+        return self._collection.delete_many(query)
+
+    async def bulk_write(self, ops, ordered=True, session=None):
+        return self._collection.bulk_write(ops, ordered=ordered)
+
+    def find(self, *args, session=None, **kwargs):
+        return _Cursor(self._collection.find(*args, **kwargs))
+
+    def aggregate(self, pipeline, session=None):
+        return _Cursor(self._collection.aggregate(pipeline))
+
+
+@pytest.fixture
+def collections(monkeypatch):
+    db = mongomock.MongoClient(tz_aware=True).db
+    snapshots = _AsyncCollection(db.account_snapshots)
+    lines = _AsyncCollection(db.gl_entries)
+    monkeypatch.setattr(balance_snapshots, "account_snapshots_collection", snapshots)
+    monkeypatch.setattr(balance_snapshots, "gl_entries_collection", lines)
+    return snapshots, lines
+
+
+def _line(entry_id, account_id, day, debit=0.0, credit=0.0):
+    return {
+        "journal_entry_id": entry_id,
+        "account_id": account_id,
+        "posting_date": datetime(2025, 5, day, tzinfo=timezone.utc),
+        "debit": debit,
+        "credit": credit,
+    }
+
+
+async def _snapshot(snapshots, account_id, period):
+    return await snapshots.find_one({"account_id": account_id, "period": period}, {"_id": 0, "debit": 1, "credit": 1})
+
+
+def test_rebuild_drops_accounts_whose_lines_were_removed(collections):
+    snapshots, lines = collections
+
+    async def scenario():
+        await lines.insert_many([
+            _line("e1", "cash", 3, debit=100.0),
+            _line("e1", "sales", 3, credit=100.0),
+            _line("e2", "cash", 10, debit=50.0),
+            _line("e2", "x", 10, credit=50.0),
+        ])
+        await balance_snapshots.ensure_built("2025-06")
+        assert await _snapshot(snapshots, "x", "2025-06") == {"debit": 0.0, "credit": 50.0}
+
+        # What general_ledger.remove_entries(["e2"]) does
+        await lines.delete_many({"journal_entry_id": "e2"})
+        await balance_snapshots.invalidate_from(datetime(2025, 5, 10, tzinfo=timezone.utc))
+        await balance_snapshots.ensure_built("2025-06")
+
+        for period in ("2025-05", "2025-06"):
+            assert await _snapshot(snapshots, "x", period) is None
+            assert await _snapshot(snapshots, "cash", period) == {"debit": 100.0, "credit": 0.0}
+            assert await _snapshot(snapshots, "sales", period) == {"debit": 0.0, "credit": 100.0}
+
+    asyncio.run(scenario())
+
+
+def test_build_waits_for_another_workers_lease(collections, monkeypatch):
+    snapshots, lines = collections
+    monkeypatch.setattr(balance_snapshots, "SNAPSHOT_BUILD_WAIT_SECONDS", 0)
+
+    async def scenario():
+        await lines.insert_many([
+            _line("e1", "cash", 3, debit=100.0),
+            _line("e1", "sales", 3, credit=100.0),
+        ])
+        await balance_snapshots.ensure_built("2025-06")
+
+        # Another worker is rebuilding from May
+        await balance_snapshots.invalidate_from(datetime(2025, 5, 3, tzinfo=timezone.utc))
+        await snapshots.update_one({"_id": balance_snapshots.STATE_ID}, {"$set": {
+            "build_owner": "other-worker",
+            "build_lease_expires_at": datetime(2999, 1, 1, tzinfo=timezone.utc),
+        }})
+        assert await balance_snapshots.ensure_built("2025-06") is None
+        # Its rows were left alone
+        assert await _snapshot(snapshots, "cash", "2025-06") == {"debit": 100.0, "credit": 0.0}
+
+        # Its lease expired: this worker takes over
+        await snapshots.update_one({"_id": balance_snapshots.STATE_ID}, {"$set": {
+            "build_lease_expires_at": datetime(2000, 1, 1, tzinfo=timezone.utc),
+        }})
+        assert await balance_snapshots.ensure_built("2025-06") is not None
+        state = await snapshots.find_one({"_id": balance_snapshots.STATE_ID})
+        assert state["built_through"] == "2025-06" and state["build_owner"] is None
+
+    asyncio.run(scenario())